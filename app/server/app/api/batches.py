@@ -0,0 +1,204 @@
+"""批量处理：提交一个目录或 zip 内的多篇 .docx，逐篇走流式处理（解析 → 分句 → 检索 → 审校）。
+
+- 每篇建文档行（documents.batch_id 关联批次）并入队一个 stream 任务；全局并发由任务队列
+  jobs.concurrency.stream 控制，单篇内审校并发仍为 review.concurrency。
+  分句器 / embedding 模型 / 知识库索引均为进程级单例，各篇共享，不重复加载。
+- 进度：每篇取其最近一个任务的状态与检查点（最近 progress 事件，块序 / 块数）；汇总给出
+  各状态篇数、整体进度（各篇进度均值）、corrections 数、耗时与吞吐（篇 / 小时，按已结束篇数计）。
+- 目录中遍历子目录（同旧版 traverse_folder），跳过非 .docx 与 Word 临时文件（~$ 开头）；
+  zip 只读取 .docx 条目内容，不解压到磁盘（无路径穿越问题）。
+"""
+from __future__ import annotations
+
+import io
+import json
+import os
+import zipfile
+from datetime import datetime
+from pathlib import Path
+
+from fastapi import APIRouter, HTTPException, UploadFile
+from pydantic import BaseModel
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from app.api.documents import require_llm_config, store_document
+from app.core.db import engine
+from app.core.jobqueue import enqueue
+from app.models import Batch, Correction, Document, Job
+
+router = APIRouter(prefix="/batches", tags=["batches"])
+
+_FINISHED_JOB_STATUSES = ("done", "error", "cancelled", "interrupted", "resumed")
+
+
+class FolderBatch(BaseModel):
+    path: str
+    name: str | None = None
+
+
+def _is_manuscript(name: str) -> bool:
+    base = os.path.basename(name)
+    return base.lower().endswith(".docx") and not base.startswith("~$")
+
+
+def _submit(name: str, source: str, files: list[tuple[str, bytes | Path]]) -> dict:
+    """建批次与各篇文档行，逐篇入队 stream 任务。files: [(显示文件名, 内容或路径)]"""
+    if not files:
+        raise HTTPException(status_code=400, detail="未找到 .docx 文件")
+    require_llm_config()
+    with Session(engine) as session:
+        batch = Batch(name=name, source=source)
+        session.add(batch)
+        session.commit()
+        batch_id = batch.id
+    for filename, content in files:
+        if isinstance(content, Path):
+            with content.open("rb") as fh:
+                doc = store_document(filename, fh, batch_id=batch_id)
+        else:
+            doc = store_document(filename, io.BytesIO(content), batch_id=batch_id)
+        enqueue("stream", document_id=doc.id, params={"batch_id": batch_id})
+    return batch_summary(batch_id)
+
+
+@router.post("", status_code=201)
+def submit_zip_batch(file: UploadFile, name: str | None = None) -> dict:
+    """上传 zip，其中每篇 .docx 入队流式处理，返回批次汇总。"""
+    filename = file.filename or "batch.zip"
+    data = file.file.read()
+    if not zipfile.is_zipfile(io.BytesIO(data)):
+        raise HTTPException(status_code=400, detail="仅支持 .zip 文件")
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        files = [
+            (info.filename, archive.read(info))
+            for info in sorted(archive.infolist(), key=lambda i: i.filename)
+            if not info.is_dir()
+            and _is_manuscript(info.filename)
+            and not info.filename.startswith("__MACOSX/")
+        ]
+    return _submit(name or Path(filename).stem, filename, files)
+
+
+@router.post("/folder", status_code=201)
+def submit_folder_batch(body: FolderBatch) -> dict:
+    """提交本机目录（含子目录）中的全部 .docx，返回批次汇总。"""
+    root = Path(body.path).expanduser()
+    if not root.is_dir():
+        raise HTTPException(status_code=400, detail=f"目录不存在: {body.path}")
+    files: list[tuple[str, bytes | Path]] = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if _is_manuscript(filename):
+                path = Path(dirpath) / filename
+                files.append((path.relative_to(root).as_posix(), path))
+    return _submit(body.name or root.name, str(root), files)
+
+
+def _document_progress(job: Job | None) -> float:
+    if job is None:
+        return 0.0
+    if job.status in _FINISHED_JOB_STATUSES:
+        return 1.0
+    checkpoint = json.loads(job.checkpoint_json) if job.checkpoint_json else {}
+    blocks = checkpoint.get("blocks")
+    if not blocks or checkpoint.get("block_idx") is None:
+        return 0.0
+    return min(1.0, (checkpoint["block_idx"] + 1) / blocks)
+
+
+def batch_summary(batch_id: str, with_documents: bool = True) -> dict:
+    with Session(engine) as session:
+        batch = session.get(Batch, batch_id)
+        if batch is None:
+            raise HTTPException(status_code=404, detail="批次不存在")
+        docs = list(
+            session.exec(
+                select(Document).where(Document.batch_id == batch_id).order_by(Document.filename)
+            ).all()
+        )
+        doc_ids = [d.id for d in docs]
+        latest_jobs: dict[str, Job] = {}
+        corrections: dict[str, int] = {}
+        if doc_ids:
+            for job in session.exec(
+                select(Job).where(Job.document_id.in_(doc_ids)).order_by(Job.created_at)
+            ).all():
+                latest_jobs[job.document_id] = job  # 按创建时间覆盖：保留最近一个任务
+            corrections = dict(
+                session.exec(
+                    select(Correction.document_id, func.count(Correction.id))
+                    .join(Document, Document.id == Correction.document_id)
+                    .where(Document.batch_id == batch_id)
+                    .group_by(Correction.document_id)
+                ).all()
+            )
+
+        counts = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+        items = []
+        finished_at: datetime | None = None
+        for doc in docs:
+            job = latest_jobs.get(doc.id)
+            job_status = job.status if job is not None else None
+            if job_status == "done":
+                counts["done"] += 1
+            elif job_status in _FINISHED_JOB_STATUSES:
+                counts["failed"] += 1
+            elif job_status in ("running", "paused"):
+                counts["running"] += 1
+            else:
+                counts["queued"] += 1
+            if job_status in _FINISHED_JOB_STATUSES:
+                finished_at = max(finished_at or job.updated_at, job.updated_at)
+            items.append(
+                {
+                    "id": doc.id,
+                    "filename": doc.filename,
+                    "status": doc.status,
+                    "error": doc.error,
+                    "job_id": job.id if job is not None else None,
+                    "job_status": job_status,
+                    "progress": round(_document_progress(job), 3),
+                    "corrections": corrections.get(doc.id, 0),
+                }
+            )
+
+    total = len(docs)
+    finished = counts["done"] + counts["failed"]
+    complete = total > 0 and finished == total
+    end = finished_at if complete and finished_at is not None else datetime.utcnow()
+    elapsed = max(0.0, (end - batch.created_at).total_seconds())
+    summary = {
+        "id": batch.id,
+        "name": batch.name,
+        "source": batch.source,
+        "created_at": batch.created_at.isoformat(),
+        "status": "done" if complete else "running",
+        "total": total,
+        **counts,
+        "progress": round(sum(i["progress"] for i in items) / total, 3) if total else 0.0,
+        "corrections": sum(i["corrections"] for i in items),
+        "elapsed_seconds": round(elapsed, 1),
+        # 吞吐：已结束篇数 / 小时（含失败篇，反映处理能力）
+        "docs_per_hour": round(finished / elapsed * 3600, 1) if finished and elapsed > 0 else None,
+        "finished_at": finished_at.isoformat() if complete and finished_at else None,
+    }
+    if with_documents:
+        summary["documents"] = items
+    return summary
+
+
+@router.get("")
+def list_batches() -> list[dict]:
+    with Session(engine) as session:
+        batch_ids = list(
+            session.exec(select(Batch.id).order_by(Batch.created_at.desc())).all()
+        )
+    return [batch_summary(batch_id, with_documents=False) for batch_id in batch_ids]
+
+
+@router.get("/{batch_id}")
+def get_batch(batch_id: str) -> dict:
+    """批次汇总 + 各篇进度（轮询用；单篇实时事件见 /api/jobs/{job_id}/events）。"""
+    return batch_summary(batch_id)
@@ -3,6 +3,7 @@
 - decision 语义沿用旧版：accepted=采纳修订(2) / rejected=保留原文(1) / custom=自定义(3)；
   pending = 撤销回待决定。每条决定即写库（decided_at），可随时关闭续作。
 - 全部决定完成（无 pending）时文档状态 → manual_done；撤销回 pending 时 → pending_manual。
+  决定、文档聚合计数（pipeline/stats.py）与状态收口同一事务提交，收口只读计数不扫 corrections。
 """
 from __future__ import annotations
 
@@ -15,8 +16,10 @@ from pydantic import BaseModel
 from sqlmodel import Session, select
 
 from app.core.db import engine
-from app.models import Block, Correction, Document, Sentence
-from app.pipeline.review import refresh_document_review_status
+from app.models import Correction, Document
+from app.pipeline.common import record_change
+from app.pipeline.review import settle_review_status
+from app.pipeline.stats import set_decision
 
 router = APIRouter(tags=["corrections"])
 
@@ -57,14 +60,10 @@ def decide_correction(correction_id: int, payload: DecisionPayload) -> dict:
         correction = session.get(Correction, correction_id)
         if correction is None:
             raise HTTPException(status_code=404, detail="correction 不存在")
-        sentence = session.get(Sentence, correction.sentence_id)
-        block = session.get(Block, sentence.block_id) if sentence is not None else None
-        doc = session.get(Document, block.document_id) if block is not None else None
+        doc = session.get(Document, correction.document_id)
         if doc is None:
             raise HTTPException(status_code=404, detail="correction 关联文档不存在")
-        doc_id = doc.id
-
-        correction.decision = payload.decision
+        set_decision(session, correction, payload.decision)
         if payload.decision == "pending":  # 撤销
             correction.decided_at = None
             correction.custom_text = None
@@ -74,11 +73,20 @@ def decide_correction(correction_id: int, payload: DecisionPayload) -> dict:
                 payload.custom_text.strip() if payload.decision == "custom" else None
             )
         session.add(correction)
+        record_change(
+            session,
+            doc.id,
+            "decision",
+            {
+                "correction_ids": [correction.id],
+                "decision": correction.decision,
+                "custom_text": correction.custom_text,
+            },
+        )
+        status = settle_review_status(session, doc)  # 决定与状态收口同一事务
         session.commit()
         session.refresh(correction)
-        result = _correction_json(correction)
-
-    return {"correction": result, "document_status": refresh_document_review_status(doc_id)}
+        return {"correction": _correction_json(correction), "document_status": status}
 
 
 class BatchFilter(BaseModel):
@@ -99,17 +107,8 @@ def batch_decide(document_id: str, payload: BatchPayload) -> dict:
         doc = session.get(Document, document_id)
         if doc is None:
             raise HTTPException(status_code=404, detail="文档不存在")
-        block_ids = [
-            b.id
-            for b in session.exec(select(Block).where(Block.document_id == document_id)).all()
-        ]
-        if not block_ids:
-            return {"affected": 0, "document_status": doc.status}
-        sentence_ids = list(
-            session.exec(select(Sentence.id).where(Sentence.block_id.in_(block_ids))).all()
-        )
         stmt = select(Correction).where(
-            Correction.sentence_id.in_(sentence_ids),
+            Correction.document_id == document_id,
             Correction.decision == payload.filter.decision,
         )
         if payload.filter.severity:
@@ -120,10 +119,17 @@ def batch_decide(document_id: str, payload: BatchPayload) -> dict:
         now = datetime.utcnow()
         decision = "accepted" if payload.action == "accept" else "rejected"
         for row in rows:
-            row.decision = decision
+            set_decision(session, row, decision)
             row.custom_text = None
             row.decided_at = now
             session.add(row)
+        if rows:
+            record_change(
+                session,
+                document_id,
+                "decision",
+                {"correction_ids": [r.id for r in rows], "decision": decision, "custom_text": None},
+            )
+        status = settle_review_status(session, doc)
         session.commit()
-        affected = len(rows)
-    return {"affected": affected, "document_status": refresh_document_review_status(document_id)}
+        return {"affected": len(rows), "document_status": status}
@@ -1,41 +1,62 @@
-"""文档接口：上传 / 列表 / 运行流水线（M2: ingest+segment）/ 详情 / parsed.md / 删除 / M3 检索 / M4 审校。"""
+"""文档接口：上传 / 列表 / 运行流水线（M2: ingest+segment）/ 详情 / parsed.md / 删除 / M3 检索 / M4 审校 /
+流式处理（分句 → 检索 → 审校逐块流水线）。
+
+长操作（流水线 / 检索 / 审校 / 导出）一律入持久化任务队列（core/jobqueue.py），接口立即返回
+job_id；处理函数在本模块以 @job_handler 注册，结果见 /api/jobs/{job_id}（result）。
+"""
 from __future__ import annotations
 
+import hashlib
 import json
 import shutil
-import threading
-from datetime import datetime
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import BinaryIO
 from uuid import uuid4
 
-from fastapi import APIRouter, HTTPException, UploadFile
+from fastapi import APIRouter, HTTPException, Request, Response, UploadFile
 from fastapi.responses import FileResponse, PlainTextResponse
-from sqlalchemy import delete
+from sqlalchemy import delete, func
 from sqlmodel import Session, select
 
 from app.core.db import engine
-from app.core.joblog import create_job, finish_job, make_emit, record_event
+from app.core.jobcontrol import JobCancelled
+from app.core.joblog import finish_job, record_event
+from app.core.jobqueue import QueuedJob, active_job, enqueue, job_handler
 from app.core.user_settings import llm_config, retrieve_enabled, review_references
 from app.llm.client import LLMNotConfiguredError
 from app.models import (
     Block,
     Correction,
+    CorrectionStat,
     Document,
+    DocumentChange,
     Evidence,
     Job,
     JobEvent,
     Query,
     Sentence,
 )
-from app.pipeline.common import project_dir, set_document_status
+from app.pipeline.common import change_json, project_dir, set_document_status
 from app.pipeline.export import EXPORTABLE_STATUSES, export_document, list_exports
 from app.pipeline.ingest import ingest_document
 from app.pipeline.review import RETRYABLE_STATUSES, review_document
 from app.pipeline.segment import segment_document
+from app.pipeline.snapshot import CorrectionSnap, EvidenceSnap, load_snapshot
+from app.pipeline.stats import document_stats
+from app.pipeline.stream import stream_document
 from app.rag import store as rag_store
 from app.rag.retrieve import PLACEHOLDER_RE, retrieve_document
 
+try:  # 可选依赖：详情大响应体的快速 JSON 序列化，缺失时回退标准库
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
 router = APIRouter(prefix="/documents", tags=["documents"])
 
+_DETAIL_MAX_LIMIT = 500  # 详情分页每页块数上限
+
 
 def _doc_json(doc: Document) -> dict:
     return {
@@ -54,14 +75,6 @@ def _get_doc_or_404(session: Session, document_id: str) -> Document:
     return doc
 
 
-def _parse_evidence_ids(raw: str) -> list:
-    try:
-        value = json.loads(raw or "[]")
-        return value if isinstance(value, list) else []
-    except json.JSONDecodeError:
-        return []
-
-
 @router.get("")
 def list_documents() -> list[dict]:
     with Session(engine) as session:
@@ -74,144 +87,271 @@ def upload_document(file: UploadFile) -> dict:
     filename = file.filename or "document.docx"
     if not filename.lower().endswith(".docx"):
         raise HTTPException(status_code=400, detail="仅支持 .docx 文件")
+    return _doc_json(store_document(filename, file.file))
+
+
+def store_document(filename: str, data: BinaryIO, batch_id: str | None = None) -> Document:
+    """落盘 projects/<doc_id>/original.docx 并建文档行（status=uploaded）。"""
     doc_id = uuid4().hex
     dest = project_dir(doc_id) / "original.docx"
     with dest.open("wb") as out:
-        shutil.copyfileobj(file.file, out)
+        shutil.copyfileobj(data, out)
     with Session(engine) as session:
-        doc = Document(id=doc_id, filename=filename, status="uploaded")
+        doc = Document(id=doc_id, filename=filename, status="uploaded", batch_id=batch_id)
         session.add(doc)
         session.commit()
         session.refresh(doc)
-        return _doc_json(doc)
+        return doc
+
+
+def _ensure_no_active_job(document_id: str) -> None:
+    """同一文档同时只允许一个排队 / 执行中的任务（防重复提交）。"""
+    job = active_job(document_id=document_id)
+    if job is not None:
+        raise HTTPException(
+            status_code=409, detail=f"该文档已有任务排队或执行中（{job.type}，{job.id}）"
+        )
 
 
 @router.post("/{document_id}/run")
 def run_pipeline(document_id: str) -> dict:
-    """同步执行 M2 流水线（ingest + segment），可重复运行（重跑自动清理旧 blocks/sentences）。"""
+    """M2 流水线（ingest + segment）入队，立即返回 job_id；进度与结果见 /api/jobs/{job_id}。
+
+    可重复运行：重跑按句子对齐增量更新，未变句子的 id、证据与 corrections 保留。
+    """
     with Session(engine) as session:
-        _get_doc_or_404(session, document_id)
-        job = Job(document_id=document_id, type="pipeline", status="running")
-        session.add(job)
-        session.commit()
-        session.refresh(job)
-        job_id = job.id
+        doc = _get_doc_or_404(session, document_id)
+        status = doc.status
+    _ensure_no_active_job(document_id)
+    job_id = enqueue("pipeline", document_id=document_id)
+    return {"job_id": job_id, "status": status, "queued": True}
 
-    def record_event(event: str, data: dict) -> None:
-        with Session(engine) as session:
-            session.add(
-                JobEvent(job_id=job_id, event=event, data=json.dumps(data, ensure_ascii=False))
-            )
-            session.commit()
 
-    def finish_job(status: str) -> None:
-        with Session(engine) as session:
-            row = session.get(Job, job_id)
-            if row is not None:
-                row.status = status
-                row.updated_at = datetime.utcnow()
-                session.add(row)
-                session.commit()
+@job_handler("pipeline", concurrency=2)
+def _pipeline_job(job: QueuedJob) -> dict:
+    document_id = job.document_id
+    job.emit("start", {"stage": "ingest"})
+    ingest_result = ingest_document(document_id)
+    job.emit("stage_done", {"stage": "ingest", **ingest_result})
+
+    job.emit("start", {"stage": "segment"})
+    segment_result = segment_document(document_id)
+    job.emit("stage_done", {"stage": "segment", **segment_result})
+
+    job.emit("done", {})
+    return {
+        "status": segment_result["status"],
+        "blocks": segment_result["blocks"],
+        "sentences": segment_result["sentences"],
+        "segmenter": segment_result["segmenter"],
+        "cache": segment_result.get("cache"),
+        "delta": segment_result["delta"],
+    }
+
+
+def _json_response(payload: dict, headers: dict[str, str]) -> Response:
+    """大响应体快速序列化：有 orjson 用之（快数倍），否则回退标准库紧凑输出。"""
+    if orjson is not None:
+        body = orjson.dumps(payload)
+    else:
+        body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return Response(content=body, media_type="application/json", headers=headers)
 
+
+def _cache_headers(
+    document_id: str, revision: int, revised_at: datetime, variant: str
+) -> dict[str, str]:
+    """ETag = 文档修订号 + 请求变体（分页 / 过滤参数）；Last-Modified = 最近修订时间。"""
+    tag = hashlib.sha1(f"{document_id}?{variant}".encode("utf-8")).hexdigest()[:12]
+    return {
+        "ETag": f'W/"{revision}-{tag}"',
+        "Last-Modified": format_datetime(revised_at.replace(tzinfo=timezone.utc), usegmt=True),
+        "Cache-Control": "no-cache",  # 可缓存，但每次须带条件请求校验
+    }
+
+
+def _not_modified(request: Request, headers: dict[str, str], revised_at: datetime) -> bool:
+    """条件请求：If-None-Match 优先（弱比较）；无则按 If-Modified-Since（秒级）。"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+        return "*" in tags or headers["ETag"].removeprefix("W/") in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if not if_modified_since:
+        return False
     try:
-        record_event("start", {"stage": "ingest"})
-        ingest_result = ingest_document(document_id)
-        record_event("stage_done", {"stage": "ingest", **ingest_result})
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        return False
+    return revised_at.replace(microsecond=0, tzinfo=timezone.utc) <= since
 
-        record_event("start", {"stage": "segment"})
-        segment_result = segment_document(document_id)
-        record_event("stage_done", {"stage": "segment", **segment_result})
 
-        record_event("done", {})
-        finish_job("done")
-    except Exception as exc:
-        record_event("error", {"message": str(exc)})
-        finish_job("error")
-        raise HTTPException(status_code=500, detail=str(exc)) from exc
+def _correction_detail_json(c: CorrectionSnap) -> dict:
+    return {
+        "id": c.id,
+        "original": c.original,
+        "suggestion": c.suggestion,
+        "error_type": c.error_type,
+        "severity": c.severity,
+        "explanation": c.explanation,
+        "evidence_ids": list(c.evidence_ids),
+        "decision": c.decision,
+        "custom_text": c.custom_text,
+        "decided_at": c.decided_at.isoformat() if c.decided_at else None,
+    }
+
 
+@router.get("/{document_id}/detail")
+def document_detail(
+    document_id: str,
+    request: Request,
+    offset: int = 0,
+    limit: int | None = None,
+    pending_only: bool = False,
+    severity: str | None = None,
+) -> Response:
+    """block→sentence 树（每句带 corrections 与 evidence）。
+
+    分页：offset / limit 为块序区间 [offset, offset+limit)，不传 limit 即整篇；next_offset 为下一页
+    起点（已到末尾为 null）。过滤：pending_only 只留有 pending corrections 的句子，severity 只留
+    该级别的 corrections 及其句子；过滤后无句子的块不返回（块序区间不变，翻页稳定）。
+    缓存：ETag / Last-Modified 取自文档修订号，未变化的页对条件请求回 304（不加载内容）。
+    """
+    if offset < 0 or (limit is not None and not 1 <= limit <= _DETAIL_MAX_LIMIT):
+        raise HTTPException(
+            status_code=400, detail=f"offset 须 ≥ 0，limit 须在 1..{_DETAIL_MAX_LIMIT}"
+        )
+    with Session(engine) as session:
+        # 先读修订号再读内容：并发写入时内容只会比 ETag 新，不会把旧内容标成新版本
+        head = session.exec(
+            select(Document.revision, Document.revised_at, Document.created_at).where(
+                Document.id == document_id
+            )
+        ).first()
+        if head is None:
+            raise HTTPException(status_code=404, detail="文档不存在")
+        revision, revised_at, created_at = head
+        revised_at = revised_at or created_at
+        variant = f"offset={offset}&limit={limit}&pending_only={pending_only}&severity={severity}"
+        headers = _cache_headers(document_id, revision, revised_at, variant)
+        if _not_modified(request, headers, revised_at):
+            return Response(status_code=304, headers=headers)
+        total_blocks = session.exec(
+            select(func.count(Block.id)).where(Block.document_id == document_id)
+        ).one()
+        snapshot = load_snapshot(
+            document_id,
+            block_range=(offset, offset + limit) if limit is not None else None,
+            session=session,
+        )
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="文档不存在")
+
+    filtering = pending_only or severity is not None
+
+    def keep(c: CorrectionSnap) -> bool:
+        return (not pending_only or c.decision == "pending") and (
+            severity is None or c.severity == severity
+        )
+
+    blocks = []
+    for block in snapshot.blocks:
+        sentences = []
+        for s in block.sentences:
+            corrections = [c for c in s.corrections if keep(c)] if filtering else s.corrections
+            if filtering and not corrections:
+                continue
+            sentences.append(
+                {
+                    "id": s.id,
+                    "idx": s.idx,
+                    "text": s.text,
+                    "corrections": [_correction_detail_json(c) for c in corrections],
+                    "evidence": [_evidence_json(e) for e in s.evidence],
+                }
+            )
+        if filtering and not sentences:
+            continue
+        blocks.append(
+            {
+                "id": block.id,
+                "idx": block.idx,
+                "chapter": block.chapter,
+                "is_reference": block.is_reference,
+                "text": block.text,
+                "sentences": sentences,
+            }
+        )
+    end = offset + limit if limit is not None else total_blocks
+    payload = {
+        "id": snapshot.id,
+        "filename": snapshot.filename,
+        "status": snapshot.status,
+        "error": snapshot.error,
+        "usage": json.loads(snapshot.usage_json) if snapshot.usage_json else None,
+        "revision": revision,
+        "total_blocks": total_blocks,
+        "offset": offset,
+        "limit": limit,
+        "next_offset": end if end < total_blocks else None,
+        "blocks": blocks,
+    }
+    return _json_response(payload, headers)
+
+
+@router.get("/{document_id}/stats")
+def document_correction_stats(document_id: str) -> dict:
+    """corrections 计数（按 decision，及按 severity / error_type 分组）：只读聚合计数行。"""
     with Session(engine) as session:
         doc = _get_doc_or_404(session, document_id)
-        return {
-            "job_id": job_id,
-            "status": doc.status,
-            "blocks": segment_result["blocks"],
-            "sentences": segment_result["sentences"],
-            "segmenter": segment_result["segmenter"],
-        }
+        return {"id": doc.id, "status": doc.status, **document_stats(session, document_id)}
 
 
-@router.get("/{document_id}/detail")
-def document_detail(document_id: str) -> dict:
+@router.get("/{document_id}/changes")
+def document_changes(document_id: str, since: int = 0, limit: int = 1000) -> dict:
+    """变更流：修订号 > since 的变更记录（按修订号升序，至多 limit 条）。
+
+    reset=true 表示 since 之后的部分记录已不在流水中（重新分句时清除更早记录，或早于变更流
+    的旧修订），客户端应全量重取详情；has_more=true 时以返回的最后一个 revision 为 since 续取。
+    """
+    if since < 0 or not 1 <= limit <= 5000:
+        raise HTTPException(status_code=400, detail="since 须 ≥ 0，limit 须在 1..5000")
     with Session(engine) as session:
         doc = _get_doc_or_404(session, document_id)
-        blocks = session.exec(
-            select(Block).where(Block.document_id == document_id).order_by(Block.idx)
-        ).all()
-        result_blocks = []
-        for block in blocks:
-            sentences = session.exec(
-                select(Sentence).where(Sentence.block_id == block.id).order_by(Sentence.idx)
+        changes = list(
+            session.exec(
+                select(DocumentChange)
+                .where(DocumentChange.document_id == document_id, DocumentChange.revision > since)
+                .order_by(DocumentChange.revision)
+                .limit(limit + 1)
             ).all()
-            result_sentences = []
-            for s in sentences:
-                corrections = session.exec(
-                    select(Correction).where(Correction.sentence_id == s.id).order_by(Correction.id)
-                ).all()
-                evidences = session.exec(
-                    select(Evidence)
-                    .where(Evidence.sentence_id == s.id)
-                    .order_by(Evidence.score.desc(), Evidence.id)
-                ).all()
-                result_sentences.append(
-                    {
-                        "id": s.id,
-                        "idx": s.idx,
-                        "text": s.text,
-                        "corrections": [
-                            {
-                                "id": c.id,
-                                "original": c.original,
-                                "suggestion": c.suggestion,
-                                "error_type": c.error_type,
-                                "severity": c.severity,
-                                "explanation": c.explanation,
-                                "evidence_ids": _parse_evidence_ids(c.evidence_ids),
-                                "decision": c.decision,
-                                "custom_text": c.custom_text,
-                                "decided_at": c.decided_at.isoformat() if c.decided_at else None,
-                            }
-                            for c in corrections
-                        ],
-                        "evidence": [
-                            {
-                                "id": e.id,
-                                "source": e.source,
-                                "chunk_text": e.chunk_text,
-                                "doc_name": e.doc_name,
-                                "score": e.score,
-                                "rank": e.rank,
-                            }
-                            for e in evidences
-                        ],
-                    }
-                )
-            result_blocks.append(
-                {
-                    "id": block.id,
-                    "idx": block.idx,
-                    "chapter": block.chapter,
-                    "is_reference": block.is_reference,
-                    "text": block.text,
-                    "sentences": result_sentences,
-                }
-            )
-        return {
-            "id": doc.id,
-            "filename": doc.filename,
-            "status": doc.status,
-            "error": doc.error,
-            "blocks": result_blocks,
-        }
+        )
+        revision = doc.revision
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    oldest = changes[0].revision if changes else None
+    reset = revision > since and (oldest is None or oldest > since + 1)
+    return {
+        "id": document_id,
+        "revision": revision,
+        "since": since,
+        "reset": reset,
+        "has_more": has_more,
+        "changes": [change_json(c) for c in changes],
+    }
+
+
+def _evidence_json(e: EvidenceSnap) -> dict:
+    return {
+        "id": e.id,
+        "source": e.source,
+        "chunk_text": e.chunk_text,
+        "doc_name": e.doc_name,
+        "score": e.score,
+        "rank": e.rank,
+    }
 
 
 @router.get("/{document_id}/parsed", response_class=PlainTextResponse)
@@ -228,19 +368,16 @@ def document_parsed(document_id: str) -> str:
 def delete_document(document_id: str) -> dict:
     with Session(engine) as session:
         doc = _get_doc_or_404(session, document_id)
-        block_ids = [
-            b.id for b in session.exec(select(Block).where(Block.document_id == document_id)).all()
-        ]
-        if block_ids:
-            sentence_ids = session.exec(
-                select(Sentence.id).where(Sentence.block_id.in_(block_ids))
-            ).all()
-            if sentence_ids:
-                session.exec(delete(Query).where(Query.sentence_id.in_(sentence_ids)))
-                session.exec(delete(Evidence).where(Evidence.sentence_id.in_(sentence_ids)))
-                session.exec(delete(Correction).where(Correction.sentence_id.in_(sentence_ids)))
-            session.exec(delete(Sentence).where(Sentence.block_id.in_(block_ids)))
-        session.exec(delete(Block).where(Block.document_id == document_id))
+        for model in (
+            Query,
+            Evidence,
+            Correction,
+            CorrectionStat,
+            DocumentChange,
+            Sentence,
+            Block,
+        ):
+            session.exec(delete(model).where(model.document_id == document_id))
         job_ids = session.exec(select(Job.id).where(Job.document_id == document_id)).all()
         if job_ids:
             session.exec(delete(JobEvent).where(JobEvent.job_id.in_(job_ids)))
@@ -252,104 +389,97 @@ def delete_document(document_id: str) -> dict:
 
 
 @router.post("/{document_id}/retrieve")
-def retrieve_document_evidence(document_id: str) -> dict:
-    """M3 检索：对全文档待审校句子执行 查询重写 + 3+3 混合检索（同步执行 + jobs 记录）。
+def retrieve_document_evidence(document_id: str, incremental: bool = False) -> dict:
+    """M3 检索入队：对全文档待审校句子执行 查询重写 + 3+3 混合检索，立即返回 job_id。
 
     状态机：segmented → retrieving → retrieved（可重跑，自动清旧 queries/evidence）。
+    incremental=true：不清旧结果，只检索尚无 queries 的句子（重新分句后新增 / 改动的句子）。
     """
     if not retrieve_enabled():
         raise HTTPException(status_code=400, detail="检索已在设置中关闭（retrieve.enabled=false）")
     with Session(engine) as session:
         doc = _get_doc_or_404(session, document_id)
-        if doc.status not in ("segmented", "retrieved", "failed"):
+        if doc.status not in ("segmented", "retrieved", "failed", "interrupted"):
             raise HTTPException(
                 status_code=400, detail=f"当前状态 {doc.status} 不能检索，请先完成解析分句"
             )
+        status = doc.status
+    _ensure_no_active_job(document_id)
+    return _enqueue_retrieve(document_id, resume=incremental, status=status)
+
+
+def _enqueue_retrieve(document_id: str, resume: bool, status: str) -> dict:
     if rag_store.count_chunks() == 0:
         raise HTTPException(status_code=400, detail="知识库为空，请先在知识库页上传并索引参考文档")
+    job_id = enqueue("retrieve", document_id=document_id, params={"resume": resume})
+    return {"job_id": job_id, "status": status, "queued": True}
+
 
-    job_id = create_job("retrieve", document_id=document_id)
+@job_handler("retrieve", max_attempts=1, on_lost="interrupt", cancellable=True)
+def _retrieve_job(job: QueuedJob) -> dict:
+    document_id = job.document_id
     try:
         set_document_status(document_id, "retrieving")
-        result = retrieve_document(document_id, emit=make_emit(job_id))
-        set_document_status(document_id, "retrieved")
-        finish_job(job_id, "done")
+        result = retrieve_document(
+            document_id, emit=job.emit, resume=bool(job.params.get("resume"))
+        )
+    except JobCancelled:
+        # 已检索的句子保留：有结果即 retrieved（其余句子审校时按无证据处理），否则回到 segmented
+        with Session(engine) as session:
+            any_done = session.exec(
+                select(Query.id).where(Query.document_id == document_id).limit(1)
+            ).first()
+        set_document_status(document_id, "retrieved" if any_done is not None else "segmented")
+        raise
     except Exception as exc:
-        record_event(job_id, "error", {"message": str(exc)})
-        finish_job(job_id, "error")
         set_document_status(document_id, "failed", str(exc))
-        raise HTTPException(status_code=500, detail=str(exc)) from exc
-    return {"job_id": job_id, "status": "retrieved", **result}
+        raise
+    set_document_status(document_id, "retrieved")
+    return {"status": "retrieved", **result}
 
 
 @router.get("/{document_id}/evidence")
 def document_evidence(document_id: str) -> dict:
     """按 block→sentence 分组返回每句的重写问题（queries）与 3+3 证据（evidence）。"""
     include_references = review_references()
-    with Session(engine) as session:
-        doc = _get_doc_or_404(session, document_id)
-        blocks = session.exec(
-            select(Block).where(Block.document_id == document_id).order_by(Block.idx)
-        ).all()
-        result_blocks = []
-        for block in blocks:
-            block_skipped = block.is_reference and not include_references
-            sentences = session.exec(
-                select(Sentence).where(Sentence.block_id == block.id).order_by(Sentence.idx)
-            ).all()
-            result_sentences = []
-            for s in sentences:
-                queries = session.exec(
-                    select(Query).where(Query.sentence_id == s.id).order_by(Query.idx)
-                ).all()
-                evidences = session.exec(
-                    select(Evidence)
-                    .where(Evidence.sentence_id == s.id)
-                    .order_by(Evidence.score.desc())
-                ).all()
-                result_sentences.append(
+    snapshot = load_snapshot(document_id, corrections=False, queries=True)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="文档不存在")
+    return {
+        "id": snapshot.id,
+        "filename": snapshot.filename,
+        "status": snapshot.status,
+        "blocks": [
+            {
+                "id": block.id,
+                "idx": block.idx,
+                "chapter": block.chapter,
+                "is_reference": block.is_reference,
+                "sentences": [
                     {
                         "id": s.id,
                         "idx": s.idx,
                         "text": s.text,
-                        "skipped": block_skipped or PLACEHOLDER_RE.match(s.text) is not None,
-                        "queries": [{"id": q.id, "idx": q.idx, "text": q.text} for q in queries],
-                        "evidence": [
-                            {
-                                "id": e.id,
-                                "source": e.source,
-                                "chunk_text": e.chunk_text,
-                                "doc_name": e.doc_name,
-                                "score": e.score,
-                                "rank": e.rank,
-                            }
-                            for e in evidences
-                        ],
+                        "skipped": (block.is_reference and not include_references)
+                        or PLACEHOLDER_RE.match(s.text) is not None,
+                        "queries": [{"id": q.id, "idx": q.idx, "text": q.text} for q in s.queries],
+                        "evidence": [_evidence_json(e) for e in s.evidence],
                     }
-                )
-            result_blocks.append(
-                {
-                    "id": block.id,
-                    "idx": block.idx,
-                    "chapter": block.chapter,
-                    "is_reference": block.is_reference,
-                    "sentences": result_sentences,
-                }
-            )
-        return {
-            "id": doc.id,
-            "filename": doc.filename,
-            "status": doc.status,
-            "blocks": result_blocks,
-        }
+                    for s in block.sentences
+                ],
+            }
+            for block in snapshot.blocks
+        ],
+    }
 
 
 @router.post("/{document_id}/export")
 def export_document_api(document_id: str) -> dict:
-    """M5 导出：同步生成双版本 docx（清洁版 _审校修订1_ / 留痕版 _审校修订2_）。
+    """M5 导出入队：生成双版本 docx（清洁版 _审校修订1_ / 留痕版 _审校修订2_），立即返回 job_id。
 
     前置状态 pending_manual / manual_done / done；无 accepted/custom 决定时导出原文
-    （adopted=0）。产物路径与 adopted 数记 documents.exports_json 与 job_events。
+    （adopted=0）。产物路径与 adopted 数记 documents.exports_json 与 job_events，
+    完整结果见 /api/jobs/{job_id} 的 result。
     """
     with Session(engine) as session:
         doc = _get_doc_or_404(session, document_id)
@@ -358,14 +488,15 @@ def export_document_api(document_id: str) -> dict:
                 status_code=400,
                 detail=f"当前状态 {doc.status} 不能导出，请先完成人工审校",
             )
-    job_id = create_job("export", document_id=document_id)
-    try:
-        result = export_document(document_id, emit=make_emit(job_id))
-        finish_job(job_id, "done")
-    except Exception as exc:
-        finish_job(job_id, "error")
-        raise HTTPException(status_code=500, detail=str(exc)) from exc
-    return {"job_id": job_id, **result}
+        status = doc.status
+    _ensure_no_active_job(document_id)
+    job_id = enqueue("export", document_id=document_id)
+    return {"job_id": job_id, "status": status, "queued": True}
+
+
+@job_handler("export", concurrency=2)
+def _export_job(job: QueuedJob) -> dict:
+    return export_document(job.document_id, emit=job.emit)
 
 
 @router.get("/{document_id}/exports")
@@ -401,7 +532,7 @@ def download_document_export(document_id: str, kind: int) -> FileResponse:
 
 @router.post("/{document_id}/review")
 def review_document_api(document_id: str, force: bool = False) -> dict:
-    """M4 审校：后台线程执行 LLM 结构化审校，进度经 /api/jobs/{job_id}/events（SSE）推送。
+    """M4 审校入队：工作线程执行 LLM 结构化审校，进度经 /api/jobs/{job_id}/events（SSE）推送。
 
     状态机：segmented/retrieved/pending_manual/manual_done/failed(重试) → reviewing →
     pending_manual（无 pending 决定时直接 manual_done）；失败 → failed 并记录原因。
@@ -413,6 +544,13 @@ def review_document_api(document_id: str, force: bool = False) -> dict:
             raise HTTPException(
                 status_code=400, detail=f"当前状态 {doc.status} 不能审校，请先完成解析分句"
             )
+    require_llm_config()
+    _ensure_no_active_job(document_id)
+    return _enqueue_review(document_id, force=force)
+
+
+def require_llm_config() -> None:
+    """LLM 三要素缺失 → 400（审校 / 流式处理 / 批量处理入队前校验，数据与状态均不变）。"""
     try:
         cfg = llm_config()
         missing = [k for k in ("base_url", "api_key", "model") if not cfg[k]]
@@ -423,15 +561,82 @@ def review_document_api(document_id: str, force: bool = False) -> dict:
             status_code=400, detail=f"{exc}，请到设置页填写 llm.base_url / llm.api_key / llm.model"
         ) from exc
 
-    job_id = create_job("review", document_id=document_id)
-
-    def work() -> None:
-        try:
-            review_document(document_id, emit=make_emit(job_id), force=force)
-            finish_job(job_id, "done")
-        except Exception as exc:
-            record_event(job_id, "error", {"message": str(exc)})
-            finish_job(job_id, "error")
 
-    threading.Thread(target=work, daemon=True).start()
+def _enqueue_review(document_id: str, force: bool) -> dict:
+    job_id = enqueue("review", document_id=document_id, params={"force": force})
     return {"job_id": job_id, "status": "reviewing"}
+
+
+@job_handler("review", concurrency=2, max_attempts=1, on_lost="interrupt", cancellable=True)
+def _review_job(job: QueuedJob) -> dict:
+    # 文档状态与 done / cancelled / error 事件由 review_document 收口
+    return review_document(job.document_id, emit=job.emit, force=bool(job.params.get("force")))
+
+
+@router.post("/{document_id}/process")
+def process_document(document_id: str) -> dict:
+    """流式处理入队：解析后逐块 分句 → 检索 → 审校 流水线执行（pipeline/stream.py），立即返回 job_id。
+
+    块一分句完成即进入检索、随后送审，corrections 逐块可见；每块每阶段一条 block_stage 事件。
+    整篇重跑（同 /run 清理旧结果）；状态机 → reviewing → pending_manual / manual_done。
+    LLM 未配置 → 400；检索关闭或知识库为空时不检索，直接纯 LLM 审校。
+    """
+    with Session(engine) as session:
+        doc = _get_doc_or_404(session, document_id)
+        status = doc.status
+    require_llm_config()
+    _ensure_no_active_job(document_id)
+    job_id = enqueue("stream", document_id=document_id)
+    return {"job_id": job_id, "status": status, "queued": True}
+
+
+@job_handler("stream", max_attempts=1, on_lost="interrupt", cancellable=True)
+def _stream_job(job: QueuedJob) -> dict:
+    # 文档状态与 done / cancelled / error 事件由 stream_document 收口
+    return stream_document(
+        job.document_id, emit=job.emit, resume=bool(job.params.get("resume"))
+    )
+
+
+@router.post("/{document_id}/resume")
+def resume_document_job(document_id: str) -> dict:
+    """继续被服务重启中断的检索 / 审校 / 流式处理，或中途失败的流式处理（文档状态 interrupted），
+    重新入队。
+
+    从已落库的单元结果接着做：检索跳过已有 queries 的句子；审校以非 force 重跑，
+    已完成的块经输入指纹复用（原任务为 force 时人工决定已在其开始时清除，无需重复）；
+    流式处理以 resume 重跑（重新分句按句子对齐保留已提交的块，检索 / 审校同上）。
+    """
+    with Session(engine) as session:
+        doc = _get_doc_or_404(session, document_id)
+        if doc.status != "interrupted":
+            raise HTTPException(status_code=400, detail=f"当前状态 {doc.status} 没有可继续的任务")
+        # 流式处理失败时任务为 error、文档为 interrupted（已提交的块保留，见 pipeline/stream.py）
+        job = session.exec(
+            select(Job)
+            .where(Job.document_id == document_id, Job.status.in_(("interrupted", "error")))
+            .order_by(Job.created_at.desc())
+        ).first()
+        if job is None or (job.status == "error" and job.type != "stream"):
+            raise HTTPException(status_code=400, detail="未找到被中断的任务，请重新执行检索或审校")
+        if job.type not in ("retrieve", "review", "stream"):
+            raise HTTPException(status_code=400, detail=f"任务类型 {job.type} 不支持继续")
+        if job.type == "retrieve" and not retrieve_enabled():
+            raise HTTPException(status_code=400, detail="检索已在设置中关闭（retrieve.enabled=false）")
+        job_id, job_type = job.id, job.type
+        params = json.loads(job.params_json) if job.params_json else {}
+    if job_type in ("review", "stream"):
+        require_llm_config()
+    _ensure_no_active_job(document_id)
+    if job_type == "retrieve":
+        result = _enqueue_retrieve(document_id, resume=True, status="interrupted")
+    elif job_type == "stream":
+        # 沿用原参数（批量处理的 batch_id 等），批次进度按文档最近任务统计
+        stream_job = enqueue("stream", document_id=document_id, params={**params, "resume": True})
+        result = {"job_id": stream_job, "status": "interrupted", "queued": True}
+    else:
+        result = _enqueue_review(document_id, force=False)
+    # 原任务收口为 resumed（不是失败），resumed 事件指向接续的新任务，避免重复继续
+    record_event(job_id, "resumed", {"resumed_by": result["job_id"]})
+    finish_job(job_id, "resumed")
+    return {"resumed_from": job_id, **result}
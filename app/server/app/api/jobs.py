@@ -1,4 +1,6 @@
-"""任务 SSE 事件流：从 job_events 表轮询回放，job 结束后发 done 关闭。"""
+"""任务状态与 SSE 事件流：订阅进程内事件总线实时推送，晚加入的连接先从 job_events 表回放，
+job 结束后发 done 关闭；关联文档的任务同时推送该文档的变更记录（change 事件，同
+GET /api/documents/{id}/changes）；排队 / 运行中任务的取消，运行中任务的暂停 / 继续。"""
 from __future__ import annotations
 
 import asyncio
@@ -10,12 +12,18 @@ from fastapi.responses import StreamingResponse
 from sqlmodel import Session, select
 
 from app.core.db import engine
-from app.models import Job, JobEvent
+from app.core.eventbus import document_topic
+from app.core.jobcontrol import get_control
+from app.core.joblog import LiveEvent, record_event, set_job_status, subscribe_job
+from app.core.jobqueue import cancel_pending
+from app.models import Document, DocumentChange, Job, JobEvent
+from app.pipeline.common import change_json
 
 router = APIRouter(prefix="/jobs", tags=["jobs"])
 
-_POLL_INTERVAL = 0.5  # 秒
+_STATUS_CHECK_INTERVAL = 5.0  # 秒：无消息时查一次任务状态（兜底，正常由总线通知终态）
 _MAX_SECONDS = 1800  # SSE 最长保活（兜底防悬挂）
+_TERMINAL_STATUSES = ("done", "error", "cancelled", "interrupted", "resumed")
 
 
 def _fetch_events(job_id: str, after_id: int) -> list[JobEvent]:
@@ -29,6 +37,32 @@ def _fetch_events(job_id: str, after_id: int) -> list[JobEvent]:
         )
 
 
+def _fetch_changes(document_id: str, after_revision: int) -> list[DocumentChange]:
+    with Session(engine) as session:
+        return list(
+            session.exec(
+                select(DocumentChange)
+                .where(
+                    DocumentChange.document_id == document_id,
+                    DocumentChange.revision > after_revision,
+                )
+                .order_by(DocumentChange.revision)
+            ).all()
+        )
+
+
+def _fetch_job_document(job_id: str) -> str | None:
+    with Session(engine) as session:
+        job = session.get(Job, job_id)
+        return job.document_id if job is not None else None
+
+
+def _fetch_document_revision(document_id: str) -> int:
+    with Session(engine) as session:
+        doc = session.get(Document, document_id)
+        return doc.revision if doc is not None else 0
+
+
 def _fetch_job_status(job_id: str) -> str | None:
     with Session(engine) as session:
         job = session.get(Job, job_id)
@@ -37,7 +71,8 @@ def _fetch_job_status(job_id: str) -> str | None:
 
 @router.get("/{job_id}")
 def job_status(job_id: str) -> dict:
-    """任务状态查询（轮询用；实时事件走下方 SSE）。"""
+    """任务状态查询（轮询用；实时事件走下方 SSE）。result 为处理函数返回值（终态 done 后可用），
+    attempts / max_attempts / run_after / error 反映任务队列的重试情况。"""
     with Session(engine) as session:
         job = session.get(Job, job_id)
         if job is None:
@@ -50,33 +85,135 @@ def job_status(job_id: str) -> dict:
             "kb_document_id": job.kb_document_id,
             "created_at": job.created_at.isoformat(),
             "updated_at": job.updated_at.isoformat(),
+            "usage": json.loads(job.usage_json) if job.usage_json else None,
+            "params": json.loads(job.params_json) if job.params_json else None,
+            "checkpoint": json.loads(job.checkpoint_json) if job.checkpoint_json else None,
+            "result": json.loads(job.result_json) if job.result_json else None,
+            "attempts": job.attempts,
+            "max_attempts": job.max_attempts,
+            "run_after": job.run_after.isoformat() if job.run_after else None,
+            "error": job.last_error,
         }
 
 
+def _running_control(job_id: str):
+    with Session(engine) as session:
+        if session.get(Job, job_id) is None:
+            raise HTTPException(status_code=404, detail="任务不存在")
+    control = get_control(job_id)
+    if control is None:
+        raise HTTPException(status_code=400, detail="任务未在运行，或该类任务不支持取消 / 暂停")
+    return control
+
+
+@router.post("/{job_id}/cancel")
+def cancel_job(job_id: str) -> dict:
+    """协作式取消：当前块/句结束前中止在途 LLM 请求，已完成部分保留，任务以 cancelled 收口。
+
+    排队中（尚未被认领）的任务直接置 cancelled。
+    """
+    if cancel_pending(job_id):
+        return {"id": job_id, "status": "cancelled"}
+    control = _running_control(job_id)
+    record_event(job_id, "cancelling", {})  # 先于取消发布：保证排在任务的 cancelled 事件之前
+    control.cancel()
+    return {"id": job_id, "status": "cancelling"}
+
+
+@router.post("/{job_id}/pause")
+def pause_job(job_id: str) -> dict:
+    """暂停：在途单元照常完成，之后不再开始新的块/句，直到 resume 或 cancel。"""
+    control = _running_control(job_id)
+    control.pause()
+    set_job_status(job_id, "paused")
+    record_event(job_id, "paused", {})
+    return {"id": job_id, "status": "paused"}
+
+
+@router.post("/{job_id}/resume")
+def resume_job(job_id: str) -> dict:
+    control = _running_control(job_id)
+    control.resume()
+    set_job_status(job_id, "running")
+    record_event(job_id, "resumed", {})
+    return {"id": job_id, "status": "running"}
+
+
 @router.get("/{job_id}/events")
-async def job_events(job_id: str) -> StreamingResponse:
-    """SSE：先回放已有事件，再每 0.5s 轮询增量；job done/error 且事件冲刷完毕后发 done 关闭。"""
+async def job_events(job_id: str, since: int | None = None) -> StreamingResponse:
+    """SSE：订阅事件总线后先从 job_events 表回放已有事件（晚加入的连接），补上尚未写库的事件，
+    之后实时推送（无轮询）；收到终态通知（done/error/cancelled/interrupted/resumed）后发 done 关闭。
+
+    任务关联文档时，修订号 > since 的文档变更以 change 事件推送（缺省从连接时的修订号起，
+    只推新变更）；客户端据此增量更新本地详情，无需重取全文。
+    """
     if _fetch_job_status(job_id) is None:
         raise HTTPException(status_code=404, detail="任务不存在")
+    document_id = await asyncio.to_thread(_fetch_job_document, job_id)
+
+    def job_event(event: LiveEvent | JobEvent) -> str:
+        # data 本身即 JSON 字符串，直接作为 SSE data 负载
+        return f"event: {event.event}\ndata: {event.data}\n\n"
+
+    def change_event(payload: dict) -> str:
+        return f"event: change\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+    def done_event(event: str, status: str | None) -> str:
+        return f"event: {event}\ndata: {json.dumps({'status': status})}\n\n"
 
     async def event_stream():
-        last_id = 0
-        deadline = time.monotonic() + _MAX_SECONDS
-        while True:
-            rows = await asyncio.to_thread(_fetch_events, job_id, last_id)
-            for row in rows:
-                # data 列本身即 JSON 字符串，直接作为 SSE data 负载
-                yield f"event: {row.event}\ndata: {row.data}\n\n"
+        # 先订阅再读库：订阅前已发布的事件在表内或 backlog 中，之后的经订阅送达，按 id 去重
+        topics = (document_topic(document_id),) if document_id is not None else ()
+        subscription, backlog = subscribe_job(job_id, *topics)
+        try:
+            last_id = 0
+            for row in await asyncio.to_thread(_fetch_events, job_id, 0):
+                yield job_event(row)
                 last_id = row.id
+            for live in backlog:
+                if live.id > last_id:
+                    yield job_event(live)
+                    last_id = live.id
+            last_revision = 0
+            if document_id is not None:
+                revision = await asyncio.to_thread(_fetch_document_revision, document_id)
+                last_revision = revision if since is None else since
+                if last_revision < revision:
+                    for change in await asyncio.to_thread(
+                        _fetch_changes, document_id, last_revision
+                    ):
+                        yield change_event(change_json(change))
+                        last_revision = change.revision
             status = await asyncio.to_thread(_fetch_job_status, job_id)
-            if status in ("done", "error"):
-                # 终态：事件已全部冲刷（jobs 写事件先于终态落库）
-                yield f"event: done\ndata: {json.dumps({'status': status})}\n\n"
-                return
-            if time.monotonic() > deadline:
-                yield f"event: timeout\ndata: {json.dumps({'status': status})}\n\n"
-                return
-            await asyncio.sleep(_POLL_INTERVAL)
+            deadline = time.monotonic() + _MAX_SECONDS
+            while True:
+                if status in _TERMINAL_STATUSES:
+                    messages = subscription.drain()
+                else:
+                    messages = await subscription.get(_STATUS_CHECK_INTERVAL)
+                    if not messages:
+                        # 兜底：未经总线通知的状态变化（如其他进程写入）
+                        status = await asyncio.to_thread(_fetch_job_status, job_id)
+                        messages = subscription.drain()
+                for topic, payload in messages:
+                    if isinstance(payload, LiveEvent):
+                        if payload.status is not None:
+                            status = payload.status
+                        elif payload.id > last_id:
+                            yield job_event(payload)
+                            last_id = payload.id
+                    elif payload["revision"] > last_revision:
+                        yield change_event(payload)
+                        last_revision = payload["revision"]
+                if status in _TERMINAL_STATUSES:
+                    # 终态通知在任务最后一条事件之后发布，此前的事件均已送出
+                    yield done_event("done", status)
+                    return
+                if time.monotonic() > deadline:
+                    yield done_event("timeout", status)
+                    return
+        finally:
+            subscription.close()
 
     return StreamingResponse(
         event_stream(),
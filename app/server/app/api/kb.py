@@ -1,8 +1,7 @@
-"""医学知识库接口：上传（异步线程索引 + job 事件）/ 列表 / 删除 / 重新索引。"""
+"""医学知识库接口：上传（索引入任务队列 + job 事件）/ 列表 / 删除 / 重新索引。"""
 from __future__ import annotations
 
 import shutil
-import threading
 from uuid import uuid4
 
 from fastapi import APIRouter, HTTPException, UploadFile
@@ -10,7 +9,7 @@ from sqlalchemy import delete
 from sqlmodel import Session, select
 
 from app.core.db import engine
-from app.core.joblog import create_job, finish_job, make_emit
+from app.core.jobqueue import QueuedJob, active_job, enqueue, job_handler
 from app.models import Job, JobEvent, KbDocument
 from app.rag.index import SUPPORTED_SUFFIXES, delete_kb_document, index_kb_document, kb_file_path
 
@@ -37,17 +36,13 @@ def _get_kb_or_404(session: Session, kb_document_id: str) -> KbDocument:
 
 def _start_index_job(kb_document_id: str) -> str:
     """创建 kb_index 任务并后台线程执行索引；进度写 job_events 供 SSE。"""
-    job_id = create_job("kb_index", kb_document_id=kb_document_id)
+    return enqueue("kb_index", kb_document_id=kb_document_id)
 
-    def run() -> None:
-        try:
-            index_kb_document(kb_document_id, emit=make_emit(job_id))
-            finish_job(job_id, "done")
-        except Exception:
-            finish_job(job_id, "error")
 
-    threading.Thread(target=run, daemon=True).start()
-    return job_id
+# LanceDB 写入与 BM25 全量重建不宜并行：默认单线程
+@job_handler("kb_index", concurrency=1)
+def _index_job(job: QueuedJob) -> dict:
+    return index_kb_document(job.kb_document_id, emit=job.emit)
 
 
 @router.get("/documents")
@@ -59,7 +54,7 @@ def list_kb_documents() -> list[dict]:
 
 @router.post("/documents", status_code=201)
 def upload_kb_document(file: UploadFile) -> dict:
-    """上传参考文档（pdf/txt/csv/docx），落盘后异步线程索引，返回 job_id 供 SSE 订阅进度。"""
+    """上传参考文档（pdf/txt/csv/docx），落盘后索引入队，返回 job_id 供 SSE 订阅进度。"""
     filename = file.filename or "kb.txt"
     suffix = ("." + filename.rsplit(".", 1)[-1].lower()) if "." in filename else ""
     if suffix not in SUPPORTED_SUFFIXES:
@@ -83,6 +78,8 @@ def reindex_kb_document(kb_document_id: str) -> dict:
     """重新索引：内容 hash 未变时增量跳过（见 rag/index.py），变更则全量重建该文档 chunks。"""
     with Session(engine) as session:
         _get_kb_or_404(session, kb_document_id)
+    if active_job(kb_document_id=kb_document_id) is not None:
+        raise HTTPException(status_code=409, detail="该文档已有索引任务排队或执行中")
     job_id = _start_index_job(kb_document_id)
     return {"job_id": job_id, "id": kb_document_id}
 
@@ -2,7 +2,7 @@
 
 - GET /api/models/status：SaT（sat-3l-sm + xlm-roberta-base tokenizer）与
   BGE-M3 的本地存在状态、目录大小、是否已加载（只读探测，不触发模型加载）。
-- POST /api/models/download：后台线程用 curl 从 hf-mirror 逐文件下载缺失模型
+- POST /api/models/download：入任务队列，用 curl 从 hf-mirror 逐文件下载缺失模型
   （-C - 断点续传，与 M2/M3 文档的手工下载命令一致），进度经 jobs/SSE 推送。
   下载完成后 SentenceSplitter / EmbeddingProvider 单例自动生效
   （core.config 的 <data_dir>/models/ 自动探测；已加载的旧实例不强制卸载，
@@ -12,7 +12,6 @@ from __future__ import annotations
 
 import shutil
 import subprocess
-import threading
 from pathlib import Path
 
 from fastapi import APIRouter, HTTPException
@@ -27,7 +26,8 @@ from app.core.config import (
     sat_model_dir,
     sat_tokenizer_dir,
 )
-from app.core.joblog import create_job, finish_job, make_emit, record_event
+from app.core.jobcontrol import checkpoint
+from app.core.jobqueue import QueuedJob, active_job, enqueue, job_handler
 
 router = APIRouter(prefix="/models", tags=["models"])
 
@@ -63,8 +63,6 @@ MODEL_MANIFESTS: dict[str, tuple[str, str, list[str]]] = {
     ),
 }
 
-_DOWNLOAD_LOCK = threading.Lock()
-
 
 def _dir_size(path: Path) -> tuple[int, int]:
     """(总字节数, 文件数)；目录不存在返回 (0, 0)。"""
@@ -143,55 +141,55 @@ def _curl_file(url: str, dest: Path) -> tuple[bool, str]:
     return True, ""
 
 
-def _download_worker(job_id: str, keys: list[str]) -> None:
-    emit = make_emit(job_id)
-    try:
-        total = sum(len(MODEL_MANIFESTS[k][2]) for k in keys)
-        emit("start", {"models": keys, "files": total})
-        done_files = 0
-        failures: list[dict] = []
-        for key in keys:
-            dirname, repo, files = MODEL_MANIFESTS[key]
-            dest_dir = models_dir() / dirname
-            for filename in files:
-                dest = dest_dir / filename
-                url = f"{HF_MIRROR}/{repo}/resolve/main/{filename}"
-                if dest.exists() and dest.stat().st_size > 0:
-                    done_files += 1
-                    emit(
-                        "progress",
-                        {"model": key, "file": filename, "status": "exists",
-                         "done": done_files, "total": total},
-                    )
-                    continue
-                emit(
-                    "progress",
-                    {"model": key, "file": filename, "status": "downloading",
-                     "done": done_files, "total": total},
-                )
-                ok, err = _curl_file(url, dest)
-                if not ok:
-                    dest.unlink(missing_ok=True)  # 清掉失败残留，避免误判为已存在
-                    failures.append({"model": key, "file": filename, "error": err})
-                    record_event(job_id, "warning", {"message": f"{key}/{filename} 下载失败: {err}"})
-                    continue
+@job_handler("model_download", concurrency=1, cancellable=True)
+def _download_job(job: QueuedJob) -> dict:
+    """逐文件下载；有文件失败时抛 OSError，由任务队列按 jobs.max_attempts 退避重试
+    （已下载完成的文件幂等跳过，curl -C - 续传未完成的文件）。"""
+    keys = [k for k in job.params.get("models", []) if k in MODEL_MANIFESTS]
+    emit = job.emit
+    total = sum(len(MODEL_MANIFESTS[k][2]) for k in keys)
+    emit("start", {"models": keys, "files": total, "attempt": job.attempt})
+    done_files = 0
+    failures: list[dict] = []
+    for key in keys:
+        dirname, repo, files = MODEL_MANIFESTS[key]
+        dest_dir = models_dir() / dirname
+        for filename in files:
+            checkpoint()  # 文件之间响应取消
+            dest = dest_dir / filename
+            url = f"{HF_MIRROR}/{repo}/resolve/main/{filename}"
+            if dest.exists() and dest.stat().st_size > 0:
                 done_files += 1
                 emit(
                     "progress",
-                    {"model": key, "file": filename, "status": "done",
-                     "bytes": dest.stat().st_size, "done": done_files, "total": total},
+                    {"model": key, "file": filename, "status": "exists",
+                     "done": done_files, "total": total},
                 )
-        if failures:
-            emit("error", {"message": f"{len(failures)} 个文件下载失败", "failures": failures})
-            finish_job(job_id, "error")
-        else:
-            emit("done", {"models": keys, "files": done_files})
-            finish_job(job_id, "done")
-    except Exception as exc:  # noqa: BLE001 - 后台线程兜底，事件留痕
-        record_event(job_id, "error", {"message": str(exc)})
-        finish_job(job_id, "error")
-    finally:
-        _DOWNLOAD_LOCK.release()
+                continue
+            emit(
+                "progress",
+                {"model": key, "file": filename, "status": "downloading",
+                 "done": done_files, "total": total},
+            )
+            ok, err = _curl_file(url, dest)
+            if not ok:
+                dest.unlink(missing_ok=True)  # 清掉失败残留，避免误判为已存在
+                failures.append({"model": key, "file": filename, "error": err})
+                emit("warning", {"message": f"{key}/{filename} 下载失败: {err}"})
+                continue
+            done_files += 1
+            emit(
+                "progress",
+                {"model": key, "file": filename, "status": "done",
+                 "bytes": dest.stat().st_size, "done": done_files, "total": total},
+            )
+    if failures:
+        raise OSError(
+            f"{len(failures)} 个文件下载失败："
+            + "；".join(f"{f['model']}/{f['file']}" for f in failures)
+        )
+    emit("done", {"models": keys, "files": done_files})
+    return {"models": keys, "files": done_files}
 
 
 @router.post("/download")
@@ -203,12 +201,7 @@ def download_models(payload: DownloadPayload) -> dict:
             status_code=400,
             detail=f"未知模型：{payload.models}，可选 {sorted(MODEL_MANIFESTS)}",
         )
-    if not _DOWNLOAD_LOCK.acquire(blocking=False):
+    if active_job(job_type="model_download") is not None:
         raise HTTPException(status_code=409, detail="已有模型下载任务进行中")
-    try:
-        job_id = create_job("model_download")
-        threading.Thread(target=_download_worker, args=(job_id, keys), daemon=True).start()
-    except Exception:
-        _DOWNLOAD_LOCK.release()
-        raise
+    job_id = enqueue("model_download", params={"models": keys})
     return {"job_id": job_id, "models": keys}
@@ -26,12 +26,32 @@ DEFAULT_SETTINGS: dict[str, Any] = {
     "llm.base_url": "",
     "llm.api_key": "",
     "llm.model": "",
+    "llm.hedge_enabled": False,
+    "llm.hedge_percentile": 90,
+    "llm.hedge_budget": 0.1,
     "review.prompt": DEFAULT_REVIEW_PROMPT,
+    "review.concurrency": 4,
+    "review.pack_tokens": 1500,
+    "review.evidence_chars": 200,
+    "review.evidence_tokens": 1500,
     "retrieve.query_count": 8,
     "retrieve.vector_topk": 3,
     "retrieve.bm25_topk": 3,
     "retrieve.rrf_k": 60,
     "retrieve.enabled": True,
+    "budget.document_tokens": 0,
+    "budget.action": "stop",
+    "pipeline.stream_queue_blocks": 4,
+    "jobs.max_attempts": 3,
+    "jobs.retry_backoff": 2.0,
+    "jobs.visibility_timeout": 60,
+    "jobs.concurrency.pipeline": 2,
+    "jobs.concurrency.retrieve": 1,
+    "jobs.concurrency.review": 2,
+    "jobs.concurrency.export": 2,
+    "jobs.concurrency.kb_index": 1,
+    "jobs.concurrency.model_download": 1,
+    "jobs.concurrency.stream": 1,
     "embedding.provider": "local",
     "embedding.model": "BAAI/bge-m3",
     "docx.has_review_table": "Y",
@@ -39,6 +59,10 @@ DEFAULT_SETTINGS: dict[str, Any] = {
     "output.dir": "",
     "segment.min_sentence_length": 10,
     "segment.review_references": False,
+    "segment.sat_batch_size": 32,
+    "segment.sat_stride": 64,
+    "segment.sat_processes": 0,
+    "segment.cache_entries": 50000,
 }
 
 _API_KEY_FIELD = "llm.api_key"
@@ -123,3 +147,14 @@ def test_llm_connection() -> dict:
         detail = str(exc).replace("\n", " ")[:300]
         message = f"HTTP {status}：{detail}" if status else detail
         return {"ok": False, "stage": "connect", "message": message}
+
+
+@router.get("/llm-metrics")
+def get_llm_metrics() -> dict:
+    """LLM 调用延迟指标：各 endpoint 的调用/对冲计数与延迟 p50/p90/p99（毫秒）。
+
+    before_ms 为对冲关闭期间的基线，after_ms 为开启后的实际延迟，对比即对冲前后的尾延迟变化。
+    """
+    from app.llm.client import llm_metrics
+
+    return {"endpoints": llm_metrics()}
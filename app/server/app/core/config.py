@@ -41,6 +41,11 @@ class Settings(BaseSettings):
     app_name: str = "ai-review"
     version: str = APP_VERSION
     data_dir: Path = _default_data_dir()
+    # SQLite 连接 pragma（每个新连接执行，见 core/db.py）
+    sqlite_journal_mode: str = "WAL"  # WAL：读不阻塞写，提交只追加日志
+    sqlite_synchronous: str = "NORMAL"  # WAL 下 NORMAL 断电最多丢最近的提交，不损坏库
+    sqlite_busy_timeout_ms: int = 5000  # 写锁被占时等待的毫秒数，而非立即报 database is locked
+    sqlite_mmap_size: int = 256 * 1024 * 1024  # 内存映射读（字节），0 = 关闭
 
     @property
     def db_path(self) -> Path:
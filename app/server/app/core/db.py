@@ -1,6 +1,13 @@
-"""SQLite / SQLModel 引擎与初始化。"""
+"""SQLite / SQLModel 引擎与初始化。
+
+每个新连接执行 pragma（AI_REVIEW_SQLITE_* 可覆盖）：WAL 日志模式（读写互不阻塞）、
+synchronous=NORMAL（WAL 下每次提交不再 fsync 主库，检查点时才同步）、busy_timeout
+（写锁被占时等待而非立即失败）、mmap_size（内存映射读）。写入密集的负载另经
+core/dbwriter.py 的单写线程批量提交。
+"""
 from __future__ import annotations
 
+from sqlalchemy import event
 from sqlmodel import SQLModel, create_engine
 
 from app.core.config import get_settings
@@ -14,6 +21,20 @@ engine = create_engine(
 )
 
 
+def apply_pragmas(dbapi_connection, _record=None) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA journal_mode={_settings.sqlite_journal_mode}")
+        cursor.execute(f"PRAGMA synchronous={_settings.sqlite_synchronous}")
+        cursor.execute(f"PRAGMA busy_timeout={int(_settings.sqlite_busy_timeout_ms)}")
+        cursor.execute(f"PRAGMA mmap_size={int(_settings.sqlite_mmap_size)}")
+    finally:
+        cursor.close()
+
+
+event.listen(engine, "connect", apply_pragmas)
+
+
 def init_db() -> None:
     # 导入 models 以注册全部表结构后建表
     from app import models  # noqa: F401
@@ -32,9 +53,34 @@ def _migrate() -> None:
             conn.exec_driver_sql(
                 "ALTER TABLE blocks ADD COLUMN is_reference BOOLEAN NOT NULL DEFAULT 0"
             )
+        if "review_fingerprint" not in block_cols:
+            # 增量审校：块输入指纹与上次产出的 corrections 数
+            conn.exec_driver_sql("ALTER TABLE blocks ADD COLUMN review_fingerprint VARCHAR")
+            conn.exec_driver_sql("ALTER TABLE blocks ADD COLUMN review_corrections INTEGER")
         job_cols = {
             row[1] for row in conn.exec_driver_sql("PRAGMA table_info(jobs)").fetchall()
         }
+        if "usage_json" not in job_cols:
+            conn.exec_driver_sql("ALTER TABLE jobs ADD COLUMN usage_json VARCHAR")
+        if "params_json" not in job_cols:
+            # 可继续任务：参数与最近检查点
+            conn.exec_driver_sql("ALTER TABLE jobs ADD COLUMN params_json VARCHAR")
+            conn.exec_driver_sql("ALTER TABLE jobs ADD COLUMN checkpoint_json VARCHAR")
+        if "attempts" not in job_cols:
+            # 持久化任务队列：认领 / 重试 / 租约
+            conn.exec_driver_sql("ALTER TABLE jobs ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+            conn.exec_driver_sql(
+                "ALTER TABLE jobs ADD COLUMN max_attempts INTEGER NOT NULL DEFAULT 1"
+            )
+            conn.exec_driver_sql("ALTER TABLE jobs ADD COLUMN run_after DATETIME")
+            conn.exec_driver_sql("ALTER TABLE jobs ADD COLUMN lease_until DATETIME")
+            conn.exec_driver_sql("ALTER TABLE jobs ADD COLUMN worker_id VARCHAR")
+            conn.exec_driver_sql("ALTER TABLE jobs ADD COLUMN result_json VARCHAR")
+            conn.exec_driver_sql("ALTER TABLE jobs ADD COLUMN last_error VARCHAR")
+        # 认领查询：按 (status, type) 取最早的可执行任务
+        conn.exec_driver_sql(
+            "CREATE INDEX IF NOT EXISTS ix_jobs_queue ON jobs (status, type, created_at)"
+        )
         if "kb_document_id" not in job_cols:
             # M3：知识库索引任务关联（外键仅声明，SQLite 旧表无法补 FK 约束，不影响使用）
             conn.exec_driver_sql("ALTER TABLE jobs ADD COLUMN kb_document_id VARCHAR")
@@ -47,3 +93,68 @@ def _migrate() -> None:
         if "exports_json" not in doc_cols:
             # M5：导出产物路径与 adopted 计数（JSON）
             conn.exec_driver_sql("ALTER TABLE documents ADD COLUMN exports_json VARCHAR")
+        if "usage_json" not in doc_cols:
+            # 计量：文档累计 tokens / 延迟（JSON）
+            conn.exec_driver_sql("ALTER TABLE documents ADD COLUMN usage_json VARCHAR")
+        if "revision" not in doc_cols:
+            # 内容修订号（详情接口 ETag / Last-Modified）
+            conn.exec_driver_sql(
+                "ALTER TABLE documents ADD COLUMN revision INTEGER NOT NULL DEFAULT 0"
+            )
+            conn.exec_driver_sql("ALTER TABLE documents ADD COLUMN revised_at DATETIME")
+        if "batch_id" not in doc_cols:
+            # 批量处理：所属批次
+            conn.exec_driver_sql("ALTER TABLE documents ADD COLUMN batch_id VARCHAR")
+            conn.exec_driver_sql(
+                "CREATE INDEX IF NOT EXISTS ix_documents_batch_id ON documents (batch_id)"
+            )
+        # 冗余 document_id：旧库补列并按 blocks → sentences → 下游表回填。
+        # SQLite 的 ADD COLUMN 加不了无默认值的 NOT NULL：旧库里该列保持可空，与模型的非空声明
+        # 不一致是有意的（不重建整表；写入路径一律带 document_id）。回填只补为空的行、每次启动
+        # 都执行（pysqlite 下 ALTER 不随事务回滚，中途失败的迁移下次启动接着补齐；已迁移的库
+        # 经 document_id 索引几乎零开销），补完校验无 NULL 残留。
+        for table, parent, key in (
+            ("sentences", "blocks", "block_id"),
+            ("queries", "sentences", "sentence_id"),
+            ("evidence", "sentences", "sentence_id"),
+            ("corrections", "sentences", "sentence_id"),
+        ):
+            cols = {
+                row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table})").fetchall()
+            }
+            if "document_id" not in cols:
+                conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN document_id VARCHAR")
+            conn.exec_driver_sql(
+                f"UPDATE {table} SET document_id = "
+                f"(SELECT document_id FROM {parent} WHERE {parent}.id = {table}.{key}) "
+                "WHERE document_id IS NULL"
+            )
+            # 上级行已不存在的孤儿行无从回填、也不会再被读到：删除（其下游行随后同样处理）
+            conn.exec_driver_sql(
+                f"DELETE FROM {table} WHERE document_id IS NULL "
+                f"AND {key} NOT IN (SELECT id FROM {parent})"
+            )
+            missing = conn.exec_driver_sql(
+                f"SELECT count(*) FROM {table} WHERE document_id IS NULL"
+            ).scalar()
+            if missing:
+                raise RuntimeError(
+                    f"迁移失败：{table} 回填 document_id 后仍有 {missing} 行为空"
+                    f"（所属 {parent} 行缺少 document_id），请先修复数据库"
+                )
+        # create_all 不给已存在的表补索引：新旧库统一在此建
+        for ddl in (
+            "ix_sentences_document_block ON sentences (document_id, block_id, idx)",
+            "ix_queries_document_id ON queries (document_id)",
+            "ix_evidence_document_id ON evidence (document_id)",
+            "ix_evidence_sentence_score ON evidence (sentence_id, score)",
+            "ix_corrections_document_decision ON corrections (document_id, decision, severity)",
+        ):
+            conn.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS {ddl}")
+        # corrections 聚合计数：旧库升级（计数表刚建、为空）时按现有 corrections 回填
+        if conn.exec_driver_sql("SELECT 1 FROM correction_stats LIMIT 1").first() is None:
+            conn.exec_driver_sql(
+                "INSERT INTO correction_stats (document_id, decision, severity, error_type, count) "
+                "SELECT document_id, decision, coalesce(severity, ''), coalesce(error_type, ''), "
+                "count(*) FROM corrections WHERE document_id IS NOT NULL GROUP BY 1, 2, 3, 4"
+            )
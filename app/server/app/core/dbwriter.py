@@ -0,0 +1,148 @@
+"""单写线程：写入密集的负载（任务事件、句子、queries / evidence、corrections）交给一个后台线程，
+多条写操作合并为一个事务提交，后台任务之间不再争抢 SQLite 写锁、也不再每行一次 fsync。
+
+- 写操作是 `fn(session) -> 结果` 的可调用对象，submit() 立即返回 Future（持久性凭据）：
+  所在批次提交后才完成，结果为 fn 的返回值；需要落库后才能继续的调用方（下游阶段要读、
+  状态收口前）等待 Future 或调用 run()，其余调用方可不等。
+- 攒批：取到第一条后至多再等 _LINGER 秒或凑满 _MAX_BATCH 条，按提交顺序在同一 Session 内执行、
+  一次提交；同一 key 的写操作在一批内只执行最后一个（如任务检查点，被覆盖的 Future 取最终结果）。
+- 失败隔离：整批任一操作出错即回滚，再逐条各自成事务重试，出错的那条以异常完成其 Future，
+  不拖累同批其他调用方。写操作因此须可重放：在 fn 内构造 ORM 对象，不依赖外部会话状态。
+- 写操作内不可再向写线程提交并等待（会自锁）；调用方等待 Future 时不要持有未提交的写事务。
+"""
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable, TypeVar
+
+from sqlalchemy.engine import Engine
+from sqlmodel import Session
+
+from app.core.db import engine
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_LINGER = 0.002  # 秒：取到第一条后再等同批写入的时长（提交期间到达的写入自然并入下一批）
+_MAX_BATCH = 512  # 每个事务最多执行的写操作数
+_FLUSH = object()  # 冲刷标记
+
+
+class DbWriter:
+    def __init__(self, bind: Engine, name: str = "db-writer") -> None:
+        self._engine = bind
+        self._name = name
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+        self.batches = 0  # 已提交的事务数（基准 / 诊断用）
+        self.operations = 0  # 已执行的写操作数
+
+    def _ensure_started(self) -> None:
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+                    self._thread.start()
+
+    def submit(self, fn: Callable[[Session], T], *, key: Hashable | None = None) -> Future[T]:
+        """提交写操作，返回在其所在事务提交后完成的 Future。"""
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("写操作内不可再向写线程提交")
+        future: Future[T] = Future()
+        self._ensure_started()
+        self._queue.put((fn, key, future))
+        return future
+
+    def run(self, fn: Callable[[Session], T], timeout: float | None = None) -> T:
+        """提交并等待落库，返回 fn 的结果（出错时抛出 fn 的异常）。"""
+        return self.submit(fn).result(timeout)
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """等待此前提交的写操作全部落库；写线程未启动（无待写内容）时立即返回。"""
+        if self._thread is None:
+            return True
+        done: Future[None] = Future()
+        self._queue.put((_FLUSH, None, done))
+        try:
+            done.result(timeout)
+        except TimeoutError:
+            return False
+        return True
+
+    def _collect(self) -> list[tuple[Any, Hashable | None, Future]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + _LINGER
+        while len(batch) < _MAX_BATCH and batch[-1][0] is not _FLUSH:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            ops = [item for item in batch if item[0] is not _FLUSH]
+            # 同 key 只执行最后一个，被覆盖者随之完成
+            last_of_key = {key: i for i, (_, key, _) in enumerate(ops) if key is not None}
+            runnable = [
+                (i, fn, future)
+                for i, (fn, key, future) in enumerate(ops)
+                if key is None or last_of_key[key] == i
+            ]
+            results = self._execute(runnable)
+            for i, (_, key, future) in enumerate(ops):
+                source = i if key is None else last_of_key[key]
+                outcome = results.get(source)
+                if outcome is None:
+                    continue
+                ok, value = outcome
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+            for fn, _, future in batch:
+                if fn is _FLUSH:
+                    future.set_result(None)
+
+    def _execute(
+        self, runnable: list[tuple[int, Callable[[Session], Any], Future]]
+    ) -> dict[int, tuple[bool, Any]]:
+        if not runnable:
+            return {}
+        try:
+            with Session(self._engine) as session:
+                values = [(i, fn(session)) for i, fn, _ in runnable]
+                session.commit()
+            self.batches += 1
+            self.operations += len(runnable)
+            return {i: (True, value) for i, value in values}
+        except Exception as exc:  # noqa: BLE001 - 整批回滚，逐条重试以隔离出错的操作
+            if len(runnable) == 1:
+                return {runnable[0][0]: (False, exc)}
+            logger.warning("批量写入失败，改为逐条提交", exc_info=True)
+            return {i: self._execute_one(fn) for i, fn, _ in runnable}
+
+    def _execute_one(self, fn: Callable[[Session], Any]) -> tuple[bool, Any]:
+        try:
+            with Session(self._engine) as session:
+                value = fn(session)
+                session.commit()
+        except Exception as exc:  # noqa: BLE001 - 由 Future 交还调用方
+            return False, exc
+        self.batches += 1
+        self.operations += 1
+        return True, value
+
+
+writer = DbWriter(engine)
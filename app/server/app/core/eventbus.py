@@ -0,0 +1,95 @@
+"""进程内事件总线：发布者（任务线程 / API 线程）把消息即时推给订阅者（SSE 连接），不经数据库轮询。
+
+- 主题为字符串（任务事件 `job:<job_id>`，文档变更 `document:<document_id>`）；一个订阅可同时
+  订阅多个主题，消息按发布顺序以 (主题, 负载) 送达。
+- 线程安全：publish 可在任意线程调用，直接追加到订阅者的 deque，再经 call_soon_threadsafe
+  唤醒其事件循环；订阅者 drain() 同步取走已送达的全部消息，不丢也不乱序。
+- 只负责实时分发，不做持久化与回放：订阅之前发布的消息由调用方从数据库补齐（见 api/jobs.py）。
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+from collections import deque
+from typing import Any
+
+
+class Subscription:
+    """一个订阅者（通常是一条 SSE 连接）；须在事件循环内创建，用完 close()。"""
+
+    def __init__(self, bus: EventBus, topics: tuple[str, ...]) -> None:
+        self._bus = bus
+        self.topics = topics
+        self._loop = asyncio.get_running_loop()
+        self._ready = asyncio.Event()
+        self._messages: deque[tuple[str, Any]] = deque()
+
+    def _deliver(self, topic: str, payload: Any) -> None:
+        self._messages.append((topic, payload))
+        try:
+            self._loop.call_soon_threadsafe(self._ready.set)
+        except RuntimeError:  # 事件循环已关闭：连接已断开，消息无人接收
+            pass
+
+    def drain(self) -> list[tuple[str, Any]]:
+        """取走已送达的全部消息（不等待）。"""
+        messages = []
+        while self._messages:
+            messages.append(self._messages.popleft())
+        return messages
+
+    async def get(self, timeout: float) -> list[tuple[str, Any]]:
+        """等待新消息，至多 timeout 秒；超时返回空列表。"""
+        if not self._messages:
+            self._ready.clear()
+            if not self._messages:
+                try:
+                    await asyncio.wait_for(self._ready.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        return self.drain()
+
+    def close(self) -> None:
+        self._bus._unsubscribe(self)
+
+
+class EventBus:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._subscribers: dict[str, list[Subscription]] = {}
+
+    def subscribe(self, *topics: str) -> Subscription:
+        subscription = Subscription(self, topics)
+        with self._lock:
+            for topic in topics:
+                self._subscribers.setdefault(topic, []).append(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            for topic in subscription.topics:
+                subscribers = self._subscribers.get(topic, [])
+                if subscription in subscribers:
+                    subscribers.remove(subscription)
+                if not subscribers:
+                    self._subscribers.pop(topic, None)
+
+    def publish(self, topic: str, payload: Any) -> None:
+        with self._lock:
+            for subscription in self._subscribers.get(topic, ()):
+                subscription._deliver(topic, payload)
+
+    def subscriber_count(self, topic: str) -> int:
+        with self._lock:
+            return len(self._subscribers.get(topic, ()))
+
+
+bus = EventBus()
+
+
+def job_topic(job_id: str) -> str:
+    return f"job:{job_id}"
+
+
+def document_topic(document_id: str) -> str:
+    return f"document:{document_id}"
@@ -0,0 +1,115 @@
+"""任务运行控制：协作式取消 / 暂停 / 继续（POST /api/jobs/{id}/cancel|pause|resume）。
+
+- 执行任务的线程以 `with job_control(register(job_id))` 绑定控制块（contextvars 传递，
+  线程池内的调用需 contextvars.copy_context().run 才能看到）。
+- pipeline 在单元之间（审校：每块；检索：每句）调用 checkpoint()：已取消 → 抛 JobCancelled；
+  已暂停 → 阻塞至继续或取消。暂停不打断在途请求，只是不再开始新单元。
+- 取消同时关闭该任务登记的 LLM HTTP 客户端（llm/client.py 建客户端时 track），
+  在途请求立即以连接错误返回，调用方据 cancelled 标志转为 JobCancelled，不重试。
+"""
+from __future__ import annotations
+
+import threading
+import weakref
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator
+
+
+class JobCancelled(Exception):
+    """任务已被取消（协作式：在 checkpoint 或在途请求被中止处抛出）。"""
+
+
+class JobControl:
+    def __init__(self, job_id: str) -> None:
+        self.job_id = job_id
+        self._cancelled = threading.Event()
+        self._running = threading.Event()
+        self._running.set()
+        self._lock = threading.Lock()
+        self._clients: weakref.WeakSet[Any] = weakref.WeakSet()
+        # 处理函数经 emit 已发出的终态事件（done / error / cancelled）；队列据此不再补发 error
+        self.terminal_event: str | None = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    @property
+    def paused(self) -> bool:
+        return not self._running.is_set()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+        self._running.set()  # 唤醒暂停中的 checkpoint，使其抛出 JobCancelled
+        with self._lock:
+            clients = list(self._clients)
+        for client in clients:
+            try:
+                client.close()
+            except Exception:
+                pass
+
+    def pause(self) -> None:
+        if not self.cancelled:
+            self._running.clear()
+
+    def resume(self) -> None:
+        self._running.set()
+
+    def track(self, client: Any) -> None:
+        """登记在途 HTTP 客户端；取消时关闭。已取消则立即关闭（请求随即失败）。"""
+        with self._lock:
+            self._clients.add(client)
+        if self.cancelled:
+            client.close()
+
+    def checkpoint(self) -> None:
+        self._running.wait()
+        if self.cancelled:
+            raise JobCancelled(f"任务 {self.job_id} 已取消")
+
+
+_lock = threading.Lock()
+_controls: dict[str, JobControl] = {}
+_current: ContextVar[JobControl | None] = ContextVar("job_control", default=None)
+
+
+def register(job_id: str) -> JobControl:
+    with _lock:
+        control = _controls[job_id] = JobControl(job_id)
+        return control
+
+
+def get_control(job_id: str) -> JobControl | None:
+    with _lock:
+        return _controls.get(job_id)
+
+
+@contextmanager
+def job_control(control: JobControl) -> Iterator[JobControl]:
+    """在当前上下文绑定控制块；退出时注销（任务结束后 cancel/pause 不再生效）。"""
+    token = _current.set(control)
+    try:
+        yield control
+    finally:
+        _current.reset(token)
+        with _lock:
+            if _controls.get(control.job_id) is control:
+                del _controls[control.job_id]
+
+
+def current_control() -> JobControl | None:
+    return _current.get()
+
+
+def checkpoint() -> None:
+    """单元边界检查：无控制块时为空操作。"""
+    control = _current.get()
+    if control is not None:
+        control.checkpoint()
+
+
+def is_cancelled() -> bool:
+    control = _current.get()
+    return control is not None and control.cancelled
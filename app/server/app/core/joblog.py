@@ -1,20 +1,97 @@
-"""Job 与 job_events 的写侧辅助（kb 索引 / retrieve 共用，SSE 从 job_events 表回放）。"""
+"""Job 与 job_events 的写侧辅助（kb 索引 / retrieve 共用）。
+
+- 事件即时发布到进程内事件总线（core/eventbus.py，主题 job:<job_id>），SSE 连接直接收到；
+  落 job_events 表交给单写线程（core/dbwriter.py）与其他写入合批提交，任务线程不再为每条
+  事件开会话、提交。progress 事件的检查点（jobs.checkpoint_json）同样经写线程，同批内同一
+  任务只写最近一个。
+- 事件 id 在发布时预分配（进程内单调递增，起点取表内最大 id；每个数据目录只跑一个后端进程），
+  写库沿用该 id：晚加入的 SSE 连接先回放表内事件，再补尚未写库的事件（pending_events），
+  之后按 id 去重衔接实时事件。
+- 任务状态变化（finish_job / 队列收口）在写库后发布状态通知；终态写库前先 flush_events()，
+  保证「事件先于终态落库」：直接读表的一方见到终态时事件已齐。
+"""
 from __future__ import annotations
 
 import json
+import threading
+from dataclasses import dataclass
 from datetime import datetime
 from typing import Any
 
-from sqlmodel import Session
+from sqlalchemy import func, insert, update
+from sqlmodel import Session, select
 
 from app.core.db import engine
+from app.core.dbwriter import writer
+from app.core.eventbus import Subscription, bus, job_topic
+from app.core.jobcontrol import current_control, get_control
 from app.models import Job, JobEvent
 
 
+@dataclass(frozen=True, slots=True)
+class LiveEvent:
+    """总线上的任务消息：事件（id > 0，data 为 JSON 文本）或状态通知（status 非空，id = 0）。"""
+
+    id: int
+    job_id: str
+    event: str
+    data: str
+    ts: datetime
+    status: str | None = None
+
+
+def _write_event(live: LiveEvent):
+    def write(session: Session) -> None:
+        session.execute(
+            insert(JobEvent).values(
+                id=live.id, job_id=live.job_id, ts=live.ts, event=live.event, data=live.data
+            )
+        )
+
+    return write
+
+
+def _write_checkpoint(job_id: str, checkpoint: str):
+    def write(session: Session) -> None:
+        session.exec(
+            update(Job)
+            .where(Job.id == job_id)
+            .values(checkpoint_json=checkpoint, updated_at=datetime.utcnow())
+        )
+
+    return write
+
+
+_lock = threading.Lock()
+_next_id: int | None = None
+_pending: dict[str, dict[int, LiveEvent]] = {}  # job_id → 已发布、尚未写库的事件
+
+
+def _forget(events: list[LiveEvent]) -> None:
+    with _lock:
+        for event in events:
+            pending = _pending.get(event.job_id)
+            if pending is not None:
+                pending.pop(event.id, None)
+                if not pending:
+                    del _pending[event.job_id]
+
+
+def _allocate_id() -> int:
+    global _next_id
+    if _next_id is None:
+        with Session(engine) as session:
+            _next_id = (session.exec(select(func.max(JobEvent.id))).one() or 0) + 1
+    allocated = _next_id
+    _next_id += 1
+    return allocated
+
+
 def create_job(
     job_type: str,
     document_id: str | None = None,
     kb_document_id: str | None = None,
+    params: dict[str, Any] | None = None,
 ) -> str:
     with Session(engine) as session:
         job = Job(
@@ -22,6 +99,7 @@ def create_job(
             kb_document_id=kb_document_id,
             type=job_type,
             status="running",
+            params_json=json.dumps(params, ensure_ascii=False) if params is not None else None,
         )
         session.add(job)
         session.commit()
@@ -30,28 +108,119 @@ def create_job(
 
 
 def record_event(job_id: str, event: str, data: dict[str, Any]) -> None:
+    """发布任务事件（订阅者即时收到），写库由后台写线程批量完成。"""
+    payload = json.dumps(data, ensure_ascii=False)
+    with _lock:
+        live = LiveEvent(_allocate_id(), job_id, event, payload, datetime.utcnow())
+        _pending.setdefault(job_id, {})[live.id] = live
+        bus.publish(job_topic(job_id), live)
+    writer.submit(_write_event(live)).add_done_callback(lambda _: _forget([live]))
+
+
+def flush_events(timeout: float = 10.0) -> bool:
+    """等待已发布的事件 / 检查点全部写库（终态落库前、进程退出前调用）。"""
+    return writer.flush(timeout)
+
+
+def pending_events(job_id: str) -> list[LiveEvent]:
+    """已发布、尚未写库的事件（按 id 升序）。"""
+    with _lock:
+        return sorted(_pending.get(job_id, {}).values(), key=lambda e: e.id)
+
+
+def subscribe_job(job_id: str, *topics: str) -> tuple[Subscription, list[LiveEvent]]:
+    """订阅任务事件（及其他主题），同时取得尚未写库的事件：两者在同一把锁内完成，
+    订阅前已发布的事件要么已在表内、要么在返回的列表里，之后发布的经订阅送达（按 id 去重）。
+    须在事件循环内调用。"""
+    with _lock:
+        subscription = bus.subscribe(job_topic(job_id), *topics)
+        backlog = sorted(_pending.get(job_id, {}).values(), key=lambda e: e.id)
+    return subscription, backlog
+
+
+def publish_status(job_id: str, status: str) -> None:
+    """任务状态已写库后通知订阅者（SSE 据终态收尾）。"""
+    bus.publish(job_topic(job_id), LiveEvent(0, job_id, "", "", datetime.utcnow(), status))
+
+
+def finish_job(job_id: str, status: str) -> None:
+    """status: done | error | cancelled | interrupted | resumed"""
+    flush_events()
     with Session(engine) as session:
-        session.add(
-            JobEvent(job_id=job_id, event=event, data=json.dumps(data, ensure_ascii=False))
-        )
+        job = session.get(Job, job_id)
+        if job is None:
+            return
+        job.status = status
+        job.updated_at = datetime.utcnow()
+        session.add(job)
         session.commit()
+    publish_status(job_id, status)
 
 
-def finish_job(job_id: str, status: str) -> None:
-    """status: done | error"""
+def set_job_usage(job_id: str, usage: dict[str, Any]) -> None:
+    """记录任务计量（jobs.usage_json）。"""
     with Session(engine) as session:
         job = session.get(Job, job_id)
         if job is not None:
-            job.status = status
-            job.updated_at = datetime.utcnow()
+            job.usage_json = json.dumps(usage, ensure_ascii=False)
             session.add(job)
             session.commit()
 
 
+_SWITCHABLE_STATUSES = ("running", "paused")
+
+
+def set_job_status(job_id: str, status: str) -> bool:
+    """非终态切换（running ↔ paused）：只改 status / updated_at，不 flush 事件、不收口。
+
+    仅当任务仍处于 running / paused 时生效（条件更新），已收口的终态不会被覆盖；
+    返回是否更新。更新后发布状态通知（SSE 对非终态通知只记录状态、不关闭连接）。
+    """
+    if status not in _SWITCHABLE_STATUSES:
+        raise ValueError(f"set_job_status 只用于非终态切换：{status}")
+    with Session(engine) as session:
+        updated = session.exec(
+            update(Job)
+            .where(Job.id == job_id, Job.status.in_(_SWITCHABLE_STATUSES))
+            .values(status=status, updated_at=datetime.utcnow())
+        ).rowcount
+        session.commit()
+    if updated:
+        publish_status(job_id, status)
+    return bool(updated)
+
+
+def set_job_checkpoint(job_id: str, checkpoint: dict[str, Any]) -> None:
+    """记录任务检查点（jobs.checkpoint_json）：仅用于展示中断位置，由 make_emit 在 progress 事件时调用。
+
+    经写线程与事件同批写入，同一任务同批只写最近一个。继续执行依据的是已落库的单元结果
+    （审校：blocks.review_fingerprint；检索：句子的 queries），与该字段无关——单元结果与
+    检查点不在同一事务也不会重复或遗漏。
+    """
+    writer.submit(
+        _write_checkpoint(job_id, json.dumps(checkpoint, ensure_ascii=False)),
+        key=("checkpoint", job_id),
+    )
+
+
 def make_emit(job_id: str):
-    """生成 pipeline/rag 模块用的 emit(event, data) 回调。"""
+    """生成 pipeline/rag 模块用的 emit(event, data) 回调。
+
+    终态事件（done / error / cancelled）携带 usage 时同步落 jobs.usage_json，并记入任务控制块
+    （队列见处理函数已发 error 便不再补发）；progress 事件经 set_job_checkpoint 记为检查点。
+    """
 
     def emit(event: str, data: dict[str, Any]) -> None:
         record_event(job_id, event, data)
+        if event == "progress":
+            set_job_checkpoint(job_id, data)
+        if event in ("done", "error", "cancelled"):
+            control = current_control()
+            if control is None or control.job_id != job_id:
+                control = get_control(job_id)
+            if control is not None:
+                control.terminal_event = event
+            if isinstance(data.get("usage"), dict):
+                set_job_usage(job_id, data["usage"])
 
     return emit
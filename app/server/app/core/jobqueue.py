@@ -0,0 +1,455 @@
+"""持久化任务队列：jobs 表即队列，进程内工作线程池按任务类型限并发执行。
+
+- 入队：enqueue() 写一行 status=pending 的 job 并唤醒工作线程，接口立即返回 job_id；
+  API 线程不再执行任何流水线工作。
+- 认领协议：工作线程取同类型最早的可执行 pending 任务（run_after 已到），以
+  `UPDATE … WHERE id=? AND status='pending'` 条件更新为 running 并写入 worker_id 与租约
+  （lease_until）；受影响行数为 1 才算认领成功，多线程 / 多进程不会重复执行。
+- 可见性超时：持有进程的维护线程每 1/3 租约周期为在途任务续租；租约过期（持有者已退出）
+  的任务视为丢失。启动时上一进程遗留的 running / paused 任务同样视为丢失（每个数据目录只跑
+  一个后端进程）。丢失的任务按类型处理：on_lost="retry" 重新入队（次数未用尽时），
+  on_lost="interrupt" 置 interrupted，由用户经 /api/documents/{id}/resume 继续。
+- 重试：处理函数抛出 retry_on 内的瞬时错误且次数未用尽时回到 pending，run_after 按
+  jobs.retry_backoff × 2^(n-1) 退避（上限 300 秒），记 retry 事件；其余异常直接 error。
+- 收口：终态以 `WHERE worker_id=?` 条件写入，租约已被接管的旧线程无法覆盖新结果。
+- 处理函数在 job_control 作用域内执行；只有声明 cancellable=True 的类型（在单元边界调用
+  checkpoint()）登记控制块，运行中可取消 / 暂停（core/jobcontrol.py），其余类型的取消 / 暂停
+  请求被拒绝。排队中的任务均可直接取消（cancel_pending）。
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Callable
+from uuid import uuid4
+
+from sqlalchemy import or_, update
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session, select
+
+from app.core.db import engine
+from app.core.jobcontrol import JobCancelled, JobControl, job_control, register
+from app.core.joblog import flush_events, make_emit, publish_status, record_event
+from app.core.user_settings import (
+    job_concurrency,
+    job_max_attempts,
+    job_retry_backoff,
+    job_visibility_timeout,
+)
+from app.models import Job
+
+logger = logging.getLogger(__name__)
+
+# 排队 / 执行中的任务状态（同一文档已有此类任务时不再入队）
+ACTIVE_STATUSES = ("pending", "running", "paused")
+# 瞬时错误：文件 / 网络 I/O 与 SQLite 锁等待超时，重试有望成功
+TRANSIENT_ERRORS: tuple[type[BaseException], ...] = (
+    OSError,
+    OperationalError,
+    sqlite3.OperationalError,
+)
+
+# 确定不会因重试而成功的 OSError（如原文件已被删除）
+_PERMANENT_ERRORS: tuple[type[BaseException], ...] = (
+    FileNotFoundError,
+    IsADirectoryError,
+    NotADirectoryError,
+)
+
+_POLL_INTERVAL = 0.5  # 秒：无唤醒时的兜底轮询（退避到期的重试靠它拾取）
+_MAX_BACKOFF = 300.0  # 秒
+
+
+@dataclass(frozen=True)
+class QueuedJob:
+    """处理函数拿到的任务快照（已认领，attempt 从 1 开始）。"""
+
+    id: str
+    type: str
+    document_id: str | None
+    kb_document_id: str | None
+    params: dict[str, Any]
+    attempt: int
+    emit: Callable[[str, dict[str, Any]], None] = field(repr=False, compare=False)
+
+
+@dataclass(frozen=True)
+class JobHandler:
+    job_type: str
+    fn: Callable[[QueuedJob], dict[str, Any] | None]
+    concurrency: int
+    max_attempts: int | None  # None = 取 jobs.max_attempts
+    retry_on: tuple[type[BaseException], ...]
+    on_lost: str  # retry | interrupt
+    cancellable: bool = False  # 处理函数在单元边界调用 checkpoint()，运行中可取消 / 暂停
+
+    def attempts_limit(self) -> int:
+        return self.max_attempts if self.max_attempts is not None else job_max_attempts()
+
+
+_HANDLERS: dict[str, JobHandler] = {}
+_wake = threading.Condition()
+
+
+def job_handler(
+    job_type: str,
+    *,
+    concurrency: int = 1,
+    max_attempts: int | None = None,
+    retry_on: tuple[type[BaseException], ...] = TRANSIENT_ERRORS,
+    on_lost: str = "retry",
+    cancellable: bool = False,
+):
+    """注册任务类型的处理函数（装饰器）。concurrency 为默认线程数，可被 jobs.concurrency.<type> 覆盖。
+
+    处理函数返回值（dict）记入 jobs.result_json；抛 JobCancelled → cancelled。
+    cancellable=True 仅用于在单元边界调用 checkpoint() 的处理函数：运行中登记控制块，
+    /api/jobs/{id}/cancel|pause|resume 可用；否则这些请求返回 400（请求不会被静默忽略）。
+    """
+
+    def decorator(fn: Callable[[QueuedJob], dict[str, Any] | None]):
+        _HANDLERS[job_type] = JobHandler(
+            job_type, fn, concurrency, max_attempts, retry_on, on_lost, cancellable
+        )
+        return fn
+
+    return decorator
+
+
+def _notify() -> None:
+    with _wake:
+        _wake.notify_all()
+
+
+def enqueue(
+    job_type: str,
+    *,
+    document_id: str | None = None,
+    kb_document_id: str | None = None,
+    params: dict[str, Any] | None = None,
+) -> str:
+    """入队并返回 job_id（立即返回，不等待执行）。"""
+    handler = _HANDLERS.get(job_type)
+    if handler is None:
+        raise KeyError(f"未注册的任务类型: {job_type}")
+    with Session(engine) as session:
+        job = Job(
+            document_id=document_id,
+            kb_document_id=kb_document_id,
+            type=job_type,
+            status="pending",
+            max_attempts=handler.attempts_limit(),
+            params_json=json.dumps(params, ensure_ascii=False) if params is not None else None,
+        )
+        session.add(job)
+        session.commit()
+        job_id = job.id
+    record_event(job_id, "queued", {"type": job_type})
+    _notify()
+    return job_id
+
+
+def active_job(
+    *,
+    document_id: str | None = None,
+    kb_document_id: str | None = None,
+    job_type: str | None = None,
+) -> Job | None:
+    """排队或执行中的任务（按文档 / 知识库文档 / 类型过滤），无则 None。"""
+    query = select(Job).where(Job.status.in_(ACTIVE_STATUSES))
+    if document_id is not None:
+        query = query.where(Job.document_id == document_id)
+    if kb_document_id is not None:
+        query = query.where(Job.kb_document_id == kb_document_id)
+    if job_type is not None:
+        query = query.where(Job.type == job_type)
+    with Session(engine) as session:
+        return session.exec(query.order_by(Job.created_at)).first()
+
+
+def cancel_pending(job_id: str) -> bool:
+    """取消尚未被认领的排队任务；任务已开始（或不存在）返回 False。"""
+    with Session(engine) as session:
+        result = session.exec(
+            update(Job)
+            .where(Job.id == job_id, Job.status == "pending")
+            .values(status="cancelled", updated_at=datetime.utcnow())
+        )
+        session.commit()
+        cancelled = result.rowcount == 1
+    if cancelled:
+        record_event(job_id, "cancelled", {"queued": True})
+        flush_events()  # 返回时事件已落库，同其他终态
+        publish_status(job_id, "cancelled")
+    return cancelled
+
+
+def claim(job_type: str, worker_id: str, lease_seconds: int) -> QueuedJob | None:
+    """认领一个可执行任务；与其他线程 / 进程竞争失败时换下一个候选，无候选返回 None。"""
+    while True:
+        now = datetime.utcnow()
+        with Session(engine) as session:
+            candidate = session.exec(
+                select(Job)
+                .where(
+                    Job.type == job_type,
+                    Job.status == "pending",
+                    or_(Job.run_after.is_(None), Job.run_after <= now),
+                )
+                .order_by(Job.created_at)
+            ).first()
+            if candidate is None:
+                return None
+            result = session.exec(
+                update(Job)
+                .where(Job.id == candidate.id, Job.status == "pending")
+                .values(
+                    status="running",
+                    worker_id=worker_id,
+                    lease_until=now + timedelta(seconds=lease_seconds),
+                    attempts=Job.attempts + 1,
+                    updated_at=now,
+                )
+            )
+            session.commit()
+            if result.rowcount != 1:
+                continue  # 被别的工作线程抢先认领
+            session.refresh(candidate)
+            return QueuedJob(
+                id=candidate.id,
+                type=candidate.type,
+                document_id=candidate.document_id,
+                kb_document_id=candidate.kb_document_id,
+                params=json.loads(candidate.params_json) if candidate.params_json else {},
+                attempt=candidate.attempts,
+                emit=make_emit(candidate.id),
+            )
+
+
+def _settle(job_id: str, owner: str, **values: Any) -> bool:
+    """以持有者身份写入任务状态；租约已被接管（worker_id 不符）时不写，返回 False。
+
+    先冲刷已发布的事件（事件先于终态落库），写入后向 SSE 订阅者发布状态通知。
+    """
+    flush_events()
+    with Session(engine) as session:
+        result = session.exec(
+            update(Job)
+            .where(Job.id == job_id, Job.worker_id == owner)
+            .values(updated_at=datetime.utcnow(), **values)
+        )
+        session.commit()
+        settled = result.rowcount == 1
+    if settled and "status" in values:
+        publish_status(job_id, values["status"])
+    return settled
+
+
+def retry_delay(attempt: int) -> float:
+    """第 attempt 次执行失败后的退避秒数。"""
+    return min(_MAX_BACKOFF, job_retry_backoff() * 2 ** max(0, attempt - 1))
+
+
+def recover_lost_jobs(
+    *, exclude_worker: str | None = None, expired_only: bool = False
+) -> list[Job]:
+    """收回丢失的任务（持有者已退出），返回被处理的任务。
+
+    expired_only=False（启动时）：worker_id 不是 exclude_worker 的 running / paused 任务全部视为丢失；
+    expired_only=True（运行中巡检）：只收回租约已过期的任务。
+    """
+    now = datetime.utcnow()
+    recovered: list[Job] = []
+    events: list[tuple[str, str, dict[str, Any]]] = []
+    with Session(engine) as session:
+        query = select(Job).where(Job.status.in_(("running", "paused")))
+        if expired_only:
+            query = query.where(Job.lease_until.is_not(None), Job.lease_until < now)
+        elif exclude_worker is not None:
+            query = query.where(or_(Job.worker_id.is_(None), Job.worker_id != exclude_worker))
+        for job in session.exec(query).all():
+            handler = _HANDLERS.get(job.type)
+            on_lost = handler.on_lost if handler is not None else None
+            if on_lost == "retry" and job.attempts < job.max_attempts:
+                job.status = "pending"
+                job.run_after = now
+                events.append((job.id, "retry", {"attempt": job.attempts + 1, "reason": "lost"}))
+            elif on_lost == "interrupt" and job.document_id:
+                job.status = "interrupted"
+            else:
+                job.status = "error"
+                job.last_error = "任务中断：执行进程已退出"
+                events.append((job.id, "error", {"message": job.last_error}))
+            job.worker_id = None
+            job.lease_until = None
+            job.updated_at = now
+            session.add(job)
+            recovered.append(job)
+        # 事件先于终态落库（SSE 见到终态即收尾）
+        for job_id, event, data in events:
+            record_event(job_id, event, data)
+        flush_events()
+        session.commit()
+        for job in recovered:
+            session.refresh(job)
+            session.expunge(job)
+            publish_status(job.id, job.status)
+    if any(job.status == "pending" for job in recovered):
+        _notify()
+    return recovered
+
+
+class WorkerPool:
+    """每个已注册任务类型起 N 个工作线程 + 1 个维护线程（续租 / 收回过期任务）。"""
+
+    def __init__(
+        self,
+        on_recover: Callable[[], None] | None = None,
+        job_types: list[str] | None = None,
+    ) -> None:
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+        self.lease_seconds = job_visibility_timeout()
+        self._on_recover = on_recover
+        self._job_types = job_types  # None = 全部已注册类型
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self._running: set[str] = set()
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        for handler in list(_HANDLERS.values()):
+            if self._job_types is not None and handler.job_type not in self._job_types:
+                continue
+            for n in range(job_concurrency(handler.job_type, handler.concurrency)):
+                self._spawn(self._work_loop, handler, name=f"job-{handler.job_type}-{n}")
+        self._spawn(self._maintain_loop, name="job-maintenance")
+
+    def _spawn(self, target: Callable[..., None], *args: Any, name: str) -> None:
+        thread = threading.Thread(target=target, args=args, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def stop(self, timeout: float = 2.0) -> None:
+        """停止认领新任务；执行中的任务线程为 daemon，进程退出时由下次启动收回。"""
+        self._stop.set()
+        _notify()
+        for thread in self._threads:
+            thread.join(timeout if thread.name == "job-maintenance" else 0.1)
+
+    def _work_loop(self, handler: JobHandler) -> None:
+        while not self._stop.is_set():
+            try:
+                job = claim(handler.job_type, self.worker_id, self.lease_seconds)
+            except Exception:  # noqa: BLE001 - 数据库暂不可用：稍后再试
+                logger.exception("认领 %s 任务失败", handler.job_type)
+                job = None
+            if job is None:
+                with _wake:
+                    _wake.wait(_POLL_INTERVAL)
+                continue
+            self._execute(handler, job)
+
+    def _execute(self, handler: JobHandler, job: QueuedJob) -> None:
+        with self._lock:
+            self._running.add(job.id)
+        # 不支持取消的类型不登记：控制块只在本线程上下文内可见（终态事件记录、LLM 客户端跟踪）
+        control = register(job.id) if handler.cancellable else JobControl(job.id)
+        try:
+            with job_control(control):
+                result = handler.fn(job)
+        except JobCancelled:
+            _settle(job.id, self.worker_id, status="cancelled", lease_until=None)
+        except Exception as exc:  # noqa: BLE001 - 任务失败落库，工作线程继续
+            message = str(exc) or type(exc).__name__
+            transient = isinstance(exc, handler.retry_on) and not isinstance(exc, _PERMANENT_ERRORS)
+            if transient and job.attempt < handler.attempts_limit():
+                delay = retry_delay(job.attempt)
+                record_event(
+                    job.id,
+                    "retry",
+                    {"attempt": job.attempt + 1, "delay": delay, "message": message},
+                )
+                _settle(
+                    job.id,
+                    self.worker_id,
+                    status="pending",
+                    run_after=datetime.utcnow() + timedelta(seconds=delay),
+                    lease_until=None,
+                    worker_id=None,
+                    last_error=message,
+                )
+            else:
+                if control.terminal_event is None:  # 处理函数已发 error（带 usage）时不重复
+                    record_event(job.id, "error", {"message": message})
+                _settle(
+                    job.id, self.worker_id, status="error", lease_until=None, last_error=message
+                )
+        else:
+            _settle(
+                job.id,
+                self.worker_id,
+                status="done",
+                lease_until=None,
+                result_json=json.dumps(result, ensure_ascii=False, default=str)
+                if result is not None
+                else None,
+            )
+        finally:
+            with self._lock:
+                self._running.discard(job.id)
+
+    def _maintain_loop(self) -> None:
+        interval = max(1.0, self.lease_seconds / 3)
+        while not self._stop.wait(interval):
+            try:
+                self._renew_leases()
+                if recover_lost_jobs(expired_only=True) and self._on_recover is not None:
+                    self._on_recover()
+            except Exception:  # noqa: BLE001 - 维护失败不影响执行，下个周期重试
+                logger.exception("任务租约维护失败")
+
+    def _renew_leases(self) -> None:
+        with self._lock:
+            running = list(self._running)
+        if not running:
+            return
+        with Session(engine) as session:
+            session.exec(
+                update(Job)
+                .where(
+                    Job.id.in_(running),
+                    Job.worker_id == self.worker_id,
+                    Job.status.in_(("running", "paused")),
+                )
+                .values(lease_until=datetime.utcnow() + timedelta(seconds=self.lease_seconds))
+            )
+            session.commit()
+
+
+_pool: WorkerPool | None = None
+
+
+def start_workers(on_recover: Callable[[], None] | None = None) -> WorkerPool:
+    global _pool
+    if _pool is None:
+        _pool = WorkerPool(on_recover)
+        _pool.start()
+    return _pool
+
+
+def stop_workers() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.stop()
+        _pool = None
+
+
+def current_worker_id() -> str | None:
+    """本进程工作线程池的持有者标识；未启动时 None（此时所有 running 任务都不属于本进程）。"""
+    return _pool.worker_id if _pool is not None else None
@@ -57,6 +57,14 @@ def _int_setting(keys: str | list[str], default: int, lo: int, hi: int) -> int:
         return default
 
 
+def _float_setting(keys: str | list[str], default: float, lo: float, hi: float) -> float:
+    value = get_setting(keys, default)
+    try:
+        return max(lo, min(hi, float(value)))
+    except (TypeError, ValueError):
+        return default
+
+
 def _bool_setting(keys: str | list[str], default: bool) -> bool:
     value = get_setting(keys, default)
     if isinstance(value, bool):
@@ -73,6 +81,21 @@ def llm_config() -> dict:
     }
 
 
+def llm_hedge_enabled() -> bool:
+    """llm.hedge_enabled：请求对冲（默认关闭）——单次调用超过自适应阈值时并发补发一份，先到先用。"""
+    return _bool_setting("llm.hedge_enabled", False)
+
+
+def llm_hedge_percentile() -> int:
+    """llm.hedge_percentile：对冲阈值取该 endpoint 观测延迟的分位数（默认 p90，范围 50-99）。"""
+    return _int_setting("llm.hedge_percentile", 90, 50, 99)
+
+
+def llm_hedge_budget() -> float:
+    """llm.hedge_budget：对冲请求占总调用数的上限比例（默认 0.1，范围 0-0.5，防止花费翻倍）。"""
+    return _float_setting("llm.hedge_budget", 0.1, 0.0, 0.5)
+
+
 def retrieve_query_count() -> int:
     """retrieve.query_count：查询重写问题数（默认 8，范围 5-10，超出自动截断）。"""
     return _int_setting("retrieve.query_count", 8, 5, 10)
@@ -98,6 +121,26 @@ def retrieve_enabled() -> bool:
     return _bool_setting("retrieve.enabled", True)
 
 
+def segment_batch_size() -> int:
+    """segment.sat_batch_size：SaT 批量推理每批送入模型的文本块数（默认 32）。"""
+    return _int_setting("segment.sat_batch_size", 32, 1, 512)
+
+
+def segment_stride() -> int:
+    """segment.sat_stride：SaT 长段落滑窗步长（token，默认 64；不超过窗口长度 512）。"""
+    return _int_setting("segment.sat_stride", 64, 16, 512)
+
+
+def segment_processes() -> int:
+    """segment.sat_processes：大文档分句的进程池规模（0 / 1 = 不启用，在本进程批量推理）。"""
+    return _int_setting("segment.sat_processes", 0, 0, 16)
+
+
+def segment_cache_entries() -> int:
+    """segment.cache_entries：段落级分句缓存的条目上限（超出按最近使用淘汰；0 = 不缓存）。"""
+    return _int_setting("segment.cache_entries", 50000, 0, 1_000_000)
+
+
 def review_references() -> bool:
     """segment.review_references：是否审校/检索参考文献块（默认否）。"""
     return _bool_setting("segment.review_references", False)
@@ -130,6 +173,43 @@ def review_prompt() -> str:
     return value or DEFAULT_REVIEW_PROMPT
 
 
+def review_concurrency() -> int:
+    """review.concurrency：同时在途的 block 审校请求数（1 = 串行；受服务商限流约束，上限 16）。"""
+    return _int_setting("review.concurrency", 4, 1, 16)
+
+
+def review_pack_tokens() -> int:
+    """review.pack_tokens：相邻小块合并为一次审校请求的体量上限（估算 token，句子 + 证据；0 = 不合并）。"""
+    return _int_setting("review.pack_tokens", 1500, 0, 32000)
+
+
+def review_evidence_chars() -> int:
+    """review.evidence_chars：每条证据在审校 prompt 中保留的最大字符数（按与引用句的词面重叠截取窗口）。"""
+    return _int_setting("review.evidence_chars", 200, 50, 2000)
+
+
+def review_evidence_tokens() -> int:
+    """review.evidence_tokens：单次审校请求中证据清单的估算 token 上限（0 = 不限）。"""
+    return _int_setting("review.evidence_tokens", 1500, 0, 32000)
+
+
+def stream_queue_blocks() -> int:
+    """pipeline.stream_queue_blocks：流式处理相邻阶段间队列的容量（块数；满时上游阻塞，即背压）。"""
+    return _int_setting("pipeline.stream_queue_blocks", 4, 1, 64)
+
+
+def document_token_budget() -> int:
+    """budget.document_tokens：单文档单次任务的 token 预算（prompt + completion，0 = 不限）。"""
+    return _int_setting("budget.document_tokens", 0, 0, 100_000_000)
+
+
+def budget_action() -> str:
+    """budget.action：超预算后的处理——stop（停止后续调用，保留已完成结果）|
+    downgrade（降级：检索不再做 LLM 查询重写，审校不再附检索证据）。"""
+    value = str(get_setting("budget.action", "stop") or "stop").strip().lower()
+    return value if value in ("stop", "downgrade") else "stop"
+
+
 def embedding_provider() -> str:
     """embedding.provider：local（本地 BGE-M3）| openai（走 llm.base_url 的 /embeddings）。
     stub 为测试专用隐藏档（确定性假向量，不加载模型）。"""
@@ -142,6 +222,29 @@ def embedding_model() -> str:
     return str(get_setting("embedding.model", "BAAI/bge-m3") or "BAAI/bge-m3")
 
 
+# ---------- 后台任务队列（core/jobqueue.py） ----------
+
+
+def job_concurrency(job_type: str, default: int) -> int:
+    """jobs.concurrency.<type>：该类任务的工作线程数（进程启动时读取，修改后重启生效）。"""
+    return _int_setting(f"jobs.concurrency.{job_type}", default, 1, 16)
+
+
+def job_max_attempts() -> int:
+    """jobs.max_attempts：可重试任务的最大执行次数（含首次；检索 / 审校固定 1 次，见 jobqueue）。"""
+    return _int_setting("jobs.max_attempts", 3, 1, 10)
+
+
+def job_retry_backoff() -> float:
+    """jobs.retry_backoff：重试退避基数（秒），第 n 次重试等待 基数 × 2^(n-1)，上限 300 秒。"""
+    return _float_setting("jobs.retry_backoff", 2.0, 0.0, 600.0)
+
+
+def job_visibility_timeout() -> int:
+    """jobs.visibility_timeout：认领租约时长（秒）；持有进程按 1/3 周期续租，过期视为持有者已死。"""
+    return _int_setting("jobs.visibility_timeout", 60, 10, 3600)
+
+
 # ---------- M5：导出（设计文档 §5.2⑥、§8） ----------
 
 
@@ -4,12 +4,27 @@
 - chat_json()：优先 response_format={"type": "json_object"} 结构化输出；
   服务端不支持时降级为普通模式 + 从文本中提取首个 JSON 对象/数组；tenacity 重试 3 次。
 - 未配置 api_key 时抛 LLMNotConfiguredError（API 层转 400 友好提示；检索流程降级处理）。
+- 计量：每次 chat_json 调用把 usage tokens、延迟、重试次数与缓存命中记入当前
+  UsageMeter 作用域（见 llm/usage.py；无作用域时不记）。
+- 请求对冲（llm.hedge_enabled，默认关闭）：单次调用超过该 endpoint 观测延迟的 p90
+  （llm.hedge_percentile）仍未返回时，向同一 endpoint 补发一份相同请求，先返回者胜出，
+  落败者关闭其 HTTP 客户端中止在途请求。首发在调用方线程内执行，只有补发进线程池；
+  落败请求的 tokens 同样计入 UsageMeter（已返回取 usage，被中止按 prompt 估算）。对冲数受 llm.hedge_budget（占总调用比例）限制，
+  样本不足 _HEDGE_MIN_SAMPLES 时不对冲。llm_metrics() 按对冲开关分窗口输出实际延迟
+  p50/p90/p99（before_ms = 未开启对冲时的基线，after_ms = 开启后），用于对比对冲前后的尾延迟。
+- 任务取消（core/jobcontrol.py）：每次尝试前检查取消标志；所建 HTTP 客户端登记到当前任务，
+  取消时被关闭，在途请求的连接错误转为 JobCancelled（不重试、不降级）。
 """
 from __future__ import annotations
 
 import json
+import math
 import re
-from typing import Any
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
 
 from tenacity import (
     retry,
@@ -19,15 +34,22 @@ from tenacity import (
     wait_exponential,
 )
 
-from app.core.user_settings import llm_config
+from app.core.jobcontrol import JobCancelled, current_control, is_cancelled
+from app.core.user_settings import (
+    llm_config,
+    llm_hedge_budget,
+    llm_hedge_enabled,
+    llm_hedge_percentile,
+)
+from app.llm.usage import record_call, record_discarded, record_failed
 
 
 class LLMNotConfiguredError(RuntimeError):
     """未配置 llm.api_key（或 base_url/model 缺失）。"""
 
 
-def _client():
-    """按当前 settings 构造 OpenAI 客户端；未配置则抛 LLMNotConfiguredError。"""
+def _checked_config() -> dict:
+    """读取 LLM 配置；未配置则抛 LLMNotConfiguredError。"""
     cfg = llm_config()
     if not cfg["api_key"]:
         raise LLMNotConfiguredError("未配置 LLM API Key，请到设置页填写 llm.api_key")
@@ -35,9 +57,237 @@ def _client():
         raise LLMNotConfiguredError("未配置 LLM Base URL，请到设置页填写 llm.base_url")
     if not cfg["model"]:
         raise LLMNotConfiguredError("未配置 LLM 模型，请到设置页填写 llm.model")
+    return cfg
+
+
+def _make_client(cfg: dict):
     from openai import OpenAI
 
-    return OpenAI(base_url=cfg["base_url"], api_key=cfg["api_key"], timeout=60.0), cfg["model"]
+    return OpenAI(base_url=cfg["base_url"], api_key=cfg["api_key"], timeout=60.0)
+
+
+def _client():
+    """按当前 settings 构造 OpenAI 客户端；未配置则抛 LLMNotConfiguredError。"""
+    cfg = _checked_config()
+    return _make_client(cfg), cfg["model"]
+
+
+# ---------- 请求对冲：自适应阈值 + 预算上限 ----------
+
+_HEDGE_WINDOW = 200  # 每 endpoint 保留最近 N 次延迟样本
+_HEDGE_MIN_SAMPLES = 20  # 样本不足时阈值不可信，不对冲
+
+
+def _percentile(samples: list[float], pct: float) -> float | None:
+    """最近秩法分位数；空样本返回 None。"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+class EndpointStats:
+    """单个 endpoint（base_url + model）的延迟窗口与对冲计数（线程安全）。
+
+    latencies：全部调用的实际延迟（对冲阈值来源）；另按对冲开关分两个窗口——
+    off 即开启对冲前的基线，on 为开启后调用方实际等待的延迟，二者的 p99 对比即对冲收益。
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.latencies: deque[float] = deque(maxlen=_HEDGE_WINDOW)
+        self.by_mode: dict[str, deque[float]] = {
+            "off": deque(maxlen=_HEDGE_WINDOW),
+            "on": deque(maxlen=_HEDGE_WINDOW),
+        }
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def threshold(self, pct: float) -> float | None:
+        """对冲阈值（秒）：实际延迟的 pct 分位数；样本不足返回 None。"""
+        with self._lock:
+            if len(self.latencies) < _HEDGE_MIN_SAMPLES:
+                return None
+            samples = list(self.latencies)
+        return _percentile(samples, pct)
+
+    def try_acquire_hedge(self, budget: float) -> bool:
+        """预算检查：对冲后 hedged / calls 不得超过 budget。"""
+        with self._lock:
+            if self.hedged + 1 > budget * self.calls:
+                return False
+            self.hedged += 1
+            return True
+
+    def record(self, seconds: float, hedging: bool, hedge_won: bool = False) -> None:
+        with self._lock:
+            self.calls += 1
+            self.latencies.append(seconds)
+            self.by_mode["on" if hedging else "off"].append(seconds)
+            if hedge_won:
+                self.hedge_wins += 1
+
+    def snapshot(self, pct: float = 90) -> dict[str, Any]:
+        with self._lock:
+            latencies = list(self.latencies)
+            off, on = list(self.by_mode["off"]), list(self.by_mode["on"])
+            calls, hedged, wins = self.calls, self.hedged, self.hedge_wins
+
+        def ms(value: float | None) -> int | None:
+            return None if value is None else int(value * 1000)
+
+        def quantiles(samples: list[float]) -> dict[str, Any]:
+            return {
+                "samples": len(samples),
+                **{f"p{p}": ms(_percentile(samples, p)) for p in (50, 90, 99)},
+            }
+
+        return {
+            "calls": calls,
+            "hedged": hedged,
+            "hedge_wins": wins,
+            "hedge_rate": round(hedged / calls, 4) if calls else 0.0,
+            "threshold_ms": ms(_percentile(latencies, pct))
+            if len(latencies) >= _HEDGE_MIN_SAMPLES
+            else None,
+            "before_ms": quantiles(off),
+            "after_ms": quantiles(on),
+        }
+
+
+_stats_lock = threading.Lock()
+_endpoint_stats: dict[str, EndpointStats] = {}
+# 只执行补发的那份请求（首发在调用方线程内）；补发数受 llm.hedge_budget 限制
+_hedge_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="llm-hedge")
+
+
+def endpoint_stats(endpoint: str) -> EndpointStats:
+    with _stats_lock:
+        stats = _endpoint_stats.get(endpoint)
+        if stats is None:
+            stats = _endpoint_stats[endpoint] = EndpointStats()
+        return stats
+
+
+def llm_metrics() -> dict[str, Any]:
+    """各 endpoint 的调用/对冲计数与对冲前（before_ms）/后（after_ms）延迟分位数。"""
+    with _stats_lock:
+        items = list(_endpoint_stats.items())
+    pct = llm_hedge_percentile()
+    return {endpoint: stats.snapshot(pct) for endpoint, stats in items}
+
+
+def reset_llm_metrics() -> None:
+    """测试用：清空延迟统计。"""
+    with _stats_lock:
+        _endpoint_stats.clear()
+
+
+def _close_quietly(client: Any) -> None:
+    try:
+        client.close()
+    except Exception:
+        pass
+
+
+def hedged_call(
+    call: Callable[[Any], Any],
+    make_client: Callable[[], Any],
+    stats: EndpointStats,
+    *,
+    enabled: bool,
+    percentile: float,
+    budget: float,
+    on_discard: Callable[[Any], None] | None = None,
+) -> Any:
+    """执行 call(client)；超过自适应阈值且预算允许时补发一份，取先成功者并关闭落败方客户端。
+
+    首发在调用方线程内执行，不经线程池排队（排队时间会被计入延迟、抬高对冲阈值）；只有补发的
+    那份由定时器在阈值到点时提交到 _hedge_pool。关闭客户端会让落败请求抛出连接错误，该异常被忽略。
+    两份请求都失败时抛首发的异常。成功与失败的调用都计入延迟统计。
+
+    on_discard(result)：对冲时落败的那份请求——已返回则传其结果，在途被中止则传 None——
+    供调用方计量其 tokens（落败请求同样产生费用）。落败方自身失败（其费用不由此处估算，
+    否则与调用方的失败计量重复）或补发尚未开始即被取消时不上报。在调用方线程内调用。
+    """
+    started = time.monotonic()
+    threshold = stats.threshold(percentile) if enabled else None
+    if threshold is None:
+        client = make_client()
+        try:
+            return call(client)
+        finally:
+            _close_quietly(client)
+            stats.record(time.monotonic() - started, hedging=enabled)
+
+    primary_client = make_client()
+    lock = threading.Lock()
+    race: dict[str, Any] = {"primary_done": False, "hedge": None, "hedge_won": False}
+
+    def run_hedge(client: Any) -> Any:
+        result = call(client)
+        with lock:
+            if not race["primary_done"]:  # 补发先返回：中止仍在调用方线程内的首发
+                race["hedge_won"] = True
+                _close_quietly(primary_client)
+        return result
+
+    def fire() -> None:
+        with lock:
+            if race["primary_done"] or not stats.try_acquire_hedge(budget):
+                return
+            client = make_client()
+            race["hedge_client"] = client
+            race["hedge"] = _hedge_pool.submit(run_hedge, client)
+
+    timer = threading.Timer(threshold, fire)
+    timer.daemon = True
+    timer.start()
+    primary_error: Exception | None = None
+    result = None
+    try:
+        result = call(primary_client)
+    except Exception as exc:  # noqa: BLE001 —— 补发可能仍会成功，先记下
+        primary_error = exc
+    timer.cancel()
+    with lock:
+        race["primary_done"] = True
+        hedge = race["hedge"]
+    _close_quietly(primary_client)
+
+    if hedge is None:  # 未对冲：首发在阈值内返回，或预算不足
+        stats.record(time.monotonic() - started, hedging=True)
+        if primary_error is not None:
+            raise primary_error
+        return result
+
+    hedge_client = race["hedge_client"]
+    if primary_error is None and not race["hedge_won"]:  # 首发胜出：中止补发
+        stats.record(time.monotonic() - started, hedging=True)
+        # 关闭客户端前判定：此后补发抛出的连接错误是被中止，而不是自身失败
+        hedge_done = hedge.done()
+        hedge_failed = hedge_done and hedge.exception() is not None
+        never_started = hedge.cancel()  # 仍在线程池排队：请求未发出
+        _close_quietly(hedge_client)
+        if on_discard is not None and not hedge_failed and not never_started:
+            on_discard(hedge.result() if hedge_done else None)
+        return result
+
+    # 首发失败，或被先返回的补发中止：以补发结果为准
+    try:
+        hedge_result = hedge.result()
+    except Exception:
+        # hedge_won 只在补发成功后置位，走到这里时首发必然已失败
+        stats.record(time.monotonic() - started, hedging=True)
+        raise primary_error from None
+    finally:
+        _close_quietly(hedge_client)
+    stats.record(time.monotonic() - started, hedging=True, hedge_won=True)
+    if on_discard is not None and race["hedge_won"]:  # 首发是被中止的落败方（自身失败的不计）
+        on_discard(result if primary_error is None else None)
+    return hedge_result
 
 
 _JSON_BLOCK_RE = re.compile(r"```(?:json)?\s*([\s\S]*?)```")
@@ -91,23 +341,60 @@ def _extract_json(text: str) -> Any:
     stop=stop_after_attempt(3),
     wait=wait_exponential(multiplier=1, min=1, max=8),
     retry=retry_if_exception_type(Exception)
-    & retry_if_not_exception_type(LLMNotConfiguredError),  # 未配置属用户错误，重试无意义
+    # 未配置属用户错误、取消属主动中止，重试均无意义
+    & retry_if_not_exception_type((LLMNotConfiguredError, JobCancelled)),
     reraise=True,
 )
-def _chat_once(system: str, user: str, use_json_mode: bool) -> str:
-    client, model = _client()
+def _chat_once(system: str, user: str, use_json_mode: bool, trace: dict | None = None) -> str:
+    """单次 chat 调用（tenacity 重试包裹）；trace 累计尝试次数并带回最近一次响应的 usage。"""
+    if is_cancelled():  # 已取消则不再发起（暂停只在单元边界生效，不阻塞单元内的重试）
+        raise JobCancelled("任务已取消")
+    if trace is not None:
+        trace["attempts"] = trace.get("attempts", 0) + 1
+    cfg = _checked_config()
+    control = current_control()
+
+    def make_client() -> Any:
+        client = _make_client(cfg)
+        if control is not None:
+            control.track(client)
+        return client
+
     kwargs: dict[str, Any] = {}
     if use_json_mode:
         kwargs["response_format"] = {"type": "json_object"}
-    resp = client.chat.completions.create(
-        model=model,
-        messages=[
-            {"role": "system", "content": system},
-            {"role": "user", "content": user},
-        ],
-        temperature=0,
-        **kwargs,
-    )
+
+    def call(client) -> Any:
+        return client.chat.completions.create(
+            model=cfg["model"],
+            messages=[
+                {"role": "system", "content": system},
+                {"role": "user", "content": user},
+            ],
+            temperature=0,
+            **kwargs,
+        )
+
+    try:
+        resp = hedged_call(
+            call,
+            make_client,
+            endpoint_stats(f"{cfg['base_url']}#{cfg['model']}"),
+            enabled=llm_hedge_enabled(),
+            percentile=llm_hedge_percentile(),
+            budget=llm_hedge_budget(),
+            on_discard=lambda loser: record_discarded(
+                getattr(loser, "usage", None), prompt_text=system + user
+            ),
+        )
+    except Exception as exc:
+        # 失败的尝试同样产生费用（chat_json 只为成功的调用记 record_call）：按 prompt 估算计入
+        record_failed(prompt_text=system + user)
+        if is_cancelled():  # 客户端被取消关闭：连接错误即取消
+            raise JobCancelled(str(exc)) from exc
+        raise
+    if trace is not None:
+        trace["usage"] = getattr(resp, "usage", None)
     return resp.choices[0].message.content or ""
 
 
@@ -116,17 +403,27 @@ def chat_json(system: str, user: str, schema_hint: dict | None = None) -> Any:
 
     schema_hint：可选的 JSON 结构示例，附加到 user prompt 末尾引导模型输出。
     未配置 api_key → LLMNotConfiguredError；其余异常经 tenacity 重试 3 次后抛出。
+    计量：成功的调用记一笔 record_call（解析失败的输出同样已计入）；失败的尝试逐次 record_failed。
     """
     if schema_hint is not None:
         user = (
             f"{user}\n\n请严格按以下 JSON 结构返回（不要输出多余文字）：\n"
             f"{json.dumps(schema_hint, ensure_ascii=False)}"
         )
+    trace: dict[str, Any] = {}
+    started = time.monotonic()
     try:
-        raw = _chat_once(system, user, use_json_mode=True)
-    except LLMNotConfiguredError:
+        raw = _chat_once(system, user, use_json_mode=True, trace=trace)
+    except (LLMNotConfiguredError, JobCancelled):
         raise
     except Exception:
         # 服务端不支持 response_format 等场景：降级普通模式 + JSON 提取
-        raw = _chat_once(system, user, use_json_mode=False)
+        raw = _chat_once(system, user, use_json_mode=False, trace=trace)
+    record_call(
+        trace.get("usage"),
+        time.monotonic() - started,
+        retries=max(0, trace.get("attempts", 1) - 1),
+        prompt_text=system + user,
+        completion_text=raw,
+    )
     return _extract_json(raw)
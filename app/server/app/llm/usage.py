@@ -0,0 +1,217 @@
+"""LLM / embedding 调用计量：tokens（取自响应 usage）、延迟、重试与缓存命中。
+
+- 计量作用域经 contextvars 传递：pipeline 入口 `with metering(meter)` 绑定 UsageMeter，
+  各调用点 `with usage_stage("review")` 标注阶段；客户端每次调用后 record_call() 记一笔。
+  线程池内执行的调用需 contextvars.copy_context().run 传递作用域。
+- 服务端未返回 usage 时按 estimate_tokens() 估算（记 estimated_calls，预算仍可生效）。
+- 缓存命中：OpenAI prompt_tokens_details.cached_tokens / DeepSeek prompt_cache_hit_tokens。
+- 请求对冲的落败方同样产生费用：其 tokens 经 record_discarded() 计入（不计 calls / 延迟）。
+- 失败的尝试（超时、连接中断、服务端错误）同理：经 record_failed() 按 prompt 估算计入，记 failed_attempts。
+- 汇总结构（snapshot）即 jobs.usage_json / documents.usage_json 的 JSON 形态：
+  {calls, prompt_tokens, completion_tokens, total_tokens, cached_tokens, cache_hits,
+   retries, latency_ms, estimated_calls, failed_attempts, by_stage: {stage: {...同上计数}}}
+"""
+from __future__ import annotations
+
+import re
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator
+
+_COUNTERS = (
+    "calls",
+    "prompt_tokens",
+    "completion_tokens",
+    "total_tokens",
+    "cached_tokens",
+    "cache_hits",
+    "retries",
+    "latency_ms",
+    "estimated_calls",
+    "failed_attempts",
+)
+
+_CJK_RE = re.compile(r"[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗估 token 数：CJK 字符（含全角标点）按 1 个计，其余字符按 4 个 1 token。"""
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def empty_usage() -> dict[str, Any]:
+    return {**{key: 0 for key in _COUNTERS}, "by_stage": {}}
+
+
+def merge_usage(base: dict[str, Any] | None, extra: dict[str, Any] | None) -> dict[str, Any]:
+    """两份汇总相加（文档累计 = 历次 job 之和）。"""
+    merged = empty_usage()
+    for part in (base or {}, extra or {}):
+        for key in _COUNTERS:
+            merged[key] += int(part.get(key, 0) or 0)
+        for stage, counters in (part.get("by_stage") or {}).items():
+            slot = merged["by_stage"].setdefault(stage, {key: 0 for key in _COUNTERS})
+            for key in _COUNTERS:
+                slot[key] += int(counters.get(key, 0) or 0)
+    return merged
+
+
+class UsageMeter:
+    """一次 pipeline 运行的计量累加器（线程安全）；token_budget > 0 时可判定是否超预算。"""
+
+    def __init__(self, token_budget: int = 0) -> None:
+        self._lock = threading.Lock()
+        self._usage = empty_usage()
+        self.token_budget = token_budget
+
+    def record(self, stage: str, counters: dict[str, int]) -> None:
+        with self._lock:
+            slot = self._usage["by_stage"].setdefault(stage, {key: 0 for key in _COUNTERS})
+            for key in _COUNTERS:
+                value = int(counters.get(key, 0) or 0)
+                self._usage[key] += value
+                slot[key] += value
+
+    @property
+    def total_tokens(self) -> int:
+        with self._lock:
+            return self._usage["total_tokens"]
+
+    def over_budget(self) -> bool:
+        return self.token_budget > 0 and self.total_tokens >= self.token_budget
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return merge_usage(self._usage, None)
+
+
+_current_meter: ContextVar[UsageMeter | None] = ContextVar("usage_meter", default=None)
+_current_stage: ContextVar[str] = ContextVar("usage_stage", default="other")
+
+
+@contextmanager
+def metering(meter: UsageMeter) -> Iterator[UsageMeter]:
+    token = _current_meter.set(meter)
+    try:
+        yield meter
+    finally:
+        _current_meter.reset(token)
+
+
+@contextmanager
+def usage_stage(stage: str) -> Iterator[None]:
+    token = _current_stage.set(stage)
+    try:
+        yield
+    finally:
+        _current_stage.reset(token)
+
+
+def current_meter() -> UsageMeter | None:
+    return _current_meter.get()
+
+
+def _usage_field(usage: Any, name: str) -> int:
+    if usage is None:
+        return 0
+    value = usage.get(name) if isinstance(usage, dict) else getattr(usage, name, None)
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def cached_prompt_tokens(usage: Any) -> int:
+    """缓存命中的 prompt tokens：OpenAI 嵌套字段优先，DeepSeek 扁平字段兜底。"""
+    if usage is None:
+        return 0
+    details = (
+        usage.get("prompt_tokens_details")
+        if isinstance(usage, dict)
+        else getattr(usage, "prompt_tokens_details", None)
+    )
+    cached = _usage_field(details, "cached_tokens")
+    return cached or _usage_field(usage, "prompt_cache_hit_tokens")
+
+
+def record_call(
+    usage: Any,
+    latency: float,
+    *,
+    retries: int = 0,
+    prompt_text: str = "",
+    completion_text: str = "",
+    estimate: bool = True,
+) -> None:
+    """记一次调用到当前作用域（无作用域时忽略）。
+
+    usage 缺失时按文本估算 tokens；estimate=False（本地模型推理，不产生费用）时不估算、记 0。
+    """
+    meter = _current_meter.get()
+    if meter is None:
+        return
+    prompt_tokens = _usage_field(usage, "prompt_tokens")
+    completion_tokens = _usage_field(usage, "completion_tokens")
+    estimated = estimate and (usage is None or (prompt_tokens == 0 and completion_tokens == 0))
+    if estimated:
+        prompt_tokens = estimate_tokens(prompt_text)
+        completion_tokens = estimate_tokens(completion_text)
+    cached = cached_prompt_tokens(usage)
+    meter.record(
+        _current_stage.get(),
+        {
+            "calls": 1,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "cached_tokens": cached,
+            "cache_hits": 1 if cached > 0 else 0,
+            "retries": retries,
+            "latency_ms": int(latency * 1000),
+            "estimated_calls": 1 if estimated else 0,
+        },
+    )
+
+
+def record_discarded(usage: Any, *, prompt_text: str = "") -> None:
+    """记被对冲丢弃的那份请求的 tokens（不计调用次数与延迟，调用本身已由胜出方记一笔）。
+
+    落败方已返回时取其 usage；被中止（usage 为 None）时服务端至少已处理 prompt，按 prompt_text 估算。
+    """
+    meter = _current_meter.get()
+    if meter is None:
+        return
+    prompt_tokens = _usage_field(usage, "prompt_tokens")
+    completion_tokens = _usage_field(usage, "completion_tokens")
+    estimated = usage is None or (prompt_tokens == 0 and completion_tokens == 0)
+    if estimated:
+        prompt_tokens, completion_tokens = estimate_tokens(prompt_text), 0
+    cached = cached_prompt_tokens(usage)
+    meter.record(
+        _current_stage.get(),
+        {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "cached_tokens": cached,
+        },
+    )
+
+
+def record_failed(*, prompt_text: str = "") -> None:
+    """记一次失败的尝试（不计 calls / 延迟）：服务端多已处理 prompt，按 prompt_text 估算 tokens。
+
+    与 record_discarded 被中止时的估算一致；自身失败的对冲落败方不经 record_discarded 重复上报。
+    """
+    meter = _current_meter.get()
+    if meter is None:
+        return
+    prompt_tokens = estimate_tokens(prompt_text)
+    meter.record(
+        _current_stage.get(),
+        {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens, "failed_attempts": 1},
+    )
@@ -1,54 +1,99 @@
 """FastAPI 应用入口：uvicorn app.main:app"""
+import json
 from contextlib import asynccontextmanager
-from datetime import datetime
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from sqlmodel import Session, select
 
-from app.api import corrections, documents, health, jobs, kb, models as models_api
+from app.api import batches, corrections, documents, health, jobs, kb, models as models_api
 from app.api import settings as settings_api
 from app.core.config import get_settings
 from app.core.db import engine, init_db
+from app.core.joblog import flush_events
+from app.core.jobqueue import (
+    active_job,
+    current_worker_id,
+    recover_lost_jobs,
+    start_workers,
+    stop_workers,
+)
 from app.models import Document, Job, KbDocument
+from app.pipeline.segment import shutdown_pool
 
-# 进程中断（重启/崩溃）后会残留的瞬态状态：后台线程已死，永不自愈，启动时统一收敛为 failed
+# 进程中断（重启/崩溃）后会残留的瞬态状态：持有任务的工作线程已死，永不自愈，启动时统一收敛。
+# 任务本身由任务队列收回（core/jobqueue.py）：可重试类型重新入队，检索 / 审校有单元级检查点
+# （句子 queries / 块指纹），收回为 interrupted 供继续执行；文档 / 知识库状态在此收敛。
 _DOC_TRANSIENT_STATUSES = ("reviewing", "retrieving")
 _KB_TRANSIENT_STATUSES = ("indexing",)
 
 
-def _sweep_interrupted_state() -> None:
-    """启动清理：running jobs → error；瞬态文档/知识库状态 → failed（前端据此显示失败而非一直转圈）。"""
+def _checkpoint_text(job: Job | None) -> str:
+    """检查点的人读描述（审校 / 流式：块序号；检索：句子进度），无检查点返回空串。"""
+    if job is None or not job.checkpoint_json:
+        return ""
+    data = json.loads(job.checkpoint_json)
+    if job.type in ("review", "stream") and "block_idx" in data:
+        return f"（已处理到第 {data['block_idx'] + 1}/{data.get('blocks') or '?'} 块）"
+    if job.type == "retrieve" and "current" in data:
+        return f"（已检索 {data['current']}/{data.get('total', '?')} 句）"
+    return ""
+
+
+def _sweep_document_state() -> None:
+    """瞬态文档 / 知识库状态收敛：仍有排队或执行中任务的保持不动（任务会接着跑）；
+    最近任务为 interrupted 的文档 → interrupted（可经 POST /api/documents/{id}/resume 继续）；
+    其余 → failed（前端据此显示中断/失败而非一直转圈）。"""
     with Session(engine) as session:
-        interrupted = False
-        for job in session.exec(select(Job).where(Job.status == "running")).all():
-            job.status = "error"
-            job.updated_at = datetime.utcnow()
-            session.add(job)
-            interrupted = True
+        changed = False
         for doc in session.exec(
             select(Document).where(Document.status.in_(_DOC_TRANSIENT_STATUSES))
         ).all():
-            doc.status = "failed"
-            doc.error = "任务中断：后端服务已重启，请重新执行该操作"
+            if active_job(document_id=doc.id) is not None:
+                continue
+            job = session.exec(
+                select(Job).where(Job.document_id == doc.id).order_by(Job.updated_at.desc())
+            ).first()
+            if job is not None and job.status == "interrupted":
+                doc.status = "interrupted"
+                doc.error = f"任务中断：后端服务已重启{_checkpoint_text(job)}，可继续执行"
+            else:
+                doc.status = "failed"
+                doc.error = "任务中断：后端服务已重启，请重新执行该操作"
             session.add(doc)
-            interrupted = True
+            changed = True
         for kb_doc in session.exec(
             select(KbDocument).where(KbDocument.status.in_(_KB_TRANSIENT_STATUSES))
         ).all():
+            if active_job(kb_document_id=kb_doc.id) is not None:
+                continue
             kb_doc.status = "failed"
             session.add(kb_doc)
-            interrupted = True
-        if interrupted:
+            changed = True
+        if changed:
             session.commit()
 
 
+def _sweep_interrupted_state() -> None:
+    """启动清理：收回不属于本进程工作线程池的 running / paused 任务（见 recover_lost_jobs），
+    再收敛文档 / 知识库瞬态状态。"""
+    recover_lost_jobs(exclude_worker=current_worker_id())
+    _sweep_document_state()
+
+
 @asynccontextmanager
 async def lifespan(_: FastAPI):
     # 启动时初始化 SQLite（数据目录自动创建，见 core.config / core.db）
     init_db()
     _sweep_interrupted_state()
-    yield
+    # 任务队列工作线程：排队中的任务（含重启前入队的）随即开始执行
+    start_workers(on_recover=_sweep_document_state)
+    try:
+        yield
+    finally:
+        stop_workers()
+        flush_events()  # 已发布未写库的任务事件落库
+        shutdown_pool()
 
 
 app = FastAPI(title="句读 Caret Backend", version=get_settings().version, lifespan=lifespan)
@@ -64,6 +109,7 @@ app.add_middleware(
 
 app.include_router(health.router, prefix="/api")
 app.include_router(documents.router, prefix="/api")
+app.include_router(batches.router, prefix="/api")
 app.include_router(corrections.router, prefix="/api")
 app.include_router(kb.router, prefix="/api")
 app.include_router(settings_api.router, prefix="/api")
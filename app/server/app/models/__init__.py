@@ -1,27 +1,35 @@
 from app.models.tables import (
+    Batch,
     Block,
     Correction,
+    CorrectionStat,
     Document,
+    DocumentChange,
     Evidence,
     Job,
     JobEvent,
     KbChunk,
     KbDocument,
     Query,
+    SegmentCacheEntry,
     Sentence,
     Setting,
 )
 
 __all__ = [
+    "Batch",
     "Block",
     "Correction",
+    "CorrectionStat",
     "Document",
+    "DocumentChange",
     "Evidence",
     "Job",
     "JobEvent",
     "KbChunk",
     "KbDocument",
     "Query",
+    "SegmentCacheEntry",
     "Sentence",
     "Setting",
 ]
@@ -5,6 +5,7 @@ from datetime import datetime
 from typing import Optional
 from uuid import uuid4
 
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel
 
 
@@ -23,6 +24,41 @@ class Document(SQLModel, table=True):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     # M5：最近一次导出结果（JSON：clean/marked 路径、adopted 数、exported_at、warnings）
     exports_json: Optional[str] = None
+    # 历次任务累计的 LLM/embedding 计量（JSON，结构见 llm/usage.py）
+    usage_json: Optional[str] = None
+    # 批量处理：所属批次（单篇上传为空）
+    batch_id: Optional[str] = Field(default=None, foreign_key="batches.id", index=True)
+    # 内容修订号：分句 / 证据 / corrections / 决定 / 状态 / 计量每次写入 +1 并记一条
+    # document_changes（详情接口 ETag 与变更流的依据）
+    revision: int = 0
+    revised_at: Optional[datetime] = None
+
+
+class DocumentChange(SQLModel, table=True):
+    """文档变更流水：每次修订（documents.revision +1）一条紧凑记录，供客户端按修订号增量同步。"""
+    __tablename__ = "document_changes"
+    __table_args__ = (
+        Index("ix_document_changes_revision", "document_id", "revision", unique=True),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    document_id: str = Field(foreign_key="documents.id")
+    revision: int
+    ts: datetime = Field(default_factory=datetime.utcnow)
+    # blocks_cleared | block_added | blocks_added | evidence_cleared | evidence | corrections
+    # | corrections_removed | decision | status | usage
+    kind: str
+    data: str = "{}"  # json
+
+
+class Batch(SQLModel, table=True):
+    """批量处理：一个目录或 zip 内的多篇稿件，逐篇走流式处理（进度与吞吐由各篇任务汇总）。"""
+    __tablename__ = "batches"
+
+    id: str = Field(default_factory=_uuid, primary_key=True)
+    name: str
+    source: str  # 目录路径或 zip 文件名
+    created_at: datetime = Field(default_factory=datetime.utcnow)
 
 
 class Block(SQLModel, table=True):
@@ -34,12 +70,21 @@ class Block(SQLModel, table=True):
     chapter: Optional[str] = None
     is_reference: bool = False  # 参考文献块（M2 起；默认不审校）
     text: str
+    # 增量审校：上次审校输入（待审句 / 证据 / prompt / 模型）的指纹与产出的 pending corrections 数
+    review_fingerprint: Optional[str] = None
+    review_corrections: Optional[int] = None
+
+
+# sentences / queries / evidence / corrections 冗余存 document_id（与所属 block 一致，写入时填）：
+# 文档级读取与删除走单列索引谓词，不再经 blocks → sentences 拼 IN (...) 长参数列表
 
 
 class Sentence(SQLModel, table=True):
     __tablename__ = "sentences"
+    __table_args__ = (Index("ix_sentences_document_block", "document_id", "block_id", "idx"),)
 
     id: Optional[int] = Field(default=None, primary_key=True)
+    document_id: str = Field(foreign_key="documents.id")
     block_id: int = Field(foreign_key="blocks.id", index=True)
     idx: int
     text: str
@@ -50,6 +95,7 @@ class Query(SQLModel, table=True):
     __tablename__ = "queries"
 
     id: Optional[int] = Field(default=None, primary_key=True)
+    document_id: str = Field(foreign_key="documents.id", index=True)
     sentence_id: int = Field(foreign_key="sentences.id", index=True)
     idx: int
     text: str
@@ -58,8 +104,11 @@ class Query(SQLModel, table=True):
 class Evidence(SQLModel, table=True):
     """3+3 证据：向量 / 关键词两路检索结果"""
     __tablename__ = "evidence"
+    # 审校 prompt / 详情按句取证据：score 降序
+    __table_args__ = (Index("ix_evidence_sentence_score", "sentence_id", "score"),)
 
     id: Optional[int] = Field(default=None, primary_key=True)
+    document_id: str = Field(foreign_key="documents.id", index=True)
     sentence_id: int = Field(foreign_key="sentences.id", index=True)
     source: str  # vector | keyword
     chunk_text: str
@@ -70,8 +119,13 @@ class Evidence(SQLModel, table=True):
 
 class Correction(SQLModel, table=True):
     __tablename__ = "corrections"
+    # pending 计数、批量决定（decision + severity 过滤）
+    __table_args__ = (
+        Index("ix_corrections_document_decision", "document_id", "decision", "severity"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
+    document_id: str = Field(foreign_key="documents.id")
     sentence_id: int = Field(foreign_key="sentences.id", index=True)
     original: str
     suggestion: str
@@ -84,6 +138,18 @@ class Correction(SQLModel, table=True):
     decided_at: Optional[datetime] = None
 
 
+class CorrectionStat(SQLModel, table=True):
+    """corrections 聚合计数（每篇文档 × decision × severity × error_type 一行），
+    随 corrections 写入同事务维护（pipeline/stats.py）。"""
+    __tablename__ = "correction_stats"
+
+    document_id: str = Field(foreign_key="documents.id", primary_key=True)
+    decision: str = Field(primary_key=True)
+    severity: str = Field(default="", primary_key=True)
+    error_type: str = Field(default="", primary_key=True)
+    count: int = 0
+
+
 class KbDocument(SQLModel, table=True):
     __tablename__ = "kb_documents"
 
@@ -120,10 +186,24 @@ class Job(SQLModel, table=True):
     kb_document_id: Optional[str] = Field(
         default=None, foreign_key="kb_documents.id", index=True
     )  # M3：知识库索引任务
-    type: str = "pipeline"  # pipeline | kb_index | retrieve | review
-    status: str = "pending"  # pending | running | done | error
+    # pipeline | kb_index | retrieve | review | stream | export | model_download
+    type: str = "pipeline"
+    # pending（排队）| running | paused | done | error | cancelled | interrupted（重启时在途，可继续）
+    # | resumed（中断 / 失败后已由新任务接续，resumed 事件记新任务 id）
+    status: str = "pending"
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
+    usage_json: Optional[str] = None  # 本任务的 LLM/embedding 计量（JSON，结构见 llm/usage.py）
+    params_json: Optional[str] = None  # 任务参数（JSON，如审校 force），继续执行时复用
+    checkpoint_json: Optional[str] = None  # 最近一次 progress 事件（JSON），展示中断位置
+    # 任务队列（core/jobqueue.py）：认领次数 / 上限、退避后最早可执行时间、认领租约与持有者
+    attempts: int = 0
+    max_attempts: int = 1
+    run_after: Optional[datetime] = None
+    lease_until: Optional[datetime] = None
+    worker_id: Optional[str] = None
+    result_json: Optional[str] = None  # 任务处理函数的返回值（JSON）
+    last_error: Optional[str] = None
 
 
 class JobEvent(SQLModel, table=True):
@@ -135,3 +215,12 @@ class JobEvent(SQLModel, table=True):
     ts: datetime = Field(default_factory=datetime.utcnow)
     event: str
     data: str = "{}"  # json
+
+
+class SegmentCacheEntry(SQLModel, table=True):
+    """段落级分句缓存：(后端, 模型, 短句阈值, 段落文本) → 短句合并后的句子列表（LRU 淘汰）。"""
+    __tablename__ = "segment_cache"
+
+    key: str = Field(primary_key=True)  # sha256(后端 \0 模型 \0 min_len \0 段落文本)
+    sentences: str = "[]"  # json
+    used_at: datetime = Field(default_factory=datetime.utcnow, index=True)
@@ -1,13 +1,24 @@
-"""pipeline 共用工具：项目目录与文档状态推进。"""
+"""pipeline 共用工具：项目目录、文档状态推进、计量累计与内容修订号 / 变更记录。
+
+变更记录在所属事务提交后发布到事件总线（主题 document:<doc_id>），SSE 连接即时推送；
+事务回滚则不发布。
+"""
 from __future__ import annotations
 
+import json
+from datetime import datetime
 from pathlib import Path
+from typing import Any
 
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session as OrmSession
 from sqlmodel import Session
 
 from app.core.config import get_settings
 from app.core.db import engine
-from app.models import Document
+from app.core.eventbus import bus, document_topic
+from app.llm.usage import merge_usage
+from app.models import Document, DocumentChange
 
 
 def project_dir(doc_id: str) -> Path:
@@ -17,6 +28,58 @@ def project_dir(doc_id: str) -> Path:
     return directory
 
 
+def record_change(
+    session: Session, doc_id: str, kind: str, data: dict[str, Any] | None = None
+) -> int | None:
+    """文档内容修订号 +1 并追加一条变更记录（不提交，随调用方事务），返回新修订号；
+    文档已不存在 → None。修订号 SQL 自增，并发写入不丢、不重号。
+
+    凡改动详情接口可见内容的写入（分句、证据、corrections 增删与决定、状态、计量）都要调用。
+    """
+    now = datetime.utcnow()
+    revision = session.exec(
+        update(Document)
+        .where(Document.id == doc_id)
+        .values(revision=Document.revision + 1, revised_at=now)
+        .returning(Document.revision)
+    ).scalar_one_or_none()
+    if revision is None:
+        return None
+    change = DocumentChange(
+        document_id=doc_id,
+        revision=revision,
+        ts=now,
+        kind=kind,
+        data=json.dumps(data or {}, ensure_ascii=False),
+    )
+    session.add(change)
+    session.info.setdefault(_UNPUBLISHED, []).append((doc_id, change_json(change)))
+    return revision
+
+
+def change_json(change: DocumentChange) -> dict:
+    return {
+        "revision": change.revision,
+        "ts": change.ts.isoformat(),
+        "kind": change.kind,
+        "data": json.loads(change.data),
+    }
+
+
+_UNPUBLISHED = "unpublished_document_changes"  # session.info 键：本事务内尚未发布的变更
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _publish_changes(session: OrmSession) -> None:
+    for doc_id, payload in session.info.pop(_UNPUBLISHED, ()):
+        bus.publish(document_topic(doc_id), payload)
+
+
+@event.listens_for(OrmSession, "after_rollback")
+def _discard_changes(session: OrmSession) -> None:
+    session.info.pop(_UNPUBLISHED, None)
+
+
 def set_document_status(doc_id: str, status: str, error: str | None = None) -> None:
     """推进 documents 状态机；error=None 时清空错误字段。"""
     with Session(engine) as session:
@@ -26,4 +89,23 @@ def set_document_status(doc_id: str, status: str, error: str | None = None) -> N
         doc.status = status
         doc.error = error
         session.add(doc)
+        record_change(session, doc_id, "status", {"status": status, "error": error})
+        session.commit()
+
+
+def add_document_usage(doc_id: str, usage: dict[str, Any]) -> dict[str, Any]:
+    """把一次任务的计量累加进 documents.usage_json，返回累计值。"""
+    with Session(engine) as session:
+        doc = session.get(Document, doc_id)
+        if doc is None:
+            return usage
+        try:
+            current = json.loads(doc.usage_json) if doc.usage_json else None
+        except json.JSONDecodeError:
+            current = None
+        total = merge_usage(current, usage)
+        doc.usage_json = json.dumps(total, ensure_ascii=False)
+        session.add(doc)
+        record_change(session, doc_id, "usage", {"usage": total})
         session.commit()
+        return total
@@ -10,11 +10,15 @@
   等价，且避免同文重复句的误伤）；锚点找不到时降级：记 warning 事件并保留原文
   （M4 已知问题——LLM 未逐字摘录 original 的场景）。
 - 段落结构还原：block → 段落；chapter 标题行用 Heading 样式；表格占位符句
-  （[{表格不予审校_N}]）独立成段，生成后按占位符把 tables.docx 中第 N 个表格
-  还原回原位（移植旧 replace_placeholders_with_tables，改为 deepcopy + addprevious
-  原位插入，两个版本互不干扰）。
+  （[{表格不予审校_N}]）独立成段，渲染时直接换成 tables.docx 中第 N 个表格
+  （移植旧 replace_placeholders_with_tables，改为 deepcopy 原位插入，两个版本互不干扰）。
 - 全文段落首行缩进 docx.first_line_indent 英寸（默认 0.5，移植旧
-  add_tab_indent_to_paragraphs）。
+  add_tab_indent_to_paragraphs），创建段落时即设置。
+- 单遍渲染：tables.docx 只解析一次由两个版本共用；两个版本并发渲染，每个文件只保存一次
+  （旧实现每个版本保存三次、重开两次，且每个版本各解析一次 tables.docx）。
+- 增量导出：块级渲染缓存（pipeline/export_cache.py，projects/<doc_id>/export_cache.json）——
+  句子与其 corrections 决定都未变的块复用上次两个版本的段落规格与已渲染的段落 XML，
+  只重建决定有变化的块；命中 / 未命中计数随结果返回（cache）。
 - 前置状态：pending_manual / manual_done / done；没有任何 accepted/custom 决定时
   仍导出（等同原文），adopted=0。成功后状态 → done，产物路径与 adopted 数记
   documents.exports_json 与 job_events。
@@ -23,30 +27,40 @@ from __future__ import annotations
 
 import json
 import re
+from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Callable
+from typing import Any, Callable, Iterable
 
 from docx import Document as DocxDocument
+from docx.oxml import OxmlElement, parse_xml
+from docx.oxml.ns import qn
 from docx.shared import Inches
-from sqlmodel import Session, select
+from docx.text.paragraph import Paragraph
+from lxml import etree
+from sqlmodel import Session
 
 from app.core.db import engine
 from app.core.user_settings import first_line_indent_inches, output_dir
-from app.models import Block, Correction, Document, Sentence
+from app.models import Document
 from app.pipeline.common import project_dir, set_document_status
 from app.pipeline.ingest import PLACEHOLDER_RE as _PLACEHOLDER_SEARCH_RE
+from app.pipeline.export_cache import RenderCache
+from app.pipeline.snapshot import BlockSnap, CorrectionSnap, SentenceSnap, load_snapshot
 
 Emit = Callable[[str, dict], None]
 
 EXPORTABLE_STATUSES = ("pending_manual", "manual_done", "done")
 
+VERSIONS = ("clean", "marked")
+
 _PLACEHOLDER_LINE_RE = re.compile(r"^\[\{表格不予审校_(\d+)\}\]$")
 
 # 导出文件名后缀（沿用旧版命名）
 CLEAN_SUFFIX = "_审校修订1_.docx"
 MARKED_SUFFIX = "_审校修订2_.docx"
+RENDER_CACHE_NAME = "export_cache.json"
 
 
 def _noop_emit(_event: str, _data: dict) -> None:
@@ -58,8 +72,8 @@ def _marked_text(original: str, replacement: str, source_label: str) -> str:
 
 
 def _apply_sentence_corrections(
-    sentence: Sentence,
-    corrections: list[Correction],
+    sentence: SentenceSnap,
+    corrections: Iterable[CorrectionSnap],
     version: str,
     warn: Callable[[str], None],
 ) -> str:
@@ -86,10 +100,10 @@ def _apply_sentence_corrections(
     return text
 
 
-def _build_paragraph_specs(
-    session: Session, doc_id: str, version: str, warn: Callable[[str], None]
+def _build_block_specs(
+    block: BlockSnap, version: str, warn: Callable[[str], None]
 ) -> list[dict[str, Any]]:
-    """按 blocks 重建段落序列。
+    """把一个块重建为段落序列。
 
     返回 [{kind: heading|para|placeholder, text, table_index?}]：
     - chapter 标题（块内首句且与 block.chapter 同文）→ Heading 段落（应用修订后文本）；
@@ -97,95 +111,112 @@ def _build_paragraph_specs(
     - 其余句子按块拼接为正文段落（句间无分隔符，还原原文连续文本），
       遇占位符切段；is_reference 块同样输出（不审校，原文照搬）。
     """
-    blocks = session.exec(
-        select(Block).where(Block.document_id == doc_id).order_by(Block.idx)
-    ).all()
     specs: list[dict[str, Any]] = []
-    for block in blocks:
-        sentences = session.exec(
-            select(Sentence).where(Sentence.block_id == block.id).order_by(Sentence.idx)
-        ).all()
-        buffer: list[str] = []
-
-        def flush_buffer() -> None:
-            if buffer:
-                specs.append({"kind": "para", "text": "".join(buffer)})
-                buffer.clear()
-
-        for sentence in sentences:
-            placeholder = _PLACEHOLDER_LINE_RE.match(sentence.text)
-            if placeholder:
-                flush_buffer()
-                specs.append(
-                    {
-                        "kind": "placeholder",
-                        "text": sentence.text,
-                        "table_index": int(placeholder.group(1)),
-                    }
-                )
-                continue
-            corrections = session.exec(
-                select(Correction)
-                .where(Correction.sentence_id == sentence.id)
-                .order_by(Correction.id)
-            ).all()
-            revised = _apply_sentence_corrections(sentence, corrections, version, warn)
-            if sentence.idx == 0 and block.chapter and sentence.text == block.chapter:
-                flush_buffer()
-                specs.append({"kind": "heading", "text": revised})
-            else:
-                buffer.append(revised)
-        flush_buffer()
+    buffer: list[str] = []
+
+    def flush_buffer() -> None:
+        if buffer:
+            specs.append({"kind": "para", "text": "".join(buffer)})
+            buffer.clear()
+
+    for sentence in block.sentences:
+        placeholder = _PLACEHOLDER_LINE_RE.match(sentence.text)
+        if placeholder:
+            flush_buffer()
+            specs.append(
+                {
+                    "kind": "placeholder",
+                    "text": sentence.text,
+                    "table_index": int(placeholder.group(1)),
+                }
+            )
+            continue
+        revised = _apply_sentence_corrections(sentence, sentence.corrections, version, warn)
+        if sentence.idx == 0 and block.chapter and sentence.text == block.chapter:
+            flush_buffer()
+            specs.append({"kind": "heading", "text": revised})
+        else:
+            buffer.append(revised)
+    flush_buffer()
     return specs
 
 
-def _render_docx(specs: list[dict[str, Any]], dest_path: Path) -> None:
-    """段落规格 → docx：Heading 样式标题 + 正文段落 + 占位符段落。"""
-    doc = DocxDocument()
-    for spec in specs:
-        if spec["kind"] == "heading":
-            doc.add_heading(spec["text"], level=1)
-        else:
-            doc.add_paragraph(spec["text"])
-    doc.save(str(dest_path))
+def _build_block_entry(block: BlockSnap, warn: Callable[[str], None]) -> dict[str, Any]:
+    """一个块两个版本的段落规格，连同构建时产生的告警（渲染缓存的条目，见 export_cache）。"""
+    warnings: list[str] = []
 
+    def capture(message: str) -> None:
+        warnings.append(message)
+        warn(message)
 
-def _restore_tables(docx_path: Path, tables_path: Path) -> int:
-    """把 [{表格不予审校_N}] 占位符段落替换回 tables.docx 中第 N 个表格。
+    entry: dict[str, Any] = {
+        version: _build_block_specs(block, version, capture) for version in VERSIONS
+    }
+    entry["warnings"] = warnings
+    return entry
 
-    移植旧 replace_placeholders_with_tables；差异：deepcopy 表格节点 + addprevious
-    原位插入（旧版按段落序号 insert，在已含表格的 body 中可能错位）。返回还原的表格数。
-    """
+
+def _load_tables(tables_path: Path) -> list:
+    """tables.docx 只解析一次，返回按序的表格节点，供两个版本共用（插入时各自 deepcopy）。"""
     if not tables_path.exists():
-        return 0
-    doc = DocxDocument(str(docx_path))
-    tables_doc = DocxDocument(str(tables_path))
-    tables = tables_doc.tables
+        return []
+    return [table._tbl for table in DocxDocument(str(tables_path)).tables]
+
+
+def _render_docx(
+    specs: list[dict[str, Any]], dest_path: Path, tables: list, indent: float
+) -> int:
+    """段落规格 → docx，单遍生成并只保存一次。返回还原的表格数。
+
+    - heading → Heading 1 样式标题，其余 → 正文段落；首行缩进 indent 英寸在创建时设置（≤0 不缩进）；
+    - 文本含 [{表格不予审校_N}] 且 tables 有第 N 个表格 → 该处插入表格的 deepcopy 代替段落
+      （判定沿用旧 replace_placeholders_with_tables：在段落文本中搜索）；序号越界的占位符段落原样保留。
+
+    段落与表格直接插在 sectPr 之前：doc.add_paragraph 每次都线性扫描 body 找 sectPr，
+    上万段落时整体退化为平方级。产出与 add_paragraph / add_heading 逐字节相同。
+    """
+    doc = DocxDocument()
+    body = doc.element.body
+    sect_pr = body.find(qn("w:sectPr"))
+    if sect_pr is None:
+        sect_pr = OxmlElement("w:sectPr")
+        body.append(sect_pr)
+    first_line = Inches(indent) if indent > 0 else None
     restored = 0
-    for para in list(doc.paragraphs):
-        match = _PLACEHOLDER_SEARCH_RE.search(para.text)
-        if match is None:
+    for spec in specs:
+        match = _PLACEHOLDER_SEARCH_RE.search(spec["text"])
+        index = int(match.group(1)) - 1 if match else -1
+        if 0 <= index < len(tables):
+            sect_pr.addprevious(deepcopy(tables[index]))
+            restored += 1
             continue
-        index = int(match.group(1)) - 1
-        if not (0 <= index < len(tables)):
+        if "xml" in spec:  # 渲染缓存命中：直接插入上次渲染的段落
+            sect_pr.addprevious(parse_xml(spec["xml"]))
             continue
-        new_tbl = deepcopy(tables[index]._tbl)
-        para._element.addprevious(new_tbl)
-        para._element.getparent().remove(para._element)
-        restored += 1
-    if restored:
-        doc.save(str(docx_path))
+        p = OxmlElement("w:p")
+        sect_pr.addprevious(p)
+        paragraph = Paragraph(p, doc)
+        if spec["text"]:
+            paragraph.add_run(spec["text"])
+        if spec["kind"] == "heading":
+            paragraph.style = "Heading 1"
+        if first_line is not None:
+            paragraph.paragraph_format.first_line_indent = first_line
+        spec["xml"] = etree.tostring(p, encoding="unicode")  # 回填，供渲染缓存
+    doc.save(str(dest_path))
     return restored
 
 
-def _apply_first_line_indent(docx_path: Path, inches: float) -> None:
-    """全文段落首行缩进（移植旧 add_tab_indent_to_paragraphs，缩进量可配置）。"""
-    if inches <= 0:
-        return
-    doc = DocxDocument(str(docx_path))
-    for paragraph in doc.paragraphs:
-        paragraph.paragraph_format.first_line_indent = Inches(inches)
-    doc.save(str(docx_path))
+def _render_versions(
+    specs: dict[str, list[dict[str, Any]]], paths: dict[str, Path], tables: list, indent: float
+) -> dict[str, int]:
+    """各版本并发渲染（共用同一份只读 tables），返回 {version: 还原的表格数}。"""
+    with ThreadPoolExecutor(max_workers=len(paths), thread_name_prefix="export") as pool:
+        futures = {
+            version: pool.submit(_render_docx, specs[version], path, tables, indent)
+            for version, path in paths.items()
+        }
+        return {version: future.result() for version, future in futures.items()}
 
 
 def export_document(doc_id: str, emit: Emit | None = None) -> dict:
@@ -213,31 +244,33 @@ def export_document(doc_id: str, emit: Emit | None = None) -> dict:
         pdir = project_dir(doc_id)
         tables_path = pdir / "tables.docx"
 
+        # 一次加载 blocks / sentences / corrections（两个版本共用同一快照）
+        snapshot = load_snapshot(doc_id, evidence=False)
+        if snapshot is None:
+            raise KeyError(f"文档不存在: {doc_id}")
         # adopted = accepted + custom 决定数（锚点缺失降级不影响决定计数，见 warnings）
-        with Session(engine) as session:
-            blocks = session.exec(select(Block).where(Block.document_id == doc_id)).all()
-            block_ids = [b.id for b in blocks]
-            sentence_ids = (
-                session.exec(select(Sentence.id).where(Sentence.block_id.in_(block_ids))).all()
-                if block_ids
-                else []
-            )
-            adopted = (
-                len(
-                    session.exec(
-                        select(Correction).where(
-                            Correction.sentence_id.in_(sentence_ids),
-                            Correction.decision.in_(("accepted", "custom")),
-                        )
-                    ).all()
-                )
-                if sentence_ids
-                else 0
-            )
-            specs = {
-                version: _build_paragraph_specs(session, doc_id, version, warn)
-                for version in ("clean", "marked")
-            }
+        adopted = sum(
+            1
+            for _, sentence in snapshot.sentences()
+            for c in sentence.corrections
+            if c.decision in ("accepted", "custom")
+        )
+        # 逐块取渲染缓存：句子与决定都未变的块直接复用两个版本的段落规格（含已渲染的段落 XML），
+        # 重放其告警；其余块重建
+        indent = first_line_indent_inches()
+        cache = RenderCache(pdir / RENDER_CACHE_NAME, indent)
+        specs: dict[str, list[dict[str, Any]]] = {version: [] for version in VERSIONS}
+        for block in snapshot.blocks:
+            key = cache.key(block)
+            entry = cache.get(key)
+            if entry is None:
+                entry = _build_block_entry(block, warn)
+                cache.put(key, entry)
+            else:
+                for message in entry["warnings"]:
+                    warn(message)
+            for version in VERSIONS:
+                specs[version].extend(entry[version])
 
         out_dir_setting = output_dir()
         out_dir = Path(out_dir_setting) if out_dir_setting else pdir / "exports"
@@ -248,12 +281,9 @@ def export_document(doc_id: str, emit: Emit | None = None) -> dict:
             "marked": out_dir / f"{stem}{MARKED_SUFFIX}",
         }
 
-        indent = first_line_indent_inches()
-        restored: dict[str, int] = {}
+        restored = _render_versions(specs, paths, _load_tables(tables_path), indent)
+        cache.save()  # 渲染时已为新建段落回填 XML
         for version, path in paths.items():
-            _render_docx(specs[version], path)
-            restored[version] = _restore_tables(path, tables_path)
-            _apply_first_line_indent(path, indent)
             emit(
                 "progress",
                 {
@@ -294,6 +324,7 @@ def export_document(doc_id: str, emit: Emit | None = None) -> dict:
             "adopted": adopted,
             "warnings": warnings,
             "tables_restored": restored,
+            "cache": cache.stats(),
             "status": "done",
         }
     except Exception as exc:
@@ -0,0 +1,74 @@
+"""导出渲染缓存（projects/<doc_id>/export_cache.json）：重导出时只重建决定有变化的块。
+
+- 键：sha256(缓存格式版本 \\0 首行缩进 \\0 块章节 / 是否参考文献 \\0 各句 id / 句序 / 文本 \\0
+  各 correction 的 id / original / suggestion / 决定 / custom_text)，覆盖块与句子的全部渲染输入；
+  句子、块属性或任一决定变化即落到新键，无需显式失效。
+- 值：清洁版 / 留痕版各自的段落规格（含渲染出的段落 XML），以及构建该块时产生的告警
+  （锚点缺失等；命中时原样重放，与整篇重建时的 warning 事件一致）。
+- 导出成功后整文件原子替换，只保留本次用到的条目；文件随项目目录一并删除。
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from app.pipeline.snapshot import BlockSnap
+
+# 渲染产物（段落 XML 结构 / 规格字段）变化时递增，旧缓存随之全部失效
+_FORMAT_VERSION = 1
+
+
+class RenderCache:
+    """一次导出的块级缓存视图（绑定缓存文件与首行缩进），累计本次命中率。"""
+
+    def __init__(self, path: Path, indent: float) -> None:
+        self.path = path
+        self._prefix = f"{_FORMAT_VERSION}\0{indent!r}\0"
+        self._entries: dict[str, dict] = {}
+        self._used: dict[str, dict] = {}
+        self.hits = 0
+        self.misses = 0
+        try:
+            self._entries = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):  # 无缓存 / 损坏 → 全部重建
+            self._entries = {}
+
+    def key(self, block: BlockSnap) -> str:
+        parts = [self._prefix, block.chapter or "", str(int(block.is_reference))]
+        for sentence in block.sentences:
+            # idx 参与标题判定（块内首句与章节同文 → Heading）
+            parts.append(f"{sentence.id}\0{sentence.idx}\0{sentence.text}")
+            for c in sentence.corrections:
+                parts.append(
+                    f"{c.id}\0{c.original}\0{c.suggestion}\0{c.decision}\0{c.custom_text or ''}"
+                )
+        return hashlib.sha256("\0\0".join(parts).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> dict | None:
+        """取条目 {clean: [spec], marked: [spec], warnings: [str]}；未命中返回 None。"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._used[key] = entry
+        return entry
+
+    def put(self, key: str, entry: dict) -> None:
+        self._used[key] = entry
+
+    def save(self) -> None:
+        """只保留本次用到的条目，原子替换缓存文件。"""
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps(self._used, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
@@ -4,16 +4,28 @@
 a. settings 中 docx.has_review_table == 'Y' 时移除第一个表格（审查意见表）
 b. 其余表格按顺序抽取另存 tables.docx
 c. 原文档中表格原位替换为占位符段落 [{表格不予审校_N}]（N 从 1 递增），存 no_table.docx
-d. no_table.docx → parsed.md：Heading 1-3 → #/##/###，其余按段落输出，保留空行分段
+d. 同时产出 parsed.md：Heading 1-3 → #/##/###，其余按段落输出，保留空行分段
+
+实现为单遍流式：lxml iterparse 顺序读 word/document.xml，body 的每个直接子元素处理完即写出并释放，
+a~d 在同一次遍历中完成；图片等其余 zip 部件按字节流原样拷入 no_table.docx，不解码、不进内存。
+段落文本与样式名沿用 python-docx 的元素类与样式解析，parsed.md 与逐段 python-docx 读取逐字节一致。
 """
 from __future__ import annotations
 
+import posixpath
 import re
-from copy import deepcopy
+import shutil
+import zipfile
 from pathlib import Path
+from typing import Callable
 
 from docx import Document as DocxDocument
-from docx.oxml.ns import qn
+from docx.enum.style import WD_STYLE_TYPE
+from docx.oxml.ns import nsdecls, qn
+from docx.oxml.parser import element_class_lookup, parse_xml
+from docx.parts.styles import StylesPart
+from docx.styles.styles import Styles
+from lxml import etree
 
 from app.core.user_settings import has_review_table
 from app.pipeline.common import project_dir, set_document_status
@@ -21,68 +33,162 @@ from app.pipeline.common import project_dir, set_document_status
 PLACEHOLDER_RE = re.compile(r"\[\{表格不予审校_(\d+)\}\]")
 _HEADING_STYLE_RE = re.compile(r"(?i)^\s*(heading|标题)\s*([1-3])\s*$")
 
+_BODY, _P, _TBL = qn("w:body"), qn("w:p"), qn("w:tbl")
+_REL_OFFICE_DOCUMENT = "/officeDocument"
+_REL_STYLES = "/styles"
+_COPY_BUFFER = 1 << 20  # zip 部件流式拷贝的块大小
 
-def _remove_first_table(doc: DocxDocument) -> bool:
-    """移除首个表格（审查意见表）。返回是否有表格被移除。"""
-    if not doc.tables:
-        return False
-    first_tbl = doc.tables[0]._element
-    doc.element.body.remove(first_tbl)
-    return True
-
-
-def _extract_tables(doc: DocxDocument, dest_path: Path) -> int:
-    """把文档中所有（剩余）表格按顺序抽取到独立 docx。"""
-    dst = DocxDocument()
-    body = dst._element.body
-    sectPr = body.find(qn("w:sectPr"))
-    for table in doc.tables:
-        new_tbl = deepcopy(table._tbl)
-        if sectPr is not None:
-            sectPr.addprevious(new_tbl)  # 保持 sectPr 位于文末，避免损坏文档结构
-        else:
-            body.append(new_tbl)
-        dst.add_paragraph()
-    dst.save(str(dest_path))
-    return len(doc.tables)
-
-
-def _replace_tables_with_placeholders(doc: DocxDocument, dest_path: Path) -> int:
-    """表格原位替换为 [{表格不予审校_N}] 占位符段落，返回占位符数量。"""
-    body = doc.element.body
-    counter = 1
-    for element in list(body):
-        if element.tag == qn("w:tbl"):
-            index = body.index(element)
-            body.remove(element)
-            placeholder = doc.add_paragraph(f"[{{表格不予审校_{counter}}}]")
-            body.insert(index, placeholder._element)
-            counter += 1
-    doc.save(str(dest_path))
-    return counter - 1
-
-
-def _heading_level(para) -> int | None:
-    """识别 Heading 1-3 / 标题 1-3 段落样式。"""
+
+def _rel_target(zf: zipfile.ZipFile, source: str, rel_type: str) -> str | None:
+    """按关系类型（Type 后缀）解析 source 部件指向的部件名；source 为 "" 表示包级关系。"""
+    folder, name = posixpath.split(source)
+    rels = posixpath.join(folder, "_rels", f"{name}.rels")
     try:
-        name = para.style.name or ""
-    except Exception:  # 样式缺失时按普通段落处理
+        root = etree.fromstring(zf.read(rels))
+    except KeyError:
         return None
-    match = _HEADING_STYLE_RE.match(name)
+    for rel in root:
+        if rel.get("Type", "").endswith(rel_type) and rel.get("TargetMode") != "External":
+            target = rel.get("Target", "")
+            if target.startswith("/"):
+                return target[1:]
+            return posixpath.normpath(posixpath.join(folder, target))
+    return None
+
+
+def _heading_level(style_name: str) -> int | None:
+    """识别 Heading 1-3 / 标题 1-3 段落样式。"""
+    match = _HEADING_STYLE_RE.match(style_name)
     return int(match.group(2)) if match else None
 
 
-def _to_markdown(doc: DocxDocument) -> str:
+def _heading_resolver(zf: zipfile.ZipFile, main: str) -> Callable[[str | None], int | None]:
+    """styleId → 标题级别（按 styleId 缓存）。
+
+    样式解析与 python-docx 的 paragraph.style 相同：styleId 缺失 / 找不到 / 类型不符时取默认段落样式；
+    文档无样式部件时用 python-docx 的默认样式表。
+    """
+    styles_name = _rel_target(zf, main, _REL_STYLES)
+    try:
+        xml = zf.read(styles_name) if styles_name else StylesPart._default_styles_xml()
+    except KeyError:
+        xml = StylesPart._default_styles_xml()
+    styles = Styles(parse_xml(xml))
+    cache: dict[str | None, int | None] = {}
+
+    def level(style_id: str | None) -> int | None:
+        if style_id not in cache:
+            try:
+                name = styles.get_by_id(style_id, WD_STYLE_TYPE.PARAGRAPH).name or ""
+            except Exception:  # 样式缺失时按普通段落处理
+                cache[style_id] = None
+            else:
+                cache[style_id] = _heading_level(name)
+        return cache[style_id]
+
+    return level
+
+
+def _markdown_line(text: str, level: int | None) -> str:
+    text = text.rstrip()
+    if level is not None and text.strip():
+        return "#" * level + " " + text.strip()
+    # 普通段落与表格占位符原样输出；空段落保留为空行以维持分段
+    return text
+
+
+def _placeholder(counter: int):
+    """与 python-docx add_paragraph(text) 相同结构的占位符段落（无样式、单个 run）。"""
+    return parse_xml(
+        f"<w:p {nsdecls('w')}><w:r><w:t>[{{表格不予审校_{counter}}}]</w:t></w:r></w:p>"
+    )
+
+
+def _copy_parts(zin: zipfile.ZipFile, zout: zipfile.ZipFile, skip: str) -> None:
+    """除 skip 外的部件按原压缩方式流式拷贝（图片等二进制不整体读入内存）。"""
+    for info in zin.infolist():
+        if info.filename == skip:
+            continue
+        copied = zipfile.ZipInfo(info.filename, info.date_time)
+        copied.compress_type = info.compress_type
+        copied.external_attr = info.external_attr
+        with zin.open(info) as src, zout.open(copied, "w", force_zip64=True) as dst:
+            shutil.copyfileobj(src, dst, _COPY_BUFFER)
+
+
+def _stream_document(
+    original: Path, tables_path: Path, no_table_path: Path, remove_first: bool
+) -> tuple[bool, int, str]:
+    """单遍处理 original：返回 (是否移除审查意见表, 表格 / 占位符数, parsed.md 文本)。
+
+    body 的直接子元素在 end 事件时处理：w:tbl 移入 tables.docx 并以占位符段落写出，w:p 转一行 Markdown
+    后原样写出；处理完即从源树删除，内存占用与单个最大段落 / 表格同阶，与文档总长无关。
+    """
     lines: list[str] = []
-    for para in doc.paragraphs:
-        text = para.text.rstrip()
-        level = _heading_level(para)
-        if level is not None and text.strip():
-            lines.append("#" * level + " " + text.strip())
-        else:
-            # 普通段落与表格占位符原样输出；空段落保留为空行以维持分段
-            lines.append(text)
-    return "\n".join(lines).strip("\n") + "\n"
+    removed = False
+    counter = 0
+    tables_doc = DocxDocument()
+    tables_body = tables_doc.element.body
+    sect_pr = tables_body.find(qn("w:sectPr"))
+
+    with zipfile.ZipFile(original) as zin, zipfile.ZipFile(
+        no_table_path, "w", zipfile.ZIP_DEFLATED
+    ) as zout:
+        main = _rel_target(zin, "", _REL_OFFICE_DOCUMENT) or "word/document.xml"
+        level = _heading_resolver(zin, main)
+        _copy_parts(zin, zout, skip=main)
+
+        info = zin.getinfo(main)
+        target = zipfile.ZipInfo(main, info.date_time)
+        target.compress_type = zipfile.ZIP_DEFLATED
+        with zin.open(info) as src, zout.open(target, "w", force_zip64=True) as dst, \
+                etree.xmlfile(dst, encoding="UTF-8") as xf:
+            xf.write_declaration(standalone=True)
+            # 与 python-docx 的 oxml_parser 同参、同元素类：段落文本（run / 超链接 / 制表 / 换行）一致
+            events = etree.iterparse(
+                src, events=("start", "end"), remove_blank_text=True, resolve_entities=False
+            )
+            events.set_element_class_lookup(element_class_lookup)
+            scopes: list = []  # 已打开的 w:document / w:body 写出作用域
+            depth = 0
+            for event, elem in events:
+                if event == "start":
+                    depth += 1
+                    if depth == 1 or (depth == 2 and elem.tag == _BODY):
+                        nsmap = elem.nsmap if depth == 1 else None  # 命名空间只在根元素声明一次
+                        scope = xf.element(elem.tag, dict(elem.attrib), nsmap=nsmap)
+                        scope.__enter__()
+                        scopes.append(scope)
+                    continue
+                depth -= 1
+                if depth == 2 and elem.getparent().tag == _BODY:
+                    if elem.tag == _TBL:
+                        if remove_first and not removed:
+                            removed = True
+                        else:
+                            counter += 1
+                            placeholder = _placeholder(counter)
+                            xf.write(placeholder)
+                            lines.append(_markdown_line(placeholder.text, level(None)))
+                            if sect_pr is not None:
+                                sect_pr.addprevious(elem)  # 保持 sectPr 位于文末，避免损坏文档结构
+                            else:
+                                tables_body.append(elem)
+                            tables_doc.add_paragraph()
+                            continue
+                    else:
+                        if elem.tag == _P:
+                            lines.append(_markdown_line(elem.text, level(elem.style)))
+                        xf.write(elem)
+                    elem.getparent().remove(elem)
+                elif depth == 1 and elem.tag != _BODY:
+                    xf.write(elem)  # w:document 下 body 以外的子元素（如 w:background）
+                    elem.getparent().remove(elem)
+                elif depth <= 1:
+                    scopes.pop().__exit__(None, None, None)
+
+    tables_doc.save(str(tables_path))
+    return removed, counter, "\n".join(lines).strip("\n") + "\n"
 
 
 def ingest_document(doc_id: str) -> dict:
@@ -96,24 +202,17 @@ def ingest_document(doc_id: str) -> dict:
         raise FileNotFoundError(f"未找到上传文件: {original}")
 
     try:
-        doc = DocxDocument(str(original))
-        removed_review_table = has_review_table() and _remove_first_table(doc)
-
-        tables_path = pdir / "tables.docx"
-        no_table_path = pdir / "no_table.docx"
         parsed_path = pdir / "parsed.md"
-
-        table_count = _extract_tables(doc, tables_path)
-        placeholder_count = _replace_tables_with_placeholders(doc, no_table_path)
-
-        md_doc = DocxDocument(str(no_table_path))
-        parsed_path.write_text(_to_markdown(md_doc), encoding="utf-8")
+        removed_review_table, table_count, markdown = _stream_document(
+            original, pdir / "tables.docx", pdir / "no_table.docx", has_review_table()
+        )
+        parsed_path.write_text(markdown, encoding="utf-8")
 
         set_document_status(doc_id, "parsed")
         return {
             "removed_review_table": removed_review_table,
             "tables": table_count,
-            "placeholders": placeholder_count,
+            "placeholders": table_count,
             "parsed_md": str(parsed_path),
         }
     except Exception as exc:
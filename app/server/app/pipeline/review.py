@@ -3,43 +3,87 @@
 流程：
 1. 前置校验：文档存在且状态可审校（segmented / retrieved / pending_manual / manual_done，
    可重跑）；LLM 配置预检失败（LLMNotConfiguredError）在任何数据/状态变更之前抛出。
-2. 清理旧 corrections：默认只清 decision=pending 的（已人工决定的保留，且对应句子跳过本次审校）；
-   force=True 时全清重审。
+2. 清理旧 corrections：已人工决定的默认保留（对应句子跳过本次审校），force=True 时一并清除；
+   pending 的逐块处理——块输入指纹（待审句原文 / 证据 id 与原文 / review prompt / 模型）
+   与上次一致且上次产出的 pending 完好时直接复用，不再送审；其余块送审前替换其 pending。
 3. 逐 block 送审（跳过 is_reference 块，除非 segment.review_references=true；
    跳过纯表格占位符 block，占位符句不参与编号）：
    - system = settings review.prompt（默认内置医学审校模板，见 user_settings.DEFAULT_REVIEW_PROMPT）
-   - user = 块原文（句子编号 [S1][S2]…）+ 每句证据（编号 [E1][E2]…，含 向量/关键词 与来源标签；
-     无证据逐句注明；全块无证据时附加"纯 LLM 审校"提示——兼容未 retrieve / 检索关闭两种前置状态）
+   - user = 块原文（句子编号 [S1][S2]…）+ 去重证据清单（请求级编号 [E1][E2]…，含 向量/关键词
+     与来源标签，按引用句截取相关窗口、总量受 review.evidence_tokens 约束）+ 逐句引用的 [E] 编号；
+     无证据逐句注明；全块无证据时附加"纯 LLM 审校"提示——兼容未 retrieve / 检索关闭两种前置状态
    - chat_json 结构化输出 corrections：sentence_id / original / suggestion /
      error_type(事实错误|术语错误|语法错误|格式错误) / severity(high|medium|low) /
      evidence_ids[] / explanation
    - 校验：sentence_id 必须在块内编号范围、original 非空；非法条目丢弃并记 job_events 警告；
-     error_type/severity 越界时按默认值收敛（不丢条目）；evidence_ids 映射回该句 evidence 行 id
+     error_type/severity 越界时按默认值收敛（不丢条目）；evidence_ids 经 [E] 编号映射回 evidence 行 id
    - 每 block 一条 progress 事件
 4. corrections 入库（decision=pending）；状态 reviewing → pending_manual；
    若审校后无任何 pending 决定（如无 corrections 或重跑时全部已决定）→ manual_done。
+   corrections 的增删与文档聚合计数（pipeline/stats.py）同一事务维护，状态收口只读计数。
    LLM 调用中途失败：状态置 failed 并抛出（API 层转 500）。
+5. 计量：审校调用记 stage=review（llm/usage.py），done / error 事件附 usage 并累计到文档。
+   预算（budget.document_tokens）超出后按 budget.action：stop 停止送审剩余 block
+   （已审结果保留，状态照常收口）；downgrade 剩余 block 不再附检索证据（纯 LLM 审校）。
+6. 并发：最多 review.concurrency 个 block 同时在途，后续 block 的句子/证据在等待期间预取；
+   结果按 block 顺序解析入库并发 progress，失败语义与串行一致（见 _review_blocks）。
+7. 打包：相邻小块按 review.pack_tokens 合并为一次请求（摊薄重复的 system prompt），
+   [S] 编号在请求内连续，corrections 经 Sentence 行拆回各块；done 事件附 requests（请求数）
+   与 prompt_tokens（压缩前 / 后的 user prompt 估算 token，progress 事件逐请求同样附带）。
+8. 增量：done 事件 blocks_reused（指纹命中复用）/ blocks_reviewed（本次送审）分别计数。
+   指纹随块结果同一事务提交，即块级检查点：中断后继续执行（非 force 重跑）从第一个未完成块接着审。
+9. 取消 / 暂停（core/jobcontrol.py）：逐块检查，取消时中止在途请求；已提交的块保留，
+   状态收口为 pending_manual（有 pending）或恢复审校前状态，发 cancelled 事件后抛 JobCancelled。
 """
 from __future__ import annotations
 
+import contextvars
+import hashlib
 import json
-from typing import Any, Callable
+import re
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Iterable, Sequence
 
-from sqlalchemy import delete
+import jieba
+from sqlalchemy import func
 from sqlmodel import Session, select
 
 from app.core.db import engine
-from app.core.user_settings import llm_config, review_prompt, review_references
+from app.core.dbwriter import writer
+from app.core.jobcontrol import JobCancelled, checkpoint
+from app.core.user_settings import (
+    budget_action,
+    document_token_budget,
+    llm_config,
+    review_concurrency,
+    review_evidence_chars,
+    review_evidence_tokens,
+    review_pack_tokens,
+    review_prompt,
+    review_references,
+)
 from app.llm.client import LLMNotConfiguredError, chat_json
-from app.models import Block, Correction, Document, Evidence, Sentence
-from app.pipeline.common import set_document_status
+from app.llm.usage import UsageMeter, estimate_tokens, metering, usage_stage
+from app.models import Block, Correction, Document, Sentence
+from app.pipeline.common import add_document_usage, record_change, set_document_status
+from app.pipeline.snapshot import (
+    BlockSnap,
+    EvidenceSnap,
+    SentenceSnap,
+    block_index,
+    load_blocks,
+    load_snapshot,
+)
+from app.pipeline.stats import add_corrections, delete_corrections, pending_count
 from app.rag.retrieve import PLACEHOLDER_RE
 
 Emit = Callable[[str, dict], None]
 
 REVIEWABLE_STATUSES = ("segmented", "retrieved", "pending_manual", "manual_done")
-# failed 也允许重试审校（审校失败保留分句数据）；但解析阶段就失败的文档没有 blocks，需先重新解析
-RETRYABLE_STATUSES = REVIEWABLE_STATUSES + ("failed",)
+# failed 也允许重试审校（审校失败保留分句数据）；但解析阶段就失败的文档没有 blocks，需先重新解析。
+# interrupted：审校/检索进行中服务重启，可继续（已完成的块经指纹复用，见 8.）
+RETRYABLE_STATUSES = REVIEWABLE_STATUSES + ("failed", "interrupted")
 
 ERROR_TYPES = ("事实错误", "术语错误", "语法错误", "格式错误")
 SEVERITIES = ("high", "medium", "low")
@@ -78,36 +122,142 @@ def _check_llm_configured() -> None:
         raise LLMNotConfiguredError("未配置 LLM 模型，请到设置页填写 llm.model")
 
 
-def _sentence_evidence(session: Session, sentence_id: int) -> list[Evidence]:
-    """单句证据，按 score 降序（同分按 id 升序）——与 prompt 中 [E] 编号顺序一致。"""
-    return list(
-        session.exec(
-            select(Evidence)
-            .where(Evidence.sentence_id == sentence_id)
-            .order_by(Evidence.score.desc(), Evidence.id)
-        ).all()
-    )
+_CLAUSE_SPLIT_RE = re.compile(r"(?<=[。！？；;!?\n])")
+_OMITTED_MARK = "…"
+
+
+def _terms(text: str) -> set[str]:
+    """jieba 分词后的词集合（去空白与单字符标点），用于证据窗口的词面重叠打分。"""
+    return {t for t in jieba.lcut(text) if t.strip() and (len(t) > 1 or t.isalnum())}
+
+
+def _trim_chunk(text: str, query_terms: set[str], max_chars: int) -> str:
+    """截取证据中与引用句词面重叠最多的连续分句窗口（不超过 max_chars，同分取靠前者）。"""
+    text = (text or "").strip()
+    if max_chars <= 0 or len(text) <= max_chars:
+        return text
+    clauses = [c for c in _CLAUSE_SPLIT_RE.split(text) if c]
+    clause_terms = [_terms(c) for c in clauses]
+    best: tuple[int, int, int] | None = None  # (得分, 起, 止)
+    for i in range(len(clauses)):
+        length, covered = 0, set()
+        for j in range(i, len(clauses)):
+            if length + len(clauses[j]) > max_chars and j > i:
+                break
+            length += len(clauses[j])
+            covered |= clause_terms[j]
+            score = len(covered & query_terms)
+            if best is None or score > best[0]:
+                best = (score, i, j + 1)
+    _, lo, hi = best or (0, 0, 1)
+    window = "".join(clauses[lo:hi])[:max_chars].strip()
+    return (_OMITTED_MARK if lo > 0 else "") + window + (_OMITTED_MARK if hi < len(clauses) else "")
+
+
+def compact_evidence(
+    numbered: list[tuple[int, SentenceSnap, Sequence[EvidenceSnap]]],
+    max_chars: int = 0,
+    token_budget: int = 0,
+) -> dict[str, Any]:
+    """证据压缩：同一 chunk（文献 + 原文相同）在请求内只列一次，给请求级 [E] 编号。
+
+    - 编号按句序 × 句内证据序首次出现分配；各句只引用编号（"[S1] 的证据：E1、E3"）。
+    - 每个 chunk 截取与引用句词面重叠最多的窗口（max_chars，即 review.evidence_chars；0 = 不截取）。
+    - 证据总量受 token_budget（review.evidence_tokens；0 = 不限）约束：按各句证据名次轮转保留
+      （先保证每句的首条证据），超出预算的 chunk 省略，相关句注明。
+    返回 {"chunks": [{eid, label, doc_name, text, rows}], "refs": {句号: [eid]}, "omitted": {句号}}；
+    rows 为共享该 chunk 的 (句号, EvidenceSnap)（解析时映射回该句自己的行）。
+    """
+    groups: dict[tuple[str, str], dict[str, Any]] = {}
+    order: list[tuple[str, str]] = []
+    sentence_keys: dict[int, list[tuple[str, str]]] = {}
+    for num, sentence, evidences in numbered:
+        keys: list[tuple[str, str]] = []
+        for e in evidences:
+            key = (e.doc_name or "", (e.chunk_text or "").strip())
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = {"sources": [], "rows": [], "sentences": []}
+                order.append(key)
+            if e.source not in group["sources"]:
+                group["sources"].append(e.source)
+            group["rows"].append((num, e))
+            if sentence.text not in group["sentences"]:
+                group["sentences"].append(sentence.text)
+            if key not in keys:
+                keys.append(key)
+        sentence_keys[num] = keys
+
+    # 预算内保留：第 1 轮取各句首条证据，第 2 轮取各句第 2 条……
+    kept: set[tuple[str, str]] = set()
+    trimmed: dict[tuple[str, str], str] = {}
+    used = 0
+    depth = max((len(keys) for keys in sentence_keys.values()), default=0)
+    for rank in range(depth):
+        for num, _, _ in numbered:
+            keys = sentence_keys[num]
+            if rank >= len(keys) or keys[rank] in kept or keys[rank] in trimmed:
+                continue
+            key = keys[rank]
+            query_terms = set().union(*(_terms(t) for t in groups[key]["sentences"]))
+            text = _trim_chunk(key[1], query_terms, max_chars)
+            cost = estimate_tokens(text) + 16  # 编号与来源标签
+            trimmed[key] = text
+            if token_budget > 0 and used + cost > token_budget:
+                continue
+            used += cost
+            kept.add(key)
+
+    chunks: list[dict[str, Any]] = []
+    eid_of: dict[tuple[str, str], int] = {}
+    for key in order:
+        if key not in kept:
+            continue
+        eid_of[key] = len(chunks) + 1
+        group = groups[key]
+        chunks.append(
+            {
+                "eid": eid_of[key],
+                "label": "+".join(_SOURCE_LABELS.get(src, src) for src in group["sources"]),
+                "doc_name": key[0],
+                "text": trimmed[key],
+                "rows": group["rows"],
+            }
+        )
+    refs = {num: [eid_of[k] for k in keys if k in eid_of] for num, keys in sentence_keys.items()}
+    omitted = {num for num, keys in sentence_keys.items() if keys and not refs[num]}
+    return {"chunks": chunks, "refs": refs, "omitted": omitted}
 
 
-def build_user_prompt(numbered: list[tuple[int, Sentence, list[Evidence]]]) -> str:
-    """构造审校 user prompt：块原文（[S] 编号）+ 每句证据（[E] 编号，含来源标签）。
+def build_user_prompt(
+    numbered: list[tuple[int, SentenceSnap, Sequence[EvidenceSnap]]],
+    compact: dict[str, Any] | None = None,
+) -> str:
+    """构造审校 user prompt：块原文（[S] 编号）+ 去重后的证据清单（[E] 编号，含来源标签）+ 逐句引用。
 
-    numbered：[(句子编号, Sentence, 该句证据列表)]；全块无证据时附加纯 LLM 审校提示。
+    numbered：[(句子编号, SentenceSnap, 该句证据)]；compact 为 compact_evidence() 结果（缺省现算）。
+    全块无证据时附加纯 LLM 审校提示。
     """
+    compact = compact_evidence(numbered) if compact is None else compact
     lines: list[str] = ["请审校以下文稿块：", "", "【正文】"]
     for num, sentence, _ in numbered:
         lines.append(f"[S{num}] {sentence.text}")
     lines += ["", "【检索证据】"]
+    for chunk in compact["chunks"]:
+        lines.append(f"[E{chunk['eid']}]（{chunk['label']} · 来源《{chunk['doc_name']}》）{chunk['text']}")
+    if compact["chunks"]:
+        lines.append("")
     any_evidence = False
     for num, _, evidences in numbered:
-        if not evidences:
+        ids = compact["refs"].get(num) or []
+        if ids:
+            any_evidence = True
+            lines.append(f"[S{num}] 的证据：" + "、".join(f"E{i}" for i in ids))
+        elif num in compact["omitted"]:
+            any_evidence = True
+            lines.append(f"[S{num}]：证据超出篇幅已省略。")
+        else:
             lines.append(f"[S{num}]：无检索证据。")
-            continue
-        any_evidence = True
-        lines.append(f"[S{num}] 的证据：")
-        for idx, e in enumerate(evidences, start=1):
-            label = _SOURCE_LABELS.get(e.source, e.source)
-            lines.append(f"[E{idx}]（{label} · 来源《{e.doc_name}》）{e.chunk_text}")
     if not any_evidence:
         lines.append(
             "（本次审校未启用检索或知识库无相关内容，请基于医学常识审慎判断；"
@@ -117,16 +267,33 @@ def build_user_prompt(numbered: list[tuple[int, Sentence, list[Evidence]]]) -> s
     return "\n".join(lines)
 
 
+def uncompacted_prompt_tokens(
+    numbered: list[tuple[int, SentenceSnap, Sequence[EvidenceSnap]]],
+) -> int:
+    """压缩前口径（每句重复列出完整证据）的 user prompt 估算 token，用于对比压缩效果。"""
+    lines = [f"[S{num}] {sentence.text}" for num, sentence, _ in numbered]
+    for num, _, evidences in numbered:
+        lines.append(f"[S{num}] 的证据：" if evidences else f"[S{num}]：无检索证据。")
+        for idx, e in enumerate(evidences, start=1):
+            label = _SOURCE_LABELS.get(e.source, e.source)
+            lines.append(f"[E{idx}]（{label} · 来源《{e.doc_name}》）{e.chunk_text}")
+    return estimate_tokens("\n".join(lines))
+
+
 def parse_corrections(
     payload: Any,
-    numbered: list[tuple[int, Sentence, list[Evidence]]],
+    numbered: list[tuple[int, SentenceSnap, Sequence[EvidenceSnap]]],
     warn: Callable[[str], None],
+    compact: dict[str, Any] | None = None,
 ) -> list[dict[str, Any]]:
     """解析并校验 LLM 输出的 corrections。
 
     校验规则：sentence_id 在块内编号范围、original/suggestion 非空——非法条目丢弃并 warn；
-    error_type/severity 越界收敛为默认值（保留条目）；evidence_ids 按该句 [E] 编号映射回 evidence 行 id。
+    error_type/severity 越界收敛为默认值（保留条目）；evidence_ids 按请求级 [E] 编号
+    （compact_evidence，缺省现算）映射回 evidence 行 id：优先该句自己的行，否则取共享该 chunk 的首行。
     """
+    compact = compact_evidence(numbered) if compact is None else compact
+    chunk_rows = {chunk["eid"]: chunk["rows"] for chunk in compact["chunks"]}
     if isinstance(payload, dict):
         items = payload.get("corrections") or []
     elif isinstance(payload, list):
@@ -153,7 +320,7 @@ def parse_corrections(
         if match is None:
             warn(f"第 {pos} 条 sentence_id={sentence_num} 不在本块编号范围，已丢弃")
             continue
-        sentence, evidences = match
+        sentence, _evidences = match
         original = str(item.get("original") or "").strip()
         suggestion = str(item.get("suggestion") or "").strip()
         if not original:
@@ -176,10 +343,11 @@ def parse_corrections(
                     num = int(raw)
                 except (TypeError, ValueError):
                     continue
-                if 1 <= num <= len(evidences):
-                    ev_id = evidences[num - 1].id
-                    if ev_id is not None and ev_id not in evidence_db_ids:
-                        evidence_db_ids.append(ev_id)
+                rows = chunk_rows.get(num) or []
+                own = [e for n, e in rows if n == sentence_num] or [e for _, e in rows[:1]]
+                for e in own:
+                    if e.id is not None and e.id not in evidence_db_ids:
+                        evidence_db_ids.append(e.id)
         parsed.append(
             {
                 "sentence": sentence,
@@ -194,40 +362,27 @@ def parse_corrections(
     return parsed
 
 
-def _doc_sentence_ids(session: Session, doc_id: str) -> list[int]:
-    block_ids = [
-        b.id for b in session.exec(select(Block).where(Block.document_id == doc_id)).all()
-    ]
-    if not block_ids:
-        return []
-    return list(session.exec(select(Sentence.id).where(Sentence.block_id.in_(block_ids))).all())
-
-
-def pending_correction_count(session: Session, doc_id: str) -> int:
-    sentence_ids = _doc_sentence_ids(session, doc_id)
-    if not sentence_ids:
-        return 0
-    return len(
-        session.exec(
-            select(Correction.id).where(
-                Correction.sentence_id.in_(sentence_ids), Correction.decision == "pending"
-            )
-        ).all()
-    )
+def settle_review_status(session: Session, doc: Document) -> str:
+    """按计数收口文档状态（不提交，决定写入可与之同一事务）。"""
+    pending = pending_count(session, doc.id)
+    status = "manual_done" if pending == 0 else "pending_manual"
+    if (doc.status, doc.error) != (status, None):
+        doc.status = status
+        doc.error = None
+        session.add(doc)
+        record_change(session, doc.id, "status", {"status": status, "error": None})
+    return status
 
 
 def refresh_document_review_status(doc_id: str) -> str:
     """决定流公共收口：无 pending corrections → manual_done，否则 → pending_manual。"""
     with Session(engine) as session:
-        pending = pending_correction_count(session, doc_id)
         doc = session.get(Document, doc_id)
         if doc is None:
             raise KeyError(f"文档不存在: {doc_id}")
-        doc.status = "manual_done" if pending == 0 else "pending_manual"
-        doc.error = None
-        session.add(doc)
+        status = settle_review_status(session, doc)
         session.commit()
-        return doc.status
+        return status
 
 
 def review_document(doc_id: str, emit: Emit = _noop_emit, force: bool = False) -> dict[str, Any]:
@@ -240,6 +395,7 @@ def review_document(doc_id: str, emit: Emit = _noop_emit, force: bool = False) -
         doc = session.get(Document, doc_id)
         if doc is None:
             raise KeyError(f"文档不存在: {doc_id}")
+        prior_status = doc.status
         if doc.status not in RETRYABLE_STATUSES:
             raise ValueError(f"当前状态 {doc.status} 不能审校，请先完成解析分句")
         if doc.status == "failed":
@@ -253,145 +409,394 @@ def review_document(doc_id: str, emit: Emit = _noop_emit, force: bool = False) -
 
     _check_llm_configured()  # 前置失败：不改数据、不动状态
 
-    # 清理旧 corrections（默认只清 pending；force 全清）
+    # 清理旧 corrections：force 清掉人工决定；pending 留到逐块处理（输入未变的块直接复用）
     with Session(engine) as session:
-        sentence_ids = _doc_sentence_ids(session, doc_id)
-        if sentence_ids:
-            if force:
-                session.exec(delete(Correction).where(Correction.sentence_id.in_(sentence_ids)))
-            else:
-                session.exec(
-                    delete(Correction).where(
-                        Correction.sentence_id.in_(sentence_ids),
-                        Correction.decision == "pending",
-                    )
+        if force:
+            removed = delete_corrections(session, doc_id, Correction.decision != "pending")
+            if removed:
+                record_change(
+                    session, doc_id, "corrections_removed", {"scope": "decided", "count": removed}
                 )
             session.commit()
-        # 已人工决定的句子本次跳过（force 时为空集）
-        decided_sentence_ids: set[int] = set()
-        if sentence_ids:
-            decided_sentence_ids = set(
-                session.exec(
-                    select(Correction.sentence_id).where(
-                        Correction.sentence_id.in_(sentence_ids),
-                        Correction.decision != "pending",
-                    )
-                ).all()
-            )
+        # 一次加载全文 blocks / sentences / corrections / evidence（逐块准备时不再逐句查询）
+        snapshot = load_snapshot(doc_id, session=session)
+    assert snapshot is not None
+    # 已人工决定的句子本次跳过（force 时为空集）
+    decided_sentence_ids = {
+        c.sentence_id
+        for _, sentence in snapshot.sentences()
+        for c in sentence.corrections
+        if c.decision != "pending"
+    }
 
     set_document_status(doc_id, "reviewing")
     include_references = review_references()
+    block_rows = [
+        (b.id, b.idx, b.chapter, b.is_reference, b.review_fingerprint, b.review_corrections)
+        for b in snapshot.blocks
+    ]
 
-    with Session(engine) as session:
-        blocks = list(
-            session.exec(
-                select(Block).where(Block.document_id == doc_id).order_by(Block.idx)
-            ).all()
-        )
-        # 取出快照（脱离 session 使用）
-        block_rows = [(b.id, b.idx, b.chapter, b.is_reference, b.text) for b in blocks]
-
+    meter = UsageMeter(document_token_budget())
     try:
-        total_new = 0
-        reviewed_blocks = 0
-        skipped_blocks = 0
-        warnings = 0
         emit("start", {"blocks": len(block_rows), "force": force})
+        with metering(meter), usage_stage("review"):
+            result = _review_blocks(
+                block_rows,
+                decided_sentence_ids,
+                include_references,
+                meter,
+                emit,
+                snapshot_blocks=block_index(snapshot.blocks),
+            )
+        status = refresh_document_review_status(doc_id)
+        result = {"status": status, **result, "usage": meter.snapshot()}
+        emit("done", result)
+        return result
+    except LLMNotConfiguredError:
+        # 运行中配置被清空：回到可审校前置状态，便于配置后重试
+        set_document_status(doc_id, "segmented")
+        raise
+    except JobCancelled:
+        # 已提交的块保留：有 pending 待人工处理，否则回到审校前的可审校状态
+        with Session(engine) as session:
+            pending = pending_count(session, doc_id)
+        if pending:
+            status = refresh_document_review_status(doc_id)
+        else:
+            status = prior_status if prior_status in REVIEWABLE_STATUSES else "segmented"
+            set_document_status(doc_id, status)
+        emit("cancelled", {"status": status, "pending": pending, "usage": meter.snapshot()})
+        raise
+    except Exception as exc:
+        set_document_status(doc_id, "failed", str(exc))
+        emit("error", {"message": str(exc), "usage": meter.snapshot()})
+        raise
+    finally:
+        add_document_usage(doc_id, meter.snapshot())
 
-        for block_id, block_idx, chapter, is_reference, _text in block_rows:
-            if is_reference and not include_references:
-                skipped_blocks += 1
-                emit(
-                    "progress",
-                    {"block_idx": block_idx, "blocks": len(block_rows), "skipped": "reference"},
-                )
-                continue
-            with Session(engine) as session:
-                sentences = list(
-                    session.exec(
-                        select(Sentence).where(Sentence.block_id == block_id).order_by(Sentence.idx)
-                    ).all()
-                )
-                targets = [
-                    s
-                    for s in sentences
-                    if PLACEHOLDER_RE.match(s.text) is None and s.id not in decided_sentence_ids
-                ]
-                numbered = [
-                    (num, s, _sentence_evidence(session, s.id))
-                    for num, s in enumerate(targets, start=1)
-                ]
-            if not numbered:
-                skipped_blocks += 1
-                emit(
-                    "progress",
-                    {"block_idx": block_idx, "blocks": len(block_rows), "skipped": "empty"},
-                )
-                continue
 
-            user_prompt = build_user_prompt(numbered)
-            block_warnings: list[str] = []
-            payload = chat_json(
-                review_prompt(), user_prompt, schema_hint=_SCHEMA_HINT
-            )  # LLMNotConfiguredError / 调用异常：向外抛（finally 置 failed）
-            entries = parse_corrections(payload, numbered, warn=block_warnings.append)
-            for message in block_warnings:
-                warnings += 1
-                emit("warning", {"block_idx": block_idx, "message": message})
-
-            with Session(engine) as session:
-                for entry in entries:
-                    session.add(
-                        Correction(
-                            sentence_id=entry["sentence"].id,
-                            original=entry["original"],
-                            suggestion=entry["suggestion"],
-                            error_type=entry["error_type"],
-                            severity=entry["severity"],
-                            explanation=entry["explanation"],
-                            evidence_ids=json.dumps(
-                                entry["evidence_ids"], ensure_ascii=False
-                            ),
-                            decision="pending",
-                        )
-                    )
-                session.commit()
-            reviewed_blocks += 1
-            total_new += len(entries)
+def _prepare_block(
+    block_id: int,
+    decided_sentence_ids: set[int],
+    with_evidence: bool,
+    block: BlockSnap | None = None,
+) -> list[tuple[SentenceSnap, tuple[EvidenceSnap, ...]]]:
+    """块内待审句子及各句证据（主线程执行，在途请求期间即完成预取）。
+
+    block 为全文快照中的块时直接取用；流式输入（无全文快照）按块集合查询加载。
+    """
+    if block is None:
+        with Session(engine) as session:
+            loaded = load_blocks(session, block_id=block_id, corrections=False)
+        if not loaded:
+            return []
+        block = loaded[0]
+    return [
+        (s, s.evidence if with_evidence else ())
+        for s in block.sentences
+        if PLACEHOLDER_RE.match(s.text) is None and s.id not in decided_sentence_ids
+    ]
+
+
+def _block_tokens(rows: list[tuple[SentenceSnap, Sequence[EvidenceSnap]]]) -> int:
+    """打包用的块体量估算：句子原文 + 各句证据原文。"""
+    return sum(
+        estimate_tokens(s.text) + sum(estimate_tokens(e.chunk_text or "") for e in evidences)
+        for s, evidences in rows
+    )
+
+
+def _number_pack(
+    blocks: list[tuple[int, str | None, list[tuple[SentenceSnap, Sequence[EvidenceSnap]]]]],
+) -> list[tuple[int, SentenceSnap, Sequence[EvidenceSnap]]]:
+    """把一组块的句子按块序连续编号（[S] 在单次请求内全局唯一）。"""
+    rows = [row for _, _, block_rows in blocks for row in block_rows]
+    return [(num, s, evidences) for num, (s, evidences) in enumerate(rows, start=1)]
+
+
+def _call_block(prompt: str, user_prompt: str) -> Any:
+    """单次 LLM 调用（一块或打包的多块；线程池内执行，不访问 DB）。
+
+    prompt 由调用方在本轮开始时读取一次，与块指纹所用的一致（运行中改设置不影响本轮）。
+    """
+    return chat_json(prompt, user_prompt, schema_hint=_SCHEMA_HINT)
+
+
+def block_fingerprint(
+    rows: list[tuple[SentenceSnap, Sequence[EvidenceSnap]]], prompt: str, model: str
+) -> str:
+    """块审校输入指纹：待审句原文、各句证据 id 与原文、review prompt、模型。"""
+    material = {
+        "prompt": prompt,
+        "model": model,
+        "sentences": [
+            [s.text, [[e.id, e.chunk_text] for e in evidences]] for s, evidences in rows
+        ],
+    }
+    raw = json.dumps(material, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _block_pending(block_id: int):
+    """块内 pending corrections 的过滤条件（经句子子查询，不展开 id 列表）。"""
+    return Correction.sentence_id.in_(
+        select(Sentence.id).where(Sentence.block_id == block_id)
+    ) & (Correction.decision == "pending")
+
+
+def _pending_in_block(session: Session, block_id: int) -> int:
+    return session.exec(select(func.count(Correction.id)).where(_block_pending(block_id))).one()
+
+
+def _persist_block(
+    block_id: int, entries: list[dict[str, Any]], fingerprint: str | None
+) -> Future[None]:
+    """替换块的 pending corrections 并记录指纹（同一事务，经单写线程），返回落库 Future；
+    fingerprint=None 表示未审（清空指纹）。"""
+
+    def write(session: Session) -> None:
+        block = session.get(Block, block_id)
+        if block is None:  # 审校期间文档被删除或重新分句：无处写入
+            return
+        removed = delete_corrections(session, block.document_id, _block_pending(block_id))
+        block.review_fingerprint = fingerprint
+        block.review_corrections = len(entries) if fingerprint is not None else None
+        session.add(block)
+        added = [
+            Correction(
+                document_id=block.document_id,
+                sentence_id=entry["sentence"].id,
+                original=entry["original"],
+                suggestion=entry["suggestion"],
+                error_type=entry["error_type"],
+                severity=entry["severity"],
+                explanation=entry["explanation"],
+                evidence_ids=json.dumps(entry["evidence_ids"], ensure_ascii=False),
+                decision="pending",
+            )
+            for entry in entries
+        ]
+        add_corrections(session, added)
+        session.flush()  # 取回新 corrections 的 id 写入变更记录
+        record_change(
+            session,
+            block.document_id,
+            "corrections",
+            {"block_id": block_id, "removed": removed, "added": [c.id for c in added]},
+        )
+
+    return writer.submit(write)
+
+
+def _review_blocks(
+    block_rows: Iterable[tuple | None],
+    decided_sentence_ids: set[int],
+    include_references: bool,
+    meter: UsageMeter,
+    emit: Emit,
+    snapshot_blocks: dict[int, BlockSnap] | None = None,
+) -> dict[str, Any]:
+    """送审全部 block 并写入 corrections，返回计数（状态收口由调用方负责）。
+
+    打包 review.pack_tokens：相邻可审块（中间无跳过块）按句子 + 证据的估算 token 合并为
+    一次请求，[S] 编号在请求内连续，corrections 经 Sentence 行拆回各自的块；单块超限时独立成包。
+    并发窗口 review.concurrency：主线程按块序准备句子/证据并提交请求，在途请求达到窗口上限时
+    按提交顺序取回最早的结果——corrections 逐块按序提交、progress 单调；任一请求失败即取消
+    未开始的请求、等在途请求结束（用量照常计入 meter）后向外抛（此前的块已落库，同串行语义）。
+    预算在打包时判定，在途请求的用量稍后才计入，超出量最多为一个窗口的调用。
+    已返回的请求在处理下一块前即按序提交（不等窗口占满），首批 corrections 尽早可见。
+    block_rows 也可是流式输入（pipeline/stream.py）：块总数未知（progress 的 blocks 为 None，
+    由调用方补齐）；产出 None 表示上游暂无新块——提交未满的包并回收已返回的请求。
+    """
+    counts = {
+        "total_new": 0,
+        "reviewed": 0,
+        "reused": 0,
+        "skipped": 0,
+        "warnings": 0,
+        "requests": 0,
+        "prompt_before": 0,
+        "prompt_after": 0,
+    }
+    budget_exceeded = False
+    blocks_total = len(block_rows) if isinstance(block_rows, list) else None
+    window = review_concurrency()
+    pack_budget = review_pack_tokens()
+    evidence_chars = review_evidence_chars()
+    evidence_tokens = review_evidence_tokens()
+    prompt, model = review_prompt(), llm_config()["model"]
+    # 按块序排队的请求单元：{"blocks": [(block_idx, chapter, rows, block_id, 指纹)], "numbered", "future"}；
+    # 跳过的块为 {"skip": (block_idx, block_id, 原因)}，指纹命中的块为 {"reused": (block_idx, chapter, 条数)}
+    queue: deque[dict[str, Any]] = deque()
+    writes: list[Future[None]] = []  # 按块序提交给单写线程的 corrections 写入
+    pack: list[
+        tuple[int, str | None, list[tuple[SentenceSnap, Sequence[EvidenceSnap]]], int, str]
+    ] = []
+    pack_tokens = 0
+
+    def in_flight() -> int:
+        return sum(1 for unit in queue if "future" in unit)
+
+    def drain_one() -> None:
+        unit = queue.popleft()
+        if "skip" in unit:
+            block_idx, block_id, reason = unit["skip"]
+            writes.append(_persist_block(block_id, [], None))  # 未审的块不保留旧 pending
+            counts["skipped"] += 1
+            emit("progress", {"block_idx": block_idx, "blocks": blocks_total, "skipped": reason})
+            return
+        if "reused" in unit:
+            block_idx, chapter, n = unit["reused"]
+            counts["reused"] += 1
+            emit(
+                "progress",
+                {
+                    "block_idx": block_idx,
+                    "blocks": blocks_total,
+                    "chapter": chapter,
+                    "reused": True,
+                    "corrections": n,
+                },
+            )
+            return
+        payload = unit["future"].result()  # LLMNotConfiguredError / 调用异常：向外抛（调用方置 failed）
+        first_idx = unit["blocks"][0][0]
+        request_warnings: list[str] = []
+        entries = parse_corrections(
+            payload, unit["numbered"], warn=request_warnings.append, compact=unit["compact"]
+        )
+        for message in request_warnings:
+            counts["warnings"] += 1
+            emit("warning", {"block_idx": first_idx, "message": message})
+        for block_idx, chapter, rows, block_id, fingerprint in unit["blocks"]:
+            sentence_ids = {s.id for s, _ in rows}
+            block_entries = [e for e in entries if e["sentence"].id in sentence_ids]
+            writes.append(_persist_block(block_id, block_entries, fingerprint))
+            counts["reviewed"] += 1
+            counts["total_new"] += len(block_entries)
             emit(
                 "progress",
                 {
                     "block_idx": block_idx,
-                    "blocks": len(block_rows),
+                    "blocks": blocks_total,
                     "chapter": chapter,
-                    "sentences": len(numbered),
-                    "corrections": len(entries),
+                    "sentences": len(rows),
+                    "corrections": len(block_entries),
+                    "packed_with": first_idx if len(unit["blocks"]) > 1 else None,
+                    "prompt_tokens": unit["prompt_tokens"] if block_idx == first_idx else None,
                 },
             )
 
-        status = refresh_document_review_status(doc_id)
-        emit(
-            "done",
+    def submit_pack() -> None:
+        nonlocal pack, pack_tokens
+        if not pack:
+            return
+        numbered = _number_pack([(idx, ch, rows) for idx, ch, rows, _, _ in pack])
+        compact = compact_evidence(numbered, evidence_chars, evidence_tokens)
+        user_prompt = build_user_prompt(numbered, compact)
+        prompt_tokens = {
+            "before": uncompacted_prompt_tokens(numbered),
+            "after": estimate_tokens(user_prompt),
+        }
+        # 复制上下文：计量作用域（metering / usage_stage）随调用进入工作线程
+        future = pool.submit(contextvars.copy_context().run, _call_block, prompt, user_prompt)
+        queue.append(
             {
-                "status": status,
-                "blocks_reviewed": reviewed_blocks,
-                "blocks_skipped": skipped_blocks,
-                "corrections": total_new,
-                "warnings": warnings,
-            },
+                "blocks": pack,
+                "numbered": numbered,
+                "compact": compact,
+                "prompt_tokens": prompt_tokens,
+                "future": future,
+            }
         )
-        return {
-            "status": status,
-            "blocks_reviewed": reviewed_blocks,
-            "blocks_skipped": skipped_blocks,
-            "corrections": total_new,
-            "warnings": warnings,
-        }
-    except LLMNotConfiguredError:
-        # 运行中配置被清空：回到可审校前置状态，便于配置后重试
-        set_document_status(doc_id, "segmented")
-        raise
-    except Exception as exc:
-        set_document_status(doc_id, "failed", str(exc))
-        emit("error", {"message": str(exc)})
-        raise
+        counts["requests"] += 1
+        counts["prompt_before"] += prompt_tokens["before"]
+        counts["prompt_after"] += prompt_tokens["after"]
+        pack, pack_tokens = [], 0
+        while in_flight() >= window:
+            drain_one()
+
+    def enqueue(unit: dict[str, Any]) -> None:
+        submit_pack()  # 只合并相邻块：跳过 / 复用的块切断当前包，保证 progress 按块序
+        queue.append(unit)
+
+    def drain_ready() -> None:
+        while queue and ("future" not in queue[0] or queue[0]["future"].done()):
+            drain_one()
+
+    pool = ThreadPoolExecutor(max_workers=window, thread_name_prefix="review")
+    try:
+        for row in block_rows:
+            if row is None:  # 流式输入空转：不再等下一块凑包
+                submit_pack()
+                drain_ready()
+                continue
+            drain_ready()
+            checkpoint()  # 取消 / 暂停：逐块检查（暂停期间在途请求照常完成）
+            block_id, block_idx, chapter, is_reference, last_fp, last_count = row
+            if is_reference and not include_references:
+                enqueue({"skip": (block_idx, block_id, "reference")})
+                continue
+            if meter.over_budget():
+                if not budget_exceeded:
+                    budget_exceeded = True
+                    emit(
+                        "budget",
+                        {
+                            "action": budget_action(),
+                            "total_tokens": meter.total_tokens,
+                            "budget": meter.token_budget,
+                            "block_idx": block_idx,
+                        },
+                    )
+                if budget_action() == "stop":
+                    enqueue({"skip": (block_idx, block_id, "budget")})
+                    continue
+            # 预算降级：不附检索证据（纯 LLM 审校）
+            snap = snapshot_blocks.get(block_id) if snapshot_blocks is not None else None
+            rows = _prepare_block(block_id, decided_sentence_ids, not budget_exceeded, snap)
+            if not rows:
+                enqueue({"skip": (block_idx, block_id, "empty")})
+                continue
+            fingerprint = block_fingerprint(rows, prompt, model)
+            if fingerprint == last_fp and last_count is not None:
+                if snap is not None:
+                    pending = sum(
+                        1 for s in snap.sentences for c in s.corrections if c.decision == "pending"
+                    )
+                else:
+                    with Session(engine) as session:
+                        pending = _pending_in_block(session, block_id)
+                intact = pending == last_count
+                if intact:  # 输入未变且上次结果完好：复用，不送审
+                    enqueue({"reused": (block_idx, chapter, last_count)})
+                    continue
+            tokens = _block_tokens(rows)
+            if pack and pack_tokens + tokens > pack_budget:
+                submit_pack()
+            pack.append((block_idx, chapter, rows, block_id, fingerprint))
+            pack_tokens += tokens
+            if pack_tokens >= pack_budget:  # 已满（含不打包 = 0）：立即提交，不等下一块
+                submit_pack()
+        submit_pack()
+        while queue:
+            drain_one()
+    finally:
+        # 失败时未开始的请求直接取消；在途请求等其结束（结果丢弃），其用量在调用方退出计量作用域、
+        # 发出终态事件之前计入。取消任务时客户端已被关闭（core/jobcontrol.py），在途请求立即返回
+        pool.shutdown(wait=True, cancel_futures=True)
+        wait(writes)
+    for write in writes:
+        write.result()
+
+    return {
+        "blocks_reviewed": counts["reviewed"],
+        "blocks_reused": counts["reused"],
+        "blocks_skipped": counts["skipped"],
+        "requests": counts["requests"],
+        # user prompt 估算 token：压缩前（逐句重复完整证据）/ 压缩后（实际发送）
+        "prompt_tokens": {"before": counts["prompt_before"], "after": counts["prompt_after"]},
+        "corrections": counts["total_new"],
+        "warnings": counts["warnings"],
+        "budget_exceeded": budget_exceeded,
+    }
@@ -7,19 +7,59 @@
 - 章节边界：Markdown 标题行（# 开头）与「一、」「（一）」正则模式。
 - 连续 [N]: 开头的行识别为参考文献区，单独成 block 且 is_reference=True（默认不审校）。
 - 单块超过 MAX_BLOCK_CHARS 时在句子边界拆分。
+- 批量分句：正文行先收集，再一次调用 SaT 的列表接口（segment.sat_batch_size / sat_stride），
+  不再逐行单独前向；大文档可按 segment.sat_processes 分片到进程池。分块逻辑不变。
+- 段落级分句缓存（pipeline/segment_cache.py）：未改动的段落直接取缓存，不再送分句器；
+  命中率随结果（stage_done 事件）上报。
+- iter_blocks 块一结束即产出：流式处理（pipeline/stream.py）逐块入库并立即送往检索 / 审校
+  （按 window 行攒批分句，首块不必等整篇）。
+- 入库走批量路径（insert_blocks）：blocks / sentences 各一次 executemany，块 id 按块序一次
+  SELECT 取回，不经 ORM 工作单元与逐块 flush。
+- 整篇重新分句为增量更新（_resegment，经单写线程同一事务）：新旧句子序列对齐，未变的句子
+  保留 id 与下游 queries / evidence / corrections（含人工决定），只删改动句、只建新句；
+  后续检索（incremental）/ 审校（块指纹复用）只需处理改动部分。
 """
 from __future__ import annotations
 
+import logging
+import multiprocessing
 import os
 import re
+import threading
+from bisect import bisect_left
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from difflib import SequenceMatcher
+from pathlib import Path
+from typing import Iterator
 
-from sqlalchemy import delete
-from sqlmodel import Session, select
+from sqlalchemy import delete, insert, select, update
+from sqlmodel import Session
 
 from app.core.db import engine
-from app.core.user_settings import min_sentence_length
-from app.models import Block, Correction, Evidence, Query, Sentence
-from app.pipeline.common import project_dir, set_document_status
+from app.core.dbwriter import writer
+from app.core.user_settings import (
+    min_sentence_length,
+    segment_batch_size,
+    segment_cache_entries,
+    segment_processes,
+    segment_stride,
+)
+from app.models import (
+    Block,
+    Correction,
+    CorrectionStat,
+    DocumentChange,
+    Evidence,
+    Query,
+    Sentence,
+)
+from app.pipeline.common import project_dir, record_change, set_document_status
+from app.pipeline.review import refresh_document_review_status
+from app.pipeline.segment_cache import SegmentCache
+from app.pipeline.stats import delete_corrections, document_stats
+
+logger = logging.getLogger(__name__)
 
 MAX_BLOCK_CHARS = 1000
 _CHAPTER_TITLE_MAX_LEN = 60
@@ -30,6 +70,12 @@ _CHAPTER_RE = re.compile(r"^\s*(?:[一二三四五六七八九十百]+、|（[
 _REF_LINE_RE = re.compile(r"^\s*\[\d+\]\s*[:：]")
 _PLACEHOLDER_LINE_RE = re.compile(r"^\[\{表格不予审校_\d+\}\]$")
 
+_ID_CHUNK = 500  # 按 id 删除时每条 IN 的参数数
+_POOL_MIN_PARAGRAPHS = 2000  # 段落数达到该值才分发到进程池（子进程加载模型有固定开销）
+_pool: ProcessPoolExecutor | None = None
+_pool_size = 0
+_pool_lock = threading.Lock()
+
 
 class SentenceSplitter:
     """SaT 单例；加载失败（含未下载模型）时回退正则分句。"""
@@ -39,6 +85,7 @@ class SentenceSplitter:
     def __init__(self) -> None:
         self._sat = None
         self.backend = "rule"
+        self.model_id = "regex"  # 分句缓存键的一部分：模型变化即换键
         if os.environ.get("AI_REVIEW_SEGMENTER", "sat").lower() == "rule":
             return
         try:
@@ -52,13 +99,16 @@ class SentenceSplitter:
                 tokenizer = sat_tokenizer_dir()
                 tokenizer_path = str(tokenizer) if tokenizer is not None else "facebookAI/xlm-roberta-base"
                 self._sat = SaT(str(model_path), tokenizer_name_or_path=tokenizer_path)
+                self.model_id = f"{model_path}:{tokenizer_path}"
             else:
                 # 首次自动从 HF Hub 下载到 ~/.cache/huggingface（可用 HF_ENDPOINT 镜像）
                 self._sat = SaT("sat-3l-sm")
+                self.model_id = "sat-3l-sm"
             self.backend = "sat"
         except Exception:
             self._sat = None
             self.backend = "rule"
+            self.model_id = "regex"
 
     @classmethod
     def get(cls) -> "SentenceSplitter":
@@ -82,6 +132,29 @@ class SentenceSplitter:
                 pass  # 推理异常时落回正则，不中断流水线
         return self._rule_split(text)
 
+    def split_many(
+        self, texts: list[str], *, batch_size: int = 32, stride: int = 64
+    ) -> list[list[str]]:
+        """批量分句：一次调用 SaT 的列表接口（模型按 batch_size 成批前向），结果与 texts 同序。"""
+        stripped = [text.strip() for text in texts]
+        results: list[list[str]] = [[] for _ in stripped]
+        todo = [i for i, text in enumerate(stripped) if text]
+        if not todo:
+            return results
+        if self._sat is not None:
+            try:
+                batched = self._sat.split(
+                    [stripped[i] for i in todo], batch_size=batch_size, stride=stride
+                )
+                for i, sentences in zip(todo, batched, strict=True):
+                    results[i] = [s for s in (s.strip() for s in sentences) if s]
+                return results
+            except Exception:
+                pass  # 推理异常时整批落回正则，不中断流水线
+        for i in todo:
+            results[i] = self._rule_split(stripped[i])
+        return results
+
     @staticmethod
     def _rule_split(text: str) -> list[str]:
         """中文标点正则分句：分隔符并回前一句结尾。"""
@@ -121,116 +194,521 @@ def merge_short_sentences(sentences: list[str], min_len: int) -> list[str]:
     return merged
 
 
-def _save_blocks(doc_id: str, blocks: list[dict]) -> None:
+def _split_shard(texts: list[str], batch_size: int, stride: int) -> list[list[str]]:
+    """进程池工作函数：在子进程内取（首次加载）本进程的 SentenceSplitter 单例分句。"""
+    return SentenceSplitter.get().split_many(texts, batch_size=batch_size, stride=stride)
+
+
+def _get_pool(processes: int) -> ProcessPoolExecutor:
+    global _pool, _pool_size
+    with _pool_lock:
+        if _pool is None or _pool_size != processes:
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            # spawn：子进程不继承父进程的线程 / 模型状态，各自加载一份 SaT
+            _pool = ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context("spawn"))
+            _pool_size = processes
+        return _pool
+
+
+def shutdown_pool() -> None:
+    """关闭分句进程池（进程退出时调用；未启用时无操作）。"""
+    global _pool, _pool_size
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool, _pool_size = None, 0
+
+
+def split_paragraphs(
+    splitter: SentenceSplitter,
+    texts: list[str],
+    *,
+    batch_size: int = 32,
+    stride: int = 64,
+    processes: int = 0,
+) -> list[list[str]]:
+    """批量分句一组段落，结果与 texts 同序。
+
+    SaT 后端、processes > 1 且段落数 ≥ _POOL_MIN_PARAGRAPHS 时按连续分片分发到进程池
+    （子进程各持一份模型，首次使用时加载）；进程池出错时回到本进程批量分句。
+    """
+    if splitter.backend == "sat" and processes > 1 and len(texts) >= _POOL_MIN_PARAGRAPHS:
+        size = -(-len(texts) // processes)
+        shards = [texts[i : i + size] for i in range(0, len(texts), size)]
+        try:
+            pool = _get_pool(processes)
+            results = pool.map(
+                _split_shard, shards, [batch_size] * len(shards), [stride] * len(shards)
+            )
+            return [sentences for shard in results for sentences in shard]
+        except Exception:
+            logger.warning("分句进程池出错，改为本进程批量分句", exc_info=True)
+            shutdown_pool()
+    return splitter.split_many(texts, batch_size=batch_size, stride=stride)
+
+
+def split_options() -> dict:
+    """分句批量参数（设置项 segment.sat_*），传给 iter_blocks。"""
+    return {
+        "batch_size": segment_batch_size(),
+        "stride": segment_stride(),
+        "processes": segment_processes(),
+    }
+
+
+def open_cache(splitter: SentenceSplitter, min_len: int) -> SegmentCache | None:
+    """本次分句的段落缓存视图；segment.cache_entries=0 时不缓存（None）。"""
+    limit = segment_cache_entries()
+    if limit <= 0:
+        return None
+    return SegmentCache(splitter.backend, splitter.model_id, min_len, limit)
+
+
+def _delete_blocks(session: Session, doc_id: str) -> None:
+    """集合删除文档的 blocks/sentences 及下游 queries/evidence/corrections（不提交）。"""
+    for model in (Query, Evidence, Correction, CorrectionStat, Sentence, Block):
+        session.exec(delete(model).where(model.document_id == doc_id))
+    revision = record_change(session, doc_id, "blocks_cleared")
+    if revision is not None:
+        # 更早的变更描述的是已清除的内容：只留本条（客户端 since 更早时全量重取）
+        session.exec(
+            delete(DocumentChange).where(
+                DocumentChange.document_id == doc_id, DocumentChange.revision < revision
+            )
+        )
+
+
+def clear_blocks(doc_id: str) -> None:
     """重跑前清理旧 blocks/sentences（含下游 queries/evidence/corrections，防孤儿行）。"""
     with Session(engine) as session:
-        old_block_ids = [
-            b.id for b in session.exec(select(Block).where(Block.document_id == doc_id)).all()
-        ]
-        if old_block_ids:
-            old_sentence_ids = session.exec(
-                select(Sentence.id).where(Sentence.block_id.in_(old_block_ids))
-            ).all()
-            if old_sentence_ids:
-                session.exec(delete(Query).where(Query.sentence_id.in_(old_sentence_ids)))
-                session.exec(delete(Evidence).where(Evidence.sentence_id.in_(old_sentence_ids)))
-                session.exec(delete(Correction).where(Correction.sentence_id.in_(old_sentence_ids)))
-            session.exec(delete(Sentence).where(Sentence.block_id.in_(old_block_ids)))
-        session.exec(delete(Block).where(Block.document_id == doc_id))
+        _delete_blocks(session, doc_id)
         session.commit()
 
-        for block_idx, block_data in enumerate(blocks):
-            block = Block(
-                document_id=doc_id,
-                idx=block_idx,
-                chapter=block_data["chapter"],
-                is_reference=block_data["is_reference"],
-                text="\n".join(block_data["sentences"]),
-            )
-            session.add(block)
-            session.flush()  # 取回自增主键
-            for sent_idx, sent_text in enumerate(block_data["sentences"]):
-                session.add(Sentence(block_id=block.id, idx=sent_idx, text=sent_text))
-        session.commit()
 
+def insert_blocks(
+    session: Session, doc_id: str, blocks: list[dict], start_idx: int = 0
+) -> list[int]:
+    """批量写入 blocks 及其句子（不提交），块序从 start_idx 起，返回各块 id（与 blocks 同序）。
 
-def segment_document(doc_id: str) -> dict:
-    """读 parsed.md → SaT 分句 → 章节/参考文献分块 → blocks/sentences 入库。
+    blocks 一次 executemany 后按 (document_id, idx) 一次 SELECT 取回 id（SQLite 上带 RETURNING 的
+    executemany 须按参数保序，会退化为逐行执行）；sentences 一次 executemany。均为核心语句。
+    """
+    if not blocks:
+        return []
+    end_idx = start_idx + len(blocks)
+    session.execute(
+        insert(Block),
+        [
+            {
+                "document_id": doc_id,
+                "idx": start_idx + offset,
+                "chapter": block_data["chapter"],
+                "is_reference": block_data["is_reference"],
+                "text": "\n".join(block_data["sentences"]),
+                "review_fingerprint": None,
+                "review_corrections": None,
+            }
+            for offset, block_data in enumerate(blocks)
+        ],
+    )
+    block_ids = list(
+        session.scalars(
+            select(Block.id)
+            .where(Block.document_id == doc_id, Block.idx >= start_idx, Block.idx < end_idx)
+            .order_by(Block.idx)
+        )
+    )
+    sentence_rows = [
+        {"document_id": doc_id, "block_id": block_id, "idx": sent_idx, "text": sent_text}
+        for block_id, block_data in zip(block_ids, blocks)
+        for sent_idx, sent_text in enumerate(block_data["sentences"])
+    ]
+    if sentence_rows:
+        session.execute(insert(Sentence), sentence_rows)
+    return block_ids
+
+
+def add_block(session: Session, doc_id: str, block_idx: int, block_data: dict) -> int:
+    """写入一个 block 及其句子（不提交），返回 block id。"""
+    (block_id,) = insert_blocks(session, doc_id, [block_data], start_idx=block_idx)
+    record_change(
+        session,
+        doc_id,
+        "block_added",
+        {"block_id": block_id, "idx": block_idx, "sentences": len(block_data["sentences"])},
+    )
+    return block_id
+
+
+def _chunked(ids: list[int]) -> Iterator[list[int]]:
+    for i in range(0, len(ids), _ID_CHUNK):
+        yield ids[i : i + _ID_CHUNK]
 
-    成功：状态 parsed → segmented；失败：记 error 并置 failed 后重新抛出。
+
+def _align(old: list[str], new: list[str]) -> dict[int, int]:
+    """句子序列对齐，返回 {新序列位置: 旧序列位置}（只含原文相同且次序一致的句子）。
+
+    patience 式：两边各只出现一次的句子作锚点，取旧位置的最长递增子序列；锚点之间的
+    小段（含重复句）再交给 difflib。整篇直接用 difflib 时改动点多则近似平方级。
     """
-    parsed_path = project_dir(doc_id) / "parsed.md"
-    if not parsed_path.exists():
-        raise FileNotFoundError("parsed.md 不存在，请先完成解析（ingest）")
+    old_counts, new_counts = Counter(old), Counter(new)
+    old_unique = {text: i for i, text in enumerate(old) if old_counts[text] == 1}
+    pairs = [
+        (j, old_unique[text])
+        for j, text in enumerate(new)
+        if new_counts[text] == 1 and text in old_unique
+    ]
+    # 最长递增子序列（按旧位置）：tails[k] 为长度 k+1 的子序列末元素在 pairs 中的下标
+    tails: list[int] = []
+    tail_values: list[int] = []
+    parent = [-1] * len(pairs)
+    for n, (_, i) in enumerate(pairs):
+        k = bisect_left(tail_values, i)
+        parent[n] = tails[k - 1] if k else -1
+        if k == len(tails):
+            tails.append(n)
+            tail_values.append(i)
+        else:
+            tails[k], tail_values[k] = n, i
+    anchors: list[tuple[int, int]] = []
+    n = tails[-1] if tails else -1
+    while n >= 0:
+        anchors.append(pairs[n])
+        n = parent[n]
+    anchors.reverse()
 
-    try:
-        text = parsed_path.read_text(encoding="utf-8")
-        splitter = SentenceSplitter.get()
-        min_len = min_sentence_length()
+    matched: dict[int, int] = {}
+    prev_j = prev_i = 0
+    for j, i in [*anchors, (len(new), len(old))]:
+        if j > prev_j and i > prev_i:
+            gap = SequenceMatcher(None, old[prev_i:i], new[prev_j:j], autojunk=False)
+            for tag, i1, i2, j1, _ in gap.get_opcodes():
+                if tag == "equal":
+                    for offset in range(i2 - i1):
+                        matched[prev_j + j1 + offset] = prev_i + i1 + offset
+        if j < len(new):
+            matched[j] = i
+        prev_j, prev_i = j + 1, i + 1
+    return matched
 
-        blocks: list[dict] = []
-        current_chapter: str | None = None
-        current_sentences: list[str] = []
-        current_is_reference = False
 
-        def flush() -> None:
-            nonlocal current_sentences
-            if current_sentences:
-                blocks.append(
-                    {
-                        "chapter": current_chapter,
-                        "is_reference": current_is_reference,
-                        "sentences": current_sentences,
-                    }
+def _resegment(session: Session, doc_id: str, blocks: list[dict]) -> dict:
+    """以新分句结果增量更新文档（不提交），返回 {kept, inserted, removed, blocks_reused}。
+
+    新旧句子序列按原文做序列对齐（_align）：对齐上的句子保留 id 及其
+    queries / evidence / corrections（仅在块序 / 句序变化时改 block_id / idx）；旧序列独有的
+    句子连同下游行删除；新序列独有的句子新建。每个新块沿用其首个保留句原属的块 id（未被
+    占用时，块内审校指纹随之保留：输入未变的块审校时直接复用），其余新建；未沿用的旧块删除。
+    """
+    old_blocks = session.scalars(
+        select(Block.id).where(Block.document_id == doc_id).order_by(Block.idx)
+    ).all()
+    old_rows = session.exec(
+        select(Sentence.id, Sentence.block_id, Sentence.idx, Sentence.text)
+        .join(Block, Block.id == Sentence.block_id)
+        .where(Sentence.document_id == doc_id)
+        .order_by(Block.idx, Sentence.idx)
+    ).all()
+    new_rows = [
+        (block_pos, sent_idx, text)
+        for block_pos, block_data in enumerate(blocks)
+        for sent_idx, text in enumerate(block_data["sentences"])
+    ]
+
+    # 新句位置 → 保留的旧句行
+    alignment = _align([row[3] for row in old_rows], [row[2] for row in new_rows])
+    kept = {j: old_rows[i] for j, i in alignment.items()}
+    kept_ids = {row[0] for row in kept.values()}
+    removed = [row[0] for row in old_rows if row[0] not in kept_ids]
+
+    # 新块沿用首个保留句原属的旧块 id（每个旧块至多沿用一次）
+    reuse: dict[int, int] = {}
+    for pos, (block_pos, _, _) in enumerate(new_rows):
+        if pos in kept and block_pos not in reuse:
+            old_block_id = kept[pos][1]
+            if old_block_id not in reuse.values():
+                reuse[block_pos] = old_block_id
+    reused_ids = set(reuse.values())
+    dropped_blocks = [block_id for block_id in old_blocks if block_id not in reused_ids]
+
+    for chunk in _chunked(removed):
+        for model in (Query, Evidence):
+            session.exec(delete(model).where(model.sentence_id.in_(chunk)))
+        delete_corrections(session, doc_id, Correction.sentence_id.in_(chunk))
+        session.exec(delete(Sentence).where(Sentence.id.in_(chunk)))
+    for chunk in _chunked(dropped_blocks):
+        session.exec(delete(Block).where(Block.id.in_(chunk)))
+
+    def block_values(block_pos: int) -> dict:
+        block_data = blocks[block_pos]
+        return {
+            "idx": block_pos,
+            "chapter": block_data["chapter"],
+            "is_reference": block_data["is_reference"],
+            "text": "\n".join(block_data["sentences"]),
+        }
+
+    if reuse:
+        session.execute(
+            update(Block),
+            [{"id": block_id, **block_values(pos)} for pos, block_id in reuse.items()],
+        )
+    fresh = [pos for pos in range(len(blocks)) if pos not in reuse]
+    if fresh:
+        session.execute(
+            insert(Block),
+            [
+                {
+                    "document_id": doc_id,
+                    **block_values(pos),
+                    "review_fingerprint": None,
+                    "review_corrections": None,
+                }
+                for pos in fresh
+            ],
+        )
+    block_ids = dict(
+        session.exec(select(Block.idx, Block.id).where(Block.document_id == doc_id)).all()
+    )
+
+    moved = []
+    inserted = []
+    for pos, (block_pos, sent_idx, text) in enumerate(new_rows):
+        block_id = block_ids[block_pos]
+        if pos in kept:
+            sentence_id, old_block_id, old_idx, _ = kept[pos]
+            if (old_block_id, old_idx) != (block_id, sent_idx):
+                moved.append({"id": sentence_id, "block_id": block_id, "idx": sent_idx})
+        else:
+            inserted.append(
+                {"document_id": doc_id, "block_id": block_id, "idx": sent_idx, "text": text}
+            )
+    if moved:
+        session.execute(update(Sentence), moved)
+    if inserted:
+        session.execute(insert(Sentence), inserted)
+    return {
+        "kept": len(kept),
+        "inserted": len(inserted),
+        "removed": len(removed),
+        "blocks_reused": len(reuse),
+    }
+
+
+def _save_blocks(doc_id: str, blocks: list[dict]) -> dict:
+    """整篇重新分句：按句子对齐增量更新（同一事务，经单写线程），返回增量计数。"""
+
+    def write(session: Session) -> dict:
+        delta = _resegment(session, doc_id, blocks)
+        revision = record_change(
+            session,
+            doc_id,
+            "blocks_added",
+            {
+                "blocks": len(blocks),
+                "sentences": sum(len(b["sentences"]) for b in blocks),
+                **delta,
+            },
+        )
+        if revision is not None:
+            # 块 / 句结构已整体重排：更早的变更只留本条（客户端 since 更早时全量重取）
+            session.exec(
+                delete(DocumentChange).where(
+                    DocumentChange.document_id == doc_id, DocumentChange.revision < revision
                 )
-            current_sentences = []
-
-        def add_sentence(sentence: str, *, is_reference: bool = False) -> None:
-            nonlocal current_is_reference
-            if is_reference != current_is_reference:
-                flush()
-                current_is_reference = is_reference
-            current_len = sum(len(s) for s in current_sentences)
-            if current_sentences and current_len + len(sentence) > MAX_BLOCK_CHARS:
-                flush()  # 单块超长时在句子边界拆分（chapter / is_reference 延续）
-            current_sentences.append(sentence)
-
-        def start_chapter(title: str) -> None:
-            nonlocal current_chapter, current_is_reference
+            )
+        return delta
+
+    return writer.run(write)
+
+
+def _classify(line: str) -> tuple[str, str]:
+    """行类型：heading（md 标题，取标题文字）/ chapter / reference / placeholder / text（待分句）。"""
+    heading = _MD_HEADING_RE.match(line)
+    if heading:
+        return "heading", heading.group(2)
+    if _CHAPTER_RE.match(line) and len(line) <= _CHAPTER_TITLE_MAX_LEN:
+        return "chapter", line
+    if _REF_LINE_RE.match(line):
+        return "reference", line
+    if _PLACEHOLDER_LINE_RE.match(line):
+        return "placeholder", line
+    return "text", line
+
+
+def _split_merged(
+    splitter: SentenceSplitter,
+    texts: list[str],
+    min_len: int,
+    cache: SegmentCache | None,
+    **options: int,
+) -> list[list[str]]:
+    """一批段落 → 短句合并后的句子列表（与 texts 同序）：先查缓存，仅未命中的去重后送分句。"""
+    cached = cache.lookup(texts) if cache is not None and texts else {}
+    todo = [text for text in dict.fromkeys(texts) if text not in cached]
+    fresh: dict[str, list[str]] = {}
+    if todo:
+        split = split_paragraphs(splitter, todo, **options)
+        fresh = {text: merge_short_sentences(s, min_len) for text, s in zip(todo, split)}
+        if cache is not None:
+            cache.store(fresh)
+    return [cached[text] if text in cached else fresh[text] for text in texts]
+
+
+def _split_lines(
+    text: str,
+    splitter: SentenceSplitter,
+    min_len: int,
+    window: int | None,
+    cache: SegmentCache | None,
+    **options: int,
+) -> Iterator[tuple[str, str, list[str] | None]]:
+    """逐行产出 (类型, 内容, 句子)；正文行攒满 window 行（None = 整篇）批量分句后一并产出。"""
+    lines: list[tuple[str, str]] = []
+    paragraphs: list[str] = []
+
+    def drain() -> Iterator[tuple[str, str, list[str] | None]]:
+        results = iter(_split_merged(splitter, paragraphs, min_len, cache, **options))
+        for kind, value in lines:
+            yield kind, value, next(results) if kind == "text" else None
+        lines.clear()
+        paragraphs.clear()
+
+    for raw_line in text.splitlines():
+        line = raw_line.strip()
+        if not line:
+            continue
+        kind, value = _classify(line)
+        lines.append((kind, value))
+        if kind == "text":
+            paragraphs.append(value)
+            if window is not None and len(paragraphs) >= window:
+                yield from drain()
+        elif not paragraphs:
+            yield from drain()  # 前面没有待分句的正文：不必等待，即刻产出
+    yield from drain()
+
+
+def iter_blocks(
+    text: str,
+    splitter: SentenceSplitter,
+    min_len: int,
+    *,
+    window: int | None = None,
+    cache: SegmentCache | None = None,
+    batch_size: int = 32,
+    stride: int = 64,
+    processes: int = 0,
+) -> Iterator[dict]:
+    """按行分句并分块，逐块产出 {chapter, is_reference, sentences}（块一结束即产出，供流式处理）。
+
+    正文行先收集再批量分句（split_paragraphs）：window=None 时整篇一次，流式处理传入 window
+    （行数）以便首块尽早产出。分块逻辑（章节 / 参考文献 / 占位符）与逐行分句时一致。
+    cache（open_cache）：已缓存的段落不再送分句器。
+    """
+    ready: list[dict] = []
+    current_chapter: str | None = None
+    current_sentences: list[str] = []
+    current_is_reference = False
+
+    def flush() -> None:
+        nonlocal current_sentences
+        if current_sentences:
+            ready.append(
+                {
+                    "chapter": current_chapter,
+                    "is_reference": current_is_reference,
+                    "sentences": current_sentences,
+                }
+            )
+        current_sentences = []
+
+    def add_sentence(sentence: str, *, is_reference: bool = False) -> None:
+        nonlocal current_is_reference
+        if is_reference != current_is_reference:
             flush()
-            current_chapter = title
-            current_is_reference = False
-            current_sentences.append(title)  # 标题本身保留为块内首句，不丢文本
-
-        for raw_line in text.splitlines():
-            line = raw_line.strip()
-            if not line:
-                continue
-            heading = _MD_HEADING_RE.match(line)
-            if heading:
-                start_chapter(heading.group(2))
-                continue
-            if _CHAPTER_RE.match(line) and len(line) <= _CHAPTER_TITLE_MAX_LEN:
-                start_chapter(line)
-                continue
-            if _REF_LINE_RE.match(line):
-                add_sentence(line, is_reference=True)
-                continue
-            if _PLACEHOLDER_LINE_RE.match(line):
-                # 表格占位符独立成句，不参与分句与短句合并（导出时按占位符还原表格）
-                add_sentence(line)
-                continue
-            for sentence in merge_short_sentences(splitter.split(line), min_len):
-                add_sentence(sentence)
+            current_is_reference = is_reference
+        current_len = sum(len(s) for s in current_sentences)
+        if current_sentences and current_len + len(sentence) > MAX_BLOCK_CHARS:
+            flush()  # 单块超长时在句子边界拆分（chapter / is_reference 延续）
+        current_sentences.append(sentence)
+
+    def start_chapter(title: str) -> None:
+        nonlocal current_chapter, current_is_reference
         flush()
+        current_chapter = title
+        current_is_reference = False
+        current_sentences.append(title)  # 标题本身保留为块内首句，不丢文本
 
-        _save_blocks(doc_id, blocks)
-        set_document_status(doc_id, "segmented")
-        return {
+    lines = _split_lines(
+        text,
+        splitter,
+        min_len,
+        window,
+        cache,
+        batch_size=batch_size,
+        stride=stride,
+        processes=processes,
+    )
+    for kind, line, sentences in lines:
+        if kind in ("heading", "chapter"):
+            start_chapter(line)
+        elif kind == "reference":
+            add_sentence(line, is_reference=True)
+        elif kind == "placeholder":
+            # 表格占位符独立成句，不参与分句与短句合并（导出时按占位符还原表格）
+            add_sentence(line)
+        else:
+            for sentence in sentences:
+                add_sentence(sentence)
+        yield from ready
+        ready.clear()
+    flush()
+    yield from ready
+
+
+def parsed_path(doc_id: str) -> Path:
+    path = project_dir(doc_id) / "parsed.md"
+    if not path.exists():
+        raise FileNotFoundError("parsed.md 不存在，请先完成解析（ingest）")
+    return path
+
+
+def segment_document(doc_id: str) -> dict:
+    """读 parsed.md → SaT 分句 → 章节/参考文献分块 → blocks/sentences 入库。
+
+    成功：状态 → segmented；重新分句保留了 corrections（含人工决定）时按计数收口为
+    pending_manual / manual_done，不把已审的文档显示为未审（审校重跑经块指纹只审改动部分）。
+    失败：记 error 并置 failed 后重新抛出。
+    """
+    path = parsed_path(doc_id)
+    try:
+        text = path.read_text(encoding="utf-8")
+        splitter = SentenceSplitter.get()
+        min_len = min_sentence_length()
+        cache = open_cache(splitter, min_len)
+        blocks = list(iter_blocks(text, splitter, min_len, cache=cache, **split_options()))
+        if cache is not None:
+            cache.finish()
+        delta = _save_blocks(doc_id, blocks)
+        with Session(engine) as session:
+            reviewed = document_stats(session, doc_id)["total"] > 0
+        if reviewed:
+            status = refresh_document_review_status(doc_id)
+        else:
+            status = "segmented"
+            set_document_status(doc_id, status)
+        result = {
+            "status": status,
             "blocks": len(blocks),
             "sentences": sum(len(b["sentences"]) for b in blocks),
             "segmenter": splitter.backend,
+            "delta": delta,
         }
+        if cache is not None:
+            result["cache"] = cache.stats()
+        return result
     except Exception as exc:
         set_document_status(doc_id, "failed", str(exc))
         raise
@@ -0,0 +1,118 @@
+"""段落级分句缓存（segment_cache 表）：重跑或上传修订稿时，未改动的段落不再送分句模型。
+
+- 键：sha256(分句后端 \0 模型标识 \0 min_sentence_length \0 段落文本)；值为短句合并后的句子列表。
+  后端 / 模型 / 阈值任一变化即落到新键，旧条目随 LRU 淘汰，无需显式失效。
+- 查：每批段落一次 IN 查询（按 _CHUNK 分片，不超出 SQLite 参数上限）；命中 / 未命中计数
+  随 segment 结果与 stage_done 事件上报（stats()）。
+- 写：新条目 UPSERT 与命中条目的 used_at 刷新经单写线程提交，调用方不等待；finish() 按
+  segment.cache_entries 淘汰最久未用的条目（同经写线程，排在本次写入之后）。
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+from datetime import datetime
+from typing import Iterable
+
+from sqlalchemy import delete, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlmodel import Session, select
+
+from app.core.db import engine
+from app.core.dbwriter import writer
+from app.models import SegmentCacheEntry
+
+_CHUNK = 500  # 每条 IN 查询 / 更新的键数
+
+
+def _chunks(items: list[str]) -> Iterable[list[str]]:
+    for i in range(0, len(items), _CHUNK):
+        yield items[i : i + _CHUNK]
+
+
+class SegmentCache:
+    """一次分句运行的缓存视图（绑定后端 / 模型 / 阈值），累计本次命中率。"""
+
+    def __init__(self, backend: str, model_id: str, min_len: int, limit: int) -> None:
+        self._prefix = f"{backend}\0{model_id}\0{min_len}\0"
+        self.limit = limit
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256((self._prefix + text).encode("utf-8")).hexdigest()
+
+    def lookup(self, texts: list[str]) -> dict[str, list[str]]:
+        """查缓存，返回 {段落文本: 句子列表}（只含命中者）；按段落出现次数计命中 / 未命中。"""
+        keys = {self.key(text): text for text in dict.fromkeys(texts)}
+        found: dict[str, list[str]] = {}
+        with Session(engine) as session:
+            for chunk in _chunks(list(keys)):
+                for key, sentences in session.exec(
+                    select(SegmentCacheEntry.key, SegmentCacheEntry.sentences).where(
+                        SegmentCacheEntry.key.in_(chunk)
+                    )
+                ).all():
+                    found[keys[key]] = json.loads(sentences)
+        hit_count = sum(1 for text in texts if text in found)
+        self.hits += hit_count
+        self.misses += len(texts) - hit_count
+        if found:
+            self._touch([self.key(text) for text in found])
+        return found
+
+    def _touch(self, keys: list[str]) -> None:
+        def write(session: Session) -> None:
+            now = datetime.utcnow()
+            for chunk in _chunks(keys):
+                session.exec(
+                    update(SegmentCacheEntry)
+                    .where(SegmentCacheEntry.key.in_(chunk))
+                    .values(used_at=now)
+                )
+
+        writer.submit(write)
+
+    def store(self, entries: dict[str, list[str]]) -> None:
+        """写入新条目 {段落文本: 句子列表}（经写线程，不等待）。"""
+        if not entries:
+            return
+        rows = [
+            {"key": self.key(text), "sentences": json.dumps(sentences, ensure_ascii=False)}
+            for text, sentences in entries.items()
+        ]
+
+        def write(session: Session) -> None:
+            now = datetime.utcnow()
+            stmt = insert(SegmentCacheEntry)
+            session.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=["key"],
+                    set_={"sentences": stmt.excluded.sentences, "used_at": now},
+                ),
+                [{**row, "used_at": now} for row in rows],
+            )
+
+        writer.submit(write)
+
+    def finish(self) -> None:
+        """本次运行结束：按条目上限淘汰最久未用者（经写线程，不等待）。"""
+        limit = self.limit
+
+        def write(session: Session) -> None:
+            stale = (
+                select(SegmentCacheEntry.key)
+                .order_by(SegmentCacheEntry.used_at.desc())
+                .offset(limit)
+            )
+            session.exec(delete(SegmentCacheEntry).where(SegmentCacheEntry.key.in_(stale)))
+
+        writer.submit(write)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
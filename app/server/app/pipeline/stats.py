@@ -0,0 +1,125 @@
+"""corrections 聚合计数：每篇文档按 decision × severity × error_type 维护条数（correction_stats 表）。
+
+- 与 corrections 的增删改在同一事务内维护（审校入库 / 清理、单条决定、批量决定），计数以
+  UPSERT count = count + delta 原子累加，并发写入不丢更新。
+- 文档状态收口（无 pending → manual_done）与 GET /api/documents/{id}/stats 只读计数行，
+  不扫描 corrections；删除文档 / 重新分句时计数行随文档级清理一并删除。
+- corrections 的写入须经本模块（add_corrections / set_decision / delete_corrections），
+  绕过时计数失准；旧库升级时由 core/db._migrate 按现有行一次回填。
+"""
+from __future__ import annotations
+
+from collections import Counter, defaultdict
+from typing import Any, Iterable, Mapping
+
+from sqlalchemy import delete, func
+from sqlalchemy.dialects.sqlite import insert
+from sqlmodel import Session, select
+
+from app.models import Correction, CorrectionStat
+
+Key = tuple[str, str, str]  # (decision, severity, error_type)
+
+DECISIONS = ("pending", "accepted", "rejected", "custom")
+
+
+def _key(correction: Correction, decision: str | None = None) -> Key:
+    return (
+        decision if decision is not None else correction.decision,
+        correction.severity or "",
+        correction.error_type or "",
+    )
+
+
+def _grouped():
+    return select(
+        Correction.decision, Correction.severity, Correction.error_type, func.count(Correction.id)
+    ).group_by(Correction.decision, Correction.severity, Correction.error_type)
+
+
+def bump(session: Session, document_id: str, deltas: Mapping[Key, int]) -> None:
+    """按键累加计数（不提交，随调用方事务）。"""
+    for (decision, severity, error_type), delta in deltas.items():
+        if not delta:
+            continue
+        stmt = insert(CorrectionStat).values(
+            document_id=document_id,
+            decision=decision,
+            severity=severity,
+            error_type=error_type,
+            count=delta,
+        )
+        session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["document_id", "decision", "severity", "error_type"],
+                set_={"count": CorrectionStat.count + stmt.excluded.count},
+            )
+        )
+
+
+def add_corrections(session: Session, corrections: Iterable[Correction]) -> None:
+    """新增 corrections 并计数（不提交）。"""
+    deltas: dict[str, Counter] = defaultdict(Counter)
+    for correction in corrections:
+        session.add(correction)
+        deltas[correction.document_id][_key(correction)] += 1
+    for document_id, counter in deltas.items():
+        bump(session, document_id, counter)
+
+
+def set_decision(session: Session, correction: Correction, decision: str) -> None:
+    """改一条 correction 的 decision 并移动计数（不提交；decided_at 等由调用方填）。"""
+    if correction.decision == decision:
+        return
+    bump(
+        session,
+        correction.document_id,
+        Counter({_key(correction): -1, _key(correction, decision): 1}),
+    )
+    correction.decision = decision
+    session.add(correction)
+
+
+def delete_corrections(session: Session, document_id: str, *conditions: Any) -> int:
+    """删除文档内满足条件的 corrections 并扣减计数（不提交），返回删除条数。"""
+    scope = (Correction.document_id == document_id, *conditions)
+    removed = session.exec(_grouped().where(*scope)).all()
+    if not removed:
+        return 0
+    bump(session, document_id, {(d, s or "", e or ""): -n for d, s, e, n in removed})
+    session.exec(delete(Correction).where(*scope))
+    return sum(n for *_, n in removed)
+
+
+def pending_count(session: Session, document_id: str) -> int:
+    return session.exec(
+        select(func.coalesce(func.sum(CorrectionStat.count), 0)).where(
+            CorrectionStat.document_id == document_id, CorrectionStat.decision == "pending"
+        )
+    ).one()
+
+
+def document_stats(session: Session, document_id: str) -> dict[str, Any]:
+    """文档 corrections 计数：总数、按 decision，及按 severity / error_type 分组的各 decision 条数。"""
+    by_decision = dict.fromkeys(DECISIONS, 0)
+    by_severity: dict[str, dict[str, int]] = {}
+    by_error_type: dict[str, dict[str, int]] = {}
+    for decision, severity, error_type, count in session.exec(
+        select(
+            CorrectionStat.decision,
+            CorrectionStat.severity,
+            CorrectionStat.error_type,
+            CorrectionStat.count,
+        ).where(CorrectionStat.document_id == document_id, CorrectionStat.count != 0)
+    ).all():
+        by_decision[decision] = by_decision.get(decision, 0) + count
+        for groups, name in ((by_severity, severity), (by_error_type, error_type)):
+            group = groups.setdefault(name, {**dict.fromkeys(DECISIONS, 0), "total": 0})
+            group[decision] = group.get(decision, 0) + count
+            group["total"] += count
+    return {
+        "total": sum(by_decision.values()),
+        "by_decision": by_decision,
+        "by_severity": by_severity,
+        "by_error_type": by_error_type,
+    }
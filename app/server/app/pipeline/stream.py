@@ -0,0 +1,467 @@
+"""流式处理：解析 → 分句 → 检索 → 审校 以 block 为单位流水线执行（POST /api/documents/{id}/process）。
+
+- ingest 整篇执行（docx 一次解析）；随后三个阶段同时运行，块一完成分句即流向检索、再流向审校：
+  分句线程（segment.iter_blocks 逐块入库）→ 有界队列 → 检索线程（逐句查询重写 + 混合检索）
+  → 有界队列 → 审校（任务线程，复用 review._review_blocks 的并发窗口 / 打包 / 按块序提交）。
+  检索 I/O 与审校 I/O 重叠，长文档首条 corrections 在首块审完即可见，不必等全文检索结束。
+- 背压：相邻阶段间队列容量 pipeline.stream_queue_blocks（块数），下游慢时上游阻塞在 put，
+  在途块数有界；审校等待上游期间仍回收已返回的请求（不等凑满包 / 窗口）。
+- 事件：每块每阶段一条 block_stage {block_idx, stage: segment|retrieve|review, ...}；审校另发
+  progress（同 review）；首条 corrections 提交时发 first_correction {block_idx, seconds}；
+  done 附分句 / 检索 / 审校计数、usage 与 time_to_first_correction（秒）。
+- 检索关闭（retrieve.enabled=false）或知识库为空时不检索，块直接送审（纯 LLM 审校）。
+- 计量 / 预算：三阶段共享一个 UsageMeter（rewrite / embed / review 分阶段计）；超预算后
+  检索按 budget.action 停止或跳过查询重写，审校语义同 review。
+- 取消：任一阶段出错或取消即通知其余阶段停止。取消时分句未完成则清除已写入的部分块、状态回到 parsed；
+  分句已完成时保留已提交的块（有 pending → pending_manual，否则 segmented）。
+- 失败：已有块提交时置 interrupted（块、检索结果与审校指纹保留），与服务重启中断的任务一样经
+  POST /api/documents/{id}/resume 继续；尚无块提交时 LLM 未配置回到 parsed，其余置 failed。
+- 继续（resume=True）：不清旧结果；整篇重新分句并按句子对齐写回（已提交的块 / 句 id 保留），
+  检索跳过已有 queries 的句子，审校按块指纹复用已审完的块，只处理余下的块。
+"""
+from __future__ import annotations
+
+import contextvars
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Iterator
+
+from sqlmodel import Session, select
+
+from app.core.db import engine
+from app.core.dbwriter import writer
+from app.core.jobcontrol import JobCancelled, checkpoint
+from app.core.user_settings import (
+    budget_action,
+    document_token_budget,
+    min_sentence_length,
+    retrieve_enabled,
+    review_references,
+    stream_queue_blocks,
+)
+from app.llm.client import LLMNotConfiguredError
+from app.llm.usage import UsageMeter, metering, usage_stage
+from app.models import Block, Correction, Query, Sentence
+from app.pipeline.common import add_document_usage, set_document_status
+from app.pipeline.ingest import ingest_document
+from app.pipeline.review import (
+    _check_llm_configured,
+    _review_blocks,
+    refresh_document_review_status,
+)
+from app.pipeline.segment import (
+    SentenceSplitter,
+    _save_blocks,
+    add_block,
+    clear_blocks,
+    iter_blocks,
+    open_cache,
+    parsed_path,
+    split_options,
+)
+from app.pipeline.stats import pending_count
+from app.rag import store
+from app.rag.retrieve import PLACEHOLDER_RE, retrieve_for_sentence, save_retrieval
+
+Emit = Callable[[str, dict], None]
+
+_END = object()  # 阶段输出结束标记
+_TICK = 0.2  # 阻塞等待的轮询间隔（秒）：检查其余阶段是否已失败，审校借此回收已返回的请求
+
+
+def _noop_emit(_event: str, _data: dict) -> None:
+    pass
+
+
+class _Stopped(Exception):
+    """其他阶段已失败：本阶段静默退出（错误由失败的阶段上报）。"""
+
+
+class _Channel:
+    """阶段间有界队列：满时 put 阻塞（背压）；任一阶段失败后 put / get 抛 _Stopped。"""
+
+    def __init__(self, maxsize: int, failed: threading.Event) -> None:
+        self._queue: queue.Queue = queue.Queue(maxsize)
+        self._failed = failed
+
+    def put(self, item: Any) -> None:
+        while True:
+            if self._failed.is_set():
+                raise _Stopped
+            try:
+                self._queue.put(item, timeout=_TICK)
+                return
+            except queue.Full:
+                continue
+
+    def get(self, wait: float | None = None) -> Any:
+        """取一项；wait 为 None 时一直等，否则超时抛 queue.Empty。"""
+        while True:
+            if self._failed.is_set():
+                raise _Stopped
+            try:
+                return self._queue.get(timeout=_TICK if wait is None else wait)
+            except queue.Empty:
+                if wait is not None:
+                    raise
+
+
+def _segment_stage(
+    doc_id: str, text: str, out: _Channel, stats: dict[str, Any], emit: Emit
+) -> None:
+    splitter = SentenceSplitter.get()
+    stats["segmenter"] = splitter.backend
+    min_len = min_sentence_length()
+    cache = open_cache(splitter, min_len)
+    options = split_options()
+    blocks = iter_blocks(
+        text, splitter, min_len, window=options["batch_size"], cache=cache, **options
+    )
+    for block_idx, block_data in enumerate(blocks):
+        checkpoint()
+        # 逐块经单写线程提交并等待落库：下游阶段立即可读
+        block_id = writer.run(
+            lambda session, idx=block_idx, data=block_data: add_block(session, doc_id, idx, data)
+        )
+        stats["blocks"] += 1
+        stats["sentences"] += len(block_data["sentences"])
+        emit(
+            "block_stage",
+            {"block_idx": block_idx, "stage": "segment", "sentences": len(block_data["sentences"])},
+        )
+        # 与 _review_blocks 的块行同形：(id, idx, chapter, is_reference, 上次指纹, 上次条数)
+        out.put(
+            (block_id, block_idx, block_data["chapter"], block_data["is_reference"], None, None)
+        )
+    if cache is not None:
+        cache.finish()
+        stats["segment_cache"] = cache.stats()
+    stats["segmented"] = True
+    out.put(_END)
+
+
+def _resume_segment_stage(
+    doc_id: str, text: str, out: _Channel, stats: dict[str, Any], emit: Emit
+) -> None:
+    """继续执行的分句：整篇重新分句并按句子对齐写回（块 / 句 id、检索结果与审校指纹保留），
+    再按块序把各块连同上次的指纹交给下游。"""
+    splitter = SentenceSplitter.get()
+    stats["segmenter"] = splitter.backend
+    min_len = min_sentence_length()
+    cache = open_cache(splitter, min_len)
+    blocks = list(iter_blocks(text, splitter, min_len, cache=cache, **split_options()))
+    if cache is not None:
+        cache.finish()
+        stats["segment_cache"] = cache.stats()
+    _save_blocks(doc_id, blocks)
+    stats["blocks"] = len(blocks)
+    stats["sentences"] = sum(len(b["sentences"]) for b in blocks)
+    stats["segmented"] = True
+    with Session(engine) as session:
+        rows = session.exec(
+            select(
+                Block.id,
+                Block.idx,
+                Block.chapter,
+                Block.is_reference,
+                Block.review_fingerprint,
+                Block.review_corrections,
+            )
+            .where(Block.document_id == doc_id)
+            .order_by(Block.idx)
+        ).all()
+    for row in rows:
+        checkpoint()
+        emit(
+            "block_stage",
+            {
+                "block_idx": row.idx,
+                "stage": "segment",
+                "sentences": len(blocks[row.idx]["sentences"]),
+                "resumed": True,
+            },
+        )
+        out.put(tuple(row))
+    out.put(_END)
+
+
+def _retrieve_stage(
+    doc_id: str,
+    inp: _Channel,
+    out: _Channel,
+    with_retrieval: bool,
+    include_references: bool,
+    completed: set[int],
+    meter: UsageMeter,
+    stats: dict[str, Any],
+    emit: Emit,
+) -> None:
+    """completed：已有 queries 的句子（继续执行时跳过，证据沿用）。"""
+    while True:
+        item = inp.get()
+        if item is _END:
+            break
+        block_id, block_idx, _, is_reference, _, _ = item
+        if with_retrieval and not (is_reference and not include_references):
+            with Session(engine) as session:
+                sentences = [
+                    (s.id, s.text)
+                    for s in session.exec(
+                        select(Sentence).where(Sentence.block_id == block_id).order_by(Sentence.idx)
+                    ).all()
+                ]
+            retrieved = evidence = 0
+            writes: list[Future[None]] = []
+            for sentence_id, text in sentences:
+                if PLACEHOLDER_RE.match(text) is not None or sentence_id in completed:
+                    continue
+                checkpoint()  # 取消 / 暂停：逐句检查
+                rewrite = True
+                if meter.over_budget():
+                    if budget_action() == "stop":
+                        break
+                    rewrite = False  # 降级：跳过 LLM 查询重写，只用原句检索
+                questions, evidences, rewritten = retrieve_for_sentence(text, rewrite=rewrite)
+                writes.append(save_retrieval(doc_id, sentence_id, questions, evidences))
+                retrieved += 1
+                evidence += len(evidences)
+                stats["rewritten"] += 1 if rewritten else 0
+            for write in writes:
+                write.result()  # 证据落库后才送审
+            stats["retrieved"] += retrieved
+            stats["evidence"] += evidence
+            emit(
+                "block_stage",
+                {
+                    "block_idx": block_idx,
+                    "stage": "retrieve",
+                    "sentences": retrieved,
+                    "evidence": evidence,
+                },
+            )
+        else:
+            emit("block_stage", {"block_idx": block_idx, "stage": "retrieve", "skipped": True})
+        out.put(item)
+    out.put(_END)
+
+
+def _review_feed(inp: _Channel) -> Iterator[tuple | None]:
+    """审校阶段的块输入：上游暂无新块时产出 None（_review_blocks 借此提交未满的包、回收结果）。"""
+    while True:
+        try:
+            item = inp.get(wait=_TICK)
+        except queue.Empty:
+            yield None
+            continue
+        if item is _END:
+            return
+        yield item
+
+
+def _settle_cancelled(doc_id: str, keep_blocks: bool) -> str:
+    """取消后的状态收口：分句未完成（且非继续执行）→ 清除部分块回到 parsed；否则按 pending 收口。"""
+    if not keep_blocks:
+        clear_blocks(doc_id)
+        set_document_status(doc_id, "parsed")
+        return "parsed"
+    with Session(engine) as session:
+        pending = pending_count(session, doc_id)
+    if pending:
+        return refresh_document_review_status(doc_id)
+    set_document_status(doc_id, "segmented")
+    return "segmented"
+
+
+def _settle_failed(doc_id: str, exc: BaseException) -> str:
+    """失败后的状态收口：已有块提交 → interrupted（未审的块经 resume 继续审校）；
+    尚无块 → LLM 未配置回到 parsed，其余 failed。"""
+    with Session(engine) as session:
+        has_blocks = (
+            session.exec(select(Block.id).where(Block.document_id == doc_id).limit(1)).first()
+            is not None
+        )
+    if has_blocks:
+        set_document_status(doc_id, "interrupted", f"流式处理中断：{exc}，已提交的块保留，可继续执行")
+        return "interrupted"
+    if isinstance(exc, LLMNotConfiguredError):
+        set_document_status(doc_id, "parsed")
+        return "parsed"
+    set_document_status(doc_id, "failed", str(exc))
+    return "failed"
+
+
+def stream_document(
+    doc_id: str, emit: Emit = _noop_emit, resume: bool = False
+) -> dict[str, Any]:
+    """解析后逐块流水线执行 分句 → 检索 → 审校，corrections 逐块入库（decision=pending）。
+
+    整篇重跑：旧 blocks/sentences 及下游结果（含人工决定）一并清除，同 /run。
+    resume=True（中断 / 失败后继续）：保留已提交的结果，只检索、审校余下的部分（见模块说明）。
+    LLM 未配置 → 预检抛 LLMNotConfiguredError，数据与状态均不变。
+    """
+    _check_llm_configured()
+    started = time.monotonic()
+    emit("start", {"stage": "ingest"})
+    ingest_result = ingest_document(doc_id)
+    emit("stage_done", {"stage": "ingest", **ingest_result})
+
+    path = parsed_path(doc_id)
+    completed: set[int] = set()
+    decided_sentence_ids: set[int] = set()
+    try:
+        text = path.read_text(encoding="utf-8")
+        if resume:
+            with Session(engine) as session:
+                completed = set(
+                    session.exec(select(Query.sentence_id).where(Query.document_id == doc_id))
+                )
+                # 已人工决定的句子不再送审（同 review 非 force 重跑）
+                decided_sentence_ids = set(
+                    session.exec(
+                        select(Correction.sentence_id).where(
+                            Correction.document_id == doc_id, Correction.decision != "pending"
+                        )
+                    )
+                )
+        else:
+            clear_blocks(doc_id)
+    except Exception as exc:
+        set_document_status(doc_id, "failed", str(exc))
+        raise
+    with_retrieval = retrieve_enabled() and store.count_chunks() > 0
+    include_references = review_references()
+    size = stream_queue_blocks()
+    set_document_status(doc_id, "reviewing")
+
+    failed = threading.Event()
+    to_retrieve = _Channel(size, failed)
+    to_review = _Channel(size, failed)
+    errors: list[BaseException] = []
+    stats: dict[str, Any] = {
+        "segmenter": None,
+        "segment_cache": None,
+        "segmented": False,
+        "blocks": 0,
+        "sentences": 0,
+        "retrieved": 0,
+        "evidence": 0,
+        "rewritten": 0,
+        "first_correction": None,
+    }
+
+    def review_emit(event: str, data: dict) -> None:
+        if event == "progress":
+            if data.get("blocks") is None and stats["segmented"]:
+                data = {**data, "blocks": stats["blocks"]}
+            emit(
+                "block_stage",
+                {
+                    "block_idx": data["block_idx"],
+                    "stage": "review",
+                    "corrections": data.get("corrections"),
+                    "skipped": data.get("skipped"),
+                },
+            )
+            if data.get("corrections") and stats["first_correction"] is None:
+                stats["first_correction"] = round(time.monotonic() - started, 3)
+                emit(
+                    "first_correction",
+                    {"block_idx": data["block_idx"], "seconds": stats["first_correction"]},
+                )
+        emit(event, data)
+
+    def run_stage(stage: Callable[..., None], *args: Any) -> None:
+        try:
+            stage(*args)
+        except _Stopped:
+            pass
+        except BaseException as exc:  # noqa: BLE001 — 交由任务线程统一收口
+            errors.append(exc)
+            failed.set()
+
+    meter = UsageMeter(document_token_budget())
+    emit(
+        "start",
+        {"stage": "stream", "queue_blocks": size, "retrieve": with_retrieval, "resume": resume},
+    )
+    segment_stage = _resume_segment_stage if resume else _segment_stage
+    review_result: dict[str, Any] = {}
+    with metering(meter):
+        # 复制上下文：计量作用域与任务控制块（取消 / 暂停）随阶段线程传递
+        threads = [
+            threading.Thread(
+                target=contextvars.copy_context().run,
+                args=(run_stage, segment_stage, doc_id, text, to_retrieve, stats, emit),
+                name="stream-segment",
+                daemon=True,
+            ),
+            threading.Thread(
+                target=contextvars.copy_context().run,
+                args=(
+                    run_stage,
+                    _retrieve_stage,
+                    doc_id,
+                    to_retrieve,
+                    to_review,
+                    with_retrieval,
+                    include_references,
+                    completed,
+                    meter,
+                    stats,
+                    emit,
+                ),
+                name="stream-retrieve",
+                daemon=True,
+            ),
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            with usage_stage("review"):
+                review_result = _review_blocks(
+                    _review_feed(to_review),
+                    decided_sentence_ids,
+                    include_references,
+                    meter,
+                    review_emit,
+                )
+        except _Stopped:
+            pass
+        except BaseException as exc:  # noqa: BLE001
+            errors.append(exc)
+            failed.set()
+        finally:
+            for thread in threads:
+                thread.join()
+
+    try:
+        if not errors:
+            status = refresh_document_review_status(doc_id)
+            result = {
+                "status": status,
+                "blocks": stats["blocks"],
+                "sentences": stats["sentences"],
+                "segmenter": stats["segmenter"],
+                "segment_cache": stats["segment_cache"],
+                "retrieved": stats["retrieved"],
+                "evidence": stats["evidence"],
+                "rewritten": stats["rewritten"],
+                **review_result,
+                "time_to_first_correction": stats["first_correction"],
+                "elapsed": round(time.monotonic() - started, 3),
+                "usage": meter.snapshot(),
+            }
+            emit("done", result)
+            return result
+        exc = errors[0]
+        if isinstance(exc, JobCancelled):
+            status = _settle_cancelled(doc_id, keep_blocks=stats["segmented"] or resume)
+            emit("cancelled", {"status": status, "usage": meter.snapshot()})
+            raise exc
+        status = _settle_failed(doc_id, exc)
+        emit("error", {"message": str(exc), "status": status, "usage": meter.snapshot()})
+        raise exc
+    finally:
+        add_document_usage(doc_id, meter.snapshot())
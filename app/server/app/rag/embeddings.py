@@ -8,14 +8,17 @@
 - stub   ：测试专用隐藏档——sha256 派生的确定性假向量（dim=32），不加载任何模型。
 
 provider 按 settings 每次 encode 时动态读取，local 模型进程内只加载一次。
+每次 embed 记一笔计量（llm/usage.py）：openai 取响应 usage，local/stub 只记延迟不计 tokens。
 """
 from __future__ import annotations
 
 import hashlib
+import time
 
 import numpy as np
 
 from app.core.user_settings import embedding_model, embedding_provider, llm_config
+from app.llm.usage import record_call
 
 STUB_DIM = 32
 BGE_M3_DIM = 1024
@@ -94,18 +97,22 @@ class EmbeddingProvider:
         if not texts:
             return []
         provider = self.provider
+        started = time.monotonic()
         if provider == "stub":
-            return _stub_embed(texts)
-        if provider == "openai":
+            vectors = _stub_embed(texts)
+        elif provider == "openai":
             return self._openai_embed(texts)
-        model = self._ensure_local_model()
-        result = model.encode(
-            texts,
-            normalize_embeddings=True,
-            batch_size=16,
-            show_progress_bar=False,
-        )
-        return np.asarray(result, dtype=np.float32).tolist()
+        else:
+            model = self._ensure_local_model()
+            result = model.encode(
+                texts,
+                normalize_embeddings=True,
+                batch_size=16,
+                show_progress_bar=False,
+            )
+            vectors = np.asarray(result, dtype=np.float32).tolist()
+        record_call(None, time.monotonic() - started, estimate=False)
+        return vectors
 
     def _openai_embed(self, texts: list[str]) -> list[list[float]]:
         cfg = llm_config()
@@ -114,7 +121,11 @@ class EmbeddingProvider:
         from openai import OpenAI
 
         client = OpenAI(base_url=cfg["base_url"], api_key=cfg["api_key"], timeout=60.0)
+        started = time.monotonic()
         resp = client.embeddings.create(model=embedding_model(), input=texts)
+        record_call(
+            getattr(resp, "usage", None), time.monotonic() - started, prompt_text="".join(texts)
+        )
         vectors = [item.embedding for item in sorted(resp.data, key=lambda d: d.index)]
         # 与 local 保持一致：L2 归一化（cosine 检索）
         arr = np.asarray(vectors, dtype=np.float32)
@@ -12,18 +12,27 @@
 跳过：参考文献块（blocks.is_reference，除非 segment.review_references=true）、
 表格占位符句（[{表格不予审校_N}]，M2 已知问题 3）。
 重写的问题同时落 queries 表（溯源），证据落 evidence 表。
+
+计量：查询重写记 stage=rewrite、问题编码记 stage=embed（llm/usage.py），done 事件附 usage。
+预算（budget.document_tokens）超出后按 budget.action：stop 停止后续句子（已检索结果保留）；
+downgrade 跳过 LLM 查询重写、只用原句检索。
+取消 / 暂停（core/jobcontrol.py）：逐句检查；取消时已完成句子的结果保留，发 cancelled 事件后抛 JobCancelled。
 """
 from __future__ import annotations
 
 import re
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from typing import Any, Callable
 
 from sqlalchemy import delete
 from sqlmodel import Session, select
 
 from app.core.db import engine
+from app.core.dbwriter import writer
+from app.core.jobcontrol import JobCancelled, checkpoint
 from app.core.user_settings import (
+    budget_action,
+    document_token_budget,
     retrieve_bm25_topk,
     retrieve_query_count,
     retrieve_rrf_k,
@@ -31,7 +40,10 @@ from app.core.user_settings import (
     review_references,
 )
 from app.llm.client import LLMNotConfiguredError, chat_json
-from app.models import Block, Evidence, Query, Sentence
+from app.llm.usage import UsageMeter, metering, usage_stage
+from app.models import Evidence, Query
+from app.pipeline.common import add_document_usage, record_change
+from app.pipeline.snapshot import SentenceSnap, load_snapshot
 from app.rag import store
 from app.rag.embeddings import EmbeddingProvider
 
@@ -67,6 +79,8 @@ def rewrite_queries(sentence: str, n: int) -> tuple[list[str], bool]:
         )
     except LLMNotConfiguredError:
         return [sentence], False  # 未配置 LLM：降级原句检索
+    except JobCancelled:
+        raise  # 任务取消：不降级，向外抛
     except Exception:
         return [sentence], False  # 重写失败（超时/解析失败）：不中断流水线
     if isinstance(result, dict):
@@ -104,22 +118,30 @@ def _search_question(query: str, vector: list[float], v_limit: int, b_limit: int
     return v_hits, b_hits
 
 
-def retrieve_for_sentence(sentence: str) -> tuple[list[str], list[dict[str, Any]], bool]:
+def retrieve_for_sentence(
+    sentence: str, rewrite: bool = True
+) -> tuple[list[str], list[dict[str, Any]], bool]:
     """对单句执行完整混合检索。返回 (问题列表, 证据列表, 是否 LLM 重写)。
 
     证据：{chunk_id, text, source_name, source(vector|keyword), rank, score(RRF 融合分)}。
+    rewrite=False（预算降级）时跳过 LLM 查询重写，只用原句检索。
     """
     n = retrieve_query_count()
     v_topk = retrieve_vector_topk()
     b_topk = retrieve_bm25_topk()
     rrf_k = retrieve_rrf_k()
 
-    questions, rewritten = rewrite_queries(sentence, n)
+    if rewrite:
+        with usage_stage("rewrite"):
+            questions, rewritten = rewrite_queries(sentence, n)
+    else:
+        questions, rewritten = [sentence], False
     if store.count_chunks() == 0:
         return questions, [], rewritten
 
     # 全部问题一次性批量编码（BGE-M3 本地推理 batch 更快），随后逐问并行打两路
-    q_vectors = EmbeddingProvider.get().embed(questions)
+    with usage_stage("embed"):
+        q_vectors = EmbeddingProvider.get().embed(questions)
     v_limit, b_limit = v_topk * 3, b_topk * 3  # 融合前每问每路取 k*3 候选
     with ThreadPoolExecutor(max_workers=4) as pool:
         results = list(
@@ -171,75 +193,156 @@ def retrieve_for_sentence(sentence: str) -> tuple[list[str], list[dict[str, Any]
     return questions, evidences, rewritten
 
 
-def _target_sentences(document_id: str) -> list[tuple[Sentence, bool]]:
+def _target_sentences(document_id: str) -> list[tuple[SentenceSnap, bool]]:
     """文档全部句子及其是否跳过标记。跳过：参考文献块（可配置）+ 表格占位符句。"""
     include_references = review_references()
-    with Session(engine) as session:
-        blocks = session.exec(
-            select(Block).where(Block.document_id == document_id).order_by(Block.idx)
-        ).all()
-        result: list[tuple[Sentence, bool]] = []
-        for block in blocks:
-            block_skipped = block.is_reference and not include_references
-            sentences = session.exec(
-                select(Sentence).where(Sentence.block_id == block.id).order_by(Sentence.idx)
-            ).all()
-            for sentence in sentences:
-                skipped = block_skipped or PLACEHOLDER_RE.match(sentence.text) is not None
-                result.append((Sentence(id=sentence.id, idx=sentence.idx, block_id=sentence.block_id, text=sentence.text), skipped))
-        return result
-
-
-def retrieve_document(document_id: str, emit: Emit = _noop_emit) -> dict[str, Any]:
-    """对文档全部待审校句子执行混合检索，queries/evidence 入库（重跑先清旧结果）。"""
+    snapshot = load_snapshot(document_id, corrections=False, evidence=False)
+    if snapshot is None:
+        return []
+    return [
+        (
+            sentence,
+            (block.is_reference and not include_references)
+            or PLACEHOLDER_RE.match(sentence.text) is not None,
+        )
+        for block, sentence in snapshot.sentences()
+    ]
+
+
+def retrieve_document(
+    document_id: str, emit: Emit = _noop_emit, resume: bool = False
+) -> dict[str, Any]:
+    """对文档全部待审校句子执行混合检索，queries/evidence 入库（重跑先清旧结果）。
+
+    resume=True（中断后继续）：不清旧结果，已有 queries 的句子视为已完成跳过——
+    每句的 queries 与 evidence 在同一事务提交，queries 存在即该句检查点。
+    """
     targets = _target_sentences(document_id)
     sentence_ids = [s.id for s, _ in targets]
+    completed: set[int] = set()
     with Session(engine) as session:
-        if sentence_ids:
-            session.exec(delete(Query).where(Query.sentence_id.in_(sentence_ids)))
-            session.exec(delete(Evidence).where(Evidence.sentence_id.in_(sentence_ids)))
+        if sentence_ids and resume:
+            completed = set(
+                session.exec(
+                    select(Query.sentence_id).where(Query.document_id == document_id)
+                ).all()
+            )
+        elif sentence_ids:
+            session.exec(delete(Query).where(Query.document_id == document_id))
+            session.exec(delete(Evidence).where(Evidence.document_id == document_id))
+            record_change(session, document_id, "evidence_cleared")
             session.commit()
 
     total = sum(1 for _, skipped in targets if not skipped)
-    emit("start", {"sentences": total, "skipped": len(targets) - total})
+    emit("start", {"sentences": total, "skipped": len(targets) - total, "resumed": len(completed)})
+    meter = UsageMeter(document_token_budget())
+    try:
+        with metering(meter):
+            result = _retrieve_targets(document_id, targets, total, completed, meter, emit)
+    except JobCancelled:
+        emit("cancelled", {"usage": meter.snapshot()})
+        raise
+    finally:
+        add_document_usage(document_id, meter.snapshot())
+    result["usage"] = meter.snapshot()
+    emit("done", result)
+    return result
+
+
+def save_retrieval(
+    document_id: str, sentence_id: int, questions: list[str], evidences: list[dict]
+) -> Future[None]:
+    """一句的 queries 与 evidence 经单写线程同一事务提交（queries 存在即该句检查点），
+    返回落库 Future：后续要读证据的调用方（审校）须先等待。"""
+
+    def write(session: Session) -> None:
+        for idx, q in enumerate(questions):
+            session.add(
+                Query(document_id=document_id, sentence_id=sentence_id, idx=idx, text=q)
+            )
+        for e in evidences:
+            session.add(
+                Evidence(
+                    document_id=document_id,
+                    sentence_id=sentence_id,
+                    source=e["source"],
+                    chunk_text=e["text"],
+                    doc_name=e["source_name"],
+                    score=round(float(e["score"]), 6),
+                    rank=e["rank"],
+                )
+            )
+        record_change(
+            session,
+            document_id,
+            "evidence",
+            {"sentence_id": sentence_id, "queries": len(questions), "evidence": len(evidences)},
+        )
+
+    return writer.submit(write)
+
+
+def _retrieve_targets(
+    document_id: str,
+    targets: list[tuple[SentenceSnap, bool]],
+    total: int,
+    completed: set[int],
+    meter: UsageMeter,
+    emit: Emit,
+) -> dict[str, Any]:
     done = 0
     evidence_count = 0
     rewritten_count = 0
-    for sentence, skipped in targets:
-        if skipped:
-            continue
-        questions, evidences, rewritten = retrieve_for_sentence(sentence.text)
-        rewritten_count += 1 if rewritten else 0
-        with Session(engine) as session:
-            for idx, q in enumerate(questions):
-                session.add(Query(sentence_id=sentence.id, idx=idx, text=q))
-            for e in evidences:
-                session.add(
-                    Evidence(
-                        sentence_id=sentence.id,
-                        source=e["source"],
-                        chunk_text=e["text"],
-                        doc_name=e["source_name"],
-                        score=round(float(e["score"]), 6),
-                        rank=e["rank"],
+    budget_exceeded = False
+    writes: list[Future[None]] = []
+    try:
+        for sentence, skipped in targets:
+            if skipped:
+                continue
+            checkpoint()  # 取消 / 暂停：逐句检查（已检索的句子照常落库，取消后保留）
+            if sentence.id in completed:
+                done += 1  # 上次已完成（继续执行）：计入进度，不重复检索
+                continue
+            if meter.over_budget():
+                if not budget_exceeded:
+                    budget_exceeded = True
+                    emit(
+                        "budget",
+                        {
+                            "action": budget_action(),
+                            "total_tokens": meter.total_tokens,
+                            "budget": meter.token_budget,
+                            "current": done,
+                        },
                     )
-                )
-            session.commit()
-        done += 1
-        evidence_count += len(evidences)
-        emit(
-            "progress",
-            {
-                "current": done,
-                "total": total,
-                "sentence": sentence.text[:40],
-                "queries": len(questions),
-                "evidence": len(evidences),
-                "rewritten": rewritten,
-            },
-        )
-    emit(
-        "done",
-        {"sentences": done, "evidence": evidence_count, "rewritten": rewritten_count},
-    )
-    return {"sentences": done, "evidence": evidence_count, "rewritten": rewritten_count}
+                if budget_action() == "stop":
+                    break
+            questions, evidences, rewritten = retrieve_for_sentence(
+                sentence.text, rewrite=not budget_exceeded
+            )
+            rewritten_count += 1 if rewritten else 0
+            writes.append(save_retrieval(document_id, sentence.id, questions, evidences))
+            done += 1
+            evidence_count += len(evidences)
+            emit(
+                "progress",
+                {
+                    "current": done,
+                    "total": total,
+                    "sentence": sentence.text[:40],
+                    "queries": len(questions),
+                    "evidence": len(evidences),
+                    "rewritten": rewritten,
+                },
+            )
+    finally:
+        wait(writes)  # 取消 / 出错时已检索的句子照常落库（检查点）
+    for write in writes:
+        write.result()
+    return {
+        "sentences": done,
+        "resumed": len(completed),
+        "evidence": evidence_count,
+        "rewritten": rewritten_count,
+        "budget_exceeded": budget_exceeded,
+    }
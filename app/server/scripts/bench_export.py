@@ -0,0 +1,155 @@
+"""基准：docx 导出渲染 —— 逐版本「渲染 → 重开还原表格 → 重开缩进」三次保存（旧写法）对比单遍渲染。
+
+合成两个版本的段落规格（默认 20000 段，含标题与表格占位符）与含 --tables 个表格的 tables.docx，
+分别执行：
+
+- legacy：每个版本 _render → 保存 → 重开并解析一次 tables.docx 还原表格 → 保存 → 重开加首行缩进 →
+  保存（即改造前的 export 渲染部分），两个版本顺序执行；
+- single：export._render_versions —— tables.docx 只解析一次，缩进随段落创建，表格原位插入，
+  两个版本并发渲染，每个文件保存一次；
+- cached：同 single，但段落规格已带上次渲染回填的段落 XML（渲染缓存全部命中的重导出）。
+
+输出多轮耗时中位数，并校验各方式产出的 word/document.xml 逐字节一致。
+
+用法（app/server 目录下）：
+python -m scripts.bench_export [--paragraphs 20000] [--tables 200] [--indent 0.5] [--rounds 3]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+import zipfile
+from copy import deepcopy
+from pathlib import Path
+
+os.environ.setdefault("AI_REVIEW_DATA_DIR", tempfile.mkdtemp(prefix="ai-review-bench-export-"))
+
+from docx import Document as DocxDocument  # noqa: E402
+from docx.shared import Inches  # noqa: E402
+
+from app.pipeline import export  # noqa: E402
+
+
+def synthetic_specs(paragraphs: int, tables: int) -> dict[str, list[dict]]:
+    table_every = max(1, paragraphs // max(1, tables))
+    specs: dict[str, list[dict]] = {"clean": [], "marked": []}
+    table_index = 0
+    for i in range(paragraphs):
+        if i % 50 == 0:
+            for version in specs:
+                specs[version].append({"kind": "heading", "text": f"第{i // 50 + 1}节 病例资料"})
+        clean = f"患者{i}号，男性，五十六岁，规律服用苯磺酸氨氯地平，血压控制良好，予以出院。"
+        marked = clean.replace("苯磺酸氨氯地平", "｛～原文:氨氯地平 AI:苯磺酸氨氯地平～｝")
+        specs["clean"].append({"kind": "para", "text": clean})
+        specs["marked"].append({"kind": "para", "text": marked})
+        if tables and i % table_every == table_every - 1 and table_index < tables:
+            table_index += 1
+            text = f"[{{表格不予审校_{table_index}}}]"
+            for version in specs:
+                specs[version].append(
+                    {"kind": "placeholder", "text": text, "table_index": table_index}
+                )
+    return specs
+
+
+def synthetic_tables(path: Path, tables: int) -> None:
+    doc = DocxDocument()
+    for i in range(tables):
+        table = doc.add_table(rows=4, cols=4)
+        for r in range(4):
+            for c in range(4):
+                table.cell(r, c).text = f"检查项目{i}-{r}-{c}"
+        doc.add_paragraph()
+    doc.save(str(path))
+
+
+def legacy_render(
+    specs: dict[str, list[dict]], paths: dict[str, Path], tables_path: Path, indent: float
+) -> None:
+    """改造前的渲染：每个版本保存三次、重开两次，每个版本各解析一次 tables.docx。"""
+    for version, path in paths.items():
+        doc = DocxDocument()
+        for spec in specs[version]:
+            if spec["kind"] == "heading":
+                doc.add_heading(spec["text"], level=1)
+            else:
+                doc.add_paragraph(spec["text"])
+        doc.save(str(path))
+
+        doc = DocxDocument(str(path))
+        tables = DocxDocument(str(tables_path)).tables
+        for para in list(doc.paragraphs):
+            match = export._PLACEHOLDER_SEARCH_RE.search(para.text)
+            if match is None or not (0 <= int(match.group(1)) - 1 < len(tables)):
+                continue
+            para._element.addprevious(deepcopy(tables[int(match.group(1)) - 1]._tbl))
+            para._element.getparent().remove(para._element)
+        doc.save(str(path))
+
+        if indent > 0:
+            doc = DocxDocument(str(path))
+            for paragraph in doc.paragraphs:
+                paragraph.paragraph_format.first_line_indent = Inches(indent)
+            doc.save(str(path))
+
+
+def single_render(
+    specs: dict[str, list[dict]], paths: dict[str, Path], tables_path: Path, indent: float
+) -> None:
+    fresh = {version: [dict(spec) for spec in items] for version, items in specs.items()}
+    export._render_versions(fresh, paths, export._load_tables(tables_path), indent)
+
+
+def cached_render(
+    specs: dict[str, list[dict]], paths: dict[str, Path], tables_path: Path, indent: float
+) -> None:
+    export._render_versions(specs, paths, export._load_tables(tables_path), indent)
+
+
+def document_xml(path: Path) -> bytes:
+    with zipfile.ZipFile(path) as zf:
+        return zf.read("word/document.xml")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--paragraphs", type=int, default=20000)
+    parser.add_argument("--tables", type=int, default=200)
+    parser.add_argument("--indent", type=float, default=0.5)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    specs = synthetic_specs(args.paragraphs, args.tables)
+    with tempfile.TemporaryDirectory(prefix="ai-review-bench-export-") as tmp:
+        out = Path(tmp)
+        tables_path = out / "tables.docx"
+        synthetic_tables(tables_path, args.tables)
+        # cached 的输入：先渲染一遍，为段落规格回填渲染 XML
+        cached = {version: [dict(spec) for spec in items] for version, items in specs.items()}
+        warm = {version: out / f"warm-{version}.docx" for version in cached}
+        export._render_versions(cached, warm, export._load_tables(tables_path), args.indent)
+        runs = {
+            "legacy": (legacy_render, specs),
+            "single": (single_render, specs),
+            "cached": (cached_render, cached),
+        }
+        outputs = {}
+        print(f"paragraphs={len(specs['clean'])} tables={args.tables}")
+        print(f"{'mode':<8}{'seconds':>10}")
+        for name, (render, inputs) in runs.items():
+            paths = {version: out / f"{name}-{version}.docx" for version in specs}
+            samples = []
+            for _ in range(args.rounds):
+                started = time.perf_counter()
+                render(inputs, paths, tables_path, args.indent)
+                samples.append(time.perf_counter() - started)
+            outputs[name] = {version: document_xml(path) for version, path in paths.items()}
+            print(f"{name:<8}{statistics.median(samples):>10.2f}")
+        assert outputs["legacy"] == outputs["single"] == outputs["cached"], "document.xml 不一致"
+        print("document.xml 逐字节一致")
+
+if __name__ == "__main__":
+    main()
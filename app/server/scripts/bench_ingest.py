@@ -0,0 +1,193 @@
+"""基准：docx 解析 —— python-docx 三遍解析 / 序列化（旧写法）对比单遍流式 ingest。
+
+合成一篇大文档（默认 20000 段正文 + 标题 + 表格 + 若干张大图；--file 可改用现成 docx），
+分别在独立子进程中执行：
+
+- legacy：python-docx 打开 original → 深拷贝表格存 tables.docx → 替换占位符存 no_table.docx →
+  重新打开 no_table.docx 逐段转 Markdown（即改造前的 ingest）；
+- stream：app.pipeline.ingest._stream_document 单遍流式处理。
+
+输出各方式的耗时与子进程峰值常驻内存（ru_maxrss，含解释器与依赖导入的基线，一并打印），
+并校验两者 parsed.md 逐字节一致、表格数一致。
+
+用法（app/server 目录下）：
+python -m scripts.bench_ingest [--paragraphs 20000] [--tables 200] [--images 4]
+    [--image-mb 8] [--file original.docx] [--rounds 3]
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import resource
+import statistics
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from copy import deepcopy
+from pathlib import Path
+
+os.environ.setdefault("AI_REVIEW_DATA_DIR", tempfile.mkdtemp(prefix="ai-review-bench-ingest-"))
+
+from docx import Document as DocxDocument  # noqa: E402
+from docx.oxml.ns import qn  # noqa: E402
+from docx.shared import Inches  # noqa: E402
+
+from app.pipeline import ingest  # noqa: E402
+
+
+def _png(path: Path, megabytes: float) -> None:
+    """写一张约 megabytes 大小、不可压缩的 RGB PNG（随机像素）。"""
+    side = max(16, int((megabytes * 1024 * 1024 / 3) ** 0.5))
+    raw = b"".join(b"\x00" + os.urandom(side * 3) for _ in range(side))
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        body = kind + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body))
+
+    header = struct.pack(">IIBBBBB", side, side, 8, 2, 0, 0, 0)
+    path.write_bytes(
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", header)
+        + chunk(b"IDAT", zlib.compress(raw, 1))
+        + chunk(b"IEND", b"")
+    )
+
+
+def synthetic_docx(path: Path, paragraphs: int, tables: int, images: int, image_mb: float) -> None:
+    doc = DocxDocument()
+    doc.add_table(rows=2, cols=2).cell(0, 0).text = "审查意见"
+    image = path.with_suffix(".png")
+    table_every = max(1, paragraphs // max(1, tables))
+    image_every = max(1, paragraphs // max(1, images))
+    for i in range(paragraphs):
+        if i % 50 == 0:
+            doc.add_heading(f"第{i // 50 + 1}节 病例资料", level=1 + (i // 50) % 3)
+        para = doc.add_paragraph(f"患者{i}号，男性，五十六岁，因反复胸闷气短三个月入院。\t")
+        para.add_run("入院后完善相关检查，").bold = True
+        para.add_run("血常规提示白细胞计数轻度升高。")
+        if i % 7 == 0:
+            para.add_run().add_break()
+            doc.add_paragraph("")
+        if tables and i % table_every == table_every - 1:
+            table = doc.add_table(rows=3, cols=3)
+            table.cell(0, 0).text = f"检查项目{i}"
+        if images and i % image_every == image_every // 2:
+            _png(image, image_mb)  # 每张不同，避免 python-docx 按内容去重
+            doc.add_picture(str(image), width=Inches(4))
+    doc.save(str(path))
+    image.unlink(missing_ok=True)
+
+
+def legacy_ingest(original: Path, out: Path) -> tuple[int, str]:
+    """改造前的 ingest（python-docx 全文档读写三遍），返回 (表格数, parsed.md 文本)。"""
+    doc = DocxDocument(str(original))
+    if doc.tables:
+        doc.element.body.remove(doc.tables[0]._element)
+    dst = DocxDocument()
+    sect_pr = dst._element.body.find(qn("w:sectPr"))
+    for table in doc.tables:
+        sect_pr.addprevious(deepcopy(table._tbl))
+        dst.add_paragraph()
+    dst.save(str(out / "tables.docx"))
+    body = doc.element.body
+    counter = 1
+    for element in list(body):
+        if element.tag == qn("w:tbl"):
+            index = body.index(element)
+            body.remove(element)
+            placeholder = doc.add_paragraph(f"[{{表格不予审校_{counter}}}]")
+            body.insert(index, placeholder._element)
+            counter += 1
+    doc.save(str(out / "no_table.docx"))
+
+    lines = []
+    for para in DocxDocument(str(out / "no_table.docx")).paragraphs:
+        text = para.text.rstrip()
+        try:
+            level = ingest._heading_level(para.style.name or "")
+        except Exception:
+            level = None
+        lines.append(ingest._markdown_line(text, level))
+    return counter - 1, "\n".join(lines).strip("\n") + "\n"
+
+
+def stream_ingest(original: Path, out: Path) -> tuple[int, str]:
+    _, tables, markdown = ingest._stream_document(
+        original, out / "tables.docx", out / "no_table.docx", True
+    )
+    return tables, markdown
+
+
+MODES = {"legacy": legacy_ingest, "stream": stream_ingest}
+
+
+def worker(mode: str, original: Path, rounds: int) -> None:
+    """子进程：执行 rounds 次，打印 JSON（中位耗时 / 峰值 RSS / 产物摘要）。"""
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    samples = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for _ in range(rounds):
+            started = time.perf_counter()
+            tables, markdown = MODES[mode](original, Path(tmp))
+            samples.append(time.perf_counter() - started)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({
+        "seconds": statistics.median(samples),
+        "baseline_mb": baseline / 1024,
+        "peak_mb": peak / 1024,
+        "tables": tables,
+        "md_sha256": hashlib.sha256(markdown.encode("utf-8")).hexdigest(),
+        "md_bytes": len(markdown.encode("utf-8")),
+    }))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--paragraphs", type=int, default=20000)
+    parser.add_argument("--tables", type=int, default=200)
+    parser.add_argument("--images", type=int, default=4)
+    parser.add_argument("--image-mb", type=float, default=8.0, help="每张图片的近似大小")
+    parser.add_argument("--file", type=Path, default=None, help="改用现成 docx")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--worker", choices=sorted(MODES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.file, args.rounds)
+        return
+
+    with tempfile.TemporaryDirectory(prefix="ai-review-bench-ingest-") as tmp:
+        original = args.file
+        if original is None:
+            original = Path(tmp) / "original.docx"
+            synthetic_docx(original, args.paragraphs, args.tables, args.images, args.image_mb)
+        print(f"file={original.name} size={original.stat().st_size / 1024 / 1024:.1f} MB")
+        print(
+            f"{'mode':<8}{'seconds':>10}{'peak MB':>10}{'base MB':>10}"
+            f"{'tables':>8}{'md bytes':>11}"
+        )
+        results = {}
+        for mode in MODES:
+            proc = subprocess.run(
+                [sys.executable, "-m", "scripts.bench_ingest", "--worker", mode,
+                 "--file", str(original), "--rounds", str(args.rounds)],
+                check=True, capture_output=True, text=True,
+            )
+            result = results[mode] = json.loads(proc.stdout.strip().splitlines()[-1])
+            print(
+                f"{mode:<8}{result['seconds']:>10.2f}{result['peak_mb']:>10.0f}"
+                f"{result['baseline_mb']:>10.0f}{result['tables']:>8}{result['md_bytes']:>11}"
+            )
+        legacy, stream = results["legacy"], results["stream"]
+        assert legacy["md_sha256"] == stream["md_sha256"], "parsed.md 不一致"
+        assert legacy["tables"] == stream["tables"], "表格数不一致"
+        print("parsed.md 逐字节一致")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""基准：分句吞吐 —— 逐行 split（旧写法）对比批量 split_many（SaT 列表接口）与进程池分片。
+
+对同一组正文段落（默认合成 2000 段；--file 指定 parsed.md 时取其中待分句的正文行）分别执行：
+
+- per-line：每段单独调用 SentenceSplitter.split（SaT 每段一次前向）；
+- batched：split_paragraphs 一次批量调用（segment.sat_batch_size / sat_stride 对应的参数）；
+- pool：--processes > 1 时按进程池分片（仅 SaT 后端；首轮含子进程加载模型，单独报告）。
+
+输出每种方式的段落数 / 秒。需已下载 SaT 模型；未安装 wtpsplit 或设了 AI_REVIEW_SEGMENTER=rule
+时为正则后端，结果只反映调用开销。
+
+用法（app/server 目录下）：
+python -m scripts.bench_segment_split [--paragraphs 2000] [--file parsed.md]
+    [--batch-size 32] [--stride 64] [--processes 0] [--rounds 3]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+os.environ.setdefault(
+    "AI_REVIEW_DATA_DIR", tempfile.mkdtemp(prefix="ai-review-bench-segment-split-")
+)
+
+from app.pipeline import segment  # noqa: E402
+from app.pipeline.segment import SentenceSplitter, shutdown_pool, split_paragraphs  # noqa: E402
+
+
+def synthetic_paragraphs(n: int) -> list[str]:
+    return [
+        f"患者{i}号，男性，五十六岁，因反复胸闷气短三个月入院。入院后完善相关检查，"
+        f"血常规提示白细胞计数轻度升高；给予抗感染、化痰及对症支持治疗{i % 14 + 1}天，"
+        "复查胸部CT未见明显异常改变。患者恢复良好，予以出院。"
+        for i in range(n)
+    ]
+
+
+def file_paragraphs(path: Path) -> list[str]:
+    lines = (line.strip() for line in path.read_text(encoding="utf-8").splitlines())
+    return [line for line in lines if line and segment._classify(line)[0] == "text"]
+
+
+def timed(fn, rounds: int) -> float:
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--paragraphs", type=int, default=2000, help="合成段落数")
+    parser.add_argument("--file", type=Path, default=None, help="改用 parsed.md 的正文行")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--stride", type=int, default=64)
+    parser.add_argument("--processes", type=int, default=0, help="进程池规模（> 1 时测 pool）")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    paragraphs = file_paragraphs(args.file) if args.file else synthetic_paragraphs(args.paragraphs)
+    splitter = SentenceSplitter.get()
+    options = {"batch_size": args.batch_size, "stride": args.stride}
+    print(f"backend={splitter.backend} paragraphs={len(paragraphs)}")
+
+    baseline = [splitter.split(p) for p in paragraphs]
+    assert split_paragraphs(splitter, paragraphs, **options) == baseline
+
+    print(f"{'mode':<10}{'seconds':>10}{'paragraphs/s':>14}")
+    runs = {
+        "per-line": lambda: [splitter.split(p) for p in paragraphs],
+        "batched": lambda: split_paragraphs(splitter, paragraphs, **options),
+    }
+    if args.processes > 1 and splitter.backend == "sat":
+        segment._POOL_MIN_PARAGRAPHS = 1  # 基准：不论段落数都走进程池
+
+        def pooled():
+            return split_paragraphs(splitter, paragraphs, processes=args.processes, **options)
+
+        warmup = timed(pooled, 1)  # 子进程首次加载模型
+        print(f"{'pool-cold':<10}{warmup:>10.2f}{len(paragraphs) / warmup:>14.0f}")
+        runs["pool"] = pooled
+    elif args.processes > 1:
+        print("（正则后端不走进程池，跳过 pool）")
+    for name, fn in runs.items():
+        seconds = timed(fn, args.rounds)
+        print(f"{name:<10}{seconds:>10.2f}{len(paragraphs) / seconds:>14.0f}")
+    shutdown_pool()
+
+
+if __name__ == "__main__":
+    main()
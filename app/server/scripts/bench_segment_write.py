@@ -0,0 +1,125 @@
+"""基准：分句结果入库 —— 逐块 ORM add + flush（旧写法）对比批量路径与增量重新分句。
+
+在临时数据目录对同一篇合成分句结果（默认 500 块 × 10 句 = 5000 句）分别执行：
+
+- legacy：清除旧行后逐块 add + flush 写入；
+- bulk：清除旧行后经 _save_blocks 批量写入（全部为新句）；
+- rerun：已有同一结果时再经 _save_blocks 增量更新（句子全部对齐保留）；
+- edited：原稿与每块改一句的修订稿交替增量更新（10% 句子改动）。
+
+统计写语句执行次数（executemany 计一次）与多轮耗时中位数。
+
+用法（app/server 目录下）：python -m scripts.bench_segment_write [--blocks 500] [--sentences 10]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault(
+    "AI_REVIEW_DATA_DIR", tempfile.mkdtemp(prefix="ai-review-bench-segment-write-")
+)
+
+from sqlalchemy import event  # noqa: E402
+from sqlmodel import Session  # noqa: E402
+
+from app.core.db import engine, init_db  # noqa: E402
+from app.models import Block, Document, Sentence  # noqa: E402
+from app.pipeline.segment import _save_blocks, clear_blocks  # noqa: E402
+
+
+def synthetic_blocks(n_blocks: int, n_sentences: int) -> list[dict]:
+    return [
+        {
+            "chapter": f"第{b // 20}章",
+            "is_reference": False,
+            "sentences": [f"第{b}块第{i}句，用于基准测试的合成正文内容。" for i in range(n_sentences)],
+        }
+        for b in range(n_blocks)
+    ]
+
+
+def legacy_save(doc_id: str, blocks: list[dict]) -> None:
+    """旧写法：先清除（单独事务），再逐块 add + flush 取 id、逐句 add。"""
+    clear_blocks(doc_id)
+    with Session(engine) as session:
+        for block_idx, block_data in enumerate(blocks):
+            block = Block(
+                document_id=doc_id,
+                idx=block_idx,
+                chapter=block_data["chapter"],
+                is_reference=block_data["is_reference"],
+                text="\n".join(block_data["sentences"]),
+            )
+            session.add(block)
+            session.flush()
+            for sent_idx, sent_text in enumerate(block_data["sentences"]):
+                session.add(
+                    Sentence(document_id=doc_id, block_id=block.id, idx=sent_idx, text=sent_text)
+                )
+        session.commit()
+
+
+def measure(fn, doc_id: str, blocks: list[dict], rounds: int) -> tuple[int, float]:
+    writes = [0]
+
+    def record(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith(("INSERT", "UPDATE", "DELETE")):
+            writes[0] += 1
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        fn(doc_id, blocks)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn(doc_id, blocks)
+        timings.append(time.perf_counter() - started)
+    return writes[0], statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--blocks", type=int, default=500)
+    parser.add_argument("--sentences", type=int, default=10, help="每块句数")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    init_db()
+    with Session(engine) as session:
+        doc = Document(filename="bench.docx", status="parsed")
+        session.add(doc)
+        session.commit()
+        doc_id = doc.id
+    blocks = synthetic_blocks(args.blocks, args.sentences)
+    sentences = args.blocks * args.sentences
+    print(f"{'path':<8}{'sentences':>10}{'writes':>8}{'median ms':>12}")
+    edited = [
+        {**block, "sentences": [f"{block['sentences'][0]}（修订）", *block["sentences"][1:]]}
+        for block in blocks
+    ]
+
+    def bulk(doc_id: str, blocks: list[dict]) -> None:
+        clear_blocks(doc_id)
+        _save_blocks(doc_id, blocks)
+
+    versions = [edited, blocks]
+
+    def edit(doc_id: str, _blocks: list[dict]) -> None:
+        # 原稿与修订稿交替：每次都是 10% 句子改动的增量更新
+        _save_blocks(doc_id, versions[0])
+        versions.reverse()
+
+    runs = (("legacy", legacy_save), ("bulk", bulk), ("rerun", _save_blocks), ("edited", edit))
+    for name, fn in runs:
+        writes, seconds = measure(fn, doc_id, blocks, args.rounds)
+        print(f"{name:<8}{sentences:>10}{writes:>8}{seconds * 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
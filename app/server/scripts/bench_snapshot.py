@@ -0,0 +1,145 @@
+"""基准：文档树加载的查询数与耗时 —— 逐行 N+1（旧详情接口写法）对比 load_snapshot。
+
+在临时数据目录构造合成大文档（默认 200 块 × 10 句 = 2000 句，每句 3 条证据、4 条查询，
+每 5 句 1 条 correction），分别统计 SELECT 次数与多轮加载耗时中位数。
+
+用法（app/server 目录下）：python -m scripts.bench_snapshot [--blocks 200] [--sentences 10]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("AI_REVIEW_DATA_DIR", tempfile.mkdtemp(prefix="ai-review-bench-snapshot-"))
+
+from sqlalchemy import event  # noqa: E402
+from sqlmodel import Session, select  # noqa: E402
+
+from app.core.db import engine, init_db  # noqa: E402
+from app.models import Block, Correction, Document, Evidence, Query, Sentence  # noqa: E402
+from app.pipeline.snapshot import load_snapshot  # noqa: E402
+
+
+def build_document(n_blocks: int, n_sentences: int) -> str:
+    with Session(engine) as session:
+        doc = Document(filename="bench.docx", status="pending_manual")
+        session.add(doc)
+        session.flush()
+        for b in range(n_blocks):
+            texts = [f"第{b}块第{i}句，用于基准测试的合成正文内容。" for i in range(n_sentences)]
+            block = Block(document_id=doc.id, idx=b, text="".join(texts))
+            session.add(block)
+            session.flush()
+            for i, text in enumerate(texts):
+                sentence = Sentence(document_id=doc.id, block_id=block.id, idx=i, text=text)
+                session.add(sentence)
+                session.flush()
+                for q in range(4):
+                    session.add(
+                        Query(
+                            document_id=doc.id, sentence_id=sentence.id, idx=q, text=f"查询{q}"
+                        )
+                    )
+                for r in range(3):
+                    session.add(
+                        Evidence(
+                            document_id=doc.id,
+                            sentence_id=sentence.id,
+                            source="vector" if r % 2 == 0 else "bm25",
+                            chunk_text=f"证据片段 {b}-{i}-{r}",
+                            doc_name="kb.pdf",
+                            score=1.0 / (r + 1),
+                            rank=r,
+                        )
+                    )
+                if i % 5 == 0:
+                    session.add(
+                        Correction(
+                            document_id=doc.id,
+                            sentence_id=sentence.id,
+                            original="合成",
+                            suggestion="合成的",
+                            error_type="语法",
+                            severity="low",
+                            explanation="基准用",
+                        )
+                    )
+        session.commit()
+        return doc.id
+
+
+def legacy_load(doc_id: str) -> int:
+    """旧写法：块 → 句 → corrections / evidence / queries 逐行查询。返回句数。"""
+    count = 0
+    with Session(engine) as session:
+        session.get(Document, doc_id)
+        blocks = session.exec(
+            select(Block).where(Block.document_id == doc_id).order_by(Block.idx)
+        ).all()
+        for block in blocks:
+            sentences = session.exec(
+                select(Sentence).where(Sentence.block_id == block.id).order_by(Sentence.idx)
+            ).all()
+            for sentence in sentences:
+                session.exec(
+                    select(Correction)
+                    .where(Correction.sentence_id == sentence.id)
+                    .order_by(Correction.id)
+                ).all()
+                session.exec(
+                    select(Evidence)
+                    .where(Evidence.sentence_id == sentence.id)
+                    .order_by(Evidence.score.desc())
+                ).all()
+                session.exec(
+                    select(Query).where(Query.sentence_id == sentence.id).order_by(Query.idx)
+                ).all()
+                count += 1
+    return count
+
+
+def snapshot_load(doc_id: str) -> int:
+    snapshot = load_snapshot(doc_id, queries=True)
+    return sum(1 for _ in snapshot.sentences())
+
+
+def measure(fn, doc_id: str, rounds: int) -> tuple[int, int, float]:
+    selects = [0]
+
+    def record(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith("SELECT"):
+            selects[0] += 1
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        sentences = fn(doc_id)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn(doc_id)
+        timings.append(time.perf_counter() - started)
+    return sentences, selects[0], statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--blocks", type=int, default=200)
+    parser.add_argument("--sentences", type=int, default=10, help="每块句数")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    init_db()
+    doc_id = build_document(args.blocks, args.sentences)
+    print(f"{'loader':<10}{'sentences':>10}{'SELECTs':>10}{'median ms':>12}")
+    for name, fn in (("legacy", legacy_load), ("snapshot", snapshot_load)):
+        sentences, selects, seconds = measure(fn, doc_id, args.rounds)
+        print(f"{name:<10}{sentences:>10}{selects:>10}{seconds * 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""基准：并发任务下的 SQLite 写入吞吐 —— 逐条提交（默认 / WAL pragma）对比单写线程批量提交。
+
+模拟多个后台任务（检索 / 审校 / 索引）同时写库：每个线程执行若干次「一句的检索结果」写入
+（1 条 query + 3 条 evidence + 1 条任务事件），各方案在独立的临时库上运行：
+
+- default：rollback journal + synchronous=FULL（旧引擎），每次写入开会话、提交；
+- wal：core/db.py 的 pragma（WAL / synchronous=NORMAL / busy_timeout / mmap），仍逐条提交；
+- writer-sync：WAL + 单写线程，每次写入等待落库（DbWriter.run）；
+- writer：WAL + 单写线程，写入只取 Future，线程结束前统一等待。
+
+输出每种方案的写入次数 / 秒与事务数。
+
+用法（app/server 目录下）：python -m scripts.bench_writes [--threads 8] [--writes 200]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+os.environ.setdefault("AI_REVIEW_DATA_DIR", tempfile.mkdtemp(prefix="ai-review-bench-writes-"))
+
+from sqlalchemy import event  # noqa: E402
+from sqlalchemy.engine import Engine  # noqa: E402
+from sqlmodel import Session, SQLModel, create_engine  # noqa: E402
+
+from app import models  # noqa: E402, F401
+from app.core.db import apply_pragmas  # noqa: E402
+from app.core.dbwriter import DbWriter  # noqa: E402
+from app.models import Evidence, JobEvent, Query  # noqa: E402
+
+
+def make_engine(path: Path, pragmas: bool) -> Engine:
+    bind = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    if pragmas:
+        event.listen(bind, "connect", apply_pragmas)
+    SQLModel.metadata.create_all(bind)
+    return bind
+
+
+def write_sentence(thread: int, n: int):
+    def write(session: Session) -> None:
+        sentence_id = thread * 1_000_000 + n
+        session.add(Query(document_id="bench", sentence_id=sentence_id, idx=0, text="查询"))
+        for rank in range(3):
+            session.add(
+                Evidence(
+                    document_id="bench",
+                    sentence_id=sentence_id,
+                    source="vector",
+                    chunk_text=f"证据 {thread}-{n}-{rank}",
+                    doc_name="kb.pdf",
+                    score=0.5,
+                    rank=rank,
+                )
+            )
+        session.add(JobEvent(job_id=f"job-{thread}", event="progress", data='{"n": %d}' % n))
+
+    return write
+
+
+def run_threads(threads: int, body) -> float:
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(t: int) -> None:
+        barrier.wait()
+        body(t)
+
+    pool = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    for thread in pool:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in pool:
+        thread.join()
+    return time.perf_counter() - started
+
+
+def per_commit(bind: Engine, threads: int, writes: int) -> tuple[float, int]:
+    def body(t: int) -> None:
+        for n in range(writes):
+            with Session(bind) as session:
+                write_sentence(t, n)(session)
+                session.commit()
+
+    return run_threads(threads, body), threads * writes
+
+
+def batched(bind: Engine, threads: int, writes: int, wait_each: bool) -> tuple[float, int]:
+    writer = DbWriter(bind, name="bench-writer")
+
+    def body(t: int) -> None:
+        if wait_each:
+            for n in range(writes):
+                writer.run(write_sentence(t, n))
+        else:
+            futures = [writer.submit(write_sentence(t, n)) for n in range(writes)]
+            for future in futures:
+                future.result()
+
+    return run_threads(threads, body), writer.batches
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=8, help="并发任务线程数")
+    parser.add_argument("--writes", type=int, default=200, help="每线程写入次数")
+    args = parser.parse_args()
+
+    root = Path(tempfile.mkdtemp(prefix="ai-review-bench-writes-db-"))
+    total = args.threads * args.writes
+    print(f"{'scheme':<14}{'writes':>8}{'commits':>9}{'seconds':>10}{'writes/s':>11}")
+    for name in ("default", "wal", "writer-sync", "writer"):
+        bind = make_engine(root / f"{name}.db", pragmas=name != "default")
+        if name in ("default", "wal"):
+            seconds, commits = per_commit(bind, args.threads, args.writes)
+        else:
+            seconds, commits = batched(bind, args.threads, args.writes, name == "writer-sync")
+        print(f"{name:<14}{total:>8}{commits:>9}{seconds:>10.2f}{total / seconds:>11.0f}")
+        bind.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+"""测试共用辅助。
+
+各测试模块在导入 app 之前自行隔离数据目录，这里不导入 app。
+"""
+import time
+
+
+def job_result(client, resp, timeout: float = 30.0) -> dict:
+    """长操作入队后轮询任务至终态，返回 {job_id, **处理函数结果}（/api/jobs/{id} 的 result）。"""
+    assert resp.status_code == 200, resp.text
+    job_id = resp.json()["job_id"]
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/api/jobs/{job_id}").json()
+        if job["status"] in ("done", "error", "cancelled"):
+            assert job["status"] == "done", job
+            return {"job_id": job_id, **job["result"]}
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} 超时未完成")
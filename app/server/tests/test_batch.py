@@ -0,0 +1,106 @@
+"""批量处理测试：zip / 目录提交、逐篇流式处理、批次汇总（进度 / 吞吐）。
+
+- LLM 一律 mock（审校 chat_json + 检索查询重写），不发起真实请求。
+- 环境隔离同其他模块：导入 app 前设置 AI_REVIEW_DATA_DIR / AI_REVIEW_SEGMENTER=rule。
+"""
+import io
+import os
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+_tmp = tempfile.mkdtemp(prefix="ai-review-test-batch-")
+os.environ.setdefault("AI_REVIEW_DATA_DIR", _tmp)
+os.environ.setdefault("AI_REVIEW_SEGMENTER", "rule")
+
+import pytest  # noqa: E402
+from docx import Document as DocxDocument  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.pipeline import review as review_mod  # noqa: E402
+
+DUMMY_LLM_SETTINGS = {
+    "llm.base_url": "http://127.0.0.1:9/v1",
+    "llm.api_key": "sk-test",
+    "llm.model": "test-model",
+}
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as c:
+        assert c.put("/api/settings", json=DUMMY_LLM_SETTINGS).status_code == 200
+        yield c
+
+
+@pytest.fixture(autouse=True)
+def mock_llm(monkeypatch):
+    payload = {"corrections": [{"sentence_id": 1, "original": "稿件", "suggestion": "文稿"}]}
+    monkeypatch.setattr(review_mod, "chat_json", lambda *a, **kw: payload)
+    monkeypatch.setattr("app.rag.retrieve.chat_json", lambda *a, **kw: ["问题"])
+
+
+def _docx_bytes(text: str) -> bytes:
+    doc = DocxDocument()
+    doc.add_paragraph("一、概述")
+    doc.add_paragraph(text)
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+
+def _wait_batch(client: TestClient, batch_id: str, timeout: float = 30.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        summary = client.get(f"/api/batches/{batch_id}").json()
+        if summary["status"] == "done":
+            return summary
+        time.sleep(0.1)
+    raise AssertionError(f"批次 {batch_id} 超时未完成")
+
+
+def test_zip_batch_processes_every_manuscript(client: TestClient):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as archive:
+        archive.writestr("a.docx", _docx_bytes("第一篇稿件内容足够长，需要审校。"))
+        archive.writestr("sub/b.docx", _docx_bytes("第二篇稿件内容足够长，需要审校。"))
+        archive.writestr("~$a.docx", b"lock")  # Word 临时文件跳过
+        archive.writestr("readme.txt", b"ignored")
+    buf.seek(0)
+    resp = client.post("/api/batches", files={"file": ("稿件.zip", buf, "application/zip")})
+    assert resp.status_code == 201, resp.text
+    created = resp.json()
+    assert created["name"] == "稿件" and created["total"] == 2
+
+    summary = _wait_batch(client, created["id"])
+    assert summary["done"] == 2 and summary["failed"] == 0 and summary["progress"] == 1.0
+    assert [d["filename"] for d in summary["documents"]] == ["a.docx", "sub/b.docx"]
+    for doc in summary["documents"]:
+        assert doc["status"] == "pending_manual" and doc["corrections"] == 1
+    assert summary["corrections"] == 2 and summary["docs_per_hour"] > 0
+    assert summary["finished_at"] is not None
+    listed = client.get("/api/batches").json()
+    assert created["id"] in [b["id"] for b in listed] and "documents" not in listed[0]
+
+
+def test_folder_batch_and_validation(client: TestClient):
+    root = Path(tempfile.mkdtemp(prefix="ai-review-batch-folder-"))
+    (root / "nested").mkdir()
+    (root / "c.docx").write_bytes(_docx_bytes("第三篇稿件内容足够长，需要审校。"))
+    (root / "nested" / "d.docx").write_bytes(_docx_bytes("第四篇稿件内容足够长，需要审校。"))
+    resp = client.post("/api/batches/folder", json={"path": str(root)})
+    assert resp.status_code == 201, resp.text
+    summary = _wait_batch(client, resp.json()["id"])
+    assert [d["filename"] for d in summary["documents"]] == ["c.docx", "nested/d.docx"]
+    assert summary["done"] == 2
+
+    missing = str(root / "missing")
+    assert client.post("/api/batches/folder", json={"path": missing}).status_code == 400
+    empty = Path(tempfile.mkdtemp(prefix="ai-review-batch-empty-"))
+    assert client.post("/api/batches/folder", json={"path": str(empty)}).status_code == 400
+    bad = io.BytesIO(b"not zip")
+    resp = client.post("/api/batches", files={"file": ("x.zip", bad, "application/zip")})
+    assert resp.status_code == 400
+    assert client.get("/api/batches/missing").status_code == 404
@@ -25,6 +25,8 @@ from app.core.config import get_settings  # noqa: E402
 from app.core.db import engine  # noqa: E402
 from app.main import app  # noqa: E402
 from app.models import Block, Correction, Document, Sentence  # noqa: E402
+from app.pipeline.stats import add_corrections  # noqa: E402
+from conftest import job_result  # noqa: E402
 
 DATA_DIR = get_settings().data_dir
 DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
@@ -196,8 +198,8 @@ def test_export_full_flow(client: TestClient, docx_path: Path, monkeypatch) -> N
         up = client.post("/api/documents", files={"file": ("export-sample.docx", f, DOCX_MIME)})
     assert up.status_code == 201, up.text
     doc_id = up.json()["id"]
-    run = client.post(f"/api/documents/{doc_id}/run")
-    assert run.status_code == 200 and run.json()["status"] == "segmented", run.text
+    run = job_result(client, client.post(f"/api/documents/{doc_id}/run"))
+    assert run["status"] == "segmented", run
     parsed = client.get(f"/api/documents/{doc_id}/parsed")
     assert "[{表格不予审校_1}]" in parsed.text
 
@@ -206,8 +208,8 @@ def test_export_full_flow(client: TestClient, docx_path: Path, monkeypatch) -> N
         "app.rag.retrieve.chat_json",
         lambda system, user, schema_hint=None: {"questions": ["高血压的诊断标准是什么？"]},
     )
-    retr = client.post(f"/api/documents/{doc_id}/retrieve")
-    assert retr.status_code == 200 and retr.json()["status"] == "retrieved", retr.text
+    retr = job_result(client, client.post(f"/api/documents/{doc_id}/retrieve"))
+    assert retr["status"] == "retrieved", retr
 
     # ---------- review（mock LLM 出四条约定 correction） ----------
     monkeypatch.setattr("app.pipeline.review.chat_json", fake_review_chat_json)
@@ -254,9 +256,7 @@ def test_export_full_flow(client: TestClient, docx_path: Path, monkeypatch) -> N
     assert resp.json()["document_status"] == "manual_done"
 
     # ---------- export ----------
-    exp = client.post(f"/api/documents/{doc_id}/export")
-    assert exp.status_code == 200, exp.text
-    result = exp.json()
+    result = job_result(client, client.post(f"/api/documents/{doc_id}/export"))
     assert result["status"] == "done"
     assert result["adopted"] == 3  # accepted×2（含坏锚点）+ custom×1；rejected 不计
     assert len(result["warnings"]) == 1  # 坏锚点降级
@@ -333,8 +333,26 @@ def test_export_full_flow(client: TestClient, docx_path: Path, monkeypatch) -> N
     assert client.get(f"/api/documents/{doc_id}/exports/3").status_code == 404
 
     # ---------- 重导出幂等（done 状态允许重跑） ----------
-    exp2 = client.post(f"/api/documents/{doc_id}/export")
-    assert exp2.status_code == 200 and exp2.json()["adopted"] == 3
+    exp2 = job_result(client, client.post(f"/api/documents/{doc_id}/export"))
+    assert exp2["adopted"] == 3
+    # 块级渲染缓存：决定未变 → 全部命中，产物不变，坏锚点告警照常重放
+    assert result["cache"]["hits"] == 0 and result["cache"]["misses"] > 0
+    assert exp2["cache"] == {"hits": result["cache"]["misses"], "misses": 0, "hit_rate": 1.0}
+    assert exp2["warnings"] == result["warnings"]
+    assert _paragraph_texts(DocxDocument(exp2["clean_path"])) == clean_text
+    assert _paragraph_texts(DocxDocument(exp2["marked_path"])) == marked_text
+
+    # ---------- 改一条决定后重导出：只重建该句所在块 ----------
+    assert client.post(
+        f"/api/corrections/{c_reject['id']}/decision", json={"decision": "accepted"}
+    ).status_code == 200
+    exp3 = job_result(client, client.post(f"/api/documents/{doc_id}/export"))
+    assert exp3["adopted"] == 4
+    assert exp3["cache"]["misses"] == 1 and exp3["cache"]["hits"] == exp2["cache"]["hits"] - 1
+    assert "每四周复查血压" in _paragraph_texts(DocxDocument(exp3["clean_path"]))
+    assert "｛～原文:定期复查血压 AI:每四周复查血压～｝" in _paragraph_texts(
+        DocxDocument(exp3["marked_path"])
+    )
 
     # ---------- 清理 ----------
     assert client.delete(f"/api/documents/{doc_id}").status_code == 200
@@ -361,7 +379,7 @@ def test_export_without_adopted_corrections(client: TestClient, docx_path: Path,
     with docx_path.open("rb") as f:
         up = client.post("/api/documents", files={"file": ("plain.docx", f, DOCX_MIME)})
     doc_id = up.json()["id"]
-    assert client.post(f"/api/documents/{doc_id}/run").status_code == 200
+    job_result(client, client.post(f"/api/documents/{doc_id}/run"))
 
     # 直接落种一条 correction 并 reject（不经 review，直奔人工决定）
     with Session(engine) as session:
@@ -373,13 +391,14 @@ def test_export_without_adopted_corrections(client: TestClient, docx_path: Path,
             select(Sentence).where(Sentence.block_id == block.id, Sentence.idx > 0)
         ).first()
         corr = Correction(
+            document_id=doc_id,
             sentence_id=sent.id,
             original=sent.text[:4],
             suggestion="任意建议",
             error_type="格式错误",
             severity="low",
         )
-        session.add(corr)
+        add_corrections(session, [corr])  # 同时维护文档 corrections 计数
         session.commit()
         session.refresh(corr)
         corr_id = corr.id
@@ -387,11 +406,30 @@ def test_export_without_adopted_corrections(client: TestClient, docx_path: Path,
     assert resp.status_code == 200
     assert resp.json()["document_status"] == "manual_done"
 
-    exp = client.post(f"/api/documents/{doc_id}/export")
-    assert exp.status_code == 200, exp.text
-    result = exp.json()
+    result = job_result(client, client.post(f"/api/documents/{doc_id}/export"))
     assert result["adopted"] == 0
     clean = DocxDocument(result["clean_path"])
     text = _paragraph_texts(clean)
     assert "任意建议" not in text and PARA_ACCEPT in text
     assert client.delete(f"/api/documents/{doc_id}").status_code == 200
+
+
+def test_render_cache_key_covers_render_inputs(tmp_path: Path) -> None:
+    """渲染缓存键覆盖块属性与句序（标题判定读 sentence.idx）：任一变化都落到新键。"""
+    from dataclasses import replace
+
+    from app.pipeline.export_cache import RenderCache
+    from app.pipeline.snapshot import BlockSnap, SentenceSnap
+
+    title = SentenceSnap(id=1, block_id=1, idx=0, text="一、病史")
+    body = SentenceSnap(id=2, block_id=1, idx=1, text="患者男性。")
+    block = BlockSnap(
+        id=1, idx=0, chapter="一、病史", is_reference=False, text="",
+        review_fingerprint=None, review_corrections=None, sentences=(title, body),
+    )
+    cache = RenderCache(tmp_path / "export_cache.json", indent=0.5)
+    key = cache.key(block)
+    assert cache.key(replace(block)) == key
+    assert cache.key(replace(block, is_reference=True)) != key
+    shifted = (replace(title, idx=1), replace(body, idx=2))  # 同文但不再是块内首句
+    assert cache.key(replace(block, sentences=shifted)) != key
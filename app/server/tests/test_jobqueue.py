@@ -0,0 +1,345 @@
+"""持久化任务队列测试：认领互斥、瞬时错误退避重试、租约过期收回（重启后继续）、排队任务取消、
+事件总线实时推送与批量写库、单写线程（合批 / 同键合并 / 失败隔离）与连接 pragma。
+
+- 测试专用任务类型在应用线程池启动后才注册（应用池不为其起线程），由各用例自建的
+  WorkerPool（只跑这些类型）执行。
+- 环境隔离同其他模块：导入 app 前设置 AI_REVIEW_DATA_DIR。
+"""
+import asyncio
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+_tmp = tempfile.mkdtemp(prefix="ai-review-test-jobqueue-")
+os.environ.setdefault("AI_REVIEW_DATA_DIR", _tmp)
+os.environ.setdefault("AI_REVIEW_SEGMENTER", "rule")
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlmodel import Session  # noqa: E402
+
+from app.core.db import engine  # noqa: E402
+from app.core.dbwriter import DbWriter  # noqa: E402
+from app.core.jobqueue import (  # noqa: E402
+    WorkerPool,
+    claim,
+    enqueue,
+    job_handler,
+    recover_lost_jobs,
+)
+from app.core.joblog import (  # noqa: E402
+    create_job,
+    finish_job,
+    flush_events,
+    make_emit,
+    pending_events,
+    record_event,
+    set_job_status,
+    subscribe_job,
+)
+from app.main import app  # noqa: E402
+from app.models import Document, Job, JobEvent  # noqa: E402
+
+_calls: dict[str, list[int]] = {}
+_flaky_failures = {"left": 0}
+_release = threading.Event()
+
+
+def _echo(job):
+    _calls.setdefault(job.id, []).append(job.attempt)
+    return {"echo": job.params.get("value")}
+
+
+def _flaky(job):
+    _calls.setdefault(job.id, []).append(job.attempt)
+    if _flaky_failures["left"] > 0:
+        _flaky_failures["left"] -= 1
+        raise OSError("磁盘暂时不可用")
+    return {"attempt": job.attempt}
+
+
+def _broken(job):
+    _calls.setdefault(job.id, []).append(job.attempt)
+    raise ValueError("参数错误")
+
+
+def _reported(job):
+    # 同 review / stream：处理函数自己发出带 usage 的 error 事件后抛出
+    make_emit(job.id)("error", {"message": "模型不可用", "usage": {"calls": 1}})
+    raise ValueError("模型不可用")
+
+
+def _blocking(job):
+    # 不调用 checkpoint()：未声明 cancellable，运行中不应接受取消 / 暂停
+    _release.wait(10)
+    return {"released": _release.is_set()}
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as c:
+        job_handler("test_echo")(_echo)
+        job_handler("test_flaky", max_attempts=3)(_flaky)
+        job_handler("test_broken", max_attempts=3)(_broken)
+        job_handler("test_reported")(_reported)
+        job_handler("test_blocking")(_blocking)
+        c.put("/api/settings", json={"jobs.retry_backoff": 0.05})
+        yield c
+        c.put("/api/settings", json={"jobs.retry_backoff": 2.0})
+
+
+def _job(job_id: str) -> Job:
+    with Session(engine) as session:
+        return session.get(Job, job_id)
+
+
+def _wait(job_id: str, statuses=("done", "error", "cancelled"), timeout: float = 10.0) -> Job:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = _job(job_id)
+        if job.status in statuses:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} 超时：{_job(job_id).status}")
+
+
+def _events(job_id: str) -> list[str]:
+    from sqlmodel import select
+
+    with Session(engine) as session:
+        return list(
+            session.exec(
+                select(JobEvent.event).where(JobEvent.job_id == job_id).order_by(JobEvent.id)
+            ).all()
+        )
+
+
+def test_claim_is_exclusive(client):
+    job_id = enqueue("test_echo", params={"value": 1})
+    won: list = []
+    barrier = threading.Barrier(4)
+
+    def contend(n: int) -> None:
+        barrier.wait()
+        job = claim("test_echo", f"worker-{n}", 30)
+        if job is not None:
+            won.append(job)
+
+    threads = [threading.Thread(target=contend, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert [j.id for j in won] == [job_id]  # 只有一个工作者认领成功
+    row = _job(job_id)
+    assert row.status == "running" and row.attempts == 1 and row.lease_until is not None
+    assert claim("test_echo", "worker-x", 30) is None  # 已无可认领任务
+
+
+def test_pool_runs_and_retries_with_backoff(client):
+    pool = WorkerPool(job_types=["test_echo", "test_flaky", "test_broken", "test_reported"])
+    pool.start()
+    try:
+        echo = enqueue("test_echo", params={"value": 42})
+        done = _wait(echo)
+        assert done.status == "done" and '"echo": 42' in done.result_json
+        assert _calls[echo] == [1]
+
+        _flaky_failures["left"] = 2
+        flaky = enqueue("test_flaky")
+        done = _wait(flaky)
+        assert done.status == "done" and done.attempts == 3
+        assert _calls[flaky] == [1, 2, 3]
+        assert _events(flaky).count("retry") == 2
+        assert client.get(f"/api/jobs/{flaky}").json()["result"] == {"attempt": 3}
+
+        # 非瞬时错误不重试：直接 error，错误信息可查
+        broken = enqueue("test_broken")
+        failed = _wait(broken)
+        assert failed.status == "error" and failed.attempts == 1 and _calls[broken] == [1]
+        info = client.get(f"/api/jobs/{broken}").json()
+        assert info["error"] == "参数错误" and _events(broken).count("error") == 1
+
+        # 处理函数已发 error 事件：队列只收口状态，不再补发第二条
+        reported = enqueue("test_reported")
+        failed = _wait(reported)
+        assert failed.status == "error" and failed.last_error == "模型不可用"
+        assert _events(reported).count("error") == 1
+    finally:
+        pool.stop()
+
+
+def test_lost_job_requeued_and_resumed_after_restart(client):
+    job_id = enqueue("test_echo", params={"value": "restart"})
+    # 模拟持有进程已退出：被别的 worker 认领后租约过期
+    assert claim("test_echo", "dead-worker", 30) is not None
+    with Session(engine) as session:
+        row = session.get(Job, job_id)
+        row.lease_until = datetime.utcnow() - timedelta(seconds=1)
+        session.add(row)
+        session.commit()
+    recovered = recover_lost_jobs(expired_only=True)
+    assert [j.id for j in recovered] == [job_id]
+    assert _job(job_id).status == "pending" and "retry" in _events(job_id)
+
+    pool = WorkerPool(job_types=["test_echo"])
+    pool.start()
+    try:
+        done = _wait(job_id)
+        assert done.status == "done" and done.attempts == 2 and done.worker_id == pool.worker_id
+    finally:
+        pool.stop()
+
+
+def test_duplicate_submit_and_cancel_pending(client):
+    with Session(engine) as session:
+        doc = Document(filename="queued.docx", status="segmented")
+        session.add(doc)
+        session.commit()
+        doc_id = doc.id
+    # 该文档已有排队任务（类型无处理线程，保持 pending）→ 再次提交 409
+    queued = enqueue("test_broken", document_id=doc_id)
+    resp = client.post(f"/api/documents/{doc_id}/export")
+    assert resp.status_code == 400  # 状态守卫先于重复检查
+    resp = client.post(f"/api/documents/{doc_id}/retrieve")
+    assert resp.status_code == 409 and queued in resp.json()["detail"]
+
+    # 排队中的任务可直接取消
+    resp = client.post(f"/api/jobs/{queued}/cancel")
+    assert resp.status_code == 200 and resp.json()["status"] == "cancelled"
+    assert _job(queued).status == "cancelled" and _events(queued)[-1] == "cancelled"
+    assert client.post(f"/api/jobs/{queued}/cancel").status_code == 400  # 已终态
+    with Session(engine) as session:
+        session.delete(session.get(Document, doc_id))
+        session.commit()
+
+
+def test_events_pushed_live_and_persisted_in_batches(client):
+    with Session(engine) as session:
+        job = Job(type="test_bus", status="running")
+        session.add(job)
+        session.commit()
+        job_id = job.id
+
+    async def listen() -> list:
+        subscription, backlog = subscribe_job(job_id)
+        assert backlog == []
+        record_event(job_id, "progress", {"n": 1})
+        threading.Thread(target=record_event, args=(job_id, "progress", {"n": 2})).start()
+        received: list = []
+        while len(received) < 2:
+            received += await subscription.get(timeout=2.0)
+        subscription.close()
+        return [payload for _, payload in received]
+
+    started = time.monotonic()
+    live = asyncio.run(listen())
+    assert time.monotonic() - started < 1.0  # 推送即达，不等轮询
+    assert [e.data for e in live] == ['{"n": 1}', '{"n": 2}'] and live[0].id < live[1].id
+
+    # 写库为后台批量：冲刷后表内 id 与发布时一致，待写列表清空
+    assert flush_events()
+    assert pending_events(job_id) == []
+    from sqlmodel import select
+
+    with Session(engine) as session:
+        rows = session.exec(select(JobEvent.id).where(JobEvent.job_id == job_id)).all()
+    assert sorted(rows) == [e.id for e in live]
+
+    # 晚加入的连接：从表回放，终态后发 done
+    finish_job(job_id, "done")
+    body = client.get(f"/api/jobs/{job_id}/events").text
+    assert body.count("event: progress") == 2 and body.endswith('data: {"status": "done"}\n\n')
+
+
+def test_db_writer_batches_coalesces_and_isolates_failures(client):
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() == 5000
+
+    with Session(engine) as session:
+        job = Job(type="test_writer", status="running")
+        session.add(job)
+        session.commit()
+        job_id = job.id
+    writer = DbWriter(engine, name="test-writer")
+    gate = threading.Event()
+    # 第一条阻塞写线程，其余写入在队列中积压，随后合为一批
+    blocker = writer.submit(lambda session: gate.wait(5))
+
+    def add_event(n: int):
+        def write(session):
+            row = JobEvent(job_id=job_id, event="progress", data=f'{{"n": {n}}}')
+            session.add(row)
+            session.flush()
+            return row.id
+
+        return write
+
+    def checkpoint(n: int):
+        def write(session):
+            session.get(Job, job_id).checkpoint_json = f'{{"n": {n}}}'
+            return n
+
+        return write
+
+    def broken(session):
+        raise ValueError("坏写入")
+
+    events = [writer.submit(add_event(n)) for n in range(5)]
+    checkpoints = [writer.submit(checkpoint(n), key=("checkpoint", job_id)) for n in range(3)]
+    failed = writer.submit(broken)
+    gate.set()
+    blocker.result(5)
+    ids = [f.result(5) for f in events]
+    assert ids == sorted(ids) and len(set(ids)) == 5
+    assert [f.result(5) for f in checkpoints] == [2, 2, 2]  # 同键只执行最后一个
+    with pytest.raises(ValueError):
+        failed.result(5)  # 出错的那条单独失败，同批其余照常落库
+    assert writer.flush(5)
+    assert _events(job_id) == ["progress"] * 5
+    assert _job(job_id).checkpoint_json == '{"n": 2}'
+
+
+def test_pause_resume_keeps_job_non_terminal(client):
+    """running ↔ paused 只改状态：不收口、不覆盖已结束任务的终态。"""
+    job_id = create_job("echo")
+
+    async def switch() -> list:
+        subscription, _ = subscribe_job(job_id)
+        assert set_job_status(job_id, "paused")
+        assert _job(job_id).status == "paused"
+        assert set_job_status(job_id, "running")
+        assert _job(job_id).status == "running"
+        received = subscription.drain()
+        subscription.close()
+        return [payload.status for _, payload in received]
+
+    # 只有非终态通知，SSE 不会因此关闭
+    assert asyncio.run(switch()) == ["paused", "running"]
+    finish_job(job_id, "done")
+    assert not set_job_status(job_id, "paused")  # 迟到的暂停不覆盖终态
+    assert _job(job_id).status == "done"
+    with pytest.raises(ValueError):
+        set_job_status(job_id, "done")
+
+
+def test_non_cancellable_job_rejects_cancel_and_pause(client):
+    pool = WorkerPool(job_types=["test_blocking"])
+    pool.start()
+    try:
+        job_id = enqueue("test_blocking")
+        _wait(job_id, statuses=("running",))
+        for action in ("cancel", "pause"):
+            resp = client.post(f"/api/jobs/{job_id}/{action}")
+            assert resp.status_code == 400, resp.text
+        assert _job(job_id).status == "running"
+        _release.set()
+        done = _wait(job_id)
+        assert done.status == "done" and '"released": true' in done.result_json
+        assert "cancelled" not in _events(job_id) and "paused" not in _events(job_id)
+    finally:
+        _release.set()
+        pool.stop()
@@ -0,0 +1,303 @@
+"""LLM 客户端测试：请求对冲（自适应阈值 / 预算上限 / 落败方取消）与延迟指标。
+
+- 不发起真实请求：hedged_call 注入假 client 与 call，直接验证调度逻辑。
+- 环境隔离同其他模块：导入 app 前设置 AI_REVIEW_DATA_DIR。
+"""
+import os
+import tempfile
+import threading
+import time
+
+_tmp = tempfile.mkdtemp(prefix="ai-review-test-llm-")
+os.environ.setdefault("AI_REVIEW_DATA_DIR", _tmp)
+os.environ.setdefault("AI_REVIEW_SEGMENTER", "rule")
+
+import pytest  # noqa: E402
+
+from app.llm.client import (  # noqa: E402
+    _HEDGE_MIN_SAMPLES,
+    EndpointStats,
+    _percentile,
+    hedged_call,
+)
+
+
+class FakeClient:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.closed = threading.Event()
+
+    def close(self) -> None:
+        self.closed.set()
+
+
+def _warm(stats: EndpointStats, seconds: float, n: int = _HEDGE_MIN_SAMPLES) -> None:
+    for _ in range(n):
+        stats.record(seconds, hedging=False)
+
+
+def test_percentile_nearest_rank():
+    samples = [float(i) for i in range(1, 101)]
+    assert _percentile(samples, 50) == 50.0
+    assert _percentile(samples, 90) == 90.0
+    assert _percentile(samples, 99) == 99.0
+    assert _percentile([], 90) is None
+
+
+def test_no_hedge_without_samples_or_disabled():
+    stats = EndpointStats()
+    made: list[FakeClient] = []
+
+    def make():
+        made.append(FakeClient(f"c{len(made)}"))
+        return made[-1]
+
+    assert hedged_call(lambda c: c.name, make, stats, enabled=True, percentile=90, budget=0.5) == "c0"
+    _warm(stats, 0.001)
+    assert hedged_call(lambda c: c.name, make, stats, enabled=False, percentile=90, budget=0.5) == "c1"
+    assert len(made) == 2 and stats.hedged == 0
+    assert all(c.closed.is_set() for c in made)
+
+
+def test_straggler_is_hedged_and_loser_cancelled():
+    stats = EndpointStats()
+    _warm(stats, 0.01, n=40)  # 阈值 ≈ 10ms，预算 0.5 × 40 次调用
+    made: list[FakeClient] = []
+
+    def make():
+        made.append(FakeClient(f"c{len(made)}"))
+        return made[-1]
+
+    def call(client: FakeClient) -> str:
+        if client.name == "c0":  # 首发成为掉队者：直到被关闭才返回（模拟中止在途请求）
+            client.closed.wait(5)
+            raise ConnectionError("aborted")
+        time.sleep(0.02)
+        return client.name
+
+    started = time.monotonic()
+    assert hedged_call(call, make, stats, enabled=True, percentile=90, budget=0.5) == "c1"
+    assert time.monotonic() - started < 1.0
+    assert made[0].closed.is_set()  # 落败方客户端已关闭
+    assert stats.hedged == 1 and stats.hedge_wins == 1
+
+
+def test_hedge_budget_caps_duplicates():
+    stats = EndpointStats()
+    _warm(stats, 0.001)
+    # budget=0 → 永不对冲，掉队者照常等待首发完成
+    calls = []
+
+    def call(client: FakeClient) -> str:
+        calls.append(client.name)
+        time.sleep(0.03)
+        return client.name
+
+    made = iter(FakeClient(f"c{i}") for i in range(10))
+    assert hedged_call(call, lambda: next(made), stats, enabled=True, percentile=90, budget=0.0) == "c0"
+    assert calls == ["c0"] and stats.hedged == 0
+    # budget=0.05 且已有 21 次调用 → 允许 1 次对冲，第 2 次超出预算
+    assert stats.try_acquire_hedge(0.05) is True
+    assert stats.try_acquire_hedge(0.05) is False
+
+
+def test_primary_runs_in_caller_thread_and_loser_usage_reported():
+    stats = EndpointStats()
+    _warm(stats, 0.01, n=40)
+    made: list[FakeClient] = []
+    threads: dict[str, str] = {}
+    discarded: list = []
+
+    def make():
+        made.append(FakeClient(f"c{len(made)}"))
+        return made[-1]
+
+    def call(client: FakeClient) -> str:
+        threads[client.name] = threading.current_thread().name
+        if client.name == "c0":
+            client.closed.wait(5)
+            raise ConnectionError("aborted")
+        return client.name
+
+    result = hedged_call(
+        call, make, stats, enabled=True, percentile=90, budget=0.5, on_discard=discarded.append
+    )
+    assert result == "c1"
+    assert threads["c0"] == threading.current_thread().name  # 首发不经线程池
+    assert threads["c1"].startswith("llm-hedge")
+    assert discarded == [None]  # 首发被中止：按 prompt 估算计量
+
+
+def test_failures_recorded_with_and_without_hedging():
+    def call(client: FakeClient) -> str:
+        raise ValueError(client.name)
+
+    stats = EndpointStats()  # 样本不足：不对冲路径
+    with pytest.raises(ValueError):
+        hedged_call(call, lambda: FakeClient("c0"), stats, enabled=True, percentile=90, budget=1.0)
+    assert stats.calls == 1
+
+    _warm(stats, 0.001)
+    made = iter(FakeClient(f"c{i}") for i in range(10))
+    with pytest.raises(ValueError):
+        hedged_call(call, lambda: next(made), stats, enabled=True, percentile=90, budget=1.0)
+    assert stats.calls == _HEDGE_MIN_SAMPLES + 2
+
+
+def test_record_discarded_meters_tokens_without_calls():
+    from app.llm.usage import UsageMeter, metering, record_discarded
+
+    meter = UsageMeter()
+    with metering(meter):
+        record_discarded({"prompt_tokens": 120, "completion_tokens": 30}, prompt_text="x")
+        record_discarded(None, prompt_text="检索问题")  # 被中止：按 prompt 估算
+    usage = meter.snapshot()
+    assert usage["calls"] == 0
+    assert usage["prompt_tokens"] == 124 and usage["completion_tokens"] == 30
+
+    # 补发自身失败（首发随后胜出）：不上报落败方，避免按 prompt 估算重复计费
+    stats = EndpointStats()
+    _warm(stats, 0.01, n=40)
+    made = iter(FakeClient(f"c{i}") for i in range(10))
+    discarded: list = []
+
+    def call(client: FakeClient) -> str:
+        if client.name == "c1":
+            raise ConnectionError("上游 502")
+        time.sleep(0.1)
+        return client.name
+
+    def on_discard(loser) -> None:
+        discarded.append(loser)
+        record_discarded(loser, prompt_text="检索问题")
+
+    with metering(meter):
+        result = hedged_call(
+            call, lambda: next(made), stats, enabled=True, percentile=90, budget=0.5,
+            on_discard=on_discard,
+        )
+    assert result == "c0" and stats.hedged == 1
+    assert discarded == [] and meter.snapshot() == usage
+
+
+def test_both_attempts_fail_raises_primary_error():
+    stats = EndpointStats()
+    _warm(stats, 0.001)
+    made = iter(FakeClient(f"c{i}") for i in range(10))
+
+    def call(client: FakeClient) -> str:
+        time.sleep(0.02)
+        raise ValueError(client.name)
+
+    with pytest.raises(ValueError, match="c0"):
+        hedged_call(call, lambda: next(made), stats, enabled=True, percentile=90, budget=1.0)
+
+
+def test_metrics_snapshot_before_after():
+    stats = EndpointStats()
+    _warm(stats, 0.2)
+    stats.record(6.0, hedging=False)  # 对冲关闭期间的掉队者
+    for _ in range(10):
+        stats.record(0.3, hedging=True, hedge_won=True)
+    snap = stats.snapshot()
+    assert snap["calls"] == _HEDGE_MIN_SAMPLES + 11
+    assert snap["hedge_wins"] == 10
+    assert snap["before_ms"]["p99"] == 6000  # 对冲前尾延迟
+    assert snap["after_ms"]["p99"] == 300  # 对冲后尾延迟
+    assert snap["threshold_ms"] is not None
+
+
+def test_cancel_aborts_in_flight_request(monkeypatch):
+    from app.core.jobcontrol import JobCancelled, job_control, register
+    from app.llm import client as llm_client
+
+    class BlockingClient(FakeClient):
+        def __init__(self) -> None:
+            super().__init__("blocking")
+            self.chat = self
+            self.completions = self
+
+        def create(self, **kwargs):
+            self.closed.wait(5)  # 直到客户端被关闭（模拟中止在途 HTTP 请求）
+            raise ConnectionError("connection closed")
+
+    made: list[BlockingClient] = []
+
+    def make_client(cfg):
+        made.append(BlockingClient())
+        return made[-1]
+
+    monkeypatch.setattr(llm_client, "_checked_config", lambda: {"base_url": "http://x", "api_key": "k", "model": "m"})
+    monkeypatch.setattr(llm_client, "_make_client", make_client)
+    # 本模块不建库：对冲设置直接给定，避免读 settings 表
+    monkeypatch.setattr(llm_client, "llm_hedge_enabled", lambda: False)
+    monkeypatch.setattr(llm_client, "llm_hedge_percentile", lambda: 90)
+    monkeypatch.setattr(llm_client, "llm_hedge_budget", lambda: 0.1)
+    control = register("job-cancel-test")
+    outcome: dict = {}
+
+    def run() -> None:
+        with job_control(control):
+            try:
+                llm_client.chat_json("sys", "user")
+            except Exception as exc:  # noqa: BLE001
+                outcome["exc"] = exc
+
+    worker = threading.Thread(target=run)
+    worker.start()
+    deadline = time.monotonic() + 2
+    while not made and time.monotonic() < deadline:
+        time.sleep(0.01)
+    started = time.monotonic()
+    control.cancel()
+    worker.join(3)
+    assert not worker.is_alive() and time.monotonic() - started < 1.0  # 不走 tenacity 退避重试
+    assert isinstance(outcome.get("exc"), JobCancelled)
+    assert len(made) == 1 and made[0].closed.is_set()
+
+
+def test_failed_attempts_metered(monkeypatch):
+    from tenacity import wait_none
+
+    from app.llm import client as llm_client
+    from app.llm.usage import UsageMeter, estimate_tokens, metering
+
+    class FlakyClient(FakeClient):
+        def __init__(self) -> None:
+            super().__init__("flaky")
+            self.chat = self
+            self.completions = self
+
+        def create(self, **kwargs):
+            if "response_format" in kwargs or broken["all"]:  # JSON 模式超时，降级普通模式成功
+                raise TimeoutError("read timeout")
+            message = type("Message", (), {"content": '{"ok": true}'})
+            choice = type("Choice", (), {"message": message})
+            usage = {"prompt_tokens": 50, "completion_tokens": 5}
+            return type("Response", (), {"choices": [choice], "usage": usage})
+
+    broken = {"all": False}
+    cfg = {"base_url": "http://x", "api_key": "k", "model": "m"}
+    monkeypatch.setattr(llm_client, "_checked_config", lambda: cfg)
+    monkeypatch.setattr(llm_client, "_make_client", lambda cfg: FlakyClient())
+    monkeypatch.setattr(llm_client, "llm_hedge_enabled", lambda: False)
+    monkeypatch.setattr(llm_client, "llm_hedge_percentile", lambda: 90)
+    monkeypatch.setattr(llm_client, "llm_hedge_budget", lambda: 0.1)
+    monkeypatch.setattr(llm_client._chat_once.retry, "wait", wait_none())
+    estimated = estimate_tokens("sys" + "user")
+
+    meter = UsageMeter()
+    with metering(meter):
+        assert llm_client.chat_json("sys", "user") == {"ok": True}
+    usage = meter.snapshot()
+    assert usage["calls"] == 1 and usage["retries"] == 3 and usage["failed_attempts"] == 3
+    assert usage["prompt_tokens"] == 50 + 3 * estimated and usage["completion_tokens"] == 5
+
+    # 全部失败：不记 calls，每次尝试的 prompt 费用仍计入
+    broken["all"] = True
+    meter = UsageMeter()
+    with metering(meter), pytest.raises(TimeoutError):
+        llm_client.chat_json("sys", "user")
+    usage = meter.snapshot()
+    assert usage["calls"] == 0 and usage["failed_attempts"] == 6
+    assert usage["prompt_tokens"] == 6 * estimated
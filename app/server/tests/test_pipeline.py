@@ -5,6 +5,7 @@
 import os
 import re
 import tempfile
+import time
 from pathlib import Path
 
 # 在导入 app 之前隔离数据目录与分句器后端，避免污染 dev 数据 / 触发模型下载
@@ -18,7 +19,15 @@ from fastapi.testclient import TestClient  # noqa: E402
 
 from app.core.config import get_settings  # noqa: E402
 from app.main import app  # noqa: E402
-from app.pipeline.segment import SentenceSplitter, merge_short_sentences  # noqa: E402
+from app.core.dbwriter import writer  # noqa: E402
+from app.pipeline.ingest import _stream_document  # noqa: E402
+from app.pipeline.segment import (  # noqa: E402
+    SentenceSplitter,
+    iter_blocks,
+    merge_short_sentences,
+)
+from app.pipeline.segment_cache import SegmentCache  # noqa: E402
+from conftest import job_result  # noqa: E402
 
 # 注意：与其他测试模块同跑时，引擎绑定的是首个导入模块设置的数据目录；
 # 因此文件路径断言一律以 get_settings().data_dir 为准，不用本模块的 _tmp。
@@ -84,6 +93,93 @@ def test_rule_splitter_and_merge() -> None:
     assert merged2 == ["好。这是一个足够长的正常句子。"]
 
 
+class _BatchRecordingSat:
+    """SaT 替身：列表输入时记录批次，按正则分句返回（与逐行分句结果可比）。"""
+
+    def __init__(self) -> None:
+        self.batches: list[tuple[int, int, int]] = []
+
+    def split(self, text_or_texts, batch_size: int = 32, stride: int = 64, **_):
+        if isinstance(text_or_texts, str):
+            return SentenceSplitter._rule_split(text_or_texts)
+        self.batches.append((len(text_or_texts), batch_size, stride))
+        return iter([SentenceSplitter._rule_split(t) for t in text_or_texts])
+
+
+def test_batched_split_keeps_blocks() -> None:
+    text = "\n".join(
+        [
+            "# 一、病例资料",
+            "患者男性，五十六岁。因反复胸闷气短三个月入院治疗。",
+            "入院后完善相关检查。嗯。血常规提示白细胞计数轻度升高。",
+            "[{表格不予审校_1}]",
+            "二、诊疗经过",
+            "",
+            "给予抗感染、化痰及对症支持治疗十天左右；复查胸部CT未见明显异常改变。",
+            "[1]: 张三. 中华医学杂志, 2020, 100(1): 1-5.",
+            "[2]: 李四. 中国实用内科杂志, 2021, 41(2): 100-103.",
+            "患者恢复良好，予以出院，嘱定期门诊随访复查。",
+        ]
+    )
+    # 基准：逐行分句（window=1，每个正文段落单独调用一次；AI_REVIEW_SEGMENTER=rule 走正则）
+    expected = list(iter_blocks(text, SentenceSplitter(), 10, window=1))
+    batched = SentenceSplitter()
+    batched._sat, batched.backend = _BatchRecordingSat(), "sat"
+
+    # 整篇：全部 4 个正文段落一次批量调用，分块与逐行分句一致
+    assert list(iter_blocks(text, batched, 10, batch_size=8, stride=32)) == expected
+    assert batched._sat.batches == [(4, 8, 32)]
+    # 流式 window=3：按 3 段攒批，结果不变
+    batched._sat.batches.clear()
+    assert list(iter_blocks(text, batched, 10, window=3, processes=4)) == expected
+    assert [n for n, _, _ in batched._sat.batches] == [3, 1]
+
+
+def test_segment_cache_lookup_and_lru(client: TestClient) -> None:
+    cache = SegmentCache("rule", "regex", 10, limit=2)
+    cache.store({"甲段落。": ["甲段落。"], "乙段落。": ["乙段落。"]})
+    writer.flush()
+    assert cache.lookup(["甲段落。", "丙段落。", "甲段落。"]) == {"甲段落。": ["甲段落。"]}
+    assert cache.stats() == {"hits": 2, "misses": 1, "hit_rate": 0.6667}
+    # 阈值不同即不同的键
+    assert SegmentCache("rule", "regex", 12, limit=2).lookup(["甲段落。"]) == {}
+
+    time.sleep(0.01)
+    cache.store({"丙段落。": ["丙段落。"]})
+    cache.finish()  # 上限 2：淘汰最久未用的「乙」（「甲」刚被命中刷新）
+    writer.flush()
+    assert set(cache.lookup(["甲段落。", "乙段落。", "丙段落。"])) == {"甲段落。", "丙段落。"}
+
+
+def test_stream_ingest_matches_python_docx(docx_path: Path, tmp_path: Path) -> None:
+    """单遍流式 ingest：parsed.md 与 python-docx 逐段读取 no_table.docx 逐字节一致，表格移入 tables.docx。"""
+    source = DocxDocument(str(docx_path))
+    para = source.add_paragraph("制表\t后的文本")
+    para.add_run().add_break()
+    para.add_run("换行后的文本  ")
+    source.add_paragraph("")
+    source.add_heading("  三、随访  ", level=3)
+    original = tmp_path / "original.docx"
+    source.save(str(original))
+
+    removed, tables, markdown = _stream_document(
+        original, tmp_path / "tables.docx", tmp_path / "no_table.docx", True
+    )
+    assert removed and tables == 1
+    assert len(DocxDocument(str(tmp_path / "tables.docx")).tables) == 1
+
+    no_table = DocxDocument(str(tmp_path / "no_table.docx"))
+    assert not no_table.tables
+    expected = []
+    for p in no_table.paragraphs:
+        match = re.match(r"(?i)^\s*(heading|标题)\s*([1-3])\s*$", p.style.name or "")
+        text = p.text.rstrip()
+        expected.append("#" * int(match.group(2)) + " " + text.strip() if match and text else text)
+    assert markdown == "\n".join(expected).strip("\n") + "\n"
+    assert "制表\t后的文本\n换行后的文本" in markdown
+    assert "### 三、随访" in markdown and "[{表格不予审校_1}]" in markdown
+
+
 def test_upload_run_detail_flow(client: TestClient, docx_path: Path) -> None:
     # 1. 上传
     with docx_path.open("rb") as f:
@@ -100,9 +196,7 @@ def test_upload_run_detail_flow(client: TestClient, docx_path: Path) -> None:
     assert any(d["id"] == doc_id for d in listing.json())
 
     # 2. 运行流水线（ingest + segment）
-    run = client.post(f"/api/documents/{doc_id}/run")
-    assert run.status_code == 200, run.text
-    result = run.json()
+    result = job_result(client, client.post(f"/api/documents/{doc_id}/run"))
     assert result["status"] == "segmented"
     assert result["segmenter"] == "rule"
     assert result["blocks"] > 0 and result["sentences"] > 0
@@ -156,15 +250,28 @@ def test_upload_run_detail_flow(client: TestClient, docx_path: Path) -> None:
         assert len(text) >= 10 or allowed_short, f"发现未合并的短碎片句: {text!r}"
 
     # 4. 可重复运行：重跑后 blocks/sentences 不翻倍
-    rerun = client.post(f"/api/documents/{doc_id}/run")
-    assert rerun.status_code == 200
-    assert rerun.json()["blocks"] == result["blocks"]
-    assert rerun.json()["sentences"] == result["sentences"]
+    rerun = job_result(client, client.post(f"/api/documents/{doc_id}/run"))
+    assert rerun["blocks"] == result["blocks"]
+    assert rerun["sentences"] == result["sentences"]
+    # 段落级分句缓存：未改动的稿件重跑全部命中
+    assert rerun["cache"]["misses"] == 0 and rerun["cache"]["hit_rate"] == 1.0
+    # 重新分句为增量更新：稿件未变，句子与块全部保留；变更流只留一条 blocks_added
+    assert rerun["delta"] == {
+        "kept": result["sentences"],
+        "inserted": 0,
+        "removed": 0,
+        "blocks_reused": result["blocks"],
+    }
+    changes = client.get(f"/api/documents/{doc_id}/changes").json()["changes"]
+    assert changes[0]["kind"] == "blocks_added"
+    assert changes[0]["data"] == {
+        "blocks": rerun["blocks"], "sentences": rerun["sentences"], **rerun["delta"]
+    }
+    assert not {"block_added", "blocks_cleared"} & {c["kind"] for c in changes}
 
     # 5. has_review_table=N 时保留全部表格 → 2 个占位符
     assert client.put("/api/settings", json={"docx.has_review_table": "N"}).status_code == 200
-    rerun2 = client.post(f"/api/documents/{doc_id}/run")
-    assert rerun2.status_code == 200
+    job_result(client, client.post(f"/api/documents/{doc_id}/run"))
     parsed2 = client.get(f"/api/documents/{doc_id}/parsed")
     assert "[{表格不予审校_1}]" in parsed2.text
     assert "[{表格不予审校_2}]" in parsed2.text
@@ -24,6 +24,7 @@ from app.main import app  # noqa: E402
 from app.rag import store  # noqa: E402
 from app.rag.index import chunk_id, load_kb_file, split_chunks  # noqa: E402
 from app.rag.retrieve import rrf_fuse  # noqa: E402
+from conftest import job_result  # noqa: E402
 
 DATA_DIR = get_settings().data_dir
 
@@ -196,7 +197,7 @@ def test_retrieve_guards(client: TestClient, docx_path: Path) -> None:
     assert resp.status_code == 400 and "解析分句" in resp.json()["detail"]
     # 开关守卫
     assert client.put("/api/settings", json={"retrieve.enabled": False}).status_code == 200
-    assert client.post(f"/api/documents/{doc_id}/run").status_code == 200
+    job_result(client, client.post(f"/api/documents/{doc_id}/run"))
     resp = client.post(f"/api/documents/{doc_id}/retrieve")
     assert resp.status_code == 400 and "关闭" in resp.json()["detail"]
     assert client.put("/api/settings", json={"retrieve.enabled": True}).status_code == 200
@@ -256,7 +257,7 @@ def test_retrieve_full_flow(client: TestClient, docx_path: Path, monkeypatch) ->
     with docx_path.open("rb") as f:
         doc = client.post("/api/documents", files={"file": ("medical2.docx", f, DOCX_MIME)}).json()
     doc_id = doc["id"]
-    assert client.post(f"/api/documents/{doc_id}/run").status_code == 200
+    job_result(client, client.post(f"/api/documents/{doc_id}/run"))
 
     # mock LLM：固定返回 3 个重写问题（原句由 rewrite_queries 强制置首）
     def fake_chat_json(system, user, schema_hint=None):
@@ -269,9 +270,7 @@ def test_retrieve_full_flow(client: TestClient, docx_path: Path, monkeypatch) ->
         }
 
     monkeypatch.setattr("app.rag.retrieve.chat_json", fake_chat_json)
-    resp = client.post(f"/api/documents/{doc_id}/retrieve")
-    assert resp.status_code == 200, resp.text
-    result = resp.json()
+    result = job_result(client, client.post(f"/api/documents/{doc_id}/retrieve"))
     assert result["status"] == "retrieved"
     assert result["sentences"] > 0
     assert result["evidence"] > 0
@@ -325,9 +324,8 @@ def test_retrieve_full_flow(client: TestClient, docx_path: Path, monkeypatch) ->
         raise LLMNotConfiguredError("未配置 LLM API Key")
 
     monkeypatch.setattr("app.rag.retrieve.chat_json", raise_not_configured)
-    resp2 = client.post(f"/api/documents/{doc_id}/retrieve")
-    assert resp2.status_code == 200, resp2.text
-    assert resp2.json()["rewritten"] == 0
+    resp2 = job_result(client, client.post(f"/api/documents/{doc_id}/retrieve"))
+    assert resp2["rewritten"] == 0
     data2 = client.get(f"/api/documents/{doc_id}/evidence").json()
     normal2 = [
         s for b in data2["blocks"] if not b["is_reference"] for s in b["sentences"] if not s["skipped"]
@@ -340,5 +338,71 @@ def test_retrieve_full_flow(client: TestClient, docx_path: Path, monkeypatch) ->
     assert client.delete(f"/api/kb/documents/{row1['id']}").status_code == 200
 
 
+def test_retrieve_resume_after_restart(client: TestClient, docx_path: Path, monkeypatch) -> None:
+    from sqlalchemy import delete
+    from sqlmodel import Session, select
+
+    from app.core.db import engine
+    from app.core.joblog import create_job
+    from app.main import _sweep_interrupted_state
+    from app.models import Block, Document, Evidence, Query, Sentence
+
+    row = _upload_kb(client, "指南-续检.txt", KB_TEXT.encode("utf-8"))
+    with docx_path.open("rb") as f:
+        doc_id = client.post("/api/documents", files={"file": ("medical3.docx", f, DOCX_MIME)}).json()["id"]
+    job_result(client, client.post(f"/api/documents/{doc_id}/run"))
+    rewrites: list[str] = []
+
+    def fake_chat_json(system, user, schema_hint=None):
+        rewrites.append(user)
+        return {"questions": ["高血压的诊断标准是什么？"]}
+
+    monkeypatch.setattr("app.rag.retrieve.chat_json", fake_chat_json)
+    first = job_result(client, client.post(f"/api/documents/{doc_id}/retrieve"))
+    assert first["sentences"] >= 2
+
+    # 模拟检索到最后一句时进程退出：最后一句无检查点（queries），任务 running、文档 retrieving
+    with Session(engine) as session:
+        last = session.exec(
+            select(Sentence)
+            .join(Block, Sentence.block_id == Block.id)
+            .join(Query, Query.sentence_id == Sentence.id)
+            .where(Block.document_id == doc_id)
+            .order_by(Block.idx.desc(), Sentence.idx.desc())
+        ).first()
+        session.exec(delete(Query).where(Query.sentence_id == last.id))
+        session.exec(delete(Evidence).where(Evidence.sentence_id == last.id))
+        doc = session.get(Document, doc_id)
+        doc.status = "retrieving"
+        session.add(doc)
+        session.commit()
+        last_text = last.text
+    create_job("retrieve", document_id=doc_id, params={"resume": False})
+    _sweep_interrupted_state()
+    with Session(engine) as session:
+        assert session.get(Document, doc_id).status == "interrupted"
+
+    rewrites.clear()
+    resp = client.post(f"/api/documents/{doc_id}/resume")
+    assert resp.status_code == 200, resp.text
+    result = job_result(client, resp)
+    assert result["status"] == "retrieved"
+    assert result["resumed"] == first["sentences"] - 1 and result["sentences"] == first["sentences"]
+    assert len(rewrites) == 1 and last_text in rewrites[0]  # 只补检未完成的句子
+
+    # 重新分句（稿件未变）保留句子与证据；增量检索无句可补
+    job_result(client, client.post(f"/api/documents/{doc_id}/run"))
+    rewrites.clear()
+    again = job_result(
+        client, client.post(f"/api/documents/{doc_id}/retrieve", params={"incremental": True})
+    )
+    assert again["resumed"] == first["sentences"] and rewrites == []
+    with Session(engine) as session:
+        assert session.exec(select(Evidence.id).where(Evidence.document_id == doc_id)).first()
+
+    assert client.delete(f"/api/documents/{doc_id}").status_code == 200
+    assert client.delete(f"/api/kb/documents/{row['id']}").status_code == 200
+
+
 def test_job_events_404(client: TestClient) -> None:
     assert client.get("/api/jobs/nonexistent-job/events").status_code == 404
@@ -23,12 +23,17 @@ from app.core.db import engine  # noqa: E402
 from app.main import app  # noqa: E402
 from app.models import Block, Correction, Document, Evidence, Sentence  # noqa: E402
 from app.pipeline import review as review_mod  # noqa: E402
+from app.pipeline.common import project_dir  # noqa: E402
+from app.pipeline.segment import _save_blocks, clear_blocks, segment_document  # noqa: E402
+from app.pipeline.snapshot import EvidenceSnap, SentenceSnap  # noqa: E402
+from app.pipeline.stats import pending_count  # noqa: E402
 
 DUMMY_LLM_SETTINGS = {
     "llm.base_url": "http://127.0.0.1:9/v1",  # 永不可达，但 chat_json 已被 mock
     "llm.api_key": "sk-test",
     "llm.model": "test-model",
 }
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
 
 
 @pytest.fixture(scope="module")
@@ -62,12 +67,13 @@ def seed_document(
             session.add(block)
             session.flush()
             for s_idx, text in enumerate(spec["sentences"]):
-                sentence = Sentence(block_id=block.id, idx=s_idx, text=text)
+                sentence = Sentence(document_id=doc.id, block_id=block.id, idx=s_idx, text=text)
                 session.add(sentence)
                 session.flush()
                 for e_idx, ev in enumerate((evidence or {}).get((b_idx, s_idx), [])):
                     session.add(
                         Evidence(
+                            document_id=doc.id,
                             sentence_id=sentence.id,
                             source=ev.get("source", "vector"),
                             chunk_text=ev["chunk_text"],
@@ -87,17 +93,9 @@ def doc_status(doc_id: str) -> str:
 
 def doc_corrections(doc_id: str) -> list[Correction]:
     with Session(engine) as session:
-        block_ids = [
-            b.id for b in session.exec(select(Block).where(Block.document_id == doc_id)).all()
-        ]
-        sentence_ids = session.exec(
-            select(Sentence.id).where(Sentence.block_id.in_(block_ids))
-        ).all()
         return list(
             session.exec(
-                select(Correction)
-                .where(Correction.sentence_id.in_(sentence_ids))
-                .order_by(Correction.id)
+                select(Correction).where(Correction.document_id == doc_id).order_by(Correction.id)
             ).all()
         )
 
@@ -125,16 +123,19 @@ def run_review(client: TestClient, monkeypatch, doc_id: str, payload, force: boo
 # ---------- prompt 构建 ----------
 
 
-def _numbered(sentences: list[str], evidence_map: dict[int, list[Evidence]] | None = None):
-    """构造 build_user_prompt 入参：[(编号, Sentence, [Evidence])]"""
+def _numbered(sentences: list[str], evidence_map: dict[int, list[EvidenceSnap]] | None = None):
+    """构造 build_user_prompt 入参：[(编号, SentenceSnap, [EvidenceSnap])]"""
     rows = []
     for i, text in enumerate(sentences, start=1):
-        rows.append((i, Sentence(id=i, block_id=1, idx=i - 1, text=text), (evidence_map or {}).get(i, [])))
+        sentence = SentenceSnap(id=i, block_id=1, idx=i - 1, text=text)
+        rows.append((i, sentence, (evidence_map or {}).get(i, [])))
     return rows
 
 
-def _ev(ev_id: int, source: str = "vector", doc_name: str = "高血压指南.pdf", text: str = "证据文本") -> Evidence:
-    return Evidence(
+def _ev(
+    ev_id: int, source: str = "vector", doc_name: str = "高血压指南.pdf", text: str = "证据文本"
+) -> EvidenceSnap:
+    return EvidenceSnap(
         id=ev_id, sentence_id=1, source=source, chunk_text=text, doc_name=doc_name, score=0.5, rank=1
     )
 
@@ -165,6 +166,44 @@ def test_prompt_no_evidence_branch():
     assert "未启用检索或知识库无相关内容" in prompt  # 全块无证据提示
 
 
+def test_prompt_compaction_dedup_trim_budget():
+    shared = "阿司匹林常用剂量每日75至100mg。" + "高血压患者需要长期规律随访。" * 30
+    numbered = _numbered(
+        ["建议每日服用阿司匹林200mg。", "阿司匹林剂量需个体化。", "第三句。"],
+        {
+            1: [_ev(21, "vector", "说明书.pdf", shared), _ev(22, "keyword", "指南.pdf", "出血风险评估。")],
+            2: [_ev(23, "keyword", "说明书.pdf", shared)],  # 同一 chunk 经另一路召回
+        },
+    )
+    compact = review_mod.compact_evidence(numbered, max_chars=60, token_budget=0)
+    assert [c["eid"] for c in compact["chunks"]] == [1, 2]  # 共享 chunk 只列一次
+    first = compact["chunks"][0]
+    assert first["label"] == "向量+关键词"
+    assert first["text"].startswith("阿司匹林常用剂量") and len(first["text"]) <= 61  # 截取相关窗口
+    assert compact["refs"] == {1: [1, 2], 2: [1], 3: []}
+
+    prompt = review_mod.build_user_prompt(numbered, compact)
+    assert prompt.count("阿司匹林常用剂量") == 1
+    assert "[S1] 的证据：E1、E2" in prompt and "[S2] 的证据：E1" in prompt
+    assert "[S3]：无检索证据。" in prompt
+    assert review_mod.estimate_tokens(prompt) < review_mod.uncompacted_prompt_tokens(numbered)
+
+    # evidence_ids：E1 映射回各句自己的 Evidence 行
+    payload = {"corrections": [
+        {"sentence_id": 1, "original": "200mg", "suggestion": "100mg", "evidence_ids": [1, 2]},
+        {"sentence_id": 2, "original": "剂量", "suggestion": "用量", "evidence_ids": [1]},
+    ]}
+    entries = review_mod.parse_corrections(payload, numbered, warn=lambda m: None, compact=compact)
+    assert entries[0]["evidence_ids"] == [21, 22]
+    assert entries[1]["evidence_ids"] == [23]
+
+    # 预算只够一条：保留各句首条证据（共享 chunk），其余省略
+    budget = review_mod.estimate_tokens(first["text"]) + 16  # 恰好容纳共享 chunk（含标签开销）
+    tight = review_mod.compact_evidence(numbered, max_chars=60, token_budget=budget)
+    assert [c["doc_name"] for c in tight["chunks"]] == ["说明书.pdf"]
+    assert tight["refs"] == {1: [1], 2: [1], 3: []} and not tight["omitted"]
+
+
 # ---------- corrections 解析与校验 ----------
 
 
@@ -469,3 +508,786 @@ def test_rerun_force_clears_decided(client: TestClient, monkeypatch):
     remaining = doc_corrections(doc_id)
     assert all(c.id != decided_id for c in remaining)  # force 全清
     assert doc_status(doc_id) == "manual_done"  # 无 pending → manual_done
+
+
+def test_usage_accounting_and_budget_stop(client: TestClient, monkeypatch):
+    from app.llm.usage import record_call
+
+    doc_id = seed_document(
+        blocks=[{"sentences": ["第一段。"]}, {"sentences": ["第二段。"]}, {"sentences": ["第三段。"]}]
+    )
+
+    def fake_chat_json(system, user, schema_hint=None):
+        record_call(
+            {"prompt_tokens": 80, "completion_tokens": 20, "prompt_tokens_details": {"cached_tokens": 64}},
+            0.05,
+        )
+        return {"corrections": []}
+
+    monkeypatch.setattr(review_mod, "chat_json", fake_chat_json)
+    client.put(
+        "/api/settings",
+        json={"budget.document_tokens": 150, "budget.action": "stop", "review.pack_tokens": 0,
+              "review.concurrency": 1},  # 串行：预算在每次提交前已计入上一块用量
+    )
+    try:
+        resp = client.post(f"/api/documents/{doc_id}/review")
+        job_id = resp.json()["job_id"]
+        assert wait_job(client, job_id) == "done"
+    finally:
+        client.put(
+            "/api/settings",
+            json={"budget.document_tokens": 0, "review.pack_tokens": 1500, "review.concurrency": 4},
+        )
+
+    usage = client.get(f"/api/jobs/{job_id}").json()["usage"]
+    # 第 1 块后 100 < 150 继续；第 2 块后 200 ≥ 150 → 第 3 块停止
+    assert usage["calls"] == 2 and usage["total_tokens"] == 200
+    assert usage["cached_tokens"] == 128 and usage["cache_hits"] == 2
+    assert usage["by_stage"]["review"]["calls"] == 2
+    with Session(engine) as session:
+        doc = session.get(Document, doc_id)
+        assert json.loads(doc.usage_json)["total_tokens"] == 200
+    assert client.get(f"/api/documents/{doc_id}/detail").json()["usage"]["calls"] == 2
+
+
+def _job_events(job_id: str) -> list[tuple[str, dict]]:
+    from app.models import JobEvent
+
+    with Session(engine) as session:
+        rows = session.exec(
+            select(JobEvent).where(JobEvent.job_id == job_id).order_by(JobEvent.id)
+        ).all()
+        return [(r.event, json.loads(r.data or "{}")) for r in rows]
+
+
+def test_concurrent_review_ordered_persistence(client: TestClient, monkeypatch):
+    texts = [f"第{i}段内容足够长。" for i in range(6)]
+    doc_id = seed_document(blocks=[{"sentences": [t]} for t in texts])
+    systems: list[str] = []
+    prompt_reads = iter(f"审校提示词 v{n}" for n in range(100))
+
+    def fake_chat_json(system, user, schema_hint=None):
+        systems.append(system)
+        idx = next(i for i, t in enumerate(texts) if t in user)
+        time.sleep(0.3 if idx % 2 == 0 else 0.05)  # 乱序完成
+        return {"corrections": [{"sentence_id": 1, "original": f"第{idx}段", "suggestion": "改"}]}
+
+    monkeypatch.setattr(review_mod, "chat_json", fake_chat_json)
+    # 每次读取设置得到不同的 prompt（模拟运行中改设置）：本轮只读一次，与块指纹一致
+    monkeypatch.setattr(review_mod, "review_prompt", lambda: next(prompt_reads))
+    client.put("/api/settings", json={"review.concurrency": 3, "review.pack_tokens": 0})
+    try:
+        started = time.monotonic()
+        job_id = client.post(f"/api/documents/{doc_id}/review").json()["job_id"]
+        assert wait_job(client, job_id) == "done"
+        elapsed = time.monotonic() - started
+    finally:
+        client.put("/api/settings", json={"review.concurrency": 4, "review.pack_tokens": 1500})
+
+    assert elapsed < 6 * 0.3  # 串行至少 3 × 0.3 + 3 × 0.05
+    # corrections 按 block 顺序提交（id 递增 ↔ 块序）
+    assert [c.original for c in doc_corrections(doc_id)] == [f"第{i}段" for i in range(6)]
+    progress = [d["block_idx"] for e, d in _job_events(job_id) if e == "progress"]
+    assert progress == list(range(6))
+    assert systems == ["审校提示词 v0"] * 6
+
+
+def test_concurrent_review_failure_marks_failed(client: TestClient, monkeypatch):
+    texts = [f"第{i}段内容足够长。" for i in range(5)]
+    doc_id = seed_document(blocks=[{"sentences": [t]} for t in texts])
+
+    def fake_chat_json(system, user, schema_hint=None):
+        from app.llm.usage import record_call
+
+        if texts[2] in user:
+            time.sleep(0.1)  # 其后的块均已提交
+            raise RuntimeError("上游 500")
+        if texts[3] in user or texts[4] in user:
+            time.sleep(0.4)  # 失败时仍在途
+        record_call({"prompt_tokens": 10, "completion_tokens": 5}, 0.01)
+        return {"corrections": [{"sentence_id": 1, "original": "段", "suggestion": "改"}]}
+
+    monkeypatch.setattr(review_mod, "chat_json", fake_chat_json)
+    client.put("/api/settings", json={"review.pack_tokens": 0})
+    try:
+        job_id = client.post(f"/api/documents/{doc_id}/review").json()["job_id"]
+        assert wait_job(client, job_id) == "error"
+    finally:
+        client.put("/api/settings", json={"review.pack_tokens": 1500})
+    assert doc_status(doc_id) == "failed"
+    assert len(doc_corrections(doc_id)) == 2  # 失败块之前的块已落库，之后的不落库
+    # 在途请求在 error 事件之前结束并计量（结果丢弃）
+    error = next(d for e, d in _job_events(job_id) if e == "error")
+    assert error["usage"]["calls"] == 4 and error["usage"]["total_tokens"] == 60
+
+
+def test_small_blocks_packed_into_one_request(client: TestClient, monkeypatch):
+    doc_id = seed_document(
+        blocks=[
+            {"chapter": "一、病例", "sentences": ["一、病例"]},
+            {"sentences": ["患者血压控制良好。", "建议每日服用阿司匹林200mg。"]},
+            {"sentences": ["[1]: 参考文献。"], "is_reference": True},  # 跳过块切断打包
+            {"sentences": ["随访三个月无复发。"]},
+        ]
+    )
+    prompts: list[str] = []
+
+    def fake_chat_json(system, user, schema_hint=None):
+        prompts.append(user)
+        if "[S3]" in user:  # 块 0 + 块 1 合并：S1 = 标题，S2/S3 = 块 1 两句
+            return {"corrections": [
+                {"sentence_id": 3, "original": "200mg", "suggestion": "100mg"},
+                {"sentence_id": 1, "original": "病例", "suggestion": "病历"},
+            ]}
+        return {"corrections": [{"sentence_id": 1, "original": "三个月", "suggestion": "3 个月"}]}
+
+    monkeypatch.setattr(review_mod, "chat_json", fake_chat_json)
+    job_id = client.post(f"/api/documents/{doc_id}/review").json()["job_id"]
+    assert wait_job(client, job_id) == "done"
+
+    assert len(prompts) == 2
+    packed = next(p for p in prompts if "[S3]" in p)  # 两个请求并发在途，调用顺序不定
+    assert "[S2] 患者血压控制良好。" in packed and "[S1] 一、病例" in packed
+    with Session(engine) as session:
+        by_original = {
+            c.original: session.get(Sentence, c.sentence_id).text for c in doc_corrections(doc_id)
+        }
+    assert by_original == {
+        "200mg": "建议每日服用阿司匹林200mg。",
+        "病例": "一、病例",
+        "三个月": "随访三个月无复发。",
+    }
+    events = _job_events(job_id)
+    assert [d["block_idx"] for e, d in events if e == "progress"] == [0, 1, 2, 3]
+    done = next(d for e, d in events if e == "done")
+    assert done["requests"] == 2 and done["blocks_reviewed"] == 3
+
+
+def test_incremental_review_reuses_unchanged_blocks(client: TestClient, monkeypatch):
+    doc_id = seed_document(
+        blocks=[{"sentences": ["第一块句子足够长。"]}, {"sentences": ["第二块句子足够长。"]}],
+        evidence={(1, 0): [{"source": "vector", "chunk_text": "旧证据。", "doc_name": "a.pdf", "score": 0.9, "rank": 1}]},
+    )
+    calls: list[str] = []
+
+    def fake_chat_json(system, user, schema_hint=None):
+        calls.append(user)
+        return {"corrections": [{"sentence_id": 1, "original": "句子", "suggestion": f"语句{len(calls)}"}]}
+
+    monkeypatch.setattr(review_mod, "chat_json", fake_chat_json)
+    client.put("/api/settings", json={"review.pack_tokens": 0, "review.concurrency": 1})
+    try:
+        first = client.post(f"/api/documents/{doc_id}/review").json()["job_id"]
+        assert wait_job(client, first) == "done" and len(calls) == 2
+        before = [(c.id, c.suggestion) for c in doc_corrections(doc_id)]
+
+        # 输入未变（force 亦然）：全部复用，不再调用 LLM，原 pending 保留
+        calls.clear()
+        again = client.post(f"/api/documents/{doc_id}/review", params={"force": "true"}).json()["job_id"]
+        assert wait_job(client, again) == "done" and calls == []
+        done = next(d for e, d in _job_events(again) if e == "done")
+        assert done["blocks_reused"] == 2 and done["blocks_reviewed"] == 0
+        assert [(c.id, c.suggestion) for c in doc_corrections(doc_id)] == before
+
+        # 第二块证据变化（重新检索）：只重审该块
+        with Session(engine) as session:
+            ev = session.exec(select(Evidence).where(Evidence.chunk_text == "旧证据。")).one()
+            ev.chunk_text = "新证据。"
+            session.add(ev)
+            session.commit()
+        calls.clear()
+        third = client.post(f"/api/documents/{doc_id}/review").json()["job_id"]
+        assert wait_job(client, third) == "done"
+        assert len(calls) == 1 and "第二块" in calls[0]
+        done = next(d for e, d in _job_events(third) if e == "done")
+        assert done["blocks_reused"] == 1 and done["blocks_reviewed"] == 1
+        after = [(c.id, c.suggestion) for c in doc_corrections(doc_id)]
+        assert after[0] == before[0] and after[1][1] == "语句1" and len(after) == 2  # 第二块为新结果
+    finally:
+        client.put("/api/settings", json={"review.pack_tokens": 1500, "review.concurrency": 4})
+
+
+def test_interrupted_review_resumes_from_checkpoint(client: TestClient, monkeypatch):
+    from app.core.joblog import create_job, make_emit
+    from app.main import _sweep_interrupted_state
+    from app.models import Job
+
+    doc_id = seed_document(blocks=[{"sentences": [f"第{i}块句子足够长。"]} for i in range(3)])
+    calls: list[str] = []
+
+    def fake_chat_json(system, user, schema_hint=None):
+        calls.append(user)
+        return {"corrections": [{"sentence_id": 1, "original": "句子", "suggestion": "语句"}]}
+
+    monkeypatch.setattr(review_mod, "chat_json", fake_chat_json)
+    client.put("/api/settings", json={"review.pack_tokens": 0})
+    try:
+        job_id = client.post(f"/api/documents/{doc_id}/review").json()["job_id"]
+        assert wait_job(client, job_id) == "done"
+        # 模拟在第 3 块进行中时进程退出：第 3 块无检查点，任务 running、文档 reviewing
+        with Session(engine) as session:
+            last = session.exec(select(Block).where(Block.document_id == doc_id, Block.idx == 2)).one()
+            last.review_fingerprint = None
+            session.add(last)
+            doc = session.get(Document, doc_id)
+            doc.status = "reviewing"
+            session.add(doc)
+            session.commit()
+        crashed = create_job("review", document_id=doc_id, params={"force": False})
+        make_emit(crashed)("progress", {"block_idx": 1, "blocks": 3})
+
+        _sweep_interrupted_state()
+        with Session(engine) as session:
+            doc = session.get(Document, doc_id)
+            assert doc.status == "interrupted" and "2/3" in doc.error
+            assert session.get(Job, crashed).status == "interrupted"
+
+        calls.clear()
+        resp = client.post(f"/api/documents/{doc_id}/resume")
+        assert resp.status_code == 200, resp.text
+        assert resp.json()["resumed_from"] == crashed
+        assert wait_job(client, resp.json()["job_id"]) == "done"
+        # 原任务收口为 resumed（不记为失败），resumed 事件指向新任务
+        with Session(engine) as session:
+            assert session.get(Job, crashed).status == "resumed"
+        assert ("resumed", {"resumed_by": resp.json()["job_id"]}) in _job_events(crashed)
+        assert len(calls) == 1 and "第2块" in calls[0]  # 只续审未完成的块
+        assert doc_status(doc_id) == "pending_manual"
+        assert len(doc_corrections(doc_id)) == 3
+        # 已接续的中断任务不可重复继续
+        assert client.post(f"/api/documents/{doc_id}/resume").status_code == 400
+    finally:
+        client.put("/api/settings", json={"review.pack_tokens": 1500})
+
+
+def test_cancel_and_pause_review_job(client: TestClient, monkeypatch):
+    import threading
+
+    doc_id = seed_document(blocks=[{"sentences": [f"第{i}块句子足够长。"]} for i in range(4)])
+    first_call = threading.Event()
+    calls: list[str] = []
+
+    def fake_chat_json(system, user, schema_hint=None):
+        calls.append(user)
+        first_call.set()
+        time.sleep(0.3)
+        return {"corrections": [{"sentence_id": 1, "original": "句子", "suggestion": "语句"}]}
+
+    monkeypatch.setattr(review_mod, "chat_json", fake_chat_json)
+    client.put("/api/settings", json={"review.pack_tokens": 0, "review.concurrency": 1})
+    try:
+        # 暂停：在途块完成后不再开始新块；继续后跑完
+        job_id = client.post(f"/api/documents/{doc_id}/review").json()["job_id"]
+        assert first_call.wait(5)
+        assert client.post(f"/api/jobs/{job_id}/pause").json()["status"] == "paused"
+        time.sleep(0.6)
+        assert len(calls) == 1 and client.get(f"/api/jobs/{job_id}").json()["status"] == "paused"
+        assert client.post(f"/api/jobs/{job_id}/resume").json()["status"] == "running"
+        assert wait_job(client, job_id) == "done" and len(calls) == 4
+        assert client.post(f"/api/jobs/{job_id}/cancel").status_code == 400  # 已结束
+
+        # 取消：在途块结束即停止，已提交的块保留
+        first_call.clear()
+        calls.clear()
+        with Session(engine) as session:  # 让指纹失效，强制逐块重审
+            for block in session.exec(select(Block).where(Block.document_id == doc_id)).all():
+                block.review_fingerprint = None
+                session.add(block)
+            session.commit()
+        job_id = client.post(f"/api/documents/{doc_id}/review").json()["job_id"]
+        assert first_call.wait(5)
+        assert client.post(f"/api/jobs/{job_id}/cancel").json()["status"] == "cancelling"
+        deadline = time.monotonic() + 5
+        while client.get(f"/api/jobs/{job_id}").json()["status"] != "cancelled":
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+        events = [e for e, _ in _job_events(job_id)]
+        assert "cancelled" in events and "done" not in events
+        assert len(calls) < 4
+        assert doc_status(doc_id) == "pending_manual"  # 保留的 pending → 待人工审校
+    finally:
+        client.put("/api/settings", json={"review.pack_tokens": 1500, "review.concurrency": 4})
+
+
+def test_stream_process_overlaps_stages(client: TestClient, monkeypatch, tmp_path):
+    from docx import Document as DocxDocument
+
+    path = tmp_path / "stream.docx"
+    docx = DocxDocument()
+    for i, title in enumerate(["一、病史", "二、检查", "三、诊断", "四、治疗"]):
+        docx.add_paragraph(title)
+        docx.add_paragraph(f"第{i}章正文内容足够长，用于流式审校。")
+    docx.save(str(path))
+    with path.open("rb") as fh:
+        resp = client.post("/api/documents", files={"file": ("stream.docx", fh, DOCX_MIME)})
+    doc_id = resp.json()["id"]
+
+    def fake_chat_json(system, user, schema_hint=None):
+        time.sleep(0.2)
+        return {"corrections": [{"sentence_id": 1, "original": "正文", "suggestion": "正文部分"}]}
+
+    monkeypatch.setattr(review_mod, "chat_json", fake_chat_json)
+    monkeypatch.setattr("app.rag.retrieve.chat_json", lambda *a, **kw: ["问题"])
+    client.put("/api/settings", json={"review.pack_tokens": 0, "pipeline.stream_queue_blocks": 1})
+    try:
+        job_id = client.post(f"/api/documents/{doc_id}/process").json()["job_id"]
+        assert wait_job(client, job_id) == "done"
+    finally:
+        client.put(
+            "/api/settings", json={"review.pack_tokens": 1500, "pipeline.stream_queue_blocks": 4}
+        )
+
+    events = _job_events(job_id)
+    stages = [(d["block_idx"], d["stage"]) for e, d in events if e == "block_stage"]
+    for block_idx in range(4):  # 每块依次经过三个阶段
+        mine = [stage for idx, stage in stages if idx == block_idx]
+        assert mine == ["segment", "retrieve", "review"]
+    # 首条 corrections 先于末块审完即可见
+    first = next(i for i, (e, _) in enumerate(events) if e == "first_correction")
+    last_review = next(
+        i for i, (e, d) in enumerate(events)
+        if e == "block_stage" and d["stage"] == "review" and d["block_idx"] == 3
+    )
+    assert first < last_review
+    done = next(d for e, d in events if e == "done")
+    assert done["blocks"] == 4 and done["corrections"] == 4 and done["blocks_reviewed"] == 4
+    assert 0 < done["time_to_first_correction"] < done["elapsed"]
+    assert doc_status(doc_id) == "pending_manual" and len(doc_corrections(doc_id)) == 4
+    # LLM 未配置 → 400
+    client.put("/api/settings", json={"llm.model": ""})
+    try:
+        assert client.post(f"/api/documents/{doc_id}/process").status_code == 400
+    finally:
+        client.put("/api/settings", json=DUMMY_LLM_SETTINGS)
+
+
+def test_stream_resumes_after_failure_and_restart(client: TestClient, monkeypatch, tmp_path):
+    from docx import Document as DocxDocument
+
+    from app.core.joblog import create_job, make_emit
+    from app.main import _sweep_interrupted_state
+    from app.models import Job
+
+    path = tmp_path / "resume.docx"
+    docx = DocxDocument()
+    for i, title in enumerate(["一、病史", "二、检查", "三、诊断", "四、治疗"]):
+        docx.add_paragraph(title)
+        docx.add_paragraph(f"第{i}章正文内容足够长，用于流式审校。")
+    docx.save(str(path))
+    with path.open("rb") as fh:
+        resp = client.post("/api/documents", files={"file": ("resume.docx", fh, DOCX_MIME)})
+    doc_id = resp.json()["id"]
+    calls: list[str] = []
+    broken = {"armed": True}
+
+    def fake_chat_json(system, user, schema_hint=None):
+        calls.append(user)
+        if broken["armed"] and "第2章" in user:
+            broken["armed"] = False
+            raise RuntimeError("模型服务不可用")
+        return {"corrections": [{"sentence_id": 2, "original": "正文", "suggestion": "正文部分"}]}
+
+    def blocks() -> list[Block]:
+        with Session(engine) as session:
+            return session.exec(
+                select(Block).where(Block.document_id == doc_id).order_by(Block.idx)
+            ).all()
+
+    def resume() -> dict:
+        resp = client.post(f"/api/documents/{doc_id}/resume")
+        assert resp.status_code == 200, resp.text
+        assert wait_job(client, resp.json()["job_id"]) == "done"
+        return resp.json()
+
+    monkeypatch.setattr(review_mod, "chat_json", fake_chat_json)
+    client.put("/api/settings", json={"review.pack_tokens": 0, "review.concurrency": 1})
+    try:
+        # 第 3 块审校失败：已审的块保留指纹，未审的块无指纹，文档可继续
+        failed_job = client.post(f"/api/documents/{doc_id}/process").json()["job_id"]
+        assert wait_job(client, failed_job) == "error"
+        assert [e for e, _ in _job_events(failed_job)].count("error") == 1
+        assert [b.review_fingerprint is not None for b in blocks()] == [True, True, False, False]
+        with Session(engine) as session:
+            doc = session.get(Document, doc_id)
+            assert doc.status == "interrupted" and "可继续执行" in doc.error
+        block_ids = [b.id for b in blocks()]
+
+        calls.clear()
+        resumed = resume()
+        assert resumed["resumed_from"] == failed_job
+        with Session(engine) as session:
+            assert session.get(Job, failed_job).status == "resumed"
+        assert ("resumed", {"resumed_by": resumed["job_id"]}) in _job_events(failed_job)
+        assert len(calls) == 2 and "第2章" in calls[0] and "第3章" in calls[1]  # 只审余下的块
+        done = next(d for e, d in _job_events(resumed["job_id"]) if e == "done")
+        assert done["blocks_reused"] == 2 and done["blocks_reviewed"] == 2
+        assert [b.id for b in blocks()] == block_ids  # 重新分句对齐：块 id 沿用
+        assert doc_status(doc_id) == "pending_manual" and len(doc_corrections(doc_id)) == 4
+
+        # 模拟在第 4 块进行中时进程退出：重启清理置 interrupted，继续时只审第 4 块
+        with Session(engine) as session:
+            last = session.get(Block, block_ids[3])
+            last.review_fingerprint = None
+            session.add(last)
+            doc = session.get(Document, doc_id)
+            doc.status = "reviewing"
+            session.add(doc)
+            session.commit()
+        crashed = create_job("stream", document_id=doc_id)
+        make_emit(crashed)("progress", {"block_idx": 2, "blocks": 4})
+        _sweep_interrupted_state()
+        with Session(engine) as session:
+            doc = session.get(Document, doc_id)
+            assert doc.status == "interrupted" and "3/4" in doc.error
+            assert session.get(Job, crashed).status == "interrupted"
+
+        calls.clear()
+        assert resume()["resumed_from"] == crashed
+        assert len(calls) == 1 and "第3章" in calls[0]
+        assert doc_status(doc_id) == "pending_manual" and len(doc_corrections(doc_id)) == 4
+        assert client.post(f"/api/documents/{doc_id}/resume").status_code == 400
+    finally:
+        client.put("/api/settings", json={"review.pack_tokens": 1500, "review.concurrency": 4})
+
+
+def test_stream_channel_backpressure():
+    import threading
+
+    from app.pipeline.stream import _Channel, _Stopped
+
+    failed = threading.Event()
+    channel = _Channel(1, failed)
+    channel.put("a")
+    done = threading.Event()
+    worker = threading.Thread(target=lambda: (channel.put("b"), done.set()))
+    worker.start()
+    assert not done.wait(0.3)  # 队列满：上游阻塞
+    assert channel.get() == "a"
+    assert done.wait(1) and channel.get() == "b"
+    worker.join()
+    failed.set()  # 其他阶段失败：阻塞中的 put / get 退出
+    with pytest.raises(_Stopped):
+        channel.get()
+
+
+def test_snapshot_query_count_independent_of_size(client: TestClient):
+    from sqlalchemy import event
+
+    from app.pipeline.snapshot import load_snapshot
+
+    def seed(n_blocks: int) -> str:
+        evidence = {(b, 0): [{"chunk_text": f"证据{b}-{i}"} for i in range(3)] for b in range(n_blocks)}
+        return seed_document(
+            blocks=[{"sentences": [f"第{b}块第一句。", f"第{b}块第二句。"]} for b in range(n_blocks)],
+            evidence=evidence,
+        )
+
+    def count_selects(doc_id: str, fn) -> int:
+        """只计参数含该文档 id 的 SELECT（排除任务队列轮询等并发查询）。"""
+        statements: list[str] = []
+
+        def record(conn, cursor, statement, parameters, *args):
+            if statement.lstrip().upper().startswith("SELECT") and doc_id in (parameters or ()):
+                statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            fn()
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+        return len(statements)
+
+    small, large = seed(2), seed(40)
+    for path in ("detail", "evidence"):
+        assert count_selects(small, lambda: client.get(f"/api/documents/{small}/{path}")) == (
+            count_selects(large, lambda: client.get(f"/api/documents/{large}/{path}"))
+        )
+    snapshot = load_snapshot(large)
+    assert len(snapshot.blocks) == 40 and len(snapshot.blocks[7].sentences[0].evidence) == 3
+    assert count_selects(large, lambda: load_snapshot(large, queries=True)) <= 6
+    with pytest.raises(AttributeError):
+        snapshot.blocks[0].text = "changed"  # 不可变
+
+
+def test_migrate_backfills_document_id(tmp_path, monkeypatch):
+    """旧库（sentences / 下游表无 document_id）升级：补列、按 blocks → sentences 回填、建复合索引。"""
+    from sqlalchemy import create_engine
+    from sqlmodel import SQLModel
+
+    from app.core import db
+
+    legacy = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with legacy.begin() as conn:
+        for ddl in (
+            "CREATE TABLE documents (id VARCHAR PRIMARY KEY, filename VARCHAR, status VARCHAR)",
+            "CREATE TABLE blocks (id INTEGER PRIMARY KEY, document_id VARCHAR, idx INTEGER, "
+            "chapter VARCHAR, text VARCHAR)",
+            "CREATE TABLE sentences (id INTEGER PRIMARY KEY, block_id INTEGER, idx INTEGER, "
+            "text VARCHAR)",
+            "CREATE TABLE queries (id INTEGER PRIMARY KEY, sentence_id INTEGER, idx INTEGER, "
+            "text VARCHAR)",
+            "CREATE TABLE evidence (id INTEGER PRIMARY KEY, sentence_id INTEGER, source VARCHAR, "
+            "chunk_text VARCHAR, doc_name VARCHAR, score FLOAT, rank INTEGER)",
+            "CREATE TABLE corrections (id INTEGER PRIMARY KEY, sentence_id INTEGER, "
+            "original VARCHAR, suggestion VARCHAR, error_type VARCHAR, severity VARCHAR, "
+            "decision VARCHAR)",
+            "CREATE TABLE jobs (id VARCHAR PRIMARY KEY, document_id VARCHAR, type VARCHAR, "
+            "status VARCHAR, created_at DATETIME)",
+            "INSERT INTO documents VALUES ('d1', 'a.docx', 'pending_manual'), "
+            "('d2', 'b.docx', 'segmented')",
+            "INSERT INTO blocks VALUES (1, 'd1', 0, NULL, '甲'), (2, 'd2', 0, NULL, '乙')",
+            "INSERT INTO sentences VALUES (10, 1, 0, '甲'), (20, 2, 0, '乙')",
+            "INSERT INTO queries VALUES (1, 10, 0, 'q')",
+            "INSERT INTO evidence VALUES (1, 20, 'vector', 'e', 'kb.pdf', 0.5, 1)",
+            "INSERT INTO corrections VALUES (1, 10, '甲', '甲甲', '语法错误', 'low', 'pending')",
+            # 孤儿行：所属块 / 句已不存在，无从回填
+            "INSERT INTO sentences VALUES (30, 99, 0, '丙')",
+            "INSERT INTO corrections VALUES (2, 30, '丙', '丙丙', '语法错误', 'low', 'pending')",
+        ):
+            conn.exec_driver_sql(ddl)
+    SQLModel.metadata.create_all(legacy)  # 同 init_db：先建新增的表（如 correction_stats）
+    monkeypatch.setattr(db, "engine", legacy)
+    db._migrate()
+    db._migrate()  # 幂等
+
+    with legacy.connect() as conn:
+        def rows(sql: str) -> list[tuple]:
+            return [tuple(r) for r in conn.exec_driver_sql(sql).fetchall()]
+
+        assert rows("SELECT id, document_id FROM sentences ORDER BY id") == [(10, "d1"), (20, "d2")]
+        assert rows("SELECT document_id FROM queries") == [("d1",)]
+        assert rows("SELECT document_id FROM evidence") == [("d2",)]
+        assert rows("SELECT document_id FROM corrections") == [("d1",)]  # 孤儿行已删除
+        assert rows("SELECT document_id, decision, severity, count FROM correction_stats") == [
+            ("d1", "pending", "low", 1)
+        ]
+        indexes = {r[1] for r in rows("SELECT type, name FROM sqlite_master WHERE type = 'index'")}
+        assert {"ix_corrections_document_decision", "ix_evidence_sentence_score"} <= indexes
+        plan = " ".join(
+            str(r[-1])
+            for r in rows(
+                "EXPLAIN QUERY PLAN SELECT count(*) FROM corrections "
+                "WHERE document_id = 'd1' AND decision = 'pending'"
+            )
+        )
+        assert "ix_corrections_document_decision" in plan
+
+
+def test_migrate_rejects_unresolvable_document_id(tmp_path, monkeypatch):
+    """回填后仍有 NULL（上级行本身缺 document_id）→ 启动失败；修复数据后下次启动补齐。"""
+    from sqlalchemy import create_engine
+    from sqlmodel import SQLModel
+
+    from app.core import db
+
+    legacy = create_engine(f"sqlite:///{tmp_path / 'broken.db'}")
+    with legacy.begin() as conn:
+        for ddl in (
+            "CREATE TABLE blocks (id INTEGER PRIMARY KEY, document_id VARCHAR, idx INTEGER, "
+            "chapter VARCHAR, text VARCHAR)",
+            "CREATE TABLE sentences (id INTEGER PRIMARY KEY, block_id INTEGER, idx INTEGER, "
+            "text VARCHAR)",
+            "INSERT INTO blocks VALUES (1, NULL, 0, NULL, '甲')",
+            "INSERT INTO sentences VALUES (10, 1, 0, '甲')",
+        ):
+            conn.exec_driver_sql(ddl)
+    SQLModel.metadata.create_all(legacy)
+    monkeypatch.setattr(db, "engine", legacy)
+    with pytest.raises(RuntimeError, match="sentences"):
+        db._migrate()
+
+    with legacy.begin() as conn:
+        conn.exec_driver_sql("UPDATE blocks SET document_id = 'd1'")
+    db._migrate()
+    with legacy.connect() as conn:
+        assert conn.exec_driver_sql("SELECT document_id FROM sentences").fetchall() == [("d1",)]
+
+
+def test_correction_counters_follow_decisions(client: TestClient, monkeypatch):
+    def recount(doc_id: str) -> dict:
+        counts = {d: 0 for d in ("pending", "accepted", "rejected", "custom")}
+        for c in doc_corrections(doc_id):
+            counts[c.decision] += 1
+        return counts
+
+    doc_id = _reviewed_doc(client, monkeypatch, n_corrections=3)
+    stats = client.get(f"/api/documents/{doc_id}/stats").json()
+    assert stats["total"] == 3 and stats["by_decision"] == recount(doc_id)
+    assert stats["by_severity"]["low"]["pending"] == 2
+    assert stats["by_severity"]["high"]["total"] == 1
+    assert stats["by_error_type"]["语法错误"]["total"] == 3
+
+    first, second, _ = doc_corrections(doc_id)
+    client.post(f"/api/corrections/{first.id}/decision", json={"decision": "accepted"})
+    client.post(
+        f"/api/corrections/{second.id}/decision", json={"decision": "custom", "custom_text": "改"}
+    )
+    client.post(
+        f"/api/corrections/{second.id}/decision", json={"decision": "custom", "custom_text": "再改"}
+    )
+    stats = client.get(f"/api/documents/{doc_id}/stats").json()
+    assert stats["by_decision"] == recount(doc_id) == {
+        "pending": 1, "accepted": 1, "rejected": 0, "custom": 1
+    }
+    resp = client.post(
+        f"/api/documents/{doc_id}/decisions/batch", json={"filter": {}, "action": "reject"}
+    )
+    assert resp.json()["document_status"] == "manual_done"
+    assert client.get(f"/api/documents/{doc_id}/stats").json()["by_decision"] == recount(doc_id)
+
+    # 重跑（清 pending / 保留已决定）与 force（全清）后计数仍与 corrections 一致
+    run_review(client, monkeypatch, doc_id, {"corrections": []})
+    assert client.get(f"/api/documents/{doc_id}/stats").json()["by_decision"] == recount(doc_id)
+    run_review(client, monkeypatch, doc_id, {"corrections": []}, force=True)
+    stats = client.get(f"/api/documents/{doc_id}/stats").json()
+    assert stats["total"] == 0 and stats["by_severity"] == {}
+    assert client.get("/api/documents/missing/stats").status_code == 404
+
+
+def test_detail_pagination_filters_and_etag(client: TestClient, monkeypatch):
+    doc_id = _reviewed_doc(client, monkeypatch, n_corrections=3)
+    full = client.get(f"/api/documents/{doc_id}/detail")
+    assert full.status_code == 200 and full.json()["total_blocks"] == 1
+    etag, revision = full.headers["etag"], full.json()["revision"]
+    assert full.headers["last-modified"] and full.json()["next_offset"] is None
+
+    # 未变化 → 304（ETag 或 Last-Modified）；不同分页 / 过滤参数是不同变体
+    assert client.get(
+        f"/api/documents/{doc_id}/detail", headers={"If-None-Match": etag}
+    ).status_code == 304
+    assert client.get(
+        f"/api/documents/{doc_id}/detail",
+        headers={"If-Modified-Since": full.headers["last-modified"]},
+    ).status_code == 304
+    filtered = client.get(
+        f"/api/documents/{doc_id}/detail",
+        params={"severity": "high"},
+        headers={"If-None-Match": etag},
+    )
+    assert filtered.status_code == 200 and filtered.headers["etag"] != etag
+    sentences = filtered.json()["blocks"][0]["sentences"]
+    assert [c["severity"] for s in sentences for c in s["corrections"]] == ["high"]
+
+    # 决定后修订号前进：旧 ETag 失效，pending_only 只剩未决定的句子
+    first = doc_corrections(doc_id)[0]
+    client.post(f"/api/corrections/{first.id}/decision", json={"decision": "accepted"})
+    fresh = client.get(f"/api/documents/{doc_id}/detail", headers={"If-None-Match": etag})
+    assert fresh.status_code == 200 and fresh.json()["revision"] > revision
+    pending = client.get(f"/api/documents/{doc_id}/detail", params={"pending_only": True}).json()
+    pending_ids = [
+        c["id"] for b in pending["blocks"] for s in b["sentences"] for c in s["corrections"]
+    ]
+    assert first.id not in pending_ids and len(pending_ids) == 2
+
+    # 块序分页
+    paged_doc = seed_document(blocks=[{"sentences": [f"第{i}块。"]} for i in range(5)])
+    page = client.get(f"/api/documents/{paged_doc}/detail", params={"offset": 1, "limit": 2}).json()
+    assert [b["idx"] for b in page["blocks"]] == [1, 2]
+    assert page["total_blocks"] == 5 and page["next_offset"] == 3
+    last = client.get(f"/api/documents/{paged_doc}/detail", params={"offset": 3, "limit": 2}).json()
+    assert [b["idx"] for b in last["blocks"]] == [3, 4] and last["next_offset"] is None
+    assert client.get(f"/api/documents/{paged_doc}/detail", params={"limit": 0}).status_code == 400
+
+
+def test_resegment_preserves_unchanged_sentences(client: TestClient, monkeypatch):
+    sentences = ["第一句内容足够长。", "第二句内容足够长。", "第三句内容足够长。"]
+    doc_id = seed_document(
+        status="retrieved",
+        blocks=[{"sentences": sentences}],
+        evidence={(0, 0): [{"chunk_text": "证据一"}], (0, 1): [{"chunk_text": "证据二"}]},
+    )
+    payload = {
+        "corrections": [
+            {"sentence_id": i + 1, "original": f"第{'一二'[i]}句", "suggestion": f"改{i + 1}",
+             "error_type": "语法错误", "severity": "low"}
+            for i in range(2)
+        ]
+    }
+    run_review(client, monkeypatch, doc_id, payload)
+    first, second = doc_corrections(doc_id)
+    client.post(f"/api/corrections/{first.id}/decision", json={"decision": "accepted"})
+    with Session(engine) as session:
+        old_ids = {
+            s.text: s.id
+            for s in session.exec(select(Sentence).where(Sentence.document_id == doc_id)).all()
+        }
+
+    # 修订稿：首块前插一句、改第二句，第三句拆到新章节块
+    delta = _save_blocks(
+        doc_id,
+        [
+            {"chapter": None, "is_reference": False,
+             "sentences": ["新插入的一句内容。", sentences[0], "第二句改过了内容。"]},
+            {"chapter": "二、诊疗经过", "is_reference": False, "sentences": [sentences[2]]},
+        ],
+    )
+    assert delta == {"kept": 2, "inserted": 2, "removed": 1, "blocks_reused": 1}
+    with Session(engine) as session:
+        rows = session.exec(
+            select(Block.idx, Sentence.idx, Sentence.text, Sentence.id)
+            .join(Block, Block.id == Sentence.block_id)
+            .where(Sentence.document_id == doc_id)
+            .order_by(Block.idx, Sentence.idx)
+        ).all()
+        evidence = session.exec(
+            select(Evidence.sentence_id).where(Evidence.document_id == doc_id)
+        ).all()
+        assert pending_count(session, doc_id) == 0  # 改动句的 pending 随句删除，计数同步
+    assert [(b, i, t) for b, i, t, _ in rows] == [
+        (0, 0, "新插入的一句内容。"), (0, 1, sentences[0]), (0, 2, "第二句改过了内容。"),
+        (1, 0, sentences[2]),
+    ]
+    ids = {t: sid for *_, t, sid in rows}
+    assert ids[sentences[0]] == old_ids[sentences[0]] and ids[sentences[2]] == old_ids[sentences[2]]
+    assert evidence == [old_ids[sentences[0]]]  # 改动句的证据删除，未变句保留
+    # 人工决定随未变句保留；改动句的 pending 删除
+    assert [(c.id, c.decision) for c in doc_corrections(doc_id)] == [(first.id, "accepted")]
+    assert second.id not in {c.id for c in doc_corrections(doc_id)}
+
+    # 整篇重新分句（parsed.md → segment_document）：保留了已决定的 corrections → 按计数收口，
+    # 不回到 segmented；非增量检索（会清空全部证据）因状态被拒绝
+    parsed = project_dir(doc_id) / "parsed.md"
+    parsed.parent.mkdir(parents=True, exist_ok=True)
+    parsed.write_text(
+        f"新插入的一句内容。\n{sentences[0]}\n第二句改过了内容。\n\n二、诊疗经过\n\n{sentences[2]}\n",
+        encoding="utf-8",
+    )
+    assert segment_document(doc_id)["status"] == "manual_done"
+    assert doc_status(doc_id) == "manual_done"
+    assert [(c.id, c.decision) for c in doc_corrections(doc_id)] == [(first.id, "accepted")]
+    assert client.post(f"/api/documents/{doc_id}/retrieve").status_code == 400
+
+
+def test_document_change_feed(client: TestClient, monkeypatch):
+    doc_id = _reviewed_doc(client, monkeypatch, n_corrections=2)
+    feed = client.get(f"/api/documents/{doc_id}/changes").json()
+    kinds = [c["kind"] for c in feed["changes"]]
+    assert kinds == ["status", "corrections", "status", "usage"] and not feed["reset"]
+    assert [c["revision"] for c in feed["changes"]] == list(range(1, feed["revision"] + 1))
+    added = next(c for c in feed["changes"] if c["kind"] == "corrections")["data"]["added"]
+    assert added == [c.id for c in doc_corrections(doc_id)]
+
+    # 决定 → 一条 decision 变更；since=当前修订号 → 无新变更
+    since = feed["revision"]
+    client.post(f"/api/corrections/{added[0]}/decision", json={"decision": "accepted"})
+    delta = client.get(f"/api/documents/{doc_id}/changes", params={"since": since}).json()
+    assert [c["kind"] for c in delta["changes"]] == ["decision"]
+    assert delta["changes"][0]["data"] == {
+        "correction_ids": [added[0]], "decision": "accepted", "custom_text": None
+    }
+    latest = client.get(f"/api/documents/{doc_id}/changes", params={"since": delta["revision"]})
+    assert latest.json()["changes"] == [] and not latest.json()["reset"]
+    paged = client.get(f"/api/documents/{doc_id}/changes", params={"limit": 1}).json()
+    assert len(paged["changes"]) == 1 and paged["has_more"]
+
+    # 任务 SSE 附带文档变更（since=0 回放全部）
+    job_id = run_review(client, monkeypatch, doc_id, {"corrections": []})["job_id"]
+    body = client.get(f"/api/jobs/{job_id}/events", params={"since": 0}).text
+    assert "event: change" in body and '"kind": "decision"' in body
+
+    # 重新分句清除更早记录：旧 since 需全量重取
+    clear_blocks(doc_id)
+    stale = client.get(f"/api/documents/{doc_id}/changes", params={"since": since}).json()
+    assert stale["reset"] and [c["kind"] for c in stale["changes"]] == ["blocks_cleared"]
+    assert client.get(f"/api/documents/{doc_id}/changes", params={"since": -1}).status_code == 400
@@ -125,11 +125,98 @@ export async function runDocument(id: string): Promise<RunResult> {
     const body = (await res.json().catch(() => null)) as { detail?: string } | null
     throw new Error(body?.detail ?? `解析失败: ${String(res.status)}`)
   }
-  return (await res.json()) as RunResult
+  const { job_id } = (await res.json()) as { job_id: string }
+  return waitForJob<RunResult>(job_id)
+}
+
+export interface DetailQuery {
+  offset?: number
+  limit?: number
+  pendingOnly?: boolean
+  severity?: string
+}
+
+export interface DocumentDetailPage extends DocumentDetail {
+  revision: number
+  total_blocks: number
+  offset: number
+  limit: number | null
+  next_offset: number | null
+}
+
+/** 详情按 ETag 缓存：未变化（304）直接复用上次结果，决定后重取只传变化的页 */
+const detailCache = new Map<string, { etag: string; body: DocumentDetailPage }>()
+
+export async function getDocumentDetailPage(
+  id: string,
+  query: DetailQuery = {},
+): Promise<DocumentDetailPage> {
+  const params = new URLSearchParams()
+  if (query.offset !== undefined) params.set('offset', String(query.offset))
+  if (query.limit !== undefined) params.set('limit', String(query.limit))
+  if (query.pendingOnly) params.set('pending_only', 'true')
+  if (query.severity) params.set('severity', query.severity)
+  const qs = params.toString()
+  const path = `/api/documents/${id}/detail${qs ? `?${qs}` : ''}`
+  const cached = detailCache.get(path)
+  const base = await getBaseUrl()
+  const res = await fetch(`${base}${path}`, {
+    headers: cached ? { 'If-None-Match': cached.etag } : {},
+  })
+  if (res.status === 304 && cached) return cached.body
+  if (!res.ok) {
+    throw new Error(`API ${path} failed: ${String(res.status)} ${res.statusText}`)
+  }
+  const body = (await res.json()) as DocumentDetailPage
+  const etag = res.headers.get('ETag')
+  if (etag) detailCache.set(path, { etag, body })
+  return body
 }
 
 export function getDocumentDetail(id: string): Promise<DocumentDetail> {
-  return apiFetch<DocumentDetail>(`/api/documents/${id}/detail`)
+  return getDocumentDetailPage(id)
+}
+
+export interface DecisionCounts {
+  pending: number
+  accepted: number
+  rejected: number
+  custom: number
+}
+
+export interface DocumentStats {
+  id: string
+  status: string
+  total: number
+  by_decision: DecisionCounts
+  by_severity: Record<string, DecisionCounts & { total: number }>
+  by_error_type: Record<string, DecisionCounts & { total: number }>
+}
+
+/** corrections 计数（服务端维护的聚合计数，不随文档规模变慢） */
+export function getDocumentStats(id: string): Promise<DocumentStats> {
+  return apiFetch<DocumentStats>(`/api/documents/${id}/stats`)
+}
+
+export interface DocumentChange {
+  revision: number
+  ts: string
+  kind: string
+  data: Record<string, unknown>
+}
+
+export interface DocumentChangeFeed {
+  id: string
+  revision: number
+  since: number
+  reset: boolean
+  has_more: boolean
+  changes: DocumentChange[]
+}
+
+/** 修订号 since 之后的文档变更；reset 为 true 时应全量重取详情 */
+export function getDocumentChanges(id: string, since: number): Promise<DocumentChangeFeed> {
+  return apiFetch<DocumentChangeFeed>(`/api/documents/${id}/changes?since=${String(since)}`)
 }
 
 export async function getParsed(id: string): Promise<string> {
@@ -145,6 +232,69 @@ export function deleteDocument(id: string): Promise<{ ok: boolean }> {
   return apiFetch<{ ok: boolean }>(`/api/documents/${id}`, { method: 'DELETE' })
 }
 
+/* ---------- 批量处理 ---------- */
+
+export interface BatchDocumentItem {
+  id: string
+  filename: string
+  status: string
+  error: string | null
+  job_id: string | null
+  job_status: string | null
+  progress: number
+  corrections: number
+}
+
+export interface BatchSummary {
+  id: string
+  name: string
+  source: string
+  created_at: string
+  status: 'running' | 'done'
+  total: number
+  queued: number
+  running: number
+  done: number
+  failed: number
+  progress: number
+  corrections: number
+  elapsed_seconds: number
+  docs_per_hour: number | null
+  finished_at: string | null
+  documents?: BatchDocumentItem[]
+}
+
+/** 上传 zip：其中每篇 .docx 入队流式处理（分句 → 检索 → 审校）。 */
+export async function submitZipBatch(file: File): Promise<BatchSummary> {
+  await requireActiveLicense()
+  const base = await getBaseUrl()
+  const form = new FormData()
+  form.append('file', file)
+  const res = await fetch(`${base}/api/batches`, { method: 'POST', body: form })
+  if (!res.ok) {
+    const body = (await res.json().catch(() => null)) as { detail?: string } | null
+    throw new Error(body?.detail ?? `批量提交失败: ${String(res.status)}`)
+  }
+  return (await res.json()) as BatchSummary
+}
+
+/** 提交本机目录（含子目录）中的全部 .docx。 */
+export async function submitFolderBatch(path: string, name?: string): Promise<BatchSummary> {
+  await requireActiveLicense()
+  return apiFetch<BatchSummary>('/api/batches/folder', {
+    method: 'POST',
+    body: JSON.stringify({ path, name }),
+  })
+}
+
+export function listBatches(): Promise<BatchSummary[]> {
+  return apiFetch<BatchSummary[]>('/api/batches')
+}
+
+export function getBatch(id: string): Promise<BatchSummary> {
+  return apiFetch<BatchSummary>(`/api/batches/${id}`)
+}
+
 /* ---------- M3 医学知识库 ---------- */
 
 export interface KbDocumentItem {
@@ -196,15 +346,19 @@ export interface RetrieveResult {
   rewritten: number
 }
 
-export async function retrieveDocument(id: string): Promise<RetrieveResult> {
+/** incremental=true：只检索尚无证据的句子（重新分句后的新增 / 改动句），不清旧证据。 */
+export async function retrieveDocument(id: string, incremental = false): Promise<RetrieveResult> {
   await requireActiveLicense()
   const base = await getBaseUrl()
-  const res = await fetch(`${base}/api/documents/${id}/retrieve`, { method: 'POST' })
+  const res = await fetch(`${base}/api/documents/${id}/retrieve?incremental=${incremental}`, {
+    method: 'POST',
+  })
   if (!res.ok) {
     const body = (await res.json().catch(() => null)) as { detail?: string } | null
     throw new Error(body?.detail ?? `检索失败: ${String(res.status)}`)
   }
-  return (await res.json()) as RetrieveResult
+  const { job_id } = (await res.json()) as { job_id: string }
+  return waitForJob<RetrieveResult>(job_id)
 }
 
 export interface QueryItem {
@@ -303,6 +457,36 @@ export async function reviewDocument(id: string, force = false): Promise<ReviewS
   return (await res.json()) as ReviewStartResult
 }
 
+/** 流式处理（分句 → 检索 → 审校逐块流水线）；进度用 subscribeJobEvents(job_id) 订阅（block_stage 事件）。 */
+export async function processDocument(id: string): Promise<ReviewStartResult> {
+  await requireActiveLicense()
+  const base = await getBaseUrl()
+  const res = await fetch(`${base}/api/documents/${id}/process`, { method: 'POST' })
+  if (!res.ok) {
+    const body = (await res.json().catch(() => null)) as { detail?: string } | null
+    throw new Error(body?.detail ?? `处理失败: ${String(res.status)}`)
+  }
+  return (await res.json()) as ReviewStartResult
+}
+
+export interface ResumeResult {
+  job_id: string
+  status: string
+  resumed_from: string
+}
+
+/** 继续被服务重启中断的检索 / 审校（文档状态 interrupted）：重新入队，可 subscribeJobEvents 跟踪。 */
+export async function resumeDocument(id: string): Promise<ResumeResult> {
+  await requireActiveLicense()
+  const base = await getBaseUrl()
+  const res = await fetch(`${base}/api/documents/${id}/resume`, { method: 'POST' })
+  if (!res.ok) {
+    const body = (await res.json().catch(() => null)) as { detail?: string } | null
+    throw new Error(body?.detail ?? `继续执行失败: ${String(res.status)}`)
+  }
+  return (await res.json()) as ResumeResult
+}
+
 export interface DecisionResult {
   correction: CorrectionItem
   document_status: string
@@ -362,12 +546,59 @@ export interface JobInfo {
   type: string
   status: string
   document_id: string | null
+  result: Record<string, unknown> | null
+  attempts: number
+  max_attempts: number
+  error: string | null
 }
 
 export function getJob(jobId: string): Promise<JobInfo> {
   return apiFetch<JobInfo>(`/api/jobs/${jobId}`)
 }
 
+const JOB_TERMINAL_STATUSES = ['done', 'error', 'cancelled', 'interrupted', 'resumed']
+
+/**
+ * 等待已入队的任务结束并返回其结果（{job_id, ...result}）。
+ * 长操作接口只返回 job_id（后端任务队列执行）；SSE 收到 done 后取一次任务详情，
+ * SSE 断开时退回 1s 轮询。非 done 终态抛错（消息取任务 error）。
+ */
+export async function waitForJob<T>(jobId: string): Promise<T> {
+  await new Promise<void>((resolve) => {
+    let settled = false
+    const finish = () => {
+      if (!settled) {
+        settled = true
+        resolve()
+      }
+    }
+    const poll = async () => {
+      while (!settled) {
+        const job = await getJob(jobId).catch(() => null)
+        if (job && JOB_TERMINAL_STATUSES.includes(job.status)) finish()
+        else await new Promise((r) => setTimeout(r, 1000))
+      }
+    }
+    void subscribeJobEvents(jobId, {
+      onDone: finish,
+      onError: () => void poll(),
+    }).catch(() => void poll())
+  })
+  const job = await getJob(jobId)
+  if (job.status !== 'done') {
+    throw new Error(job.error ?? (job.status === 'cancelled' ? '任务已取消' : `任务${job.status}`))
+  }
+  return { job_id: jobId, ...(job.result ?? {}) } as T
+}
+
+/** 运行中任务的协作式控制：cancel 中止（已完成部分保留）、pause / resume 在块/句边界生效。 */
+export function controlJob(
+  jobId: string,
+  action: 'cancel' | 'pause' | 'resume',
+): Promise<{ id: string; status: string }> {
+  return apiFetch(`/api/jobs/${jobId}/${action}`, { method: 'POST' })
+}
+
 /* ---------- M5 导出双版本 docx ---------- */
 
 export interface ExportResult {
@@ -394,7 +625,7 @@ export interface ExportListResult {
   adopted: number | null
 }
 
-/** 触发导出（同步执行）：生成 清洁版(_审校修订1_) + 留痕版(_审校修订2_)。 */
+/** 触发导出（入队并等待完成）：生成 清洁版(_审校修订1_) + 留痕版(_审校修订2_)。 */
 export async function exportDocument(id: string): Promise<ExportResult> {
   await requireActiveLicense()
   const base = await getBaseUrl()
@@ -403,7 +634,8 @@ export async function exportDocument(id: string): Promise<ExportResult> {
     const body = (await res.json().catch(() => null)) as { detail?: string } | null
     throw new Error(body?.detail ?? `导出失败: ${String(res.status)}`)
   }
-  return (await res.json()) as ExportResult
+  const { job_id } = (await res.json()) as { job_id: string }
+  return waitForJob<ExportResult>(job_id)
 }
 
 export function listExports(id: string): Promise<ExportListResult> {
@@ -482,6 +714,8 @@ export async function subscribeJobEvents(
     }
   }
   const events = [
+    'queued',
+    'retry',
     'start',
     'loaded',
     'chunked',
@@ -491,7 +725,15 @@ export async function subscribeJobEvents(
     'skipped',
     'warning',
     'stage_done',
+    'block_stage',
+    'first_correction',
+    'budget',
+    'paused',
+    'resumed',
+    'cancelling',
+    'cancelled',
     'error',
+    'change',
   ]
   const removers = events.map((name) => {
     const fn = listener(name)
@@ -3,6 +3,7 @@ import type { Dispatch, SetStateAction } from 'react'
 import { useNavigate } from 'react-router-dom'
 import clsx from 'clsx'
 import {
+  controlJob,
   deleteDocument,
   exportDocument,
   getDocumentDetail,
@@ -13,6 +14,7 @@ import {
   listDocuments,
   listExports,
   listKbDocuments,
+  resumeDocument,
   retrieveDocument,
   reviewDocument,
   runDocument,
@@ -36,6 +38,7 @@ const STATUS_META: Record<string, { label: string; className: string }> = {
   manual_done: { label: '审校完成', className: 'bg-emerald-50 text-emerald-700' },
   done: { label: '已导出', className: 'bg-teal-50 text-teal-700' },
   failed: { label: '失败', className: 'bg-red-50 text-red-600' },
+  interrupted: { label: '已中断', className: 'bg-amber-50 text-amber-700' },
 }
 
 function StatusChip({ status }: { status: string }) {
@@ -317,6 +320,8 @@ export default function DocumentsPage() {
   const [runningId, setRunningId] = useState<string | null>(null)
   const [retrievingId, setRetrievingId] = useState<string | null>(null)
   const [reviewingId, setReviewingId] = useState<string | null>(null)
+  const [reviewJobId, setReviewJobId] = useState<string | null>(null)
+  const [reviewPaused, setReviewPaused] = useState(false)
   const [reviewProgress, setReviewProgress] = useState<string | null>(null)
   const [reviewStart, setReviewStart] = useState<number | null>(null)
   const [reviewBlocks, setReviewBlocks] = useState<{ done: number; total: number | null }>({
@@ -453,10 +458,13 @@ export default function DocumentsPage() {
       setReviewProgress(null)
       setReviewStart(null)
       setReviewBlocks({ done: 0, total: null })
+      setReviewJobId(null)
+      setReviewPaused(false)
     }
     let close: (() => void) | null = null
     try {
       const { job_id } = await reviewDocument(id)
+      setReviewJobId(job_id)
       setReviewStart(Date.now())
       close = await subscribeJobEvents(job_id, {
         onEvent: (event, data) => {
@@ -480,6 +488,9 @@ export default function DocumentsPage() {
           if (status === 'done') {
             void refresh()
             navigate(`/workbench/${id}`)
+          } else if (status === 'cancelled') {
+            // 已取消：已审的块保留，刷新列表即可
+            void refresh()
           } else {
             // 失败：取回后端记录的错误原因，刷新列表让状态芯片显示「失败」
             void (async () => {
@@ -506,6 +517,18 @@ export default function DocumentsPage() {
     }
   }
 
+  /** 审校任务控制：暂停 / 继续 / 取消（后端在块边界生效，取消会中止在途请求）。 */
+  const handleReviewControl = async (action: 'cancel' | 'pause' | 'resume') => {
+    if (reviewJobId === null) return
+    try {
+      await controlJob(reviewJobId, action)
+      if (action !== 'cancel') setReviewPaused(action === 'pause')
+      else setReviewProgress('正在取消…')
+    } catch (e) {
+      setError(e instanceof Error ? e.message : String(e))
+    }
+  }
+
   /** M5：加载导出产物列表（含浏览器预览模式下的下载链接）。 */
   const loadExports = async (id: string) => {
     try {
@@ -542,6 +565,18 @@ export default function DocumentsPage() {
     if (expandedId === id) await loadDetail(id)
   }
 
+  /** 继续被中断的检索 / 审校：从已完成的句子 / 块之后接着执行。 */
+  const handleResume = async (id: string) => {
+    setError(null)
+    try {
+      await resumeDocument(id)
+    } catch (e) {
+      setError(e instanceof Error ? e.message : String(e))
+    } finally {
+      await refresh()
+    }
+  }
+
   const handleDelete = async (id: string) => {
     setError(null)
     try {
@@ -626,6 +661,24 @@ export default function DocumentsPage() {
                     ? `已完成 ${Math.round(Math.min(1, reviewBlocks.done / reviewBlocks.total) * 100)}%`
                     : '准备中…'}
                 </div>
+                {reviewJobId !== null && (
+                  <div className="flex shrink-0 gap-1.5">
+                    <button
+                      type="button"
+                      onClick={() => void handleReviewControl(reviewPaused ? 'resume' : 'pause')}
+                      className="rounded border border-emerald-300 px-2 py-0.5 text-xs text-emerald-700 hover:bg-emerald-100"
+                    >
+                      {reviewPaused ? '继续' : '暂停'}
+                    </button>
+                    <button
+                      type="button"
+                      onClick={() => void handleReviewControl('cancel')}
+                      className="rounded border border-red-200 px-2 py-0.5 text-xs text-red-600 hover:bg-red-50"
+                    >
+                      取消
+                    </button>
+                  </div>
+                )}
               </div>
               <div className="mt-0.5 text-xs text-emerald-600/80">
                 {reviewStart !== null ? (
@@ -751,6 +804,16 @@ export default function DocumentsPage() {
                                 : 'AI 审校'}
                           </button>
                         )}
+                        {doc.status === 'interrupted' && (
+                          <button
+                            type="button"
+                            title="服务重启中断了检索 / 审校；已完成的部分会保留，从中断处继续"
+                            onClick={() => void handleResume(doc.id)}
+                            className="rounded border border-amber-200 px-2.5 py-1 text-xs text-amber-600 hover:bg-amber-50"
+                          >
+                            继续执行
+                          </button>
+                        )}
                         {doc.status === 'reviewing' && (
                           <span className="inline-flex items-center gap-1.5 px-2.5 py-1 text-xs text-amber-600">
                             <span className="inline-block h-3 w-3 animate-spin rounded-full border-2 border-amber-500 border-t-transparent" />